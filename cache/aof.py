@@ -0,0 +1,268 @@
+"""
+Append-only log of a node's writes.
+
+Every PUT and DEL a node applies is appended to the log, so the writes made since
+the last snapshot survive a restart: load the snapshot, then replay the log on top.
+
+Records are buffered in memory and written with one write() per commit; the node
+commits once per pipelined batch, so a batch of N writes costs one write() (and,
+with the "always" policy, one fsync) rather than N. fsync policies:
+
+    always    fsync on every commit, before the batch is answered
+    interval  write on every commit, fsync from a background thread every fsync_ms
+    never     write on every commit and leave flushing to the OS
+
+Expiry is not logged as separate events: a PUT record carries its absolute
+expires_at, so replay drops (or shortens) entries exactly as the node would have.
+
+Record layout (integers big-endian), the snapshot entry with an op byte in front:
+
+    op u8 | key_len u16 | kind u8 | value_len u32 | expires_at f64 | key | value
+
+A record cut short by a crash is discarded (and truncated away) when the log is
+next opened.
+"""
+
+import os
+import struct
+import sys
+import threading
+import time
+from typing import Any, Callable, Dict, List, Mapping, Optional, Tuple
+
+from .base import Cache
+from .snapshot import KIND_STR, KINDS, decode_value, encode_value
+
+OP_PUT = 1
+OP_DEL = 2
+
+RECORD = struct.Struct("!BHBId")
+
+FSYNC_ALWAYS = "always"
+FSYNC_INTERVAL = "interval"
+FSYNC_NEVER = "never"
+FSYNC_POLICIES = (FSYNC_ALWAYS, FSYNC_INTERVAL, FSYNC_NEVER)
+
+
+class LogError(ValueError):
+    """Raised when a file is not a readable append-only log."""
+
+
+def encode_put(key: str, value: Any, expires_at: Optional[float]) -> bytes:
+    kb = key.encode("utf-8")
+    kind, vb = encode_value(key, value)
+    return b"".join((RECORD.pack(OP_PUT, len(kb), kind, len(vb), expires_at or 0.0), kb, vb))
+
+
+def encode_del(key: str) -> bytes:
+    kb = key.encode("utf-8")
+    return RECORD.pack(OP_DEL, len(kb), KIND_STR, 0, 0.0) + kb
+
+
+def _valid_length(data: bytes) -> int:
+    """
+    Length of the longest prefix of data made of whole records.
+    """
+    offset = 0
+    size = RECORD.size
+    end = len(data)
+    while offset + size <= end:
+        op, key_len, kind, value_len, _ = RECORD.unpack_from(data, offset)
+        if op not in (OP_PUT, OP_DEL) or kind not in KINDS:
+            raise LogError(f"bad record at offset {offset}")
+        record_end = offset + size + key_len + value_len
+        if record_end > end:
+            break
+        offset = record_end
+    return offset
+
+
+class AppendOnlyLog:
+    """
+    Thread-safe writer for one log file. The append methods only buffer;
+    commit() writes the buffer (and fsyncs it under the "always" policy).
+    """
+
+    def __init__(self, path: str, fsync: str = FSYNC_INTERVAL, fsync_ms: int = 1000):
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"fsync must be one of {', '.join(FSYNC_POLICIES)}")
+        if fsync_ms <= 0:
+            raise ValueError("fsync_ms must be > 0")
+        self.path = path
+        self.fsync = fsync
+        self.fsync_ms = fsync_ms
+
+        self._lock = threading.Lock()
+        self._buf: List[bytes] = []
+        self._dirty = False  # written since the last fsync
+        self._fd = self._open()
+
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        if fsync == FSYNC_INTERVAL:
+            self._thread = threading.Thread(target=self._fsync_loop, name="cache-aof-fsync", daemon=True)
+            self._thread.start()
+
+    def _open(self) -> int:
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT | os.O_APPEND, 0o644)
+        try:
+            with open(self.path, "rb") as f:
+                data = f.read()
+            valid = _valid_length(data)
+            if valid < len(data):
+                print(
+                    f"[cache-node] discarding {len(data) - valid} bytes of torn record at the end of {self.path}",
+                    file=sys.stderr,
+                )
+                os.ftruncate(fd, valid)
+        except BaseException:
+            os.close(fd)
+            raise
+        return fd
+
+    def append(self, record: bytes) -> None:
+        """
+        Buffer one record made by encode_put or encode_del.
+        """
+        with self._lock:
+            self._buf.append(record)
+
+    def append_put(self, key: str, value: Any, expires_at: Optional[float]) -> None:
+        self.append(encode_put(key, value, expires_at))
+
+    def append_del(self, key: str) -> None:
+        self.append(encode_del(key))
+
+    def _write_locked(self) -> None:
+        if self._buf:
+            data = b"".join(self._buf)
+            self._buf.clear()
+            view = memoryview(data)
+            while view:
+                view = view[os.write(self._fd, view):]
+            self._dirty = True
+
+    def commit(self) -> None:
+        """
+        Write buffered records; under the "always" policy also fsync them.
+        """
+        with self._lock:
+            self._write_locked()
+            if self.fsync == FSYNC_ALWAYS and self._dirty:
+                os.fsync(self._fd)
+                self._dirty = False
+
+    def _fsync_loop(self) -> None:
+        while not self._stop.wait(self.fsync_ms / 1000):
+            with self._lock:
+                self._write_locked()
+                if not self._dirty:
+                    continue
+                self._dirty = False
+                # fsync a duplicate so appends are not held up and rotate() may close the original
+                fd = os.dup(self._fd)
+            try:
+                os.fsync(fd)
+            except OSError as e:
+                print(f"[cache-node] fsync of {self.path} failed: {e}", file=sys.stderr)
+            finally:
+                os.close(fd)
+
+    def size(self) -> int:
+        """
+        Bytes in the log file, not counting buffered records.
+        """
+        return os.fstat(self._fd).st_size
+
+    def rotate(self, old_path: str) -> None:
+        """
+        Make the records logged so far durable, move them to old_path and continue in
+        an empty file at path. Used by compaction: once a snapshot taken after the
+        rotation is on disk, old_path is no longer needed.
+        """
+        with self._lock:
+            self._write_locked()
+            os.fsync(self._fd)
+            self._dirty = False
+            os.replace(self.path, old_path)
+            os.close(self._fd)
+            self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT | os.O_APPEND, 0o644)
+
+    def close(self) -> None:
+        """
+        Stop the fsync thread, then write and fsync what is left.
+        """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        with self._lock:
+            if self._fd < 0:
+                return
+            self._write_locked()
+            os.fsync(self._fd)
+            os.close(self._fd)
+            self._fd = -1
+
+
+def apply_records(
+    data: bytes,
+    shards: Mapping[int, Cache[str, Any]],
+    shard_of: Callable[[str], int],
+) -> int:
+    """
+    Apply the records in data, in order, to the shards and return the number of
+    records applied. Runs of PUTs are applied with one put_many per shard; a DEL
+    first applies the PUTs pending for its shard, so each key sees its writes in
+    order. Records for shards not in `shards` are skipped; a torn record at the end
+    is ignored.
+    """
+    now = time.time()
+    unpack = RECORD.unpack_from
+    size = RECORD.size
+    end = _valid_length(data)
+    pending: Dict[int, List[Tuple[str, Any, Optional[float]]]] = {}
+    applied = 0
+    offset = 0
+    try:
+        while offset < end:
+            op, key_len, kind, value_len, expires_at = unpack(data, offset)
+            offset += size
+            key = data[offset:offset + key_len].decode("utf-8")
+            offset += key_len
+            raw = data[offset:offset + value_len]
+            offset += value_len
+
+            sid = shard_of(key)
+            if sid not in shards:
+                continue
+            if op == OP_DEL or (expires_at and expires_at <= now):
+                # a PUT that has expired since it was logged deletes the older value
+                if sid in pending:
+                    shards[sid].put_many(pending.pop(sid))
+                shards[sid].delete(key)
+            else:
+                ttl = expires_at - now if expires_at else None
+                pending.setdefault(sid, []).append((key, decode_value(kind, raw), ttl))
+            applied += 1
+    except UnicodeDecodeError as e:
+        raise LogError(f"corrupt record: {e}") from e
+
+    for sid, items in pending.items():
+        shards[sid].put_many(items)
+    return applied
+
+
+def replay_log(
+    path: str,
+    shards: Mapping[int, Cache[str, Any]],
+    shard_of: Callable[[str], int],
+) -> int:
+    """
+    Apply the records of the log file at path to the owned shards; see apply_records.
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+    try:
+        return apply_records(data, shards, shard_of)
+    except LogError as e:
+        raise LogError(f"{path}: {e}") from e
@@ -1,6 +1,13 @@
 from abc import ABC, abstractmethod
-from dataclasses import dataclass
-from typing import Generic, Hashable, TypeVar, Optional
+from collections import OrderedDict
+from dataclasses import dataclass, replace
+import math
+import threading
+import time
+from typing import Any, Callable, Dict, Generic, Hashable, Iterable, List, Optional, Tuple, TypeVar
+
+from .compression import Compressed
+from .sizing import Sizer, default_sizer
 
 K = TypeVar("K", bound=Hashable)
 V = TypeVar("V")
@@ -12,6 +19,191 @@ class CacheStats:
     evictions: int = 0
     gets: int = 0
     puts: int = 0
+    expired: int = 0
+    bytes_used: int = 0  # gauge, not a counter
+    entries: int = 0  # gauge, not a counter
+
+class ValueTooLargeError(ValueError):
+    """
+    Raised by put() when an entry is larger than the cache's max entry size or byte budget.
+    """
+
+class WrongTypeError(ValueError):
+    """
+    Raised by incr() on a value that is not an integer and by append() on one that is
+    not a str or bytes.
+    """
+
+def counter_value(value: Any) -> int:
+    """
+    The integer held by a counter: an int, or its decimal str or bytes.
+    """
+    if type(value) is Compressed:
+        value = value.decompress()
+    if type(value) is int:
+        return value
+    if isinstance(value, (str, bytes)):
+        digits = value[1:] if value[:1] in ("-", b"-") else value
+        if digits.isdigit() and digits.isascii():
+            return int(value)
+    raise WrongTypeError(f"value is not an integer: {value!r}")
+
+def as_counter(like: Any, n: int) -> Any:
+    """
+    n as the same type as the counter value like.
+    """
+    if type(like) is Compressed:
+        like = like.decompress()
+    if isinstance(like, str):
+        return str(n)
+    if isinstance(like, bytes):
+        return str(n).encode("ascii")
+    return n
+
+def appended(value: Any, suffix: Any) -> Any:
+    """
+    value + suffix, where either may be str or bytes (a str is encoded as UTF-8 to
+    join bytes). Compressed values are decompressed, and the result is not.
+    """
+    if type(value) is Compressed:
+        value = value.decompress()
+    if isinstance(value, str):
+        if isinstance(suffix, str):
+            return value + suffix
+        if isinstance(suffix, (bytes, bytearray)):
+            return value.encode("utf-8") + suffix
+    elif isinstance(value, (bytes, bytearray)):
+        if isinstance(suffix, str):
+            suffix = suffix.encode("utf-8")
+        if isinstance(suffix, (bytes, bytearray)):
+            return bytes(value) + suffix
+    raise WrongTypeError(f"cannot append {type(suffix).__name__} to {type(value).__name__}")
+
+class TimedLock:
+    """
+    Wraps a lock and reports how long each contended acquire waited, in nanoseconds.
+    Uncontended acquires are not reported. Acquiring the wrapper acquires the
+    wrapped lock, so code holding either excludes code holding the other.
+    """
+
+    __slots__ = ("lock", "timer")
+
+    def __init__(self, lock, timer: Callable[[int], None]):
+        self.lock = lock
+        self.timer = timer
+
+    def acquire(self, blocking: bool = True, timeout: float = -1) -> bool:
+        if self.lock.acquire(False):
+            return True
+        if not blocking:
+            return False
+        start = time.perf_counter_ns()
+        acquired = self.lock.acquire(True, timeout)
+        self.timer(time.perf_counter_ns() - start)
+        return acquired
+
+    def release(self) -> None:
+        self.lock.release()
+
+    def locked(self) -> bool:
+        return self.lock.locked()
+
+    __enter__ = acquire
+
+    def __exit__(self, *exc) -> None:
+        self.lock.release()
+
+# Most None results one cache remembers for get_or_load(negative_ttl=...); the oldest are dropped first
+MAX_NEGATIVE = 10_000
+
+# States returned by get_with_state(): FRESH, STALE (inside its grace window, being
+# refreshed by someone else) and REFRESH (the caller should compute and put the value)
+FRESH = "FRESH"
+STALE = "STALE"
+REFRESH = "REFRESH"
+
+class Flight:
+    """
+    One load in flight for get_or_load(). The caller that started it sets value or
+    error and then done; every other caller that missed the key waits on done.
+    stale is set when the key is written or deleted while the load runs, so its
+    result is handed to the waiters but not stored.
+    """
+
+    __slots__ = ("done", "value", "error", "stale")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value: Any = None
+        self.error: Optional[BaseException] = None
+        self.stale = False
+
+    def result(self) -> Any:
+        self.done.wait()
+        if self.error is not None:
+            raise self.error
+        return self.value
+
+class LoadGroup:
+    """
+    The loads in flight and the remembered None results of one cache. Not
+    thread-safe: the cache serializes every call with a lock.
+    """
+
+    __slots__ = ("flights", "negative", "max_negative")
+
+    def __init__(self, max_negative: int = MAX_NEGATIVE):
+        self.flights: Dict[Hashable, Flight] = {}
+        # key -> expires_at, oldest first
+        self.negative: "OrderedDict[Hashable, float]" = OrderedDict()
+        self.max_negative = max_negative
+
+    def is_negative(self, key: Hashable, now: float) -> bool:
+        expires_at = self.negative.get(key)
+        if expires_at is None:
+            return False
+        if now < expires_at:
+            return True
+        del self.negative[key]
+        return False
+
+    def join(self, key: Hashable) -> Tuple[Flight, bool]:
+        """
+        Returns (flight, started): started is True if the caller must run the load.
+        """
+        flight = self.flights.get(key)
+        if flight is not None:
+            return flight, False
+        flight = self.flights[key] = Flight()
+        return flight, True
+
+    def forget(self, key: Hashable) -> None:
+        """
+        key was written or deleted.
+        """
+        flight = self.flights.get(key)
+        if flight is not None:
+            flight.stale = True
+        self.negative.pop(key, None)
+
+    def finish(self, key: Hashable, flight: Flight, negative_ttl: Optional[float], now: float) -> None:
+        """
+        Remove the finished flight, remembering a None result for negative_ttl seconds.
+        """
+        del self.flights[key]
+        if negative_ttl is not None and flight.value is None and flight.error is None and not flight.stale:
+            self.negative[key] = now + negative_ttl
+            self.negative.move_to_end(key)
+            while len(self.negative) > self.max_negative:
+                self.negative.popitem(last=False)
+
+    def clear(self) -> None:
+        for flight in self.flights.values():
+            flight.stale = True
+        self.negative.clear()
+
+# Serializes get_or_load() bookkeeping for caches that do not override it
+_loads_lock = threading.Lock()
 
 class Cache(ABC, Generic[K, V]):
     """
@@ -20,6 +212,12 @@ class Cache(ABC, Generic[K, V]):
     Implementations (LRU, LFU, FIFO, etc.) should be drop-in replaceable.
     """
 
+    # See set_removal_listener; implementations call it where they evict or expire an entry
+    _on_remove: Optional[Callable[[K], None]] = None
+
+    # See get_or_load; created by its first miss
+    _loads: Optional[LoadGroup] = None
+
     @abstractmethod
     def get(self, key: K) -> Optional[V]:
         """
@@ -41,6 +239,197 @@ class Cache(ABC, Generic[K, V]):
         """
         ...
 
+    def get_many(self, keys: Iterable[K]) -> Dict[K, V]:
+        """
+        Return {key: value} for every key that exists within cache and is not expired.
+        Missing keys are omitted. Implementations should override this to look up the
+        whole batch under a single lock acquisition.
+        """
+        found: Dict[K, V] = {}
+        for key in keys:
+            val = self.get(key)
+            if val is not None:
+                found[key] = val
+        return found
+
+    def put_many(self, items: Iterable[Tuple[K, V, Optional[float]]]) -> None:
+        """
+        Store every (key, value, ttl) triple. ttl follows the same rules as put().
+        """
+        for key, value, ttl in items:
+            self.put(key, value, ttl)
+
+    def delete_many(self, keys: Iterable[K]) -> Dict[K, bool]:
+        """
+        Return {key: removed} for every key, where removed follows the same rules as delete().
+        """
+        return {key: self.delete(key) for key in keys}
+
+    def get_or_load(
+        self,
+        key: K,
+        loader: Callable[[K], Optional[V]],
+        ttl: Optional[float] = None,
+        negative_ttl: Optional[float] = None,
+        grace: Optional[float] = None,
+        beta: float = 0.0,
+    ) -> Optional[V]:
+        """
+        Return the value of key, calling loader(key) on a miss and putting its result
+        with ttl. Concurrent misses on the same key share one loader call: the first
+        runs it, the others wait for its result, and an exception raised by loader is
+        raised in every one of them, with nothing stored. A None result is not stored;
+        with negative_ttl set it is remembered for that many seconds, during which
+        misses return None without calling loader.
+
+        grace and beta are as for put_with_grace() and get_with_state(): the one caller
+        told to REFRESH a hit reloads it, and every other caller gets the cached value.
+
+        This default looks the key up with get() and keeps its bookkeeping under a lock
+        of its own, so a put() made while the load runs may be overwritten by the
+        loaded value, and a remembered None only ends when it expires; it ignores beta.
+        Implementations should override it to check, join and store under their own lock.
+        """
+        val = self.get(key)
+        if val is not None:
+            return val
+        with _loads_lock:
+            loads = self._loads
+            if loads is None:
+                loads = self._loads = LoadGroup()
+            if loads.is_negative(key, time.time()):
+                return None
+            flight, started = loads.join(key)
+        if not started:
+            return flight.result()
+        try:
+            flight.value = loader(key)
+            if flight.value is not None:
+                if grace is not None and ttl is not None:
+                    self.put_with_grace(key, flight.value, ttl, grace)
+                else:
+                    self.put(key, flight.value, ttl)
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with _loads_lock:
+                loads.finish(key, flight, negative_ttl, time.time())
+            flight.done.set()
+        return flight.value
+
+    def put_with_grace(self, key: K, value: V, ttl: float, grace: float, delta: Optional[float] = None) -> None:
+        """
+        put() an entry that is fresh for ttl seconds and then served stale for grace
+        more while one caller refreshes it (see get_with_state). delta is how many
+        seconds the value took to compute, for early refreshes; by default it is the
+        time from handing out the entry's REFRESH to this put. The default stores the
+        entry for ttl + grace seconds with no stale period.
+        """
+        self.put(key, value, ttl + grace)
+
+    def get_with_state(self, key: K, beta: float = 0.0) -> Tuple[Optional[V], str]:
+        """
+        Return (value, state) for key, where value is as for get() and state is FRESH,
+        STALE or REFRESH. An entry past its ttl but inside its grace window is STALE,
+        except for the first caller to read it so, who gets REFRESH and should put a
+        new value. With beta > 0 a fresh entry is also handed out for REFRESH early, at
+        random, more likely the closer its expiry and the longer its delta (XFetch:
+        when now - delta * beta * ln(random()) passes the expiry). Only one caller is
+        told to refresh an entry until it is put again. The default is always FRESH.
+        """
+        return self.get(key), FRESH
+
+    @abstractmethod
+    def incr(
+        self,
+        key: K,
+        delta: int = 1,
+        initial: Any = None,
+        ttl: Optional[float] = None,
+        encode: Optional[Callable[[Any], Any]] = None,
+    ) -> Optional[int]:
+        """
+        Atomically add delta (which may be negative) to the integer held by key, an
+        int or its decimal str or bytes, store the sum as the same type and return it.
+        The entry keeps its ttl. A missing key is created holding initial, with ttl,
+        and initial is returned; without initial, a missing key is left alone and None
+        returned. Raises WrongTypeError if the value is not an integer. encode, if
+        given, maps the value to what is stored (a node compresses it).
+        """
+        ...
+
+    @abstractmethod
+    def append(self, key: K, suffix: Any, encode: Optional[Callable[[Any], Any]] = None) -> bool:
+        """
+        Atomically append suffix to the str or bytes value of key, keeping its ttl.
+        Returns False, storing nothing, if key is missing. Raises WrongTypeError if
+        the value is not a str or bytes. encode is as for incr().
+        """
+        ...
+
+    @abstractmethod
+    def gets(self, key: K) -> Optional[Tuple[V, int]]:
+        """
+        Return (value, version) for key, or None, as for get(). The version changes
+        every time the entry is written, and is only meaningful to cas() on this cache.
+        """
+        ...
+
+    @abstractmethod
+    def cas(self, key: K, value: V, version: int, ttl: Optional[float] = None) -> Optional[bool]:
+        """
+        put() value only if key still has the version gets() returned: True if it was
+        stored, False if key was written since (nothing is stored), None if key is
+        missing.
+        """
+        ...
+
+    @abstractmethod
+    def get_entry(self, key: K) -> Optional[Tuple[V, Optional[float]]]:
+        """
+        Return (value, expires_at) for a live entry, or None, without counting a read
+        or changing the eviction order. Writers use it to log what incr() or append()
+        left in the cache.
+        """
+        ...
+
+    def expire(self, max_items: Optional[int] = None) -> int:
+        """
+        Actively remove up to max_items expired entries (all of them if None) and
+        return how many were removed. The default only expires lazily on read.
+        """
+        return 0
+
+    def set_removal_listener(self, listener: Optional[Callable[[K], None]]) -> None:
+        """
+        Call listener(key) for every entry the cache drops on its own, evicted or
+        expired. It runs under the cache's lock, so it must be quick and must not call
+        back into the cache. delete() and overwrites are not reported. None removes it.
+        """
+        self._on_remove = listener
+
+    def set_lock_timer(self, timer: Optional[Callable[[int], None]]) -> None:
+        """
+        Call timer(ns) with the time every contended acquire of the cache's lock
+        waited. None stops it. Caches without a _lock ignore this.
+        """
+        lock = getattr(self, "_lock", None)
+        if lock is None:
+            return
+        if isinstance(lock, TimedLock):
+            lock = lock.lock
+        self._lock = lock if timer is None else TimedLock(lock, timer)
+
+    def dump(self) -> List[Tuple[K, V, Optional[float]]]:
+        """
+        Return (key, value, expires_at) for every live entry, coldest first, where
+        expires_at is a UNIX timestamp or None. put()-ing the entries back in this
+        order restores the eviction order. Implementations copy under one lock
+        acquisition and leave the cache unchanged.
+        """
+        raise NotImplementedError(f"{type(self).__name__} does not support dump()")
+
     @abstractmethod
     def get_stats(self) -> CacheStats:
         """
@@ -54,3 +443,229 @@ class Cache(ABC, Generic[K, V]):
         Remove all entries from the cache.
         """
         ...
+
+class BoundedCache(Cache[K, V], Generic[K, V]):
+    """
+    Base of the eviction policies: a capacity, an optional byte budget and one lock.
+
+    - Every entry is charged sizer(key, value) bytes. Entries above max_entry_bytes or
+      max_bytes are rejected with ValueTooLargeError before the lock is taken, and a
+      ttl or grace that is not finite with ValueError (a NaN deadline would stall the
+      expiry heap).
+    - Subclasses keep their entries in self.cache and implement _get_locked,
+      _put_locked and _delete_locked; get/put/delete and the batch methods run them
+      under self._lock, a batch under a single acquisition.
+    """
+    def __init__(
+        self,
+        capacity: int,
+        max_bytes: Optional[int] = None,
+        max_entry_bytes: Optional[int] = None,
+        sizer: Optional[Sizer] = None,
+    ):
+        if capacity <= 0:
+            raise ValueError(f"{type(self).__name__} capacity must be > 0")
+        if max_bytes is not None and max_bytes <= 0:
+            raise ValueError("max_bytes must be > 0")
+        if max_entry_bytes is not None and max_entry_bytes <= 0:
+            raise ValueError("max_entry_bytes must be > 0")
+
+        self.capacity = capacity
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_entry_bytes
+        self.sizer: Sizer = sizer or default_sizer
+        self.cache: Dict[K, Any] = {}
+        self._bytes_used = 0
+
+        self._lock = threading.Lock()
+        self._stats = CacheStats()
+        # Cache-wide write counter: _put_locked gives every entry it writes the next
+        # value as its version, so a version is never reused while the cache lives
+        self._version = 0
+
+    def _check_size(self, key: K, value: V, ttl: Optional[float] = None, grace: Optional[float] = None) -> int:
+        for name, seconds in (("ttl", ttl), ("grace", grace)):
+            if seconds is not None and not math.isfinite(seconds):
+                raise ValueError(f"{name} must be finite, got {seconds}")
+        size = self.sizer(key, value)
+        if self.max_entry_bytes is not None and size > self.max_entry_bytes:
+            raise ValueTooLargeError(f"entry of {size} bytes exceeds max_entry_bytes={self.max_entry_bytes}")
+        if self.max_bytes is not None and size > self.max_bytes:
+            raise ValueTooLargeError(f"entry of {size} bytes exceeds max_bytes={self.max_bytes}")
+        return size
+
+    @abstractmethod
+    def _get_locked(self, key: K, now: float) -> Optional[V]:
+        """
+        get() body; caller must hold self._lock
+        """
+        ...
+
+    @abstractmethod
+    def _put_locked(self, key: K, value: V, ttl: Optional[float], now: float, size: int) -> None:
+        """
+        put() body; caller must hold self._lock and have sized the entry with _check_size
+        """
+        ...
+
+    @abstractmethod
+    def _delete_locked(self, key: K) -> bool:
+        """
+        delete() body; caller must hold self._lock
+        """
+        ...
+
+    @abstractmethod
+    def _entry_locked(self, key: K, now: float) -> Optional[Tuple[V, Optional[float], int]]:
+        """
+        (value, expires_at, version) of key's live entry, without counting a read or
+        changing the eviction order; an expired entry is removed. Caller must hold self._lock.
+        """
+        ...
+
+    def _replace_locked(self, key: K, value: V, expires_at: Optional[float], now: float, size: int) -> None:
+        """
+        Give key's live entry a new value, keeping its expiry; caller must hold
+        self._lock and have sized the entry with _check_size
+        """
+        self._put_locked(key, value, None if expires_at is None else expires_at - now, now, size)
+
+    def get(self, key: K) -> Optional[V]:
+        with self._lock:
+            return self._get_locked(key, time.time())
+
+    def put(self, key: K, value: V, ttl: Optional[float] = None) -> None:
+        size = self._check_size(key, value, ttl)
+        with self._lock:
+            self._put_locked(key, value, ttl, time.time(), size)
+
+    def delete(self, key: K) -> bool:
+        """
+        Return True if key existed and was removed, False otherwise.
+        """
+        with self._lock:
+            return self._delete_locked(key)
+
+    def get_many(self, keys: Iterable[K]) -> Dict[K, V]:
+        """
+        Look up every key under one lock acquisition. Missing or expired keys are omitted.
+        """
+        found: Dict[K, V] = {}
+        with self._lock:
+            now = time.time()
+            for key in keys:
+                val = self._get_locked(key, now)
+                if val is not None:
+                    found[key] = val
+        return found
+
+    def put_many(self, items: Iterable[Tuple[K, V, Optional[float]]]) -> None:
+        """
+        Store every (key, value, ttl) triple under one lock acquisition. Every entry is
+        sized first, so an oversized entry rejects the whole batch before anything is stored.
+        """
+        sized = [(key, value, ttl, self._check_size(key, value, ttl)) for key, value, ttl in items]
+        with self._lock:
+            now = time.time()
+            for key, value, ttl, size in sized:
+                self._put_locked(key, value, ttl, now, size)
+
+    def delete_many(self, keys: Iterable[K]) -> Dict[K, bool]:
+        """
+        Delete every key under one lock acquisition.
+        """
+        with self._lock:
+            return {key: self._delete_locked(key) for key in keys}
+
+    def incr(
+        self,
+        key: K,
+        delta: int = 1,
+        initial: Any = None,
+        ttl: Optional[float] = None,
+        encode: Optional[Callable[[Any], Any]] = None,
+    ) -> Optional[int]:
+        """
+        See Cache.incr. The read and the write run under one lock acquisition.
+        """
+        with self._lock:
+            now = time.time()
+            entry = self._entry_locked(key, now)
+            if entry is None:
+                if initial is None:
+                    return None
+                n = counter_value(initial)
+                if encode is not None:
+                    initial = encode(initial)
+                self._put_locked(key, initial, ttl, now, self._check_size(key, initial, ttl))
+                return n
+            val, expires_at, _ = entry
+            n = counter_value(val) + delta
+            value = as_counter(val, n)
+            if encode is not None:
+                value = encode(value)
+            self._replace_locked(key, value, expires_at, now, self._check_size(key, value))
+            return n
+
+    def append(self, key: K, suffix: Any, encode: Optional[Callable[[Any], Any]] = None) -> bool:
+        """
+        See Cache.append. The read and the write run under one lock acquisition.
+        """
+        with self._lock:
+            now = time.time()
+            entry = self._entry_locked(key, now)
+            if entry is None:
+                return False
+            val, expires_at, _ = entry
+            value = appended(val, suffix)
+            if encode is not None:
+                value = encode(value)
+            self._replace_locked(key, value, expires_at, now, self._check_size(key, value))
+            return True
+
+    def gets(self, key: K) -> Optional[Tuple[V, int]]:
+        """
+        See Cache.gets. Versions come from a cache-wide write counter, so one is never
+        reused while the cache lives.
+        """
+        with self._lock:
+            now = time.time()
+            val = self._get_locked(key, now)
+            if val is None:
+                return None
+            return val, self._entry_locked(key, now)[2]
+
+    def cas(self, key: K, value: V, version: int, ttl: Optional[float] = None) -> Optional[bool]:
+        """
+        See Cache.cas. The version check and the write run under one lock acquisition.
+        """
+        size = self._check_size(key, value, ttl)
+        with self._lock:
+            now = time.time()
+            entry = self._entry_locked(key, now)
+            if entry is None:
+                return None
+            if entry[2] != version:
+                return False
+            self._put_locked(key, value, ttl, now, size)
+            return True
+
+    def get_entry(self, key: K) -> Optional[Tuple[V, Optional[float]]]:
+        with self._lock:
+            entry = self._entry_locked(key, time.time())
+            if entry is None:
+                return None
+            return entry[0], entry[1]
+
+    def _stats_locked(self) -> CacheStats:
+        """
+        get_stats() body; caller must hold self._lock
+        """
+        return replace(self._stats, bytes_used=self._bytes_used, entries=len(self.cache))
+
+    def get_stats(self) -> CacheStats:
+        """
+        Returns collected stats for gets, puts, hits, misses, and evictions.
+        """
+        with self._lock:
+            return self._stats_locked()
@@ -0,0 +1,102 @@
+"""
+Concurrent counter updates over TCP: GET then PUT, GETS then CAS, and INCR.
+
+THREADS threads each bump one of --keys shared counters --ops times through one
+node, as a rate limiter would. Runs:
+
+    GET+PUT      read, add one, write back: two round trips, and racing writers
+                 overwrite each other's increments
+    GETS+CAS     read with a version and write only if it is unchanged, retrying
+                 on EXISTS: no lost updates, but conflicts cost extra round trips
+    INCR         one round trip, applied under the shard lock
+
+Every run reports throughput, round trips per update, and how many updates are
+missing from the final counts.
+"""
+
+import argparse
+import json
+import os
+import tempfile
+import threading
+import time
+from typing import Callable, Dict
+
+from ..client import CacheClient
+from .replication_benchmarks import start_node
+from .worker_benchmarks import free_port
+
+THREADS = 8
+N_SHARDS = 4
+
+
+def run(client: CacheClient, keys: int, ops: int, bump: Callable[[str], int]) -> Dict[str, float]:
+    names = [f"counter{i}" for i in range(keys)]
+    client.mset((name, "0", None) for name in names)
+    trips = [0] * THREADS
+
+    def worker(t: int) -> None:
+        for i in range(ops):
+            trips[t] += bump(names[(t + i) % keys])
+
+    threads = [threading.Thread(target=worker, args=(t,)) for t in range(THREADS)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    seconds = time.perf_counter() - start
+
+    updates = THREADS * ops
+    counted = sum(int(v) for v in client.mget(names).values())
+    return {"updates_s": updates / seconds, "trips": sum(trips) / updates, "lost": updates - counted}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Counter updates with GET+PUT, GETS+CAS and INCR")
+    parser.add_argument("--ops", type=int, default=500, help="Updates per thread")
+    parser.add_argument("--keys", type=int, default=4, help="Counters the threads share")
+    args = parser.parse_args()
+
+    print("--- Atomic Update Benchmark ---")
+    print(f"{THREADS} threads x {args.ops:,} updates over {args.keys} shared counters\n")
+
+    with tempfile.TemporaryDirectory() as config_dir:
+        port = free_port()
+        cluster_path = os.path.join(config_dir, "cluster.json")
+        node_path = os.path.join(config_dir, "node.json")
+        with open(cluster_path, "w") as f:
+            json.dump({"n_shards": N_SHARDS, "cluster_map": {str(s): ["127.0.0.1", port] for s in range(N_SHARDS)}}, f)
+        with open(node_path, "w") as f:
+            json.dump({"host": "127.0.0.1", "port": port, "owned_shards": list(range(N_SHARDS)), "capacity": 1000}, f)
+
+        proc = start_node(cluster_path, node_path, port)
+        try:
+            with CacheClient.from_config(cluster_path, pool_size=THREADS) as client:
+                def get_put(key: str) -> int:
+                    client.put(key, str(int(client.get(key)) + 1))
+                    return 2
+
+                def gets_cas(key: str) -> int:
+                    trips = 0
+                    while True:
+                        value, version = client.gets(key)
+                        trips += 2
+                        if client.cas(key, str(int(value) + 1), version):
+                            return trips
+
+                def incr(key: str) -> int:
+                    client.incr(key)
+                    return 1
+
+                print(f"{'run':>9} {'updates/s':>10} {'round trips':>12} {'lost':>7}")
+                for name, bump in (("GET+PUT", get_put), ("GETS+CAS", gets_cas), ("INCR", incr)):
+                    r = run(client, args.keys, args.ops, bump)
+                    print(f"{name:>9} {r['updates_s']:>10,.0f} {r['trips']:>12.2f} {r['lost']:>7,}")
+        finally:
+            proc.terminate()
+            proc.wait()
+
+
+if __name__ == "__main__":
+    main()
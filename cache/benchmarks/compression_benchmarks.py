@@ -0,0 +1,116 @@
+"""
+Memory and throughput of a node with and without value compression, by value size.
+
+For each size, VALUES distinct JSON documents of about that size (records with
+repeated field names and a mix of numbers and short strings, serialized without
+whitespace, as an API would cache them) are written with PUT and read back with
+GET through CacheNode.handle, once with compression off and once with
+compress_threshold set. Reported per run: bytes the shards hold, PUT and GET
+throughput in MB/s of original value bytes, and the compression ratio. The
+"passthrough" column is binary GETs with Opcode.ACCEPT_COMPRESSED, which skip
+decompression.
+"""
+
+import argparse
+import json
+import random
+import time
+from typing import Dict, List, Optional
+
+from ..cache_node import CacheNode, CacheNodeConfig
+from ..protocol import Opcode
+
+N_SHARDS = 4
+VALUES = 200
+SIZES = [1_000, 10_000, 50_000, 200_000]
+WORDS = ["alpha", "bravo", "charlie", "delta", "echo", "foxtrot", "golf", "hotel", "india", "juliet"]
+
+
+def json_blob(size: int, rng: random.Random) -> str:
+    records = []
+    length = 2
+    while length < size:
+        record = {
+            "id": rng.randrange(10**9),
+            "name": f"{rng.choice(WORDS)}-{rng.choice(WORDS)}",
+            "score": round(rng.random() * 100, 3),
+            "tags": rng.sample(WORDS, 3),
+            "active": rng.random() < 0.5,
+            "created_at": 1_700_000_000 + rng.randrange(10**7),
+        }
+        text = json.dumps(record, separators=(",", ":"))
+        records.append(text)
+        length += len(text) + 1
+    return "[" + ",".join(records) + "]"
+
+
+def make_node(threshold: Optional[int]) -> CacheNode:
+    return CacheNode(CacheNodeConfig(
+        node_id="bench",
+        host="127.0.0.1",
+        port=0,
+        n_shards=N_SHARDS,
+        owned_shards=set(range(N_SHARDS)),
+        cluster_map={s: ("127.0.0.1", 0) for s in range(N_SHARDS)},
+        capacity=VALUES * 2,
+        compress_threshold=threshold,
+    ))
+
+
+def run(blobs: List[str], threshold: Optional[int], rounds: int) -> Dict[str, float]:
+    node = make_node(threshold)
+    total = sum(len(b) for b in blobs) * rounds
+    keys = [f"doc{i}" for i in range(len(blobs))]
+
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for key, blob in zip(keys, blobs):
+            node.handle(f"PUT {key} {blob}")
+    put_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for key in keys:
+            node.handle(f"GET {key}")
+    get_s = time.perf_counter() - start
+
+    frames = [(Opcode.GET | Opcode.ACCEPT_COMPRESSED, key, b"", None) for key in keys]
+    start = time.perf_counter()
+    for _ in range(rounds):
+        node.handle_frames(frames)
+    passthrough_s = time.perf_counter() - start
+
+    return {
+        "bytes_used": sum(shard.get_stats().bytes_used for shard in node.local_shards.values()),
+        "put_mb_s": total / put_s / 1e6,
+        "get_mb_s": total / get_s / 1e6,
+        "passthrough_mb_s": total / passthrough_s / 1e6,
+        "ratio": node.compression.ratio(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Value compression: memory vs throughput by value size")
+    parser.add_argument("--threshold", type=int, default=4096, help="compress_threshold for the compressed runs")
+    parser.add_argument("--rounds", type=int, default=3, help="Times every value is written and read")
+    args = parser.parse_args()
+
+    print("--- Compression Benchmark ---")
+    print(f"{VALUES} JSON values per size, compress_threshold {args.threshold:,}, {args.rounds} rounds\n")
+    print(
+        f"{'value size':>10} {'compress':>9} {'MB held':>8} {'ratio':>6} {'PUT MB/s':>9} {'GET MB/s':>9} "
+        f"{'passthrough MB/s':>17}"
+    )
+    rng = random.Random(42)
+    for size in SIZES:
+        blobs = [json_blob(size, rng) for _ in range(VALUES)]
+        for threshold in (None, args.threshold):
+            r = run(blobs, threshold, args.rounds)
+            print(
+                f"{size:>10,} {'on' if threshold else 'off':>9} {r['bytes_used'] / 1e6:>8.2f} {r['ratio']:>6.2f} "
+                f"{r['put_mb_s']:>9.0f} {r['get_mb_s']:>9.0f} {r['passthrough_mb_s']:>17.0f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
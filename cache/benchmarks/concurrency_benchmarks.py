@@ -0,0 +1,97 @@
+"""
+Benchmark server throughput as the number of concurrent client connections grows.
+Every client runs a closed request/response loop on its own connection for a fixed
+duration; all clients share one asyncio event loop so the benchmark itself can
+hold thousands of sockets open.
+
+Run against a node started with `--mode asyncio` (the default). A node started
+with `--mode blocking` only serves the first connection.
+"""
+
+import asyncio
+import time
+import zlib
+
+HOST = "127.0.0.1"
+PORT = 9000
+
+CLIENT_COUNTS = [1, 10, 100, 1000]
+DURATION = 5.0      # seconds per client count
+KEYSPACE = 10_000   # number of rotating keys
+READ_RATIO = 0.5    # 50% GET, 50% PUT
+
+# Keys that hash to shards owned by the node under test.
+OWNED_SHARDS = {0, 1}
+N_SHARDS = 4
+
+
+def owned_keys():
+    keys = []
+    i = 0
+    while len(keys) < KEYSPACE:
+        key = f"key{i}"
+        if zlib.crc32(key.encode("utf-8")) % N_SHARDS in OWNED_SHARDS:
+            keys.append(key)
+        i += 1
+    return keys
+
+
+async def client(client_id: int, keys, deadline: float, counts) -> None:
+    reader, writer = await asyncio.open_connection(HOST, PORT)
+    value = "x" * 32  # 32-byte payload
+    i = client_id
+    ops = 0
+
+    try:
+        while time.perf_counter() < deadline:
+            key = keys[i % len(keys)]
+            if (i % 100) < (READ_RATIO * 100):
+                cmd = f"GET {key}\n"
+            else:
+                cmd = f"PUT {key} {value}\n"
+
+            writer.write(cmd.encode("utf-8"))
+            line = await reader.readline()
+            if not line:
+                raise ConnectionError("Server closed connection")
+            ops += 1
+            i += 1
+    finally:
+        writer.close()
+        await writer.wait_closed()
+
+    counts.append(ops)
+
+
+async def run_level(n_clients: int, keys) -> float:
+    counts = []
+    deadline = time.perf_counter() + DURATION
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client(c, keys, deadline, counts) for c in range(n_clients)))
+    duration = time.perf_counter() - start
+
+    return sum(counts) / duration
+
+
+async def main_async() -> None:
+    keys = owned_keys()
+
+    print(f"--- Concurrent Clients TCP Benchmark ---")
+    print(f"Server: {HOST}:{PORT}")
+    print(f"Duration per level: {DURATION:.1f}s")
+    print(f"Keyspace: {KEYSPACE:,}")
+    print(f"GET/PUT ratio: {READ_RATIO*100:.0f}% / {100-READ_RATIO*100:.0f}%\n")
+
+    print(f"{'clients':>8}  {'ops/sec':>12}")
+    for n_clients in CLIENT_COUNTS:
+        ops_sec = await run_level(n_clients, keys)
+        print(f"{n_clients:>8}  {ops_sec:>12,.0f}")
+
+
+def main():
+    asyncio.run(main_async())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Hit ratio of each eviction policy on synthetic traces. Every access is a read-through:
+GET, and on a miss PUT the key.
+
+- zipf:  keys drawn from a Zipfian distribution (stable hot set)
+- scan:  the same Zipfian traffic, interrupted by long one-off sequential scans
+- loop:  a cyclic scan over a keyspace slightly larger than the cache (LRU's worst case)
+"""
+
+import bisect
+import itertools
+import random
+from typing import Callable, Dict, List, Sequence
+
+from ..base import Cache
+from ..eviction import EvictionPolicy
+from ..factory import CacheFactory
+
+CAPACITY = 1_000
+KEYSPACE = 100_000
+N_REQUESTS = 300_000
+ZIPF_ALPHA = 0.9
+
+
+def zipf_trace(n: int, keyspace: int, alpha: float, seed: int = 1) -> List[int]:
+    rng = random.Random(seed)
+    weights = [1.0 / (rank ** alpha) for rank in range(1, keyspace + 1)]
+    cdf = list(itertools.accumulate(weights))
+    total = cdf[-1]
+    return [bisect.bisect_left(cdf, rng.random() * total) for _ in range(n)]
+
+
+def scan_polluted_trace(n: int, keyspace: int, alpha: float, scan_len: int, every: int, seed: int = 1) -> List[int]:
+    """
+    Zipfian traffic with a scan of scan_len never-repeated keys after every `every` requests.
+    """
+    base = zipf_trace(n, keyspace, alpha, seed)
+    trace: List[int] = []
+    next_scan_key = keyspace
+    for i in range(0, n, every):
+        trace.extend(base[i:i + every])
+        trace.extend(range(next_scan_key, next_scan_key + scan_len))
+        next_scan_key += scan_len
+    return trace
+
+
+def loop_trace(n: int, loop_len: int) -> List[int]:
+    return [i % loop_len for i in range(n)]
+
+
+def hit_ratio(make_cache: Callable[[], Cache], trace: Sequence[int]) -> float:
+    cache = make_cache()
+    hits = 0
+    for key in trace:
+        if cache.get(key) is None:
+            cache.put(key, key)
+        else:
+            hits += 1
+    return hits / len(trace)
+
+
+def policies(capacity: int) -> Dict[str, Callable[[], Cache]]:
+    from ..lfu import LFUCache
+
+    return {
+        "LRU": lambda: CacheFactory.create_local_cache(capacity, EvictionPolicy.LRU),
+        "LFU": lambda: CacheFactory.create_local_cache(capacity, EvictionPolicy.LFU),
+        "LFU (decay)": lambda: LFUCache(capacity, decay_after=10 * capacity),
+        "SIEVE": lambda: CacheFactory.create_local_cache(capacity, EvictionPolicy.SIEVE),
+        "W-TinyLFU": lambda: CacheFactory.create_local_cache(capacity, EvictionPolicy.TINYLFU),
+    }
+
+
+def traces() -> Dict[str, List[int]]:
+    return {
+        "zipf": zipf_trace(N_REQUESTS, KEYSPACE, ZIPF_ALPHA),
+        "scan": scan_polluted_trace(N_REQUESTS, KEYSPACE, ZIPF_ALPHA, scan_len=5 * CAPACITY, every=20_000),
+        "loop": loop_trace(N_REQUESTS, int(CAPACITY * 1.25)),
+    }
+
+
+def main():
+    print(f"--- Hit Ratio Benchmark ---")
+    print(f"Capacity: {CAPACITY:,}")
+    print(f"Keyspace: {KEYSPACE:,}, Zipf alpha: {ZIPF_ALPHA}\n")
+
+    all_traces = traces()
+    candidates = policies(CAPACITY)
+
+    print(f"{'policy':<14}" + "".join(f"{name:>10}" for name in all_traces))
+    for name, make_cache in candidates.items():
+        ratios = [hit_ratio(make_cache, trace) for trace in all_traces.values()]
+        print(f"{name:<14}" + "".join(f"{r * 100:>9.1f}%" for r in ratios))
+
+
+if __name__ == "__main__":
+    main()
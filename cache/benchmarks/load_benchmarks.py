@@ -0,0 +1,439 @@
+"""
+Open-loop load generator: many clients, a fixed arrival rate, production-like keys.
+
+Closed-loop benchmarks (send, wait for the reply, send the next) slow down with the
+server, so a stall delays the requests that would have queued behind it and they
+never show up in the percentiles (coordinated omission). Here every request has an
+intended send time drawn from the arrival process (--arrival: evenly spaced or
+Poisson at --rate requests/s, split over --processes), requests are pipelined on
+their connection without waiting for earlier replies, and latency is measured from
+the intended send time. If the generator itself falls behind, that time counts as
+latency too; "lag" in the output shows how late requests were actually sent.
+
+Each process runs an asyncio loop with its share of --clients connections to every
+node (the cluster map is read from --host/--port with CLUSTER MAP, so keys are sent
+straight to their owner). Keys are drawn uniformly, from a Zipf distribution
+(--zipf-alpha), or from a hotspot (--hot-keys of the keyspace get --hot-ops of the
+requests); value sizes are fixed, uniform or Pareto (--value-size). Latencies go
+into cache.metrics.LatencyHistogram, merged across processes, and --output writes
+them with the run's settings as JSON; --baseline compares with such a file.
+
+    python -m cache.benchmarks.load_benchmarks --spawn --rate 5000 --key-dist zipf --preload
+"""
+
+import argparse
+import asyncio
+import bisect
+import itertools
+import json
+import multiprocessing
+import random
+import socket
+import sys
+import tempfile
+import time
+from collections import deque
+from dataclasses import asdict, dataclass
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+from ..cache_node import key_shard
+from ..metrics import LatencyHistogram
+from .tcp_benchmarks import LineReader
+from .worker_benchmarks import free_port, start_node
+
+KEY_DISTRIBUTIONS = ("uniform", "zipf", "hotspot")
+ARRIVALS = ("uniform", "poisson")
+
+# Largest value the generator sends; Pareto sizes are capped here
+MAX_VALUE_SIZE = 16 * 1024
+
+# Seconds to wait for replies still outstanding when the run ends
+DRAIN_TIMEOUT = 5.0
+
+PRELOAD_BATCH = 256
+
+Address = Tuple[str, int]
+
+
+@dataclass(frozen=True)
+class Workload:
+    keyspace: int = 100_000
+    key_dist: str = "uniform"
+    zipf_alpha: float = 0.99
+    hot_keys: float = 0.01  # fraction of the keyspace that is hot
+    hot_ops: float = 0.9    # fraction of requests that go to hot keys
+    value_size: str = "100"
+    read_ratio: float = 0.9
+
+
+def key_chooser(workload: Workload, rng: random.Random) -> Callable[[], int]:
+    """
+    Returns a function drawing key indexes in [0, keyspace).
+    """
+    n = workload.keyspace
+    if workload.key_dist == "uniform":
+        return lambda: rng.randrange(n)
+    if workload.key_dist == "zipf":
+        weights = [1.0 / (rank ** workload.zipf_alpha) for rank in range(1, n + 1)]
+        cdf = list(itertools.accumulate(weights))
+        total = cdf[-1]
+        return lambda: bisect.bisect_left(cdf, rng.random() * total)
+    if workload.key_dist == "hotspot":
+        n_hot = min(n, max(1, int(n * workload.hot_keys)))
+        hot_ops = workload.hot_ops if n_hot < n else 1.0
+        return lambda: rng.randrange(n_hot) if rng.random() < hot_ops else rng.randrange(n_hot, n)
+    raise ValueError(f"key distribution must be one of {', '.join(KEY_DISTRIBUTIONS)}")
+
+
+def value_sizer(spec: str, rng: random.Random) -> Callable[[], int]:
+    """
+    Returns a function drawing value sizes in bytes from spec: "N" (always N),
+    "uniform:LO:HI" or "pareto:MIN:ALPHA" (heavy tailed, capped at MAX_VALUE_SIZE).
+    """
+    kind, *params = spec.split(":")
+    try:
+        if not params:
+            size = int(kind)
+            if not 1 <= size <= MAX_VALUE_SIZE:
+                raise ValueError
+            return lambda: size
+        if kind == "uniform" and len(params) == 2:
+            low, high = int(params[0]), int(params[1])
+            if not 1 <= low <= high <= MAX_VALUE_SIZE:
+                raise ValueError
+            return lambda: rng.randint(low, high)
+        if kind == "pareto" and len(params) == 2:
+            low, alpha = int(params[0]), float(params[1])
+            if not 1 <= low <= MAX_VALUE_SIZE or alpha <= 0:
+                raise ValueError
+            return lambda: min(MAX_VALUE_SIZE, int(low * rng.paretovariate(alpha)))
+    except ValueError:
+        pass
+    raise ValueError(f"bad value size {spec!r}: expected N, uniform:LO:HI or pareto:MIN:ALPHA (sizes 1..{MAX_VALUE_SIZE})")
+
+
+def arrivals(rate: float, kind: str, rng: random.Random):
+    """
+    Yields intended send times, in seconds from the start of the run.
+    """
+    t = 0.0
+    while True:
+        t += rng.expovariate(rate) if kind == "poisson" else 1.0 / rate
+        yield t
+
+
+def read_cluster_map(address: Address) -> Tuple[int, Dict[int, Address]]:
+    """
+    (n_shards, shard id -> owner address) from the node at address.
+    """
+    with socket.create_connection(address, timeout=5) as sock:
+        sock.sendall(b"CLUSTER MAP\n")
+        reader = LineReader(sock)
+        header = reader.readline()
+        if not header.startswith("MULTI "):
+            raise RuntimeError(f"unexpected CLUSTER MAP reply: {header}")
+        lines = [reader.readline() for _ in range(int(header.split()[1]))]
+    owners: Dict[int, Address] = {}
+    for line in lines:
+        fields = line.split()
+        if fields[0] == "SHARD":
+            host, _, port = fields[2].rpartition(":")
+            owners[int(fields[1])] = (host, int(port))
+    return len(owners), owners
+
+
+def preload(workload: Workload, n_shards: int, owners: Dict[int, Address], seed: int) -> None:
+    """
+    PUT every key once, so GETs hit from the start.
+    """
+    sizes = value_sizer(workload.value_size, random.Random(seed))
+    payload = "x" * MAX_VALUE_SIZE
+    by_address: Dict[Address, List[str]] = {}
+    for i in range(workload.keyspace):
+        key = f"key{i}"
+        by_address.setdefault(owners[key_shard(key, n_shards)], []).append(f"PUT {key} {payload[:sizes()]}")
+    for address, lines in by_address.items():
+        with socket.create_connection(address) as sock:
+            reader = LineReader(sock)
+            for start in range(0, len(lines), PRELOAD_BATCH):
+                batch = lines[start:start + PRELOAD_BATCH]
+                sock.sendall(("\n".join(batch) + "\n").encode("utf-8"))
+                for _ in batch:
+                    reader.readline()
+
+
+class _Connection:
+    """
+    One pipelined connection. Replies come back in request order, so each is
+    matched with the oldest outstanding request.
+    """
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter, result: "_Result"):
+        self.writer = writer
+        self.pending: Deque[Tuple[float, float, bool, bool]] = deque()  # intended, sent, is_get, measured
+        self.result = result
+        self.task = asyncio.ensure_future(self._read(reader))
+
+    def send(self, line: bytes, intended: float, is_get: bool, measured: bool) -> None:
+        self.pending.append((intended, time.perf_counter(), is_get, measured))
+        self.writer.write(line)
+
+    async def _read(self, reader: asyncio.StreamReader) -> None:
+        result = self.result
+        while True:
+            reply = await reader.readline()
+            if not reply:
+                return
+            now = time.perf_counter()
+            intended, sent, is_get, measured = self.pending.popleft()
+            if measured:
+                result.record(reply, now - intended, now - sent, sent - intended, is_get)
+
+
+class _Result:
+    def __init__(self):
+        self.latency = LatencyHistogram()  # from the intended send time
+        self.service = LatencyHistogram()  # from the actual send time
+        self.lag = LatencyHistogram()      # actual - intended send time
+        self.counts = dict.fromkeys(("gets", "hits", "misses", "puts", "errors"), 0)
+
+    def record(self, reply: bytes, latency: float, service: float, lag: float, is_get: bool) -> None:
+        self.latency.record(int(latency * 1e9))
+        self.service.record(int(service * 1e9))
+        self.lag.record(max(0, int(lag * 1e9)))
+        counts = self.counts
+        if is_get:
+            counts["gets"] += 1
+            if reply.startswith(b"VALUE"):
+                counts["hits"] += 1
+            elif reply.startswith(b"NOT_FOUND"):
+                counts["misses"] += 1
+            else:
+                counts["errors"] += 1
+        else:
+            counts["puts"] += 1
+            if not reply.startswith(b"STORED"):
+                counts["errors"] += 1
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "counts": self.counts,
+            "latency": self.latency.to_dict(),
+            "service": self.service.to_dict(),
+            "lag": self.lag.to_dict(),
+        }
+
+
+async def _generate(
+    workload: Workload, n_shards: int, owners: Dict[int, Address], rate: float, arrival: str,
+    connections: int, warmup: float, seconds: float, seed: int,
+) -> Dict[str, Any]:
+    rng = random.Random(seed)
+    choose_key = key_chooser(workload, rng)
+    sizes = value_sizer(workload.value_size, rng)
+    payload = "x" * MAX_VALUE_SIZE
+    result = _Result()
+
+    pools: Dict[Address, List[_Connection]] = {}
+    for address in sorted(set(owners.values())):
+        pools[address] = []
+        for _ in range(connections):
+            reader, writer = await asyncio.open_connection(*address)
+            writer.get_extra_info("socket").setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            pools[address].append(_Connection(reader, writer, result))
+    by_shard = {sid: itertools.cycle(pools[address]) for sid, address in owners.items()}
+    # shard of every key, computed up front so the send loop stays cheap
+    key_shards = [key_shard(f"key{i}", n_shards) for i in range(workload.keyspace)]
+
+    sent = 0
+    end = warmup + seconds
+    start = time.perf_counter()
+    schedule = arrivals(rate, arrival, rng)
+    for offset in schedule:
+        if offset >= end:
+            break
+        delay = start + offset - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        key = choose_key()
+        is_get = rng.random() < workload.read_ratio
+        line = f"GET key{key}\n" if is_get else f"PUT key{key} {payload[:sizes()]}\n"
+        next(by_shard[key_shards[key]]).send(line.encode("utf-8"), start + offset, is_get, offset >= warmup)
+        sent += 1
+    elapsed = time.perf_counter() - start
+
+    # wait for the replies still outstanding, then close
+    conns = [conn for pool in pools.values() for conn in pool]
+    deadline = time.perf_counter() + DRAIN_TIMEOUT
+    while any(conn.pending for conn in conns) and time.perf_counter() < deadline:
+        await asyncio.sleep(0.01)
+    unanswered = sum(len(conn.pending) for conn in conns)
+    for conn in conns:
+        conn.writer.close()
+        conn.task.cancel()
+    await asyncio.gather(*(conn.task for conn in conns), return_exceptions=True)
+
+    out = result.to_dict()
+    out.update(sent=sent, elapsed=elapsed, unanswered=unanswered)
+    return out
+
+
+def _worker(args: Tuple[Any, ...]) -> Dict[str, Any]:
+    return asyncio.run(_generate(*args))
+
+
+def summarize(hist: LatencyHistogram) -> Dict[str, float]:
+    return {
+        "mean_us": round(hist.mean() * 1e6, 1),
+        "p50_us": round(hist.percentile(0.5) * 1e6, 1),
+        "p99_us": round(hist.percentile(0.99) * 1e6, 1),
+        "p999_us": round(hist.percentile(0.999) * 1e6, 1),
+        "max_us": round(hist.max_ns / 1e3, 1),
+    }
+
+
+def run_load(
+    address: Address, workload: Workload, rate: float, arrival: str = "poisson", processes: int = 1,
+    clients: int = 4, warmup: float = 1.0, seconds: float = 10.0, seed: int = 1,
+) -> Dict[str, Any]:
+    """
+    Drive the cluster reachable at address at rate requests/s and return the merged
+    results (the JSON written by --output).
+    """
+    if rate <= 0 or processes <= 0 or clients < processes or seconds <= 0 or warmup < 0:
+        raise ValueError("need rate > 0, processes > 0, clients >= processes, seconds > 0 and warmup >= 0")
+    key_chooser(workload, random.Random())
+    value_sizer(workload.value_size, random.Random())
+    n_shards, owners = read_cluster_map(address)
+
+    jobs = []
+    for i in range(processes):
+        connections = clients // processes + (i < clients % processes)
+        jobs.append((workload, n_shards, owners, rate / processes, arrival, connections, warmup, seconds, seed + i))
+    if processes == 1:
+        parts = [_worker(jobs[0])]
+    else:
+        with multiprocessing.Pool(processes) as pool:
+            parts = pool.map(_worker, jobs)
+
+    merged = {name: LatencyHistogram() for name in ("latency", "service", "lag")}
+    counts: Dict[str, int] = {}
+    for part in parts:
+        for name, hist in merged.items():
+            hist.merge(LatencyHistogram.from_dict(part[name]))
+        for name, n in part["counts"].items():
+            counts[name] = counts.get(name, 0) + n
+    completed = merged["latency"].count
+    return {
+        "config": {
+            "address": f"{address[0]}:{address[1]}", "rate": rate, "arrival": arrival, "processes": processes,
+            "clients": clients, "warmup": warmup, "seconds": seconds, "seed": seed, **asdict(workload),
+        },
+        "sent": sum(part["sent"] for part in parts),
+        "unanswered": sum(part["unanswered"] for part in parts),
+        "throughput": completed / seconds,
+        "generator_seconds": max(part["elapsed"] for part in parts),
+        "counts": counts,
+        "summary": {name: summarize(hist) for name, hist in merged.items()},
+        "histograms": {name: hist.to_dict() for name, hist in merged.items()},
+    }
+
+
+def print_results(results: Dict[str, Any], baseline: Optional[Dict[str, Any]]) -> None:
+    counts = results["counts"]
+    print(f"Throughput: {results['throughput']:,.0f} req/s (target {results['config']['rate']:,.0f})")
+    print(
+        f"GETs {counts.get('gets', 0):,} (hits {counts.get('hits', 0):,}, misses {counts.get('misses', 0):,}), "
+        f"PUTs {counts.get('puts', 0):,}, errors {counts.get('errors', 0):,}, unanswered {results['unanswered']:,}"
+    )
+    header = f"\n{'':>8} {'mean_us':>10} {'p50_us':>10} {'p99_us':>10} {'p999_us':>10} {'max_us':>10}"
+    print(header)
+    for name, summary in results["summary"].items():
+        print(f"{name:>8} " + " ".join(f"{summary[field]:>10,.1f}" for field in summary))
+        if baseline is not None:
+            before = baseline["summary"][name]
+            changes = [(summary[field] - before[field]) / before[field] if before[field] else 0.0 for field in summary]
+            print(f"{'vs base':>8} " + " ".join(f"{change:>+10.1%}" for change in changes))
+    lag = results["summary"]["lag"]["p99_us"]
+    if lag > 1000:
+        print(f"\nwarning: p99 send lag is {lag / 1e3:.1f} ms; the generator could not keep up with the rate")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Open-loop multi-client load generator")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--spawn", action="store_true", help="Start a local node on a free port instead")
+    parser.add_argument("--rate", type=float, default=5000, help="Requests per second, over all processes")
+    parser.add_argument("--arrival", choices=ARRIVALS, default="poisson")
+    parser.add_argument("--processes", type=int, default=1)
+    parser.add_argument("--clients", type=int, default=4, help="Connections to each node, over all processes")
+    parser.add_argument("--seconds", type=float, default=10.0, help="Measured duration")
+    parser.add_argument("--warmup", type=float, default=1.0, help="Unmeasured seconds before the measured part")
+    parser.add_argument("--keyspace", type=int, default=Workload.keyspace)
+    parser.add_argument("--key-dist", choices=KEY_DISTRIBUTIONS, default=Workload.key_dist)
+    parser.add_argument("--zipf-alpha", type=float, default=Workload.zipf_alpha)
+    parser.add_argument("--hot-keys", type=float, default=Workload.hot_keys, help="Hot fraction of the keyspace")
+    parser.add_argument("--hot-ops", type=float, default=Workload.hot_ops, help="Fraction of requests to hot keys")
+    parser.add_argument(
+        "--value-size", default=Workload.value_size, help="N, uniform:LO:HI or pareto:MIN:ALPHA (bytes)"
+    )
+    parser.add_argument("--read-ratio", type=float, default=Workload.read_ratio)
+    parser.add_argument("--preload", action="store_true", help="PUT every key before the run")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    parser.add_argument("--baseline", help="JSON results of an earlier run to compare with")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    workload = Workload(
+        keyspace=args.keyspace, key_dist=args.key_dist, zipf_alpha=args.zipf_alpha, hot_keys=args.hot_keys,
+        hot_ops=args.hot_ops, value_size=args.value_size, read_ratio=args.read_ratio,
+    )
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    with tempfile.TemporaryDirectory() as config_dir:
+        proc = None
+        address = (args.host, args.port)
+        if args.spawn:
+            address = ("127.0.0.1", free_port())
+            proc = start_node(config_dir, address[1], workers=1)
+        try:
+            print("--- Open-Loop Load Benchmark ---")
+            print(
+                f"Target: {address[0]}:{address[1]}, rate: {args.rate:,.0f}/s ({args.arrival}), "
+                f"processes: {args.processes}, clients: {args.clients}"
+            )
+            print(
+                f"Keys: {args.keyspace:,} {args.key_dist}, values: {args.value_size} bytes, "
+                f"read ratio: {args.read_ratio:.0%}, {args.warmup:g}s warmup + {args.seconds:g}s\n"
+            )
+            if args.preload:
+                n_shards, owners = read_cluster_map(address)
+                preload(workload, n_shards, owners, args.seed)
+            try:
+                results = run_load(
+                    address, workload, args.rate, args.arrival, args.processes, args.clients,
+                    args.warmup, args.seconds, args.seed,
+                )
+            except ValueError as e:
+                sys.exit(f"error: {e}")
+        finally:
+            if proc is not None:
+                proc.terminate()
+                proc.wait()
+
+    print_results(results, baseline)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=1)
+        print(f"\nResults written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+Cost of the per-command latency histograms.
+
+Runs the same pipelined GET/PUT batches through CacheNode.handle_many (text) and
+handle_frames (binary) on nodes with latency timing off (latency_sample 0) and at
+several sampling rates, in process, so the instrumentation is measured against the
+commands themselves with no network time to hide behind.
+
+Every batch is run on each node in turn and timed on its own, so a slow stretch of
+the machine (other processes, frequency changes) is shared by all the settings
+instead of landing on whichever one happened to be running; the garbage collector
+is off while timing.
+"""
+
+import argparse
+import gc
+import time
+from typing import Callable, List, Sequence
+
+from ..cache_node import CacheNode, CacheNodeConfig
+from ..protocol import Opcode
+
+N_SHARDS = 4
+KEYSPACE = 10_000
+BATCH = 32
+READ_RATIO = 0.9
+
+
+def make_node(latency_sample: int) -> CacheNode:
+    cfg = CacheNodeConfig(
+        node_id="bench",
+        host="127.0.0.1",
+        port=0,
+        n_shards=N_SHARDS,
+        owned_shards=set(range(N_SHARDS)),
+        cluster_map={s: ("127.0.0.1", 0) for s in range(N_SHARDS)},
+        capacity=KEYSPACE,
+        latency_sample=latency_sample,
+    )
+    node = CacheNode(cfg)
+    node.handle_many([f"PUT key{i} value{i}" for i in range(KEYSPACE)])
+    return node
+
+
+def text_batches(n_ops: int) -> List[List[str]]:
+    lines = []
+    for i in range(n_ops):
+        key = f"key{(i * 7919) % KEYSPACE}"
+        lines.append(f"GET {key}" if (i % 100) < READ_RATIO * 100 else f"PUT {key} v{i}")
+    return [lines[i:i + BATCH] for i in range(0, len(lines), BATCH)]
+
+
+def frame_batches(n_ops: int) -> List[list]:
+    requests = []
+    for i in range(n_ops):
+        key = f"key{(i * 7919) % KEYSPACE}"
+        if (i % 100) < READ_RATIO * 100:
+            requests.append((Opcode.GET, key, b"", None))
+        else:
+            requests.append((Opcode.PUT, key, b"v%d" % i, None))
+    return [requests[i:i + BATCH] for i in range(0, len(requests), BATCH)]
+
+
+def interleaved_throughput(
+    run: Callable[[CacheNode, list], None], batches: Sequence[list], samples: List[int], repeats: int
+) -> List[float]:
+    """
+    Returns ops/s for each latency_sample setting.
+    """
+    nodes = [make_node(sample) for sample in samples]
+    elapsed = [0] * len(nodes)
+    clock = time.perf_counter_ns
+    gc.disable()
+    try:
+        for _ in range(repeats):
+            for batch in batches:
+                for i, node in enumerate(nodes):
+                    start = clock()
+                    run(node, batch)
+                    elapsed[i] += clock() - start
+    finally:
+        gc.enable()
+        for node in nodes:
+            node.close()
+    n_ops = repeats * sum(len(batch) for batch in batches)
+    return [n_ops / (ns / 1e9) for ns in elapsed]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Overhead of per-command latency histograms")
+    parser.add_argument("--ops", type=int, default=100_000, help="Commands per pass")
+    parser.add_argument("--repeats", type=int, default=5, help="Passes over the commands")
+    parser.add_argument(
+        "--samples", type=int, nargs="+", default=[1, 16, 64], help="latency_sample settings to compare with 0 (off)"
+    )
+    args = parser.parse_args()
+
+    print("--- Metrics Overhead Benchmark ---")
+    print(f"Ops per pass: {args.ops:,} x {args.repeats}, batch: {BATCH}, read ratio: {READ_RATIO:.0%}\n")
+
+    samples = [0, *args.samples]
+    print(f"{'protocol':>8} {'sample':>7} {'ops/s':>10} {'overhead':>9}")
+    runs = (
+        ("text", text_batches(args.ops), lambda node, batch: node.handle_many(batch)),
+        ("binary", frame_batches(args.ops), lambda node, batch: node.handle_frames(batch)),
+    )
+    for name, batches, run in runs:
+        ops = interleaved_throughput(run, batches, samples, args.repeats)
+        for sample, rate in zip(samples, ops):
+            label = "off" if sample == 0 else f"1/{sample}"
+            print(f"{name:>8} {label:>7} {rate:>10,.0f} {(ops[0] - rate) / ops[0]:>9.1%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,5 @@
 import time
+import tracemalloc
 from ..factory import CacheFactory
 from ..eviction import EvictionPolicy
 
@@ -6,13 +7,14 @@ def benchmark_lru(
     capacity=100,
     n_ops=10_000_000,
     read_ratio=0.1,  #HIGH write ratio 
+    policy=EvictionPolicy.LRU,
 ):
-    print(f"--- LRU Microbenchmark ---")
+    print(f"--- {policy.value} Microbenchmark ---")
     print(f"Capacity: {capacity}")
     print(f"Operations: {n_ops:,}")
     print(f"Read ratio: {read_ratio * 100:.0f}%\n")
 
-    cache = CacheFactory.create_local_cache(capacity, EvictionPolicy.LRU)
+    cache = CacheFactory.create_local_cache(capacity, policy)
 
     # Warm-up phase: fill cache to capacity
     print("Warming up cache...")
@@ -43,6 +45,41 @@ def benchmark_lru(
     print(f"Throughput: {ops_per_sec:,.0f} ops/sec")
     print("\nBenchmark complete.")
 
+    return ops_per_sec
+
+
+def benchmark_memory(n_keys=1_000_000, policy=EvictionPolicy.LRU):
+    """
+    Bytes of cache bookkeeping per entry, measured with tracemalloc. Keys and values
+    are created before tracing starts so only the cache's own structures are counted.
+    """
+    keys = [f"key{i}" for i in range(n_keys)]
+    values = list(range(n_keys))
+
+    tracemalloc.start()
+    cache = CacheFactory.create_local_cache(n_keys, policy)
+    for key, value in zip(keys, values):
+        cache.put(key, value)
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    per_entry = current / n_keys
+    print(f"{policy.value:<12} {n_keys:>10,} keys  {current / 2**20:>8,.1f} MiB  {per_entry:>6.0f} B/entry")
+    return per_entry
+
+
+def compare_lru_engines(n_ops=2_000_000, n_keys=1_000_000):
+    engines = [EvictionPolicy.LRU, EvictionPolicy.LRU_COMPACT]
+
+    throughput = {policy: benchmark_lru(n_ops=n_ops, policy=policy) for policy in engines}
+
+    print(f"\n--- Memory per entry (tracemalloc) ---")
+    memory = {policy: benchmark_memory(n_keys, policy) for policy in engines}
+
+    print(f"\n{'engine':<12} {'ops/sec':>12} {'B/entry':>8}")
+    for policy in engines:
+        print(f"{policy.value:<12} {throughput[policy]:>12,.0f} {memory[policy]:>8.0f}")
+
 
 if __name__ == "__main__":
-    benchmark_lru()
+    compare_lru_engines()
@@ -0,0 +1,152 @@
+"""
+Hit ratio of read-through traffic while shards migrate to a node that joins empty.
+
+Two nodes own N_SHARDS shards between them. A client reads Zipfian keys through the
+cluster (GET, and on a miss PUT the key, as an application filling the cache from
+its database would) until the hit ratio is steady, then a third node, started
+empty, is given its even share of the shards with cache.rebalance while the client
+keeps going. The hit ratio and throughput are printed per WINDOW seconds.
+
+Because the shards' keys move with them, the hit ratio should barely dip. For
+comparison, the run also reports the share of requests that went to the moved
+shards: the hit ratio a handover that starts the new owner cold would drop by.
+"""
+
+import argparse
+import json
+import os
+import tempfile
+import threading
+import time
+from typing import List, Tuple
+
+from ..cache_node import key_shard
+from ..client import CacheClient
+from ..rebalance import fetch_map, migrate_shard, plan_add
+from .hit_ratio_benchmarks import zipf_trace
+from .replication_benchmarks import start_node
+from .worker_benchmarks import free_port
+
+N_SHARDS = 8
+KEYSPACE = 50_000
+CAPACITY = 8_000     # per node
+ZIPF_ALPHA = 0.9
+WINDOW = 0.1
+BEFORE = 1.0         # seconds measured before and after the migration
+VALUE = "x" * 100
+
+
+def write_configs(config_dir: str) -> Tuple[str, List[Tuple[str, int]]]:
+    """
+    Returns (cluster_path, [(node_path, port)]); the third node starts empty.
+    """
+    ports = [free_port() for _ in range(3)]
+    per_node = N_SHARDS // 2
+    cluster_path = os.path.join(config_dir, "cluster.json")
+    with open(cluster_path, "w") as f:
+        json.dump({
+            "n_shards": N_SHARDS,
+            "cluster_map": {str(s): ["127.0.0.1", ports[s // per_node]] for s in range(N_SHARDS)},
+        }, f)
+    node_paths = []
+    for i, port in enumerate(ports):
+        owned = list(range(i * per_node, (i + 1) * per_node)) if i < 2 else []
+        path = os.path.join(config_dir, f"node{port}.json")
+        with open(path, "w") as f:
+            json.dump({"host": "127.0.0.1", "port": port, "owned_shards": owned, "capacity": CAPACITY}, f)
+        node_paths.append((path, port))
+    return cluster_path, node_paths
+
+
+class ReadThrough(threading.Thread):
+    """
+    Replays a Zipfian trace in a loop and counts hits per window.
+    """
+
+    def __init__(self, client: CacheClient, trace: List[int]):
+        super().__init__(daemon=True)
+        self.client = client
+        self.trace = trace
+        self.stop = threading.Event()
+        self.windows: List[Tuple[float, int, int]] = []  # (end time, requests, hits)
+
+    def run(self) -> None:
+        i = requests = hits = 0
+        window_end = time.perf_counter() + WINDOW
+        while not self.stop.is_set():
+            key = f"key{self.trace[i % len(self.trace)]}"
+            i += 1
+            if self.client.get(key) is not None:
+                hits += 1
+            else:
+                self.client.put(key, VALUE)
+            requests += 1
+            now = time.perf_counter()
+            if now >= window_end:
+                self.windows.append((now, requests, hits))
+                requests = hits = 0
+                window_end = now + WINDOW
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Hit ratio during an online shard migration")
+    parser.add_argument("--warmup", type=float, default=5.0, help="Seconds of traffic before measuring")
+    args = parser.parse_args()
+
+    print("--- Migration Hit-Ratio Benchmark ---")
+    print(f"Shards: {N_SHARDS}, keys: {KEYSPACE:,} (zipf {ZIPF_ALPHA}), capacity/node: {CAPACITY:,}, window: {WINDOW * 1000:.0f}ms\n")
+
+    trace = zipf_trace(500_000, KEYSPACE, ZIPF_ALPHA)
+    with tempfile.TemporaryDirectory() as config_dir:
+        cluster_path, node_paths = write_configs(config_dir)
+        new_node = ("127.0.0.1", node_paths[2][1])
+        procs = []
+        try:
+            for path, port in node_paths:
+                procs.append(start_node(cluster_path, path, port))
+            with CacheClient.from_config(cluster_path) as client:
+                load = ReadThrough(client, trace)
+                load.start()
+                time.sleep(args.warmup)
+                started = time.perf_counter()
+                time.sleep(BEFORE)
+
+                _, shards = fetch_map(client.cluster_map[0])
+                cluster_map = {sid: owner for sid, (owner, _, _) in shards.items()}
+                nodes = sorted(set(cluster_map.values()) | {new_node})
+                moves = plan_add(cluster_map, new_node)
+                migration_start = time.perf_counter()
+                for sid, target in moves:
+                    migrate_shard(sid, target, cluster_map, nodes, timeout=120)
+                migration_end = time.perf_counter()
+
+                time.sleep(BEFORE)
+                load.stop.set()
+                load.join()
+        finally:
+            for proc in procs:
+                proc.terminate()
+                proc.wait()
+
+    print(f"{'t (s)':>7} {'hit ratio':>10} {'req/s':>9}")
+    phases = {"before": [0, 0], "during": [0, 0], "after": [0, 0]}
+    for end, requests, hits in load.windows:
+        if end < started:
+            continue
+        phase = "before" if end < migration_start else "during" if end < migration_end + WINDOW else "after"
+        phases[phase][0] += requests
+        phases[phase][1] += hits
+        marker = "  <- migrating" if phase == "during" else ""
+        print(f"{end - started:>7.1f} {hits / max(requests, 1):>10.3f} {requests / WINDOW:>9,.0f}{marker}")
+
+    moved = {sid for sid, _ in moves}
+    share = sum(key_shard(f"key{k}", N_SHARDS) in moved for k in trace) / len(trace)
+    print()
+    for phase, (requests, hits) in phases.items():
+        print(f"{phase:>7}: hit ratio {hits / max(requests, 1):.3f} over {requests:,} requests")
+    print(f"moved shards {sorted(moved)} in {migration_end - migration_start:.2f}s")
+    print(f"requests to moved shards: {share:.1%} (what a cold handover would start missing)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""
+Read latency and server load with and without a near cache.
+
+One node owns every shard. A few reader threads replay a Zipfian trace (GET, and
+on a miss PUT, as a read-through application would) while one writer thread
+overwrites random keys at a fixed rate, so the near cache keeps being invalidated.
+The run is done once with CacheClient and once with NearCacheClient; both report
+the GET latency percentiles seen by the readers and the GETs the node served
+(from STATS), which is the load the near cache takes off the server.
+"""
+
+import argparse
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+from typing import Any, Dict, List
+
+from ..client import CacheClient
+from ..near_cache import NearCacheClient
+from .hit_ratio_benchmarks import zipf_trace
+from .replication_benchmarks import start_node
+from .worker_benchmarks import free_port
+
+N_SHARDS = 4
+KEYSPACE = 20_000
+ZIPF_ALPHA = 1.0
+NEAR_CAPACITY = 2_000
+VALUE = "x" * 100
+
+
+def percentile(sorted_values: List[float], p: float) -> float:
+    return sorted_values[min(len(sorted_values) - 1, int(p * len(sorted_values)))]
+
+
+def server_gets(client: CacheClient) -> int:
+    fields = next(iter(client.stats().values())).split()
+    return int(fields[fields.index("GETS") + 1])
+
+
+def run(client: CacheClient, trace: List[int], readers: int, seconds: float, write_rate: float) -> Dict[str, Any]:
+    stop = threading.Event()
+    latencies: List[List[float]] = [[] for _ in range(readers)]
+
+    def read(i: int) -> None:
+        out = latencies[i]
+        j = i * 7919
+        while not stop.is_set():
+            key = f"key{trace[j % len(trace)]}"
+            j += 1
+            start = time.perf_counter()
+            value = client.get(key)
+            out.append(time.perf_counter() - start)
+            if value is None:
+                client.put(key, VALUE)
+
+    def write() -> None:
+        rng = random.Random(1)
+        while not stop.wait(1 / write_rate):
+            client.put(f"key{trace[rng.randrange(len(trace))]}", VALUE)
+
+    before = server_gets(client)
+    threads = [threading.Thread(target=read, args=(i,)) for i in range(readers)]
+    threads.append(threading.Thread(target=write))
+    for t in threads:
+        t.start()
+    time.sleep(seconds)
+    stop.set()
+    for t in threads:
+        t.join()
+
+    all_latencies = sorted(x for out in latencies for x in out)
+    return {
+        "reads": len(all_latencies),
+        "server_gets": server_gets(client) - before,
+        "p50_us": percentile(all_latencies, 0.50) * 1e6,
+        "p99_us": percentile(all_latencies, 0.99) * 1e6,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Near cache on/off under a skewed read workload")
+    parser.add_argument("--seconds", type=float, default=5.0, help="Seconds per run")
+    parser.add_argument("--readers", type=int, default=4, help="Reader threads")
+    parser.add_argument("--write-rate", type=float, default=200.0, help="Overwrites per second")
+    args = parser.parse_args()
+
+    print("--- Near Cache Benchmark ---")
+    print(
+        f"Keys: {KEYSPACE:,} (zipf {ZIPF_ALPHA}), near capacity: {NEAR_CAPACITY:,}, "
+        f"readers: {args.readers}, writes/s: {args.write_rate:.0f}, {args.seconds:.0f}s per run\n"
+    )
+    trace = zipf_trace(200_000, KEYSPACE, ZIPF_ALPHA)
+
+    with tempfile.TemporaryDirectory() as config_dir:
+        port = free_port()
+        cluster_path = os.path.join(config_dir, "cluster.json")
+        node_path = os.path.join(config_dir, "node.json")
+        with open(cluster_path, "w") as f:
+            json.dump({"n_shards": N_SHARDS, "cluster_map": {str(s): ["127.0.0.1", port] for s in range(N_SHARDS)}}, f)
+        with open(node_path, "w") as f:
+            json.dump({"host": "127.0.0.1", "port": port, "owned_shards": list(range(N_SHARDS)), "capacity": KEYSPACE}, f)
+
+        proc = start_node(cluster_path, node_path, port)
+        try:
+            results = {}
+            with CacheClient.from_config(cluster_path) as client:
+                results["off"] = run(client, trace, args.readers, args.seconds, args.write_rate)
+            with NearCacheClient.from_config(cluster_path, near_capacity=NEAR_CAPACITY) as client:
+                results["on"] = run(client, trace, args.readers, args.seconds, args.write_rate)
+                near = client.near_stats()
+        finally:
+            proc.terminate()
+            proc.wait()
+
+    print(f"{'near cache':>10} {'reads/s':>10} {'p50 (us)':>9} {'p99 (us)':>9} {'server GETs/read':>17}")
+    for name, r in results.items():
+        print(
+            f"{name:>10} {r['reads'] / args.seconds:>10,.0f} {r['p50_us']:>9.1f} {r['p99_us']:>9.1f} "
+            f"{r['server_gets'] / max(r['reads'], 1):>17.3f}"
+        )
+    lookups = near["hits"] + near["misses"]
+    print(f"\nnear hit ratio {near['hits'] / max(lookups, 1):.3f}, invalidations received {near['invalidations']:,}")
+
+
+if __name__ == "__main__":
+    main()
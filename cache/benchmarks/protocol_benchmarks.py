@@ -0,0 +1,106 @@
+"""
+Compare the text protocol with the length-prefixed binary protocol for
+32 B, 1 KB and 64 KB values. Each run uses one connection, writes every key
+once with PUT and then reads them back with GET, one request per round trip.
+"""
+
+import socket
+import time
+import zlib
+
+from ..protocol import Opcode, RecvBuffer, Status, encode_request, read_response, send_buffers
+
+HOST = "127.0.0.1"
+PORT = 9000
+
+VALUE_SIZES = [32, 1024, 64 * 1024]
+OPS = 20_000        # PUTs and GETs per run
+KEYSPACE = 1_000
+
+# Keys that hash to shards owned by the node under test.
+OWNED_SHARDS = {0, 1}
+N_SHARDS = 4
+
+
+def owned_keys():
+    keys = []
+    i = 0
+    while len(keys) < KEYSPACE:
+        key = f"key{i}"
+        if zlib.crc32(key.encode("utf-8")) % N_SHARDS in OWNED_SHARDS:
+            keys.append(key)
+        i += 1
+    return keys
+
+
+def run_text(keys, value: bytes):
+    sock = socket.create_connection((HOST, PORT))
+    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    rbuf = RecvBuffer()
+
+    def roundtrip(line: bytes) -> None:
+        sock.sendall(line)
+        while True:
+            end = rbuf.buf.find(b"\n", rbuf.start, rbuf.end)
+            if end != -1:
+                rbuf.consume_to(end + 1)
+                return
+            if not rbuf.recv_into(sock):
+                raise ConnectionError("Server closed connection")
+
+    start = time.perf_counter()
+    for i in range(OPS):
+        roundtrip(b"PUT " + keys[i % len(keys)].encode("utf-8") + b" " + value + b"\n")
+    put_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for i in range(OPS):
+        roundtrip(b"GET " + keys[i % len(keys)].encode("utf-8") + b"\n")
+    get_time = time.perf_counter() - start
+
+    sock.close()
+    return OPS / put_time, OPS / get_time
+
+
+def run_binary(keys, value: bytes):
+    sock = socket.create_connection((HOST, PORT))
+    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    rbuf = RecvBuffer()
+    encoded = [k.encode("utf-8") for k in keys]
+
+    start = time.perf_counter()
+    for i in range(OPS):
+        send_buffers(sock, encode_request(Opcode.PUT, encoded[i % len(keys)], value))
+        status, _ = read_response(sock, rbuf)
+        assert status == Status.OK
+    put_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for i in range(OPS):
+        send_buffers(sock, encode_request(Opcode.GET, encoded[i % len(keys)]))
+        status, _ = read_response(sock, rbuf)
+        assert status == Status.OK
+    get_time = time.perf_counter() - start
+
+    sock.close()
+    return OPS / put_time, OPS / get_time
+
+
+def main():
+    keys = owned_keys()
+
+    print(f"--- Text vs Binary Protocol Benchmark ---")
+    print(f"Server: {HOST}:{PORT}")
+    print(f"Ops per phase: {OPS:,}")
+    print(f"Keyspace: {KEYSPACE:,}\n")
+
+    print(f"{'value':>8}  {'protocol':>8}  {'PUT ops/sec':>12}  {'GET ops/sec':>12}  {'GET MB/s':>9}")
+    for size in VALUE_SIZES:
+        value = b"x" * size
+        for name, run in (("text", run_text), ("binary", run_binary)):
+            put_ops, get_ops = run(keys, value)
+            print(f"{size:>8}  {name:>8}  {put_ops:>12,.0f}  {get_ops:>12,.0f}  {get_ops * size / 1e6:>9,.1f}")
+
+
+if __name__ == "__main__":
+    main()
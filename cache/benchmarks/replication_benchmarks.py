@@ -0,0 +1,169 @@
+"""
+Read throughput of one shard set served by its primary alone and with 1 and 2 replicas.
+
+For each replica count a primary owning N_SHARDS shards and its replicas are
+started on free ports, KEYSPACE keys are written to the primary, and the run waits
+until every replica has acknowledged the primary's offsets (the time this takes is
+reported as "sync"). Then CLIENTS client processes, spread round-robin over the
+primary and the replicas (as read_from_replica does at random), each send OPS
+pipelined GETs. Read throughput only scales with the number of cores the host
+gives the node processes and clients.
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+from .tcp_benchmarks import LineReader
+from .worker_benchmarks import REPO_ROOT, free_port
+
+N_SHARDS = 8
+CLIENTS = 6
+OPS = 50_000         # per client
+DEPTH = 32
+KEYSPACE = 10_000
+REPLICA_COUNTS = [0, 1, 2]
+
+
+def start_node(cluster_path: str, node_path: str, port: int) -> subprocess.Popen:
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "cache.server", "--cluster-config", cluster_path, "--node-config", node_path],
+        cwd=REPO_ROOT,
+        stdout=subprocess.DEVNULL,
+    )
+    deadline = time.time() + 10
+    while time.time() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.2).close()
+            return proc
+        except OSError:
+            time.sleep(0.05)
+    proc.kill()
+    raise RuntimeError("node did not start")
+
+
+def start_cluster(config_dir: str, n_replicas: int):
+    """
+    Returns ([primary port, replica ports...], [procs]).
+    """
+    ports = [free_port() for _ in range(1 + n_replicas)]
+    shards = list(range(N_SHARDS))
+    cluster_path = os.path.join(config_dir, "cluster.json")
+    with open(cluster_path, "w") as f:
+        json.dump({
+            "n_shards": N_SHARDS,
+            "cluster_map": {str(s): ["127.0.0.1", ports[0]] for s in shards},
+            "replicas": {str(s): [["127.0.0.1", p] for p in ports[1:]] for s in shards},
+        }, f)
+
+    procs = []
+    # replicas first, so the primary's first full resync finds them listening
+    for i, port in reversed(list(enumerate(ports))):
+        node_path = os.path.join(config_dir, f"node{port}.json")
+        with open(node_path, "w") as f:
+            json.dump({
+                "host": "127.0.0.1",
+                "port": port,
+                "owned_shards": shards if i == 0 else [],
+                "replica_shards": [] if i == 0 else shards,
+                "capacity": 4 * KEYSPACE,
+            }, f)
+        procs.append(start_node(cluster_path, node_path, port))
+    return ports, procs
+
+
+def load_and_wait(primary_port: int) -> float:
+    """
+    Write every key to the primary; return seconds until all replicas have acked.
+    """
+    sock = socket.create_connection(("127.0.0.1", primary_port))
+    reader = LineReader(sock)
+    lines = [f"PUT key{i} value{i}" for i in range(KEYSPACE)]
+    for start in range(0, KEYSPACE, 1000):
+        batch = lines[start:start + 1000]
+        sock.sendall(("\n".join(batch) + "\n").encode("utf-8"))
+        for _ in batch:
+            reader.readline()
+
+    start = time.perf_counter()
+    while True:
+        sock.sendall(b"REPLICATION\n")
+        n = int(reader.readline().split()[1])
+        fields = [reader.readline().split() for _ in range(n)]
+        if all(f[5] == f[9] for f in fields):
+            break
+        time.sleep(0.005)
+    sock.close()
+    return time.perf_counter() - start
+
+
+def client(args) -> float:
+    port, ops, depth, seed, start_at = args
+    rng = random.Random(seed)
+    sock = socket.create_connection(("127.0.0.1", port))
+    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    reader = LineReader(sock)
+
+    batches = []
+    for _ in range(0, ops, depth):
+        lines = [f"GET key{rng.randrange(KEYSPACE)}" for _ in range(depth)]
+        batches.append(("\n".join(lines) + "\n").encode("utf-8"))
+
+    time.sleep(max(0.0, start_at - time.time()))
+    start = time.perf_counter()
+    for batch in batches:
+        sock.sendall(batch)
+        for _ in range(depth):
+            if not reader.readline().startswith("VALUE "):
+                raise RuntimeError("replica is missing keys")
+    elapsed = time.perf_counter() - start
+    sock.close()
+    return elapsed
+
+
+def run(n_replicas: int, clients: int, ops: int, depth: int) -> None:
+    with tempfile.TemporaryDirectory() as config_dir:
+        ports, procs = start_cluster(config_dir, n_replicas)
+        try:
+            sync = load_and_wait(ports[0])
+            start_at = time.time() + 1.0
+            jobs = [(ports[i % len(ports)], ops, depth, i, start_at) for i in range(clients)]
+            with multiprocessing.Pool(clients) as pool:
+                durations = pool.map(client, jobs)
+        finally:
+            for proc in procs:
+                proc.terminate()
+                proc.wait()
+
+    total = clients * ops
+    print(f"{n_replicas:>9} {total / max(durations):>14,.0f} {sync * 1000:>10.1f}ms")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Read throughput with 0, 1 and 2 replicas")
+    parser.add_argument("--clients", type=int, default=CLIENTS)
+    parser.add_argument("--ops", type=int, default=OPS, help="GETs per client")
+    parser.add_argument("--depth", type=int, default=DEPTH)
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    print(f"--- Replication Read Benchmark ---")
+    print(f"Shards: {N_SHARDS}, keys: {KEYSPACE:,}, clients: {args.clients}, GETs/client: {args.ops:,}, depth: {args.depth}")
+    print(f"CPUs: {os.cpu_count()}\n")
+
+    print(f"{'replicas':>9} {'GETs/sec':>14} {'sync':>12}")
+    for n_replicas in REPLICA_COUNTS:
+        run(n_replicas, args.clients, args.ops, args.depth)
+
+
+if __name__ == "__main__":
+    main()
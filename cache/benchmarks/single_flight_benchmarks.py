@@ -0,0 +1,147 @@
+"""
+Backend calls caused by a burst of concurrent misses on one key.
+
+THREADS threads are released at once against a key nobody holds, each wanting its
+value from a "database" that takes --db-ms to answer. Without coordination every
+thread misses, loads and puts (get, then put, as a read-through application
+would); with it, one load fills the key for all of them. Runs:
+
+    LRU get+put       LRUCache, each thread loads on its own miss
+    LRU get_or_load   LRUCache.get_or_load (checks and joins under the cache lock)
+    LFU get_or_load   LFUCache, through the Cache default
+    node GET+PUT      a node over TCP, CacheClient.get and put
+    node GETL         a node over TCP, CacheClient.get_or_load (fill leases)
+
+Every run reports the backend calls made and how long the burst took to drain.
+"""
+
+import argparse
+import json
+import os
+import tempfile
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+from ..client import CacheClient
+from ..lfu import LFUCache
+from ..lru import LRUCache
+from .replication_benchmarks import start_node
+from .worker_benchmarks import free_port
+
+THREADS = 1000
+N_SHARDS = 4
+
+
+class Backend:
+    """
+    A slow database that counts its calls.
+    """
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def load(self, key: str) -> str:
+        with self._lock:
+            self.calls += 1
+        time.sleep(self.latency)
+        return f"value-of-{key}"
+
+
+def burst(threads: int, read: Callable[[], Optional[str]]) -> Dict[str, float]:
+    barrier = threading.Barrier(threads + 1)
+    wrong = []
+
+    def run() -> None:
+        barrier.wait()
+        if read() is None:
+            wrong.append(1)
+
+    pool = [threading.Thread(target=run) for _ in range(threads)]
+    for t in pool:
+        t.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for t in pool:
+        t.join()
+    return {"seconds": time.perf_counter() - start, "missing": len(wrong)}
+
+
+def local_runs(threads: int, latency: float) -> Dict[str, Dict[str, float]]:
+    results = {}
+
+    backend = Backend(latency)
+    cache = LRUCache(capacity=1000)
+
+    def naive() -> Optional[str]:
+        value = cache.get("hot")
+        if value is None:
+            value = backend.load("hot")
+            cache.put("hot", value)
+        return value
+
+    results["LRU get+put"] = dict(burst(threads, naive), calls=backend.calls)
+
+    for name, cache in (("LRU get_or_load", LRUCache(capacity=1000)), ("LFU get_or_load", LFUCache(capacity=1000))):
+        backend = Backend(latency)
+        results[name] = dict(burst(threads, lambda: cache.get_or_load("hot", backend.load)), calls=backend.calls)
+    return results
+
+
+def server_runs(threads: int, latency: float, pool_size: int) -> Dict[str, Dict[str, float]]:
+    results = {}
+    with tempfile.TemporaryDirectory() as config_dir:
+        port = free_port()
+        cluster_path = os.path.join(config_dir, "cluster.json")
+        node_path = os.path.join(config_dir, "node.json")
+        with open(cluster_path, "w") as f:
+            json.dump({"n_shards": N_SHARDS, "cluster_map": {str(s): ["127.0.0.1", port] for s in range(N_SHARDS)}}, f)
+        with open(node_path, "w") as f:
+            json.dump({"host": "127.0.0.1", "port": port, "owned_shards": list(range(N_SHARDS)), "capacity": 1000}, f)
+
+        proc = start_node(cluster_path, node_path, port)
+        try:
+            with CacheClient.from_config(cluster_path, pool_size=pool_size) as client:
+                backend = Backend(latency)
+
+                def naive() -> Optional[str]:
+                    value = client.get("hot-a")
+                    if value is None:
+                        value = backend.load("hot-a")
+                        client.put("hot-a", value)
+                    return value
+
+                results["node GET+PUT"] = dict(burst(threads, naive), calls=backend.calls)
+
+                backend = Backend(latency)
+                results["node GETL"] = dict(
+                    burst(threads, lambda: client.get_or_load("hot-b", backend.load)), calls=backend.calls
+                )
+        finally:
+            proc.terminate()
+            proc.wait()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backend calls for a burst of concurrent misses on one key")
+    parser.add_argument("--threads", type=int, default=THREADS, help="Concurrent readers")
+    parser.add_argument("--db-ms", type=float, default=50.0, help="Backend latency per load (ms)")
+    parser.add_argument("--pool-size", type=int, default=64, help="Connections per node for the TCP runs")
+    args = parser.parse_args()
+
+    latency = args.db_ms / 1000
+    print("--- Single-Flight Benchmark ---")
+    print(f"{args.threads:,} concurrent misses on one key, backend latency {args.db_ms:.0f} ms\n")
+    results = local_runs(args.threads, latency)
+    results.update(server_runs(args.threads, latency, args.pool_size))
+
+    print(f"{'run':>16} {'backend calls':>14} {'drain (ms)':>11} {'missing':>8}")
+    for name, r in results.items():
+        print(f"{name:>16} {r['calls']:>14,} {r['seconds'] * 1000:>11.1f} {r['missing']:>8}")
+
+
+if __name__ == "__main__":
+    main()
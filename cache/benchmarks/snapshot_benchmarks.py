@@ -0,0 +1,92 @@
+"""
+Snapshot save and load time against key count.
+
+A node with N_SHARDS LRU shards is filled with n keys (32-byte values, half with a
+ttl), saved with write_snapshot and loaded into a fresh node with load_snapshot.
+"stall" is the longest single Cache.dump() call, i.e. the longest time any one
+shard's lock is held by the snapshot; the other shards keep serving meanwhile.
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+from ..cache_node import CacheNode, CacheNodeConfig
+from ..snapshot import load_snapshot, write_snapshot
+
+N_SHARDS = 16
+KEY_COUNTS = [100_000, 500_000, 1_000_000, 2_000_000]
+VALUE = "v" * 32
+
+
+def make_node(capacity: int) -> CacheNode:
+    cfg = CacheNodeConfig(
+        node_id="bench",
+        host="127.0.0.1",
+        port=0,
+        n_shards=N_SHARDS,
+        owned_shards=set(range(N_SHARDS)),
+        cluster_map={s: ("127.0.0.1", 0) for s in range(N_SHARDS)},
+        capacity=capacity,
+    )
+    return CacheNode(cfg)
+
+
+def longest_dump(node: CacheNode) -> float:
+    longest = 0.0
+    for shard in node.local_shards.values():
+        start = time.perf_counter()
+        shard.dump()
+        longest = max(longest, time.perf_counter() - start)
+    return longest
+
+
+def run(n_keys: int, directory: str) -> None:
+    # headroom: keys do not hash perfectly evenly across shards
+    node = make_node(2 * n_keys)
+    by_shard = {}
+    for i in range(n_keys):
+        key = f"key:{i}"
+        by_shard.setdefault(node.shard_id(key), []).append((key, VALUE, 3600.0 if i % 2 else None))
+    for sid, items in by_shard.items():
+        node.local_shards[sid].put_many(items)
+
+    path = os.path.join(directory, f"snap{n_keys}.bin")
+    start = time.perf_counter()
+    written = write_snapshot(path, node.local_shards, N_SHARDS)
+    save = time.perf_counter() - start
+    stall = longest_dump(node)
+    size = os.path.getsize(path)
+
+    fresh = make_node(2 * n_keys)
+    start = time.perf_counter()
+    loaded = load_snapshot(path, fresh.local_shards, N_SHARDS, fresh.shard_id)
+    load = time.perf_counter() - start
+    assert written == loaded == n_keys
+
+    print(
+        f"{n_keys:>10,} {save:>9.2f}s {stall * 1000:>9.1f}ms {size / 2**20:>9.1f} "
+        f"{load:>9.2f}s {n_keys / load:>12,.0f}"
+    )
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Snapshot save/load benchmark")
+    parser.add_argument("--keys", type=int, nargs="*", default=KEY_COUNTS)
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    print(f"--- Snapshot Benchmark ---")
+    print(f"Shards: {N_SHARDS}, value size: {len(VALUE)} bytes\n")
+
+    print(f"{'keys':>10} {'save':>10} {'stall':>11} {'MiB':>9} {'load':>10} {'keys/s load':>12}")
+    with tempfile.TemporaryDirectory() as directory:
+        for n_keys in args.keys:
+            run(n_keys, directory)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+"""
+Read latency when many keys expire together, with hard TTLs, grace windows and XFetch.
+
+KEYS keys are written at once with the same ttl, so they all expire at the same
+instant, every ttl seconds, for as long as the run lasts. READERS threads read
+Zipfian keys through a read-through cache whose backend takes --db-ms per load,
+each at a fixed --rate. Latency is measured from when a read was due, so reads
+held up behind a slow one count the wait too. Runs:
+
+    hard ttl          get_or_load(ttl): a miss waits for the load (shared per key)
+    grace             get_or_load(ttl, grace): one reader reloads each stale key inline,
+                      the others get the stale value
+    grace + async     get_with_state(): a REFRESH is handed to a background thread and
+                      the stale value returned at once
+    xfetch            get_or_load(ttl, beta): no grace; keys are reloaded inline, early
+                      and at random, before they expire
+
+Entries are written with delta = --db-ms, as if they had been loaded once already.
+"slow" counts the reads that took at least half a backend load.
+"""
+
+import argparse
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+from ..base import REFRESH
+from ..lru import LRUCache
+from .hit_ratio_benchmarks import zipf_trace
+from .near_cache_benchmarks import percentile
+
+KEYS = 100
+READERS = 8
+ZIPF_ALPHA = 0.9
+
+
+class Backend:
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.loads = 0
+
+    def load(self, key: str) -> str:
+        self.loads += 1  # approximate under threads, fine for a report
+        time.sleep(self.latency)
+        return f"v{key}"
+
+
+def run(
+    read_factory: Callable[[LRUCache, Backend], Callable[[str], Optional[str]]],
+    args: argparse.Namespace,
+    trace: List[int],
+    grace: float,
+) -> Dict[str, float]:
+    latency = args.db_ms / 1000
+    backend = Backend(latency)
+    cache: LRUCache = LRUCache(capacity=KEYS * 2)
+    for i in range(KEYS):
+        cache.put_with_grace(f"key{i}", f"vkey{i}", args.ttl, grace, delta=latency)
+    read = read_factory(cache, backend)
+
+    stop = threading.Event()
+    latencies: List[List[float]] = [[] for _ in range(READERS)]
+
+    interval = 1 / args.rate
+
+    def reader(i: int) -> None:
+        out = latencies[i]
+        j = i * 7919
+        due = time.perf_counter()
+        while not stop.is_set():
+            key = f"key{trace[j % len(trace)]}"
+            j += 1
+            now = time.perf_counter()
+            if now < due:
+                time.sleep(due - now)
+            read(key)
+            out.append(time.perf_counter() - due)
+            due += interval
+
+    threads = [threading.Thread(target=reader, args=(i,)) for i in range(READERS)]
+    for t in threads:
+        t.start()
+    time.sleep(args.seconds)
+    stop.set()
+    for t in threads:
+        t.join()
+
+    values = sorted(x for out in latencies for x in out)
+    return {
+        "reads": len(values),
+        "slow": sum(1 for x in values if x >= latency / 2),
+        "loads": backend.loads,
+        "p50_us": percentile(values, 0.50) * 1e6,
+        "p99_us": percentile(values, 0.99) * 1e6,
+        "p999_us": percentile(values, 0.999) * 1e6,
+        "max_us": values[-1] * 1e6,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Latency of synchronized expiry with and without grace/XFetch")
+    parser.add_argument("--seconds", type=float, default=8.0, help="Seconds per run")
+    parser.add_argument("--ttl", type=float, default=2.0, help="TTL of every key (s)")
+    parser.add_argument("--db-ms", type=float, default=20.0, help="Backend latency per load (ms)")
+    parser.add_argument("--rate", type=float, default=1000.0, help="Reads per second per reader")
+    parser.add_argument("--beta", type=float, default=1.0, help="XFetch beta")
+    args = parser.parse_args()
+    ttl = args.ttl
+    grace = ttl  # long enough for one refresh per key to come back
+
+    print("--- Stale-While-Revalidate Benchmark ---")
+    print(
+        f"{KEYS:,} keys expiring together every {ttl:g}s, {READERS} readers (zipf {ZIPF_ALPHA}), "
+        f"{args.rate:g} reads/s each, backend {args.db_ms:g} ms, {args.seconds:g}s per run\n"
+    )
+    trace = zipf_trace(200_000, KEYS, ZIPF_ALPHA)
+
+    def hard(cache, backend):
+        return lambda key: cache.get_or_load(key, backend.load, ttl)
+
+    def inline_grace(cache, backend):
+        return lambda key: cache.get_or_load(key, backend.load, ttl, grace=grace)
+
+    refresher = ThreadPoolExecutor(max_workers=4, thread_name_prefix="refresh")
+
+    def async_grace(cache, backend):
+        def refresh(key: str) -> None:
+            start = time.perf_counter()
+            value = backend.load(key)
+            cache.put_with_grace(key, value, ttl, grace, time.perf_counter() - start)
+
+        def read(key: str) -> Optional[str]:
+            value, state = cache.get_with_state(key)
+            if value is None:
+                return cache.get_or_load(key, backend.load, ttl, grace=grace)
+            if state == REFRESH:
+                refresher.submit(refresh, key)
+            return value
+        return read
+
+    def xfetch(cache, backend):
+        return lambda key: cache.get_or_load(key, backend.load, ttl, beta=args.beta)
+
+    runs = [("hard ttl", hard, 0.0), ("grace", inline_grace, grace), ("grace + async", async_grace, grace),
+            ("xfetch", xfetch, 0.0)]
+    print(f"{'run':>14} {'reads/s':>10} {'loads':>7} {'slow':>6} {'p50 (us)':>9} {'p99 (us)':>10} {'p99.9 (us)':>11} {'max (us)':>10}")
+    try:
+        for name, factory, run_grace in runs:
+            r = run(factory, args, trace, run_grace)
+            print(
+                f"{name:>14} {r['reads'] / args.seconds:>10,.0f} {r['loads']:>7,} {r['slow']:>6,} {r['p50_us']:>9.1f} "
+                f"{r['p99_us']:>10.1f} {r['p999_us']:>11.1f} {r['max_us']:>10.1f}"
+            )
+    finally:
+        refresher.shutdown(wait=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -3,8 +3,14 @@ Benchmark the single-threaded TCP cache server using a single client connection.
 This script issues a mix of GET and PUT requests and measures total throughput
 as well as p50, p95, and p99 request latency.
 
+With --depth N > 1 the client pipelines N requests per round trip: it writes
+the whole batch with one send and then reads N responses. Latency is then
+reported per batch.
+
+--read-ratio 0 sends only PUTs, e.g. to compare a node's aof_fsync policies.
 """
 
+import argparse
 import socket
 import time
 
@@ -14,52 +20,88 @@ PORT = 9000
 OPS = 50_000     # total operations to send
 KEYSPACE = 10_000   # number of rotating keys
 READ_RATIO = 0.5    # 50% GET, 50% PUT
-
-def send_line(sock: socket.socket, line: str) -> None:
-    sock.sendall(line.encode("utf-8") + b"\n")
-
-
-def recv_line(sock: socket.socket) -> str:
-    """Read exactly one '\\n'-terminated line from socket."""
-    buf = b""
-    while True:
-        chunk = sock.recv(4096)
-        if not chunk:
-            raise ConnectionError("Server closed connection")
-        buf += chunk
-        if b"\n" in buf:
-            line, rest = buf.split(b"\n", 1)
-            return line.decode("utf-8", errors="replace").strip()
+PIPELINE_DEPTH = 1  # requests per round trip
+
+
+class LineReader:
+    """Buffered reader that keeps bytes left over after a line for the next call."""
+
+    def __init__(self, sock: socket.socket):
+        self.sock = sock
+        self.buf = bytearray()
+        self.pos = 0
+
+    def readline(self) -> str:
+        while True:
+            end = self.buf.find(b"\n", self.pos)
+            if end != -1:
+                line = self.buf[self.pos:end].decode("utf-8", errors="replace").strip()
+                self.pos = end + 1
+                return line
+
+            del self.buf[:self.pos]
+            self.pos = 0
+            chunk = self.sock.recv(65536)
+            if not chunk:
+                raise ConnectionError("Server closed connection")
+            self.buf += chunk
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Single-client TCP benchmark")
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--ops", type=int, default=OPS)
+    parser.add_argument(
+        "--depth",
+        type=int,
+        default=PIPELINE_DEPTH,
+        help="Requests sent per round trip (1 = no pipelining)",
+    )
+    parser.add_argument(
+        "--read-ratio",
+        type=float,
+        default=READ_RATIO,
+        help="Fraction of requests that are GETs (0 = PUT only)",
+    )
+    return parser.parse_args()
 
 
 def main():
+    args = parse_args()
+    depth = max(1, args.depth)
     latencies = []
 
     s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-    s.connect((HOST, PORT))
+    s.connect((args.host, args.port))
+    reader = LineReader(s)
 
     print(f"--- Single-Client TCP Benchmark ---")
-    print(f"Server: {HOST}:{PORT}")
-    print(f"Ops: {OPS:,}")
+    print(f"Server: {args.host}:{args.port}")
+    print(f"Ops: {args.ops:,}")
+    print(f"Pipeline depth: {depth}")
     print(f"Keyspace: {KEYSPACE:,}")
-    print(f"GET/PUT ratio: {READ_RATIO*100:.0f}% / {100-READ_RATIO*100:.0f}%\n")
+    print(f"GET/PUT ratio: {args.read_ratio*100:.0f}% / {100-args.read_ratio*100:.0f}%\n")
 
+    value = "x" * 32  # 32-byte payload
     start_total = time.perf_counter()
 
-    for i in range(OPS):
-        key = f"key{i % KEYSPACE}"
-        value = "x" * 32  # 32-byte payload
+    for batch_start in range(0, args.ops, depth):
+        batch = []
+        for i in range(batch_start, min(batch_start + depth, args.ops)):
+            key = f"key{i % KEYSPACE}"
 
-        # Select GET or PUT based on READ_RATIO
-        is_get = (i % 100) < (READ_RATIO * 100)
-        if is_get:
-            cmd = f"GET {key}"
-        else:
-            cmd = f"PUT {key} {value}"
+            # Select GET or PUT based on --read-ratio
+            is_get = (i % 100) < (args.read_ratio * 100)
+            if is_get:
+                batch.append(f"GET {key}")
+            else:
+                batch.append(f"PUT {key} {value}")
 
         t0 = time.perf_counter()
-        send_line(s, cmd)
-        _ = recv_line(s)
+        s.sendall(("\n".join(batch) + "\n").encode("utf-8"))
+        for _ in batch:
+            _ = reader.readline()
         t1 = time.perf_counter()
 
         latencies.append((t1 - t0) * 1000.0)  # milliseconds
@@ -68,7 +110,7 @@ def main():
     s.close()
 
     duration = end_total - start_total
-    ops_sec = OPS / duration
+    ops_sec = args.ops / duration
 
     print(f"Total time: {duration:.3f}s")
     print(f"Throughput: {ops_sec:,.0f} ops/sec")
@@ -80,7 +122,8 @@ def main():
     p95 = lat_sorted[int(0.95 * len_latencies)]
     p99 = lat_sorted[int(0.99 * len_latencies)]
 
-    print("\nLatency (ms):")
+    unit = "per request" if depth == 1 else f"per batch of {depth}"
+    print(f"\nLatency (ms, {unit}):")
     print(f"  p50 = {p50:.3f}")
     print(f"  p95 = {p95:.3f}")
     print(f"  p99 = {p99:.3f}")
@@ -0,0 +1,79 @@
+"""
+Live-entry occupancy under a mixed-TTL workload.
+
+Most writes are short-TTL session keys that are never read again; the rest are
+long-lived keys that are read repeatedly. With lazy-only expiry the dead session
+keys keep their slots until LRU pressure pushes them out, crowding out the
+long-lived keys. Active expiry reclaims those slots as soon as they are due.
+"""
+
+import random
+import time
+
+from ..lru import LRUCache
+
+CAPACITY = 10_000
+DURATION = 3.0          # seconds per configuration
+SESSION_TTL = 0.01      # seconds
+SESSION_RATIO = 0.6     # fraction of operations that write a new session key
+HOT_KEYS = 8_000        # long-lived keys, read with a 1/3 write rate
+
+
+def live_entries(cache: LRUCache) -> int:
+    now = time.time()
+    return sum(1 for node in cache.cache.values() if not cache._is_expired(node, now))
+
+
+def run(name: str, expire_batch: int, sweep_every: int = 0) -> None:
+    cache = LRUCache(CAPACITY, expire_batch=expire_batch)
+    rng = random.Random(42)
+    samples = []
+    hot_hits = hot_gets = 0
+    session = 0
+    ops = 0
+
+    deadline = time.perf_counter() + DURATION
+    next_sample = time.perf_counter() + 0.1
+    while time.perf_counter() < deadline:
+        ops += 1
+        if rng.random() < SESSION_RATIO:
+            cache.put(f"session{session}", "s", ttl=SESSION_TTL)
+            session += 1
+        else:
+            key = f"hot{rng.randrange(HOT_KEYS)}"
+            if rng.random() < 0.33:
+                cache.put(key, "h")
+            else:
+                hot_gets += 1
+                if cache.get(key) is not None:
+                    hot_hits += 1
+
+        if sweep_every and ops % sweep_every == 0:
+            cache.expire()
+
+        if time.perf_counter() >= next_sample:
+            samples.append(live_entries(cache) / CAPACITY)
+            next_sample += 0.1
+
+    stats = cache.get_stats()
+    occupancy = sum(samples) / len(samples)
+    print(
+        f"{name:<24} {ops / DURATION:>12,.0f} {occupancy * 100:>13.1f}% "
+        f"{hot_hits / max(hot_gets, 1) * 100:>11.1f}% {stats.expired:>10,} {stats.evictions:>10,}"
+    )
+
+
+def main():
+    print(f"--- Mixed-TTL Occupancy Benchmark ---")
+    print(f"Capacity: {CAPACITY:,}")
+    print(f"Session TTL: {SESSION_TTL}s, session writes: {SESSION_RATIO * 100:.0f}% of ops")
+    print(f"Long-lived keys: {HOT_KEYS:,}\n")
+
+    print(f"{'expiry':<24} {'ops/sec':>12} {'live entries':>14} {'hot hits':>12} {'expired':>10} {'evictions':>10}")
+    run("lazy only", expire_batch=0)
+    run("amortized (batch=16)", expire_batch=16)
+    run("amortized + sweep", expire_batch=16, sweep_every=1_000)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""
+Throughput of one node served by 1, 2, 4 and 8 worker processes (--workers).
+
+For each worker count a fresh node owning N_SHARDS shards is started on a free
+port, then CLIENTS client processes each open one connection and send OPS pipelined
+GET/PUT requests (DEPTH per round trip). SO_REUSEPORT spreads the connections over
+the workers; a request for a shard owned by a sibling worker is forwarded over a
+Unix socket. Throughput only scales with the number of cores the host gives the
+workers and clients.
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+from .tcp_benchmarks import LineReader
+
+N_SHARDS = 8
+CLIENTS = 8
+OPS = 50_000         # per client
+DEPTH = 32
+KEYSPACE = 10_000
+READ_RATIO = 0.5
+SWITCH_INTERVAL = 0.0002  # seconds; lets worker threads answer forwarded batches sooner
+WORKER_COUNTS = [1, 2, 4, 8]
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_node(config_dir: str, port: int, workers: int) -> subprocess.Popen:
+    cluster_path = os.path.join(config_dir, "cluster.json")
+    node_path = os.path.join(config_dir, "node.json")
+    with open(cluster_path, "w") as f:
+        json.dump({"n_shards": N_SHARDS, "cluster_map": {str(s): ["127.0.0.1", port] for s in range(N_SHARDS)}}, f)
+    with open(node_path, "w") as f:
+        json.dump({"host": "127.0.0.1", "port": port, "owned_shards": list(range(N_SHARDS)), "capacity": 100_000}, f)
+
+    args = [sys.executable, "-m", "cache.server", "--cluster-config", cluster_path,
+            "--node-config", node_path, "--workers", str(workers)]
+    if workers > 1:
+        args += ["--switch-interval", str(SWITCH_INTERVAL)]
+    proc = subprocess.Popen(
+        args,
+        cwd=REPO_ROOT,
+        stdout=subprocess.DEVNULL,
+    )
+    deadline = time.time() + 10
+    while time.time() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.2).close()
+            return proc
+        except OSError:
+            time.sleep(0.05)
+    proc.kill()
+    raise RuntimeError("node did not start")
+
+
+def client(args) -> float:
+    port, ops, depth, seed, start_at = args
+    rng = random.Random(seed)
+    sock = socket.create_connection(("127.0.0.1", port))
+    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    reader = LineReader(sock)
+
+    batches = []
+    for _ in range(0, ops, depth):
+        lines = []
+        for _ in range(depth):
+            key = f"key{rng.randrange(KEYSPACE)}"
+            lines.append(f"GET {key}" if rng.random() < READ_RATIO else f"PUT {key} {seed}")
+        batches.append(("\n".join(lines) + "\n").encode("utf-8"))
+
+    # start every client at the same moment
+    time.sleep(max(0.0, start_at - time.time()))
+    start = time.perf_counter()
+    for batch in batches:
+        sock.sendall(batch)
+        for _ in range(depth):
+            reader.readline()
+    elapsed = time.perf_counter() - start
+    sock.close()
+    return elapsed
+
+
+def run(workers: int, clients: int, ops: int, depth: int) -> None:
+    port = free_port()
+    with tempfile.TemporaryDirectory() as config_dir:
+        proc = start_node(config_dir, port, workers)
+        try:
+            start_at = time.time() + 1.0
+            with multiprocessing.Pool(clients) as pool:
+                durations = pool.map(client, [(port, ops, depth, i, start_at) for i in range(clients)])
+        finally:
+            proc.terminate()
+            proc.wait()
+
+    total = clients * ops
+    print(f"{workers:>8} {total / max(durations):>14,.0f}")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Multi-worker node throughput")
+    parser.add_argument("--clients", type=int, default=CLIENTS)
+    parser.add_argument("--ops", type=int, default=OPS, help="Operations per client")
+    parser.add_argument("--depth", type=int, default=DEPTH)
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    print(f"--- Multi-Worker Benchmark ---")
+    print(f"Shards: {N_SHARDS}, clients: {args.clients}, ops/client: {args.ops:,}, depth: {args.depth}")
+    print(f"CPUs: {os.cpu_count()}\n")
+
+    print(f"{'workers':>8} {'ops/sec':>14}")
+    for workers in WORKER_COUNTS:
+        run(workers, args.clients, args.ops, args.depth)
+
+
+if __name__ == "__main__":
+    main()
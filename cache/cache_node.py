@@ -1,13 +1,79 @@
-from dataclasses import dataclass
-from typing import Dict, Optional, Set, Tuple
+from dataclasses import dataclass, field
+import math
+import os
+import struct
+import sys
+import threading
+import time
+from typing import Any, Callable, Dict, FrozenSet, Iterable, List, Optional, Set, Tuple
 import zlib
 
-from .base import Cache, CacheStats
+from .aof import FSYNC_INTERVAL, FSYNC_POLICIES, AppendOnlyLog, encode_del, encode_put, replay_log
+from .base import FRESH, Cache, CacheStats, ValueTooLargeError, WrongTypeError
+from .compression import DEFAULT_LEVEL, Compressed, Compressor
 from .eviction import EvictionPolicy
 from .factory import CacheFactory
+from .metrics import NodeMetrics
+from .migration import ShardMigration
+from .protocol import Opcode, Status, key_too_long
+from .replication import ReplicaLink, ReplicaShards, ReplicationBacklog, new_replid
+from .slowlog import DEFAULT_PROFILE_EVERY, NOT_TRACED, SAMPLED, SLOWLOG_MAX_LEN, RequestTracer
+from .snapshot import decode_entries, load_snapshot, write_snapshot
+from .trace import OP_DEL, OP_GET, OP_PUT, TraceRecorder
+from .tracking import MAX_TRACKED_KEYS, ClientSession, Tracker
 
 Address = Tuple[str, int] # (host, port)
 
+# Redirects returned by CacheNode's write helpers
+MOVED = "MOVED"
+ASK = "ASK"
+
+# Commands with their own latency histogram; binary opcodes are counted under the same names
+COMMANDS = (
+    "GET", "PUT", "DEL", "MGET", "MSET", "MDEL", "STATS", "INFO", "BGSAVE", "REPLICATION",
+    "CLUSTER", "MIGRATE", "CLIENT", "SLOWLOG", "PROFILE", "TRACE", "GETL", "INCR", "DECR", "APPEND", "GETS",
+    "CAS", "ASKING", "QUIT",
+)
+OPCODE_NAMES = {
+    Opcode.GET: "GET", Opcode.PUT: "PUT", Opcode.DEL: "DEL", Opcode.STATS: "STATS", Opcode.QUIT: "QUIT",
+    Opcode.REPLICATE: "REPLICATE", Opcode.SYNC: "SYNC", Opcode.IMPORT: "IMPORT",
+    Opcode.INCR: "INCR", Opcode.APPEND: "APPEND", Opcode.GETS: "GETS", Opcode.CAS: "CAS",
+    Opcode.GET | Opcode.ASKING: "ASKING", Opcode.PUT | Opcode.ASKING: "ASKING", Opcode.DEL | Opcode.ASKING: "ASKING",
+    Opcode.GET | Opcode.ACCEPT_COMPRESSED: "GET", Opcode.GET | Opcode.ACCEPT_COMPRESSED | Opcode.ASKING: "ASKING",
+}
+
+# Text commands whose first argument is a key (MGET, MSET and MDEL check all of theirs)
+KEYED_COMMANDS = frozenset(("GET", "PUT", "DEL", "GETL", "INCR", "DECR", "APPEND", "GETS", "CAS"))
+
+# GETL fill leases: how long the client told to fill a missing key has (unless GETL
+# names its own lease_ms), the most retry delay WAIT suggests, and the most leases a
+# node holds at once (past that, misses are told to FILL without taking a lease)
+FILL_LEASE_MS = 2000
+FILL_RETRY_MS = 20
+MAX_FILL_LEASES = 100_000
+
+# Sections of INFO, in output order
+INFO_SECTIONS = ("server", "clients", "stats", "commands", "shards")
+
+def key_shard(key: str, n_shards: int) -> int:
+    # Stable across processes/machines
+    return zlib.crc32(key.encode("utf-8")) % n_shards
+
+def parse_seconds(text: str) -> Optional[float]:
+    # A ttl or grace: a finite number of seconds > 0, else None (float() also
+    # accepts nan and inf, and a NaN deadline would stall a shard's expiry heap)
+    try:
+        seconds = float(text)
+    except ValueError:
+        return None
+    return seconds if math.isfinite(seconds) and seconds > 0 else None
+
+def _parse_address(text: str) -> Optional[Address]:
+    host, _, port = text.rpartition(":")
+    if not host or not port.isdigit():
+        return None
+    return host, int(port)
+
 @dataclass(frozen=True)
 class CacheNodeConfig:
     node_id: str
@@ -21,104 +87,1807 @@ class CacheNodeConfig:
     capacity: int
     policy: EvictionPolicy = EvictionPolicy.LRU
 
+    # Optional byte budget for the whole node (split across owned shards) and per-entry limit
+    max_bytes: Optional[int] = None
+    max_entry_bytes: Optional[int] = None
+
+    # Seconds between background sweeps of expired entries; None = only lazy/amortized expiry
+    expire_interval: Optional[float] = None
+
+    # Snapshot file for BGSAVE, warm restarts and (with snapshot_interval, in seconds) periodic saves
+    snapshot_path: Optional[str] = None
+    snapshot_interval: Optional[float] = None
+
+    # Append-only log of writes, replayed over the snapshot at startup. aof_fsync is "always",
+    # "interval" (fsync every aof_fsync_ms) or "never". Every snapshot compacts the log; with
+    # snapshot_path set, one is also taken whenever the log grows past aof_rewrite_bytes.
+    aof_path: Optional[str] = None
+    aof_fsync: str = FSYNC_INTERVAL
+    aof_fsync_ms: int = 1000
+    aof_rewrite_bytes: Optional[int] = 64 * 2**20
+
+    # Replica addresses of every shard (from cluster.json) and the shards this node replicates.
+    # Each replicated owned shard keeps the last repl_backlog_bytes of its write stream, so a
+    # replica that falls further behind than that is resynced from a full copy.
+    replicas: Dict[int, List[Address]] = field(default_factory=dict)
+    replica_shards: Set[int] = field(default_factory=set)
+    repl_backlog_bytes: int = 2**20
+
+    # Version of cluster_map ("version" in cluster.json); every shard starts at this epoch
+    map_version: int = 0
+
+    # Most keys tracked at once for clients that enabled CLIENT TRACKING (see cache.tracking)
+    tracking_max_keys: int = MAX_TRACKED_KEYS
+
+    # Per-command latency histograms time one command in latency_sample on average
+    # (1 = every command, 0 = off; see cache.metrics). metrics_port, if set, is where
+    # cache.server serves Prometheus metrics.
+    latency_sample: int = 16
+    metrics_port: Optional[int] = None
+
+    # Commands taking at least slowlog_threshold_us are kept in the slowlog (the last
+    # slowlog_max_len of them); None = off until SLOWLOG THRESHOLD. See cache.slowlog.
+    slowlog_threshold_us: Optional[int] = None
+    slowlog_max_len: int = SLOWLOG_MAX_LEN
+
+    # File TRACE START records the node's requests to, for cache.simulator (see cache.trace)
+    trace_path: Optional[str] = None
+
+    # XFetch early refreshes: GET and GETL answer "VALUE v REFRESH" to one reader of an
+    # entry ahead of its expiry, at random, sooner for entries slower to recompute
+    # (0 = off; see Cache.get_with_state)
+    xfetch_beta: float = 0.0
+
+    # Values of at least compress_threshold bytes are stored zlib-compressed at
+    # compress_level (None = off; see cache.compression)
+    compress_threshold: Optional[int] = None
+    compress_level: int = DEFAULT_LEVEL
+
 class CacheNode:
-    def __init__(self, cfg: CacheNodeConfig):
+    # Max heap entries one shard.expire() call may pop while holding the shard lock
+    EXPIRE_BUDGET = 256
+
+    # Seconds between checks of the append-only log's size against aof_rewrite_bytes
+    AOF_CHECK_INTERVAL = 1.0
+
+    def __init__(self, cfg: CacheNodeConfig, shards: Optional[Dict[int, Cache[str, Any]]] = None):
+        """
+        shards, if given, supplies one cache per owned shard instead of creating them
+        from cfg (used by multi-worker mode, where some shards live in sibling processes).
+        Replica shards get a local cache like owned ones but only serve reads.
+        """
         self.cfg = cfg
         self._validate_cfg()
-        self.local_shards: Dict[int, Cache[str, str]] = CacheFactory.create_local_shards(
-            total_capacity=self.cfg.capacity, 
-            policy=self.cfg.policy, 
-            shard_ids=sorted(self.cfg.owned_shards),
-        )
+        # Ownership changes at runtime when shards migrate. owned_shards, _readable,
+        # local_shards and the cluster map are replaced, never mutated in place, so
+        # request paths can read them without a lock; _map_lock serializes the changes.
+        self.owned_shards: FrozenSet[int] = frozenset(self.cfg.owned_shards)
+        # shards this node answers GETs for
+        self._readable = self.owned_shards | frozenset(self.cfg.replica_shards)
+        self.cluster_map: Dict[int, Address] = dict(self.cfg.cluster_map)
+        # shard id -> version of its cluster_map entry, raised by every migration of the shard
+        self.shard_epochs: Dict[int, int] = dict.fromkeys(range(self.cfg.n_shards), self.cfg.map_version)
+        self._map_lock = threading.Lock()
+        self._migrations: Dict[int, ShardMigration] = {}  # shards moving away, by shard id
+        self._importing: Dict[int, Address] = {}  # shards moving here -> their source
+        self._failed_migrations: Dict[int, str] = {}
+        if shards is not None:
+            if set(shards) != self._readable:
+                raise ValueError("shards must contain exactly the owned and replica shard ids")
+            self.local_shards: Dict[int, Cache[str, Any]] = dict(shards)
+        elif not self._readable:
+            # a node joining the cluster empty, to receive shards by migration
+            self.local_shards = {}
+        else:
+            self.local_shards = CacheFactory.create_local_shards(
+                total_capacity=self.cfg.capacity,
+                policy=self.cfg.policy,
+                shard_ids=sorted(self._readable),
+                max_bytes=self.cfg.max_bytes,
+                max_entry_bytes=self.cfg.max_entry_bytes,
+            )
+
+        self._stop = threading.Event()
+        self._expiry_thread: Optional[threading.Thread] = None
+        if self.cfg.expire_interval is not None:
+            self._expiry_thread = threading.Thread(target=self._expire_loop, name="cache-expiry", daemon=True)
+            self._expiry_thread.start()
+
+        # held while a snapshot is being written
+        self._snapshot_lock = threading.Lock()
+        self._snapshot_thread: Optional[threading.Thread] = None
+        if self.cfg.snapshot_interval is not None:
+            self._snapshot_thread = threading.Thread(target=self._snapshot_loop, name="cache-snapshot", daemon=True)
+            self._snapshot_thread.start()
+
+        self._log: Optional[AppendOnlyLog] = None
+        self._log_thread: Optional[threading.Thread] = None
+        if self.cfg.aof_path is not None:
+            self._log = AppendOnlyLog(self.cfg.aof_path, self.cfg.aof_fsync, self.cfg.aof_fsync_ms)
+            if self.cfg.snapshot_path is not None and self.cfg.aof_rewrite_bytes is not None:
+                self._log_thread = threading.Thread(target=self._log_compact_loop, name="cache-aof-compact", daemon=True)
+                self._log_thread.start()
+
+        # Replication: a backlog per owned shard that has replicas, one link per replica
+        # address (started by start_replication), and the state of the shards replicated here
+        self.replid = new_replid()
+        self._backlogs: Dict[int, ReplicationBacklog] = {}
+        for sid in self.cfg.owned_shards:
+            if any(addr != (self.cfg.host, self.cfg.port) for addr in self.cfg.replicas.get(sid, ())):
+                self._backlogs[sid] = ReplicationBacklog(self.cfg.repl_backlog_bytes)
+        self._links: List[ReplicaLink] = []
+        self._replica = ReplicaShards({sid: self.local_shards[sid] for sid in self.cfg.replica_shards})
+
+        # Writes to a shard whose writes are logged or replicated hold its record lock
+        # while applying the write and appending its record, so records are in the
+        # order the writes were applied in
+        recorded = self.cfg.owned_shards if self._log is not None else self._backlogs
+        self._record_locks: Dict[int, threading.Lock] = {sid: threading.Lock() for sid in recorded}
+
+        # Client tracking; writes, evictions and expiry only report keys once a client has enabled it
+        self._tracker = Tracker(self.cfg.tracking_max_keys)
+        self._tracking = False
+
+        # Connection and byte counters are kept by the server; command counts and
+        # sampled latencies by handle and friends. Concurrent commands race on
+        # _countdown, so it may be decremented past zero; due means <= 0, not == 0.
+        self.metrics = NodeMetrics(COMMANDS, OPCODE_NAMES, self.cfg.latency_sample)
+        self._countdown = self.metrics.countdown()
+
+        # Slowlog and profile. tracing is only true while either is on; until then
+        # commands take the untraced paths and shard locks are the plain locks.
+        self.tracer = RequestTracer(self.cfg.slowlog_threshold_us, self.cfg.slowlog_max_len)
+        self.tracing = False
+        self._update_tracing()
+
+        # Request trace, while TRACE START is in effect
+        self._trace: Optional[TraceRecorder] = None
+        self._trace_lock = threading.Lock()
+
+        # GETL fill leases: key -> time.monotonic() deadline. Taken under _lease_lock;
+        # every write or delete of a key through the helpers below ends its lease.
+        self._leases: Dict[str, float] = {}
+        self._lease_lock = threading.Lock()
+
+        # GET and GETL ask shards for the state of what they read (get_with_state) once
+        # a PUT has given an entry a grace window, or from the start with xfetch_beta set
+        self._stateful_reads = self.cfg.xfetch_beta > 0
+
+        # Compresses large values on write (with compress_threshold set) and inflates
+        # compressed ones on read, which may also come from snapshots, logs and peers
+        self.compression = Compressor(self.cfg.compress_threshold, self.cfg.compress_level)
+        self._compressing = self.cfg.compress_threshold is not None
+
+    def _expire_loop(self) -> None:
+        while not self._stop.wait(self.cfg.expire_interval):
+            for shard in list(self.local_shards.values()):
+                # keep going while a full budget was used, i.e. more entries are likely due
+                while shard.expire(self.EXPIRE_BUDGET) >= self.EXPIRE_BUDGET:
+                    if self._stop.is_set():
+                        return
+            if self._tracking:
+                self._tracker.flush()
+
+    def _snapshot_loop(self) -> None:
+        while not self._stop.wait(self.cfg.snapshot_interval):
+            with self._snapshot_lock:
+                self._write_snapshot()
+
+    def _write_snapshot(self) -> int:
+        """
+        Caller must hold self._snapshot_lock. Errors are reported, not raised, since
+        this also runs on background threads.
+        """
+        try:
+            # Records logged before the rotation are all reflected in the snapshot, so
+            # the rotated part can go once the snapshot is on disk. If an earlier
+            # snapshot failed, the rotated part is still there and is kept as is.
+            if self._log is not None and not os.path.exists(self._old_log_path):
+                self._log.rotate(self._old_log_path)
+            skipped: List[str] = []
+            count = write_snapshot(self.cfg.snapshot_path, self.local_shards, self.cfg.n_shards, skipped)
+            if skipped:
+                print(
+                    f"[cache-node] snapshot to {self.cfg.snapshot_path} left out {len(skipped)} keys"
+                    f" longer than 65535 bytes, e.g. {skipped[0][:40]!r}...",
+                    file=sys.stderr,
+                )
+            if self._log is not None:
+                os.remove(self._old_log_path)
+            return count
+        except (OSError, TypeError, NotImplementedError, struct.error) as e:
+            print(f"[cache-node] snapshot to {self.cfg.snapshot_path} failed: {e}", file=sys.stderr)
+            return -1
+
+    @property
+    def _old_log_path(self) -> str:
+        return f"{self.cfg.aof_path}.old"
+
+    def _log_compact_loop(self) -> None:
+        while not self._stop.wait(self.AOF_CHECK_INTERVAL):
+            if self._log.size() < self.cfg.aof_rewrite_bytes:
+                continue
+            # skip this round if a snapshot (which compacts the log anyway) is running
+            if self._snapshot_lock.acquire(blocking=False):
+                try:
+                    self._write_snapshot()
+                finally:
+                    self._snapshot_lock.release()
+
+    def save_snapshot(self) -> int:
+        """
+        Write the owned shards to cfg.snapshot_path, waiting for any snapshot in
+        progress. Returns the number of entries written, or -1 on failure.
+        """
+        with self._snapshot_lock:
+            return self._write_snapshot()
+
+    def load_snapshot(self, skipped: Optional[List[str]] = None) -> int:
+        """
+        Load cfg.snapshot_path into the owned shards. Returns the number of entries
+        loaded; keys of entries too large to load are appended to skipped.
+        """
+        return load_snapshot(self.cfg.snapshot_path, self.local_shards, self.cfg.n_shards, self.shard_id, skipped)
+
+    def replay_log(self) -> int:
+        """
+        Replay cfg.aof_path into the owned shards (after load_snapshot, if any), including
+        the part rotated out by a snapshot that did not finish. Returns the number of
+        records applied.
+        """
+        applied = 0
+        for path in (self._old_log_path, self.cfg.aof_path):
+            if os.path.exists(path):
+                applied += replay_log(path, self.local_shards, self.shard_id)
+        return applied
+
+    def start_replication(self) -> None:
+        """
+        Start pushing replicated shards to their replicas. Call once the shards hold
+        their starting data (after load_snapshot/replay_log), since replicas are first
+        resynced from a copy of the shards.
+        """
+        by_address: Dict[Address, List[int]] = {}
+        for sid in sorted(self._backlogs):
+            for addr in self.cfg.replicas[sid]:
+                if addr != (self.cfg.host, self.cfg.port):
+                    by_address.setdefault(addr, []).append(sid)
+        for addr, sids in by_address.items():
+            link = ReplicaLink(
+                addr,
+                {sid: (self.local_shards[sid], self._backlogs[sid], self._record_locks[sid]) for sid in sids},
+                self.replid,
+                self._stop,
+            )
+            link.start()
+            self._links.append(link)
+
+    def _record(self, sid: int, record: bytes) -> None:
+        if self._log is not None:
+            self._log.append(record)
+        backlog = self._backlogs.get(sid)
+        if backlog is not None:
+            backlog.append(record)
+
+    @staticmethod
+    def _deadline(ttl: Optional[float]) -> Optional[float]:
+        return time.time() + ttl if ttl is not None else None
+
+    # Writes go through these so they are logged, replicated and migrated; see _record_locks.
+    # They return the redirect (MOVED or ASK) for keys they did not apply: the shard may
+    # have moved away since the request was routed, and while a shard migrates, keys the
+    # source no longer (or never did) hold are written on the target.
+
+    def _redirect_locked(self, sid: int, keys: List[str], shard: Cache[str, Any]) -> Dict[str, str]:
+        """
+        Caller holds sid's record lock.
+        """
+        if sid not in self.owned_shards and sid not in self._importing:
+            return dict.fromkeys(keys, MOVED)
+        migration = self._migrations.get(sid)
+        if migration is None or not migration.started:
+            return {}
+        present = shard.get_many(keys)
+        return {key: ASK for key in keys if key not in present}
+
+    def _put(
+        self, sid: int, shard: Cache[str, Any], key: str, value: Any, ttl: Optional[float], grace: Optional[float] = None
+    ) -> Optional[str]:
+        """
+        grace (with ttl) keeps the entry readable, marked stale, for that many seconds
+        past ttl. Logs, replicas and migrations only carry the entry's final deadline.
+        """
+        if self._tracking:
+            self._tracker.invalidate(key)
+        if self._leases:
+            self._leases.pop(key, None)
+        if self._compressing:
+            value = self.compression.compress(value)
+        lock = self._record_locks.get(sid)
+        if lock is None:
+            self._put_shard(shard, key, value, ttl, grace)
+            return None
+        with lock:
+            redirect = self._redirect_locked(sid, [key], shard).get(key)
+            if redirect is None:
+                deadline = self._deadline(ttl if grace is None else ttl + grace)
+                record = self._put_record(sid, key, value, deadline)
+                self._put_shard(shard, key, value, ttl, grace)
+                self._record_put(sid, key, deadline, record)
+        return redirect
+
+    def _put_shard(
+        self, shard: Cache[str, Any], key: str, value: Any, ttl: Optional[float], grace: Optional[float]
+    ) -> None:
+        if grace is None:
+            shard.put(key, value, ttl)
+        else:
+            self._stateful_reads = True
+            shard.put_with_grace(key, value, ttl, grace)
+
+    def _put_many(
+        self, sid: int, shard: Cache[str, Any], items: List[Tuple[str, Any, Optional[float]]]
+    ) -> Dict[str, str]:
+        if self._tracking:
+            for key, _, _ in items:
+                self._tracker.invalidate(key)
+        if self._leases:
+            for key, _, _ in items:
+                self._leases.pop(key, None)
+        if self._compressing:
+            compress = self.compression.compress
+            items = [(key, compress(value), ttl) for key, value, ttl in items]
+        lock = self._record_locks.get(sid)
+        if lock is None:
+            shard.put_many(items)
+            return {}
+        with lock:
+            redirects = self._redirect_locked(sid, [key for key, _, _ in items], shard)
+            if redirects:
+                items = [item for item in items if item[0] not in redirects]
+            deadlines = [self._deadline(ttl) for _, _, ttl in items]
+            records = [
+                self._put_record(sid, key, value, deadline) for (key, value, _), deadline in zip(items, deadlines)
+            ]
+            shard.put_many(items)
+            for (key, _, _), deadline, record in zip(items, deadlines, records):
+                self._record_put(sid, key, deadline, record)
+        return redirects
+
+    def _put_record(self, sid: int, key: str, value: Any, deadline: Optional[float]) -> Optional[bytes]:
+        """
+        Encode the log record of a put, if sid is logged or replicated. Done before the
+        shard is written, so a write that cannot be recorded is not applied either.
+        """
+        if self._log is not None or sid in self._backlogs:
+            return encode_put(key, value, deadline)
+        return None
+
+    def _record_put(self, sid: int, key: str, deadline: Optional[float], record: Optional[bytes]) -> None:
+        migration = self._migrations.get(sid)
+        if migration is not None:
+            migration.note_write(key, deadline)
+        if record is not None:
+            self._record(sid, record)
+
+    def _update(
+        self, sid: int, shard: Cache[str, Any], key: str, update: Callable[[], Any], applied: Callable[[Any], bool]
+    ) -> Tuple[Optional[str], Any]:
+        """
+        Run update(), an atomic read-modify-write of key on shard (incr, append or cas),
+        and record the entry it left if applied(its result). Returns (redirect, result);
+        update does not run when redirected.
+        """
+        if self._tracking:
+            self._tracker.invalidate(key)
+        if self._leases:
+            self._leases.pop(key, None)
+        lock = self._record_locks.get(sid)
+        if lock is None:
+            return None, update()
+        with lock:
+            redirect = self._redirect_locked(sid, [key], shard).get(key)
+            if redirect is not None:
+                return redirect, None
+            result = update()
+            if applied(result):
+                entry = shard.get_entry(key)
+                if entry is not None:
+                    self._record_put(sid, key, entry[1], self._put_record(sid, key, entry[0], entry[1]))
+                elif self._log is not None or sid in self._backlogs:
+                    self._record(sid, encode_del(key))  # already evicted
+        return None, result
+
+    def _delete(self, sid: int, shard: Cache[str, Any], key: str) -> Tuple[Optional[str], bool]:
+        """
+        Returns (redirect, deleted).
+        """
+        if sid not in self._record_locks:
+            if self._tracking:
+                self._tracker.invalidate(key)
+            if self._leases:
+                self._leases.pop(key, None)
+            return None, shard.delete(key)
+        redirects, removed = self._delete_many(sid, shard, [key])
+        return redirects.get(key), removed.get(key, False)
+
+    def _delete_many(
+        self, sid: int, shard: Cache[str, Any], keys: List[str]
+    ) -> Tuple[Dict[str, str], Dict[str, bool]]:
+        """
+        Returns (redirects, deleted) by key.
+        """
+        if self._tracking:
+            for key in keys:
+                self._tracker.invalidate(key)
+        if self._leases:
+            for key in keys:
+                self._leases.pop(key, None)
+        lock = self._record_locks.get(sid)
+        if lock is None:
+            return {}, shard.delete_many(keys)
+        with lock:
+            redirects = self._redirect_locked(sid, keys, shard)
+            if redirects:
+                keys = [key for key in keys if key not in redirects]
+            removed = shard.delete_many(keys)
+            if self._log is not None or sid in self._backlogs:
+                for key in keys:
+                    if removed[key]:
+                        self._record(sid, encode_del(key))
+        return redirects, removed
+
+    def commit_log(self) -> None:
+        """
+        Write the records of the writes executed so far to the log (group commit) and
+        send the invalidations they caused. handle, handle_many and their binary
+        counterparts call this before returning.
+        """
+        if self._log is not None:
+            self._log.commit()
+        if self._tracking:
+            self._tracker.flush()
+
+    def open_session(self, push: Optional[Callable[[bytes], None]]) -> ClientSession:
+        """
+        Called by the server for every new connection. push (thread-safe) writes bytes
+        to the connection; without it the connection cannot receive invalidations.
+        """
+        return self._tracker.open(push)
+
+    def close_session(self, session: ClientSession) -> None:
+        self._tracker.close(session)
+
+    def _start_tracking(self) -> None:
+        with self._map_lock:
+            if self._tracking:
+                return
+            for shard in self.local_shards.values():
+                shard.set_removal_listener(self._tracker.invalidate)
+            self._tracking = True
+
+    def _client(self, args: List[str], session: Optional[ClientSession]) -> str:
+        usage = "ERR usage: CLIENT ID | CLIENT TRACKING ON [REDIRECT id] [BCAST] [PREFIX p ...] | CLIENT TRACKING OFF"
+        sub = args[0].upper() if args else ""
+        if session is None:
+            return "ERR CLIENT commands need a server that keeps connection state (asyncio mode)"
+        if sub == "ID" and len(args) == 1:
+            return f"ID {session.id}"
+        if sub != "TRACKING" or len(args) < 2:
+            return usage
+        if args[1].upper() == "OFF" and len(args) == 2:
+            self._tracker.disable(session)
+            return "OK"
+        if args[1].upper() != "ON":
+            return usage
+
+        redirect: Optional[int] = None
+        bcast = False
+        prefixes: List[str] = []
+        i = 2
+        while i < len(args):
+            option = args[i].upper()
+            if option == "BCAST":
+                bcast = True
+                i += 1
+            elif option in ("REDIRECT", "PREFIX") and i + 1 < len(args):
+                if option == "PREFIX":
+                    prefixes.append(args[i + 1])
+                elif args[i + 1].isdigit():
+                    redirect = int(args[i + 1])
+                else:
+                    return usage
+                i += 2
+            else:
+                return usage
+        error = self._tracker.enable(session, redirect, bcast, prefixes)
+        if error is not None:
+            return f"ERR {error}"
+        self._start_tracking()
+        return "OK"
+
+    @property
+    def map_version(self) -> int:
+        """
+        Version of this node's cluster map: the highest epoch of any shard.
+        """
+        return max(self.shard_epochs.values())
+
+    def _migrate(self, args: List[str]) -> str:
+        if len(args) != 2 or not args[0].isdigit():
+            return "ERR usage: MIGRATE shard host:port"
+        sid = int(args[0])
+        target = _parse_address(args[1])
+        if target is None:
+            return "ERR usage: MIGRATE shard host:port"
+        me = (self.cfg.host, self.cfg.port)
+        with self._map_lock:
+            if sid not in self.owned_shards:
+                return "ERR shard not owned"
+            if sid in self._migrations:
+                return "ERR migration_in_progress"
+            if target == me:
+                return "ERR shard is already here"
+            if sid in self._backlogs:
+                return "ERR replicated shards cannot be migrated"
+            # from here on every write to the shard takes its record lock
+            lock = self._record_locks.setdefault(sid, threading.Lock())
+            migration = ShardMigration(
+                sid, self.local_shards[sid], lock, me, target,
+                lambda: self.map_version, self._migration_finished, self._migration_aborted,
+            )
+            self._migrations[sid] = migration
+            self._failed_migrations.pop(sid, None)
+        migration.start()
+        return "OK"
+
+    def _migration_finished(self, migration: ShardMigration, epoch: int) -> None:
+        sid = migration.sid
+        with self._map_lock:
+            self.owned_shards = self.owned_shards - {sid}
+            self._readable = self._readable - {sid}
+            self.cluster_map = {**self.cluster_map, sid: migration.target}
+            self.shard_epochs = {**self.shard_epochs, sid: epoch}
+            self.local_shards = {k: v for k, v in self.local_shards.items() if k != sid}
+            del self._migrations[sid]
+            if self._log is None:
+                self._record_locks.pop(sid, None)
+        if self._tracking:
+            # clients must not keep serving keys whose writes now go to another node
+            self._tracker.invalidate_all()
+            self._tracker.flush()
+
+    def _migration_aborted(self, migration: ShardMigration) -> None:
+        with self._map_lock:
+            del self._migrations[migration.sid]
+            self._failed_migrations[migration.sid] = migration.error or "aborted"
+
+    def _import(self, key: str, value: bytes) -> Tuple[int, bytes]:
+        """
+        Target side of a migration: the IMPORT frames described in cache.migration.
+        """
+        fields = key.split()
+        if len(fields) < 2 or not fields[0].isdigit() or int(fields[0]) >= self.cfg.n_shards:
+            return Status.ERR, b"bad import frame"
+        sid, step = int(fields[0]), fields[1]
+
+        if step == "begin" and len(fields) == 5:
+            source = _parse_address(fields[2])
+            if source is None or not fields[3].isdigit() or not fields[4].isdigit():
+                return Status.ERR, b"bad import frame"
+            capacity = int(fields[3]) or max(1, self.cfg.capacity // self.cfg.n_shards)
+            with self._map_lock:
+                if sid in self._readable:
+                    return Status.ERR, b"shard is already served by this node"
+                shard = CacheFactory.create_local_cache(
+                    capacity, self.cfg.policy, int(fields[4]) or None, self.cfg.max_entry_bytes
+                )
+                if self._log is not None:
+                    self._record_locks[sid] = threading.Lock()
+                if self._tracking:
+                    shard.set_removal_listener(self._tracker.invalidate)
+                if self.tracing:
+                    shard.set_lock_timer(self.tracer.lock_waited)
+                # a retried migration starts over with an empty shard
+                self.local_shards = {**self.local_shards, sid: shard}
+                self._importing[sid] = source
+            return Status.OK, str(self.map_version).encode("utf-8")
+
+        shard = self.local_shards.get(sid) if sid in self._importing else None
+        if shard is None:
+            return Status.ERR, b"shard is not being imported"
+
+        if step == "keys" and len(fields) == 3 and fields[2].isdigit():
+            items = decode_entries(value, 0, int(fields[2]), time.time())
+            try:
+                self._put_many(sid, shard, items)
+            except ValueTooLargeError:
+                return Status.ERR, b"value_too_large"
+            return Status.OK, b""
+
+        if step == "end" and len(fields) == 3 and fields[2].isdigit():
+            with self._map_lock:
+                self.owned_shards = self.owned_shards | {sid}
+                self._readable = self._readable | {sid}
+                self.cluster_map = {**self.cluster_map, sid: (self.cfg.host, self.cfg.port)}
+                self.shard_epochs = {**self.shard_epochs, sid: max(int(fields[2]), self.shard_epochs[sid])}
+                del self._importing[sid]
+            return Status.OK, b""
+
+        if step == "abort" and len(fields) == 2:
+            with self._map_lock:
+                del self._importing[sid]
+                self.local_shards = {k: v for k, v in self.local_shards.items() if k != sid}
+                self._record_locks.pop(sid, None)
+            return Status.OK, b""
+
+        return Status.ERR, b"bad import frame"
+
+    def _cluster_map_lines(self) -> List[str]:
+        lines = [f"VERSION {self.map_version}"]
+        epochs = self.shard_epochs
+        for sid, (host, port) in sorted(self.cluster_map.items()):
+            line = f"SHARD {sid} {host}:{port} EPOCH {epochs[sid]}"
+            migration = self._migrations.get(sid)
+            if migration is not None:
+                line += f" MIGRATING {migration.target[0]}:{migration.target[1]} MOVED {migration.moved}"
+            source = self._importing.get(sid)
+            if source is not None:
+                line += f" IMPORTING {source[0]}:{source[1]}"
+            if sid in self._failed_migrations:
+                line += " FAILED"
+            lines.append(line)
+        return lines
+
+    def _set_owner(self, args: List[str]) -> str:
+        """
+        Record that another node now owns a shard (after it migrated between two other
+        nodes). Ignored unless epoch is newer than the shard's current one.
+        """
+        usage = "ERR usage: CLUSTER SETOWNER shard host:port epoch"
+        if len(args) != 3 or not args[0].isdigit() or not args[2].isdigit():
+            return usage
+        sid, owner, epoch = int(args[0]), _parse_address(args[1]), int(args[2])
+        if owner is None or sid >= self.cfg.n_shards:
+            return usage
+        with self._map_lock:
+            if epoch <= self.shard_epochs[sid]:
+                return "STALE"
+            if (sid in self.owned_shards) != (owner == (self.cfg.host, self.cfg.port)):
+                return "ERR ownership of a shard this node holds only changes by MIGRATE"
+            self.cluster_map = {**self.cluster_map, sid: owner}
+            self.shard_epochs = {**self.shard_epochs, sid: epoch}
+        return "OK"
+
+    def _cluster(self, args: List[str]) -> str:
+        sub = args[0].upper() if args else ""
+        if sub == "MAP" and len(args) == 1:
+            return self._multi(self._cluster_map_lines())
+        if sub == "SETOWNER":
+            return self._set_owner(args[1:])
+        return "ERR usage: CLUSTER MAP | CLUSTER SETOWNER shard host:port epoch"
+
+    def _bgsave(self) -> str:
+        if self.cfg.snapshot_path is None:
+            return "ERR no snapshot_path configured"
+        if not self._snapshot_lock.acquire(blocking=False):
+            return "ERR snapshot_in_progress"
+
+        def run() -> None:
+            try:
+                self._write_snapshot()
+            finally:
+                self._snapshot_lock.release()
+
+        threading.Thread(target=run, name="cache-bgsave", daemon=True).start()
+        return "OK"
+
+    def close(self) -> None:
+        """
+        Stop background threads and close the append-only log.
+        """
+        self._stop.set()
+        if self._expiry_thread is not None:
+            self._expiry_thread.join()
+        if self._snapshot_thread is not None:
+            self._snapshot_thread.join()
+        if self._log_thread is not None:
+            self._log_thread.join()
+        for link in self._links:
+            link.join()
+        for migration in list(self._migrations.values()):
+            migration.join()
+        if self._log is not None:
+            self._log.close()
+        self._stop_trace()
 
     def _validate_cfg(self) -> None:
         if self.cfg.n_shards <= 0:
             raise ValueError("n_shards must be > 0")
-        if not self.cfg.owned_shards:
-            raise ValueError("owned_shards cannot be empty")
+        if self.cfg.expire_interval is not None and self.cfg.expire_interval <= 0:
+            raise ValueError("expire_interval must be > 0")
+        if self.cfg.snapshot_interval is not None:
+            if self.cfg.snapshot_interval <= 0:
+                raise ValueError("snapshot_interval must be > 0")
+            if self.cfg.snapshot_path is None:
+                raise ValueError("snapshot_interval requires snapshot_path")
+        if self.cfg.aof_fsync not in FSYNC_POLICIES:
+            raise ValueError(f"aof_fsync must be one of {', '.join(FSYNC_POLICIES)}")
+        if self.cfg.aof_fsync_ms <= 0:
+            raise ValueError("aof_fsync_ms must be > 0")
+        if self.cfg.aof_rewrite_bytes is not None and self.cfg.aof_rewrite_bytes <= 0:
+            raise ValueError("aof_rewrite_bytes must be > 0")
         if any(s < 0 or s >= self.cfg.n_shards for s in self.cfg.owned_shards):
             raise ValueError("owned_shards contains invalid shard id")
+        if any(s < 0 or s >= self.cfg.n_shards for s in self.cfg.replica_shards):
+            raise ValueError("replica_shards contains invalid shard id")
+        if self.cfg.replica_shards & self.cfg.owned_shards:
+            raise ValueError("a shard cannot be both owned and replicated by one node")
+        for sid in self.cfg.replica_shards:
+            if (self.cfg.host, self.cfg.port) not in self.cfg.replicas.get(sid, ()):
+                raise ValueError(f"shard {sid} is in replica_shards but its replicas do not list this node")
+        if self.cfg.repl_backlog_bytes <= 0:
+            raise ValueError("repl_backlog_bytes must be > 0")
         if set(self.cfg.cluster_map.keys()) != set(range(self.cfg.n_shards)):
             raise ValueError("cluster_map must contain every shard_id in [0, n_shards)")
+        if self.cfg.map_version < 0:
+            raise ValueError("map_version must be >= 0")
+        if self.cfg.tracking_max_keys <= 0:
+            raise ValueError("tracking_max_keys must be > 0")
+        if self.cfg.latency_sample < 0:
+            raise ValueError("latency_sample must be >= 0")
+        if self.cfg.metrics_port is not None and not 0 < self.cfg.metrics_port < 65536:
+            raise ValueError("metrics_port must be in [1, 65535]")
+        if self.cfg.slowlog_threshold_us is not None and self.cfg.slowlog_threshold_us < 0:
+            raise ValueError("slowlog_threshold_us must be >= 0")
+        if self.cfg.slowlog_max_len <= 0:
+            raise ValueError("slowlog_max_len must be > 0")
+        if self.cfg.xfetch_beta < 0:
+            raise ValueError("xfetch_beta must be >= 0")
+        if self.cfg.compress_threshold is not None and self.cfg.compress_threshold <= 0:
+            raise ValueError("compress_threshold must be > 0")
+        if not 1 <= self.cfg.compress_level <= 9:
+            raise ValueError("compress_level must be in [1, 9]")
 
     def shard_id(self, key: str) -> int:
-        # Stable across processes/machines
-        return zlib.crc32(key.encode("utf-8")) % self.cfg.n_shards
+        return key_shard(key, self.cfg.n_shards)
 
     def _addr_for(self, shard_id: int) -> Address:
-        return self.cfg.cluster_map[shard_id]
+        return self.cluster_map[shard_id]
 
     def _moved(self, shard_id: int) -> str:
         host, port = self._addr_for(shard_id)
         return f"MOVED {shard_id} {host}:{port}"
 
-    def _sum_stats(self) -> CacheStats:
+    def _redirect(self, kind: str, shard_id: int) -> str:
+        """
+        The reply line for a MOVED or ASK returned by a write helper or _miss_redirect.
+        """
+        if kind == ASK:
+            migration = self._migrations.get(shard_id)
+            if migration is not None:
+                host, port = migration.target
+                return f"ASK {shard_id} {host}:{port}"
+        # the migration has finished since, so the target is the owner now
+        return self._moved(shard_id)
+
+    def _redirect_frame(self, kind: str, shard_id: int) -> Tuple[int, bytes]:
+        name, body = self._redirect(kind, shard_id).split(" ", 1)
+        return (Status.ASK if name == ASK else Status.MOVED), body.encode("utf-8")
+
+    def _miss_redirect(self, shard_id: int) -> Optional[str]:
+        """
+        For a key a shard does not hold: ASK if the shard is migrating (the key may
+        have moved already), MOVED if the shard has moved away since it was routed.
+        """
+        migration = self._migrations.get(shard_id)
+        if migration is not None and migration.started:
+            return ASK
+        if shard_id not in self._readable and shard_id not in self._importing:
+            return MOVED
+        return None
+
+    def _route(self, key: str, asking: bool = False) -> Tuple[int, Optional[Cache[str, Any]]]:
+        """
+        Return (shard_id, local shard), where the shard is None if this node does not own
+        it. With asking, a shard this node is importing counts as owned.
+        """
+        sid = self.shard_id(key)
+        if sid in self.owned_shards or (asking and sid in self._importing):
+            return sid, self.local_shards.get(sid)
+        return sid, None
+
+    def _route_read(self, key: str, asking: bool = False) -> Tuple[int, Optional[Cache[str, Any]]]:
+        """
+        Like _route, but replica shards are served too.
+        """
+        sid = self.shard_id(key)
+        if sid in self._readable or (asking and sid in self._importing):
+            return sid, self.local_shards.get(sid)
+        return sid, None
+
+    @staticmethod
+    def _value_reply(val: Any, suffix: str = "") -> str:
+        """
+        "VALUE v" followed by suffix. Values stored over the binary protocol are raw
+        bytes; one containing a line break would split the reply, so it gets
+        "ERR binary_value" instead.
+        """
+        if isinstance(val, (bytes, bytearray, memoryview)):
+            val = bytes(val)
+            if b"\n" in val or b"\r" in val:
+                return "ERR binary_value"
+            return f"VALUE {val.decode('utf-8', errors='replace')}{suffix}"
+        return f"VALUE {val}{suffix}"
+
+    @staticmethod
+    def _as_bytes(val: Any) -> bytes:
+        if isinstance(val, (bytes, bytearray, memoryview)):
+            return val
+        return str(val).encode("utf-8")
+
+    def _group_by_shard(self, keys: Iterable[str]) -> Dict[int, List[str]]:
+        groups: Dict[int, List[str]] = {}
+        for key in keys:
+            groups.setdefault(self.shard_id(key), []).append(key)
+        return groups
+
+    @staticmethod
+    def _multi(replies: List[str]) -> str:
+        """
+        Multi-key replies are a "MULTI n" header followed by one line per key, in request order.
+        """
+        return "\n".join([f"MULTI {len(replies)}", *replies])
+
+    def _mget(self, keys: List[str], asking: bool = False, session: Optional[ClientSession] = None) -> str:
+        replies: Dict[str, str] = {}
+        for sid, group in self._group_by_shard(keys).items():
+            _, shard = self._route_read(group[0], asking)
+            if shard is None:
+                moved = self._moved(sid)
+                for key in group:
+                    replies[key] = moved
+                continue
+            if session is not None and session.tracks_reads and sid in self.owned_shards:
+                self._tracker.track(session, group)
+            found = shard.get_many(group)
+            trace = self._trace
+            if trace is not None:
+                for key in group:
+                    trace.record(OP_GET, key, self._traced_size(found.get(key)))
+            miss: Optional[str] = None
+            for key in group:
+                val = found.get(key)
+                if val is not None:
+                    if type(val) is Compressed:
+                        val = self.compression.decompress(val)
+                    replies[key] = self._value_reply(val)
+                    continue
+                if miss is None:
+                    redirect = self._miss_redirect(sid)
+                    miss = self._redirect(redirect, sid) if redirect is not None else "NOT_FOUND"
+                replies[key] = miss
+        return self._multi([replies[key] for key in keys])
+
+    def _mset(self, args: List[str], asking: bool = False) -> str:
+        # key value [EX ttl] key value [EX ttl] ...; a token EX after a pair always
+        # starts its ttl, so no key may be named EX (in any case)
+        entries: List[Tuple[str, str, Optional[float]]] = []
+        i = 0
+        while i < len(args):
+            if i + 1 >= len(args):
+                return "ERR usage: MSET key value [EX ttl] [key value [EX ttl] ...]"
+            key, value = args[i], args[i + 1]
+            if key.upper() == "EX":
+                return "ERR EX is reserved in MSET and cannot be a key; use PUT"
+            if key_too_long(key):
+                return "ERR key_too_long"
+            i += 2
+            ttl = None
+            if i < len(args) and args[i].upper() == "EX":
+                if i + 1 >= len(args):
+                    return "ERR usage: MSET key value [EX ttl] [key value [EX ttl] ...]"
+                ttl = parse_seconds(args[i + 1])
+                if ttl is None:
+                    return "ERR ttl must be a positive number"
+                i += 2
+            entries.append((key, value, ttl))
+
+        by_key = {key: (value, ttl) for key, value, ttl in entries}
+        replies: Dict[str, str] = {}
+        for sid, group in self._group_by_shard(by_key).items():
+            _, shard = self._route(group[0], asking)
+            if shard is None:
+                moved = self._moved(sid)
+                for key in group:
+                    replies[key] = moved
+                continue
+            trace = self._trace
+            if trace is not None:
+                for key in group:
+                    value, ttl = by_key[key]
+                    trace.record(OP_PUT, key, len(value), ttl)
+            try:
+                redirects = self._put_many(sid, shard, [(key, *by_key[key]) for key in group])
+                reply = "STORED"
+            except ValueTooLargeError:
+                redirects, reply = {}, "ERR value_too_large"
+            for key in group:
+                redirect = redirects.get(key)
+                replies[key] = self._redirect(redirect, sid) if redirect is not None else reply
+        return self._multi([replies[key] for key, _, _ in entries])
+
+    def _mdel(self, keys: List[str], asking: bool = False) -> str:
+        replies: Dict[str, str] = {}
+        for sid, group in self._group_by_shard(dict.fromkeys(keys)).items():
+            _, shard = self._route(group[0], asking)
+            if shard is None:
+                moved = self._moved(sid)
+                for key in group:
+                    replies[key] = moved
+                continue
+            trace = self._trace
+            if trace is not None:
+                for key in group:
+                    trace.record(OP_DEL, key)
+            redirects, removed = self._delete_many(sid, shard, group)
+            for key in group:
+                redirect = redirects.get(key)
+                if redirect is not None:
+                    replies[key] = self._redirect(redirect, sid)
+                else:
+                    replies[key] = "DELETED" if removed[key] else "NOT_FOUND"
+        return self._multi([replies[key] for key in keys])
+
+    def _sum_stats(self, shard_ids: Optional[Iterable[int]] = None) -> CacheStats:
         total = CacheStats()
-        for c in self.local_shards.values():
-            s = c.get_stats()
+        ids = self.local_shards if shard_ids is None else shard_ids
+        for sid in ids:
+            s = self.local_shards[sid].get_stats()
             total.hits += s.hits
             total.misses += s.misses
             total.evictions += s.evictions
             total.gets += s.gets
             total.puts += s.puts
+            total.expired += s.expired
+            total.bytes_used += s.bytes_used
+            total.entries += s.entries
         return total
 
-    def handle(self, line: str) -> Optional[str]:
+    def _replication_lines(self) -> List[str]:
         """
-        Parse and execute one command. Returns a response string,
-        or None to close the connection (QUIT).
+        One line per (replicated owned shard, replica) and per replica shard, with stream offsets.
+        """
+        acked: Dict[Tuple[int, Address], Optional[int]] = {}
+        for link in self._links:
+            for sid in link.shards:
+                acked[sid, link.address] = link.acked.get(sid)
+
+        lines = []
+        for sid in sorted(self._backlogs):
+            offset = self._backlogs[sid].end_offset
+            for addr in self.cfg.replicas[sid]:
+                if addr != (self.cfg.host, self.cfg.port):
+                    ack = acked.get((sid, addr))
+                    lines.append(
+                        f"SHARD {sid} ROLE primary OFFSET {offset} REPLICA {addr[0]}:{addr[1]} "
+                        f"ACKED {-1 if ack is None else ack}"
+                    )
+        for sid in sorted(self.cfg.replica_shards):
+            _, offset = self._replica.offsets.get(sid, ("", -1))
+            lines.append(f"SHARD {sid} ROLE replica OFFSET {offset}")
+        return lines
+
+    def _stats_line(self, shard_ids: Optional[Iterable[int]] = None) -> str:
+        """
+        Shard counters summed over shard_ids (default: every local shard); the
+        node-wide STATS also carries the connection, command and byte counters.
+        """
+        s = self._sum_stats(shard_ids)
+        line = (
+            f"HITS {s.hits} MISSES {s.misses} EVICTIONS {s.evictions} GETS {s.gets} PUTS {s.puts} "
+            f"EXPIRED {s.expired} BYTES_USED {s.bytes_used} ENTRIES {s.entries}"
+        )
+        if shard_ids is not None:
+            return line
+        m = self.metrics
+        line = (
+            f"{line} CONNECTIONS {m.connections} TOTAL_CONNECTIONS {m.total_connections} "
+            f"COMMANDS {m.commands_total} BYTES_IN {m.bytes_in} BYTES_OUT {m.bytes_out}"
+        )
+        if self._compressing:
+            c = self.compression
+            line += (
+                f" COMPRESSED {c.compressed} COMPRESS_SKIPPED {c.skipped} COMPRESS_RATIO {c.ratio():.2f} "
+                f"COMPRESS_US {c.compress_ns // 1000} DECOMPRESSED {c.decompressed} DECOMPRESS_US {c.decompress_ns // 1000}"
+            )
+        return line
+
+    def _shard_stats(self) -> Dict[int, CacheStats]:
+        return {sid: shard.get_stats() for sid, shard in sorted(self.local_shards.items())}
+
+    def _info(self, args: List[str]) -> str:
+        if len(args) > 1 or (args and args[0].lower() not in INFO_SECTIONS):
+            return f"ERR usage: INFO [{'|'.join(INFO_SECTIONS)}]"
+        sections = [args[0].lower()] if args else INFO_SECTIONS
+        m = self.metrics
+        lines: List[str] = []
+        for section in sections:
+            lines.append(f"# {section}")
+            if section == "server":
+                lines += [
+                    f"node_id {self.cfg.node_id}",
+                    f"uptime_seconds {int(time.time() - m.started)}",
+                    f"owned_shards {','.join(map(str, sorted(self.owned_shards))) or '-'}",
+                    f"replica_shards {','.join(map(str, sorted(self.cfg.replica_shards))) or '-'}",
+                    f"map_version {self.map_version}",
+                    f"policy {self.cfg.policy.name}",
+                ]
+            elif section == "clients":
+                tracking = self._tracker.info()
+                lines += [
+                    f"connections {m.connections}",
+                    f"total_connections {m.total_connections}",
+                    f"tracked_keys {tracking['tracked_keys']}",
+                    f"invalidations {tracking['invalidations']}",
+                ]
+            elif section == "stats":
+                s = self._sum_stats()
+                lines += [
+                    f"commands {m.commands_total}",
+                    f"bytes_in {m.bytes_in}",
+                    f"bytes_out {m.bytes_out}",
+                    f"hits {s.hits}",
+                    f"misses {s.misses}",
+                    f"hit_ratio {s.hits / max(s.hits + s.misses, 1):.4f}",
+                    f"evictions {s.evictions}",
+                    f"expired {s.expired}",
+                    f"entries {s.entries}",
+                    f"bytes_used {s.bytes_used}",
+                ]
+                if self._compressing:
+                    c = self.compression
+                    lines += [
+                        f"compressed {c.compressed}",
+                        f"compress_skipped {c.skipped}",
+                        f"compress_ratio {c.ratio():.2f}",
+                        f"compress_us {c.compress_ns // 1000}",
+                        f"decompressed {c.decompressed}",
+                        f"decompress_us {c.decompress_ns // 1000}",
+                    ]
+            elif section == "commands":
+                lines += m.command_lines()
+            else:
+                for sid, s in self._shard_stats().items():
+                    lines.append(
+                        f"{sid} entries {s.entries} bytes_used {s.bytes_used} hits {s.hits} misses {s.misses} "
+                        f"hit_ratio {s.hits / max(s.hits + s.misses, 1):.4f} evictions {s.evictions} expired {s.expired}"
+                    )
+        return self._multi(lines)
+
+    def prometheus_metrics(self) -> str:
+        """
+        The node's metrics in the Prometheus text format (see cache.metrics).
+        """
+        return self.metrics.prometheus(self.cfg.node_id, self._shard_stats())
+
+    def _update_tracing(self) -> None:
+        """
+        Install or remove the shard lock timers to match the tracer, after the
+        slowlog threshold or the profile changed.
+        """
+        with self._map_lock:
+            active = self.tracer.active
+            timer = self.tracer.lock_waited if active else None
+            for shard in self.local_shards.values():
+                shard.set_lock_timer(timer)
+            self.tracing = active
+
+    def _slowlog(self, args: List[str]) -> str:
+        sub = args[0].upper() if args else ""
+        if sub == "GET" and len(args) <= 2:
+            try:
+                count = int(args[1]) if len(args) == 2 else 10
+            except ValueError:
+                return "ERR count must be an integer"
+            # commands traced earlier on this thread, whose write was not reported yet
+            self.tracer.begin_batch()
+            return self._multi([entry.line() for entry in self.tracer.entries(max(count, 0))])
+        if sub == "LEN" and len(args) == 1:
+            return str(len(self.tracer))
+        if sub == "RESET" and len(args) == 1:
+            self.tracer.reset()
+            return "OK"
+        if sub == "THRESHOLD" and len(args) == 2:
+            if args[1].upper() == "OFF":
+                threshold = None
+            else:
+                try:
+                    threshold = int(args[1])
+                except ValueError:
+                    return "ERR threshold must be an integer number of microseconds or OFF"
+                if threshold < 0:
+                    return "ERR threshold must be >= 0"
+            self.tracer.set_threshold(threshold)
+            self._update_tracing()
+            return "OK"
+        return "ERR usage: SLOWLOG GET [count] | LEN | RESET | THRESHOLD us|OFF"
+
+    def _profile(self, args: List[str]) -> str:
+        sub = args[0].upper() if args else ""
+        if sub == "START" and len(args) <= 2:
+            try:
+                every = int(args[1]) if len(args) == 2 else DEFAULT_PROFILE_EVERY
+            except ValueError:
+                return "ERR rate must be an integer"
+            if every <= 0:
+                return "ERR rate must be > 0"
+            self.tracer.start_profile(every)
+            self._update_tracing()
+            return "OK"
+        if sub == "STOP" and len(args) == 1:
+            self.tracer.begin_batch()
+            lines = self.tracer.stop_profile()
+            self._update_tracing()
+            if not lines:
+                return "ERR no profile running"
+            return self._multi(lines)
+        return "ERR usage: PROFILE START [every] | STOP"
+
+    def _trace_command(self, args: List[str]) -> str:
+        sub = args[0].upper() if len(args) == 1 else ""
+        if sub == "START":
+            if self.cfg.trace_path is None:
+                return "ERR no trace_path configured"
+            with self._trace_lock:
+                if self._trace is not None:
+                    return "ERR trace already running"
+                try:
+                    self._trace = TraceRecorder(self.cfg.trace_path)
+                except OSError as e:
+                    return f"ERR cannot open trace: {e.strerror}"
+            return "OK"
+        if sub == "STOP":
+            records = self._stop_trace()
+            return "ERR no trace running" if records is None else f"RECORDS {records}"
+        if sub == "STATUS":
+            trace = self._trace
+            return "OFF" if trace is None else f"RECORDING {trace.path} RECORDS {trace.records}"
+        return "ERR usage: TRACE START | STOP | STATUS"
+
+    def _stop_trace(self) -> Optional[int]:
+        """
+        Stop recording. Returns the number of records written, or None if no trace
+        was running.
+        """
+        with self._trace_lock:
+            trace, self._trace = self._trace, None
+        if trace is None:
+            return None
+        trace.close()
+        return trace.records
+
+    def _getl(self, key: str, lease_ms: int, asking: bool, session: Optional[ClientSession]) -> str:
+        """
+        GET that coordinates the clients missing the same key: the first miss is told
+        to FILL it (load it and PUT it, or DEL it to give up) and takes a lease of
+        lease_ms; later misses get "WAIT ms", a retry delay, until a write or delete of
+        the key ends the lease or it runs out. Served by the owner only, since the
+        lease must be where the fill is written. With --workers, each worker process
+        keeps its own leases.
+        """
+        sid, shard = self._route(key, asking)
+        if shard is None:
+            return self._moved(sid)
+        if session is not None and session.tracks_reads:
+            self._tracker.track(session, (key,))
+        if self._stateful_reads:
+            val, state = shard.get_with_state(key, self.cfg.xfetch_beta)
+        else:
+            val, state = shard.get(key), FRESH
+        if self._trace is not None:
+            self._trace.record(OP_GET, key, self._traced_size(val))
+        if val is not None:
+            if type(val) is Compressed:
+                val = self.compression.decompress(val)
+            return self._value_reply(val) if state == FRESH else self._value_reply(val, f" {state}")
+        redirect = self._miss_redirect(sid)
+        if redirect is not None:
+            return self._redirect(redirect, sid)
+
+        now = time.monotonic()
+        with self._lease_lock:
+            leases = self._leases
+            deadline = leases.get(key)
+            if deadline is not None and now < deadline:
+                return f"WAIT {min(FILL_RETRY_MS, int((deadline - now) * 1000) + 1)}"
+            if len(leases) >= MAX_FILL_LEASES:
+                # writes end leases without the lock, so iterate over a copy
+                for k, d in list(leases.items()):
+                    if d <= now:
+                        leases.pop(k, None)
+            if len(leases) < MAX_FILL_LEASES:
+                leases[key] = now + lease_ms / 1000
+        return "FILL"
+
+    # Atomic updates (see BoundedCache.incr, append, gets and cas). Each runs under the shard's
+    # lock, and the entry it leaves is what gets logged and replicated. Versions are
+    # per node, so GETS and CAS are served by the owner only.
+
+    def _incr(self, args: List[str], decr: bool, asking: bool) -> str:
+        cmd = "DECR" if decr else "INCR"
+        if not (1 <= len(args) <= 4):
+            return f"ERR usage: {cmd} key [delta [initial [ttl]]]"
+        key = args[0]
+        try:
+            delta = int(args[1]) if len(args) >= 2 else 1
+            initial = int(args[2]) if len(args) >= 3 else None
+        except ValueError:
+            return "ERR delta and initial must be integers"
+        ttl = None
+        if len(args) == 4:
+            ttl = parse_seconds(args[3])
+            if ttl is None:
+                return "ERR ttl must be a positive number"
+        sid, shard = self._route(key, asking)
+        if shard is None:
+            return self._moved(sid)
+        if decr:
+            delta = -delta
+        stored = str(initial) if initial is not None else None
+        encode = self.compression.compress if self._compressing else None
+        try:
+            redirect, n = self._update(
+                sid, shard, key, lambda: shard.incr(key, delta, stored, ttl, encode), lambda n: n is not None
+            )
+        except WrongTypeError:
+            return "ERR not_an_integer"
+        except ValueTooLargeError:
+            return "ERR value_too_large"
+        if redirect is not None:
+            return self._redirect(redirect, sid)
+        if n is None:
+            redirect = self._miss_redirect(sid)
+            return self._redirect(redirect, sid) if redirect is not None else "NOT_FOUND"
+        if self._trace is not None:
+            self._trace.record(OP_PUT, key, len(str(n)), ttl)
+        return f"VALUE {n}"
+
+    def _append(self, args: List[str], asking: bool) -> str:
+        if len(args) != 2:
+            return "ERR usage: APPEND key suffix"
+        key, suffix = args
+        sid, shard = self._route(key, asking)
+        if shard is None:
+            return self._moved(sid)
+        encode = self.compression.compress if self._compressing else None
+        try:
+            redirect, ok = self._update(sid, shard, key, lambda: shard.append(key, suffix, encode), bool)
+        except WrongTypeError:
+            return "ERR wrong_type"
+        except ValueTooLargeError:
+            return "ERR value_too_large"
+        if redirect is not None:
+            return self._redirect(redirect, sid)
+        if not ok:
+            redirect = self._miss_redirect(sid)
+            return self._redirect(redirect, sid) if redirect is not None else "NOT_FOUND"
+        if self._trace is not None:
+            self._trace.record(OP_PUT, key, len(suffix))
+        return "STORED"
+
+    def _gets(self, args: List[str], asking: bool, session: Optional[ClientSession]) -> str:
+        if len(args) != 1:
+            return "ERR usage: GETS key"
+        key = args[0]
+        sid, shard = self._route(key, asking)
+        if shard is None:
+            return self._moved(sid)
+        if session is not None and session.tracks_reads:
+            self._tracker.track(session, (key,))
+        found = shard.gets(key)
+        if self._trace is not None:
+            self._trace.record(OP_GET, key, self._traced_size(found[0]) if found is not None else 0)
+        if found is None:
+            redirect = self._miss_redirect(sid)
+            return self._redirect(redirect, sid) if redirect is not None else "NOT_FOUND"
+        val, version = found
+        if type(val) is Compressed:
+            val = self.compression.decompress(val)
+        return self._value_reply(val, f" VERSION {version}")
+
+    def _cas(self, args: List[str], asking: bool) -> str:
+        if not (3 <= len(args) <= 4):
+            return "ERR usage: CAS key value version [ttl]"
+        key, value = args[0], args[1]
+        if not args[2].isdigit():
+            return "ERR version must be a non-negative integer"
+        version = int(args[2])
+        ttl = None
+        if len(args) == 4:
+            ttl = parse_seconds(args[3])
+            if ttl is None:
+                return "ERR ttl must be a positive number"
+        sid, shard = self._route(key, asking)
+        if shard is None:
+            return self._moved(sid)
+        if self._trace is not None:
+            self._trace.record(OP_PUT, key, len(value), ttl)
+        stored = self.compression.compress(value) if self._compressing else value
+        try:
+            redirect, ok = self._update(
+                sid, shard, key, lambda: shard.cas(key, stored, version, ttl), lambda ok: ok is True
+            )
+        except ValueTooLargeError:
+            return "ERR value_too_large"
+        if redirect is not None:
+            return self._redirect(redirect, sid)
+        if ok is None:
+            redirect = self._miss_redirect(sid)
+            return self._redirect(redirect, sid) if redirect is not None else "NOT_FOUND"
+        return "STORED" if ok else "EXISTS"
+
+    def _atomic_frame(self, opcode: int, key: str, value: bytes, ttl: Optional[float]) -> Tuple[int, bytes]:
+        """
+        Binary-protocol INCR, APPEND, GETS, CAS and GET_ENTRY; see Opcode for their
+        frames. Values are bytes, as for PUT frames.
+        """
+        sid, shard = self._route(key)
+        if shard is None:
+            host, port = self._addr_for(sid)
+            return Status.MOVED, f"{sid} {host}:{port}".encode("utf-8")
+        trace = self._trace
+        encode = self.compression.compress if self._compressing else None
+
+        if opcode == Opcode.GETS or opcode == Opcode.GET_ENTRY:
+            found = shard.gets(key) if opcode == Opcode.GETS else shard.get_entry(key)
+            if trace is not None and opcode == Opcode.GETS:
+                trace.record(OP_GET, key, self._traced_size(found[0]) if found is not None else 0)
+            if found is None:
+                return self._miss_frame(sid)
+            val, meta = found
+            if type(val) is Compressed:
+                val = self.compression.decompress(val)
+            if opcode == Opcode.GET_ENTRY:
+                meta = repr(meta or 0.0)
+            return Status.OK, f"{meta} ".encode("utf-8") + self._as_bytes(val)
+
+        if opcode == Opcode.INCR:
+            fields = value.split()
+            try:
+                if not 1 <= len(fields) <= 2:
+                    raise ValueError
+                delta = int(fields[0])
+                initial = str(int(fields[1])) if len(fields) == 2 else None
+            except ValueError:
+                return Status.ERR, b"delta and initial must be integers"
+            update, applied = lambda: shard.incr(key, delta, initial, ttl, encode), lambda n: n is not None
+        elif opcode == Opcode.APPEND:
+            update, applied = lambda: shard.append(key, value, encode), bool
+        else:  # CAS
+            version, _, new = value.partition(b" ")
+            if not version.isdigit():
+                return Status.ERR, b"version must be a non-negative integer"
+            stored = encode(new) if encode is not None else new
+            update, applied = lambda: shard.cas(key, stored, int(version), ttl), lambda ok: ok is True
+
+        try:
+            redirect, result = self._update(sid, shard, key, update, applied)
+        except WrongTypeError:
+            return Status.ERR, b"not_an_integer" if opcode == Opcode.INCR else b"wrong_type"
+        except ValueTooLargeError:
+            return Status.ERR, b"value_too_large"
+        if redirect is not None:
+            return self._redirect_frame(redirect, sid)
+        if result is None or (result is False and opcode == Opcode.APPEND):
+            return self._miss_frame(sid)
+        if result is False:
+            return Status.EXISTS, b""
+        if trace is not None:
+            size = len(str(result)) if opcode == Opcode.INCR else len(value if opcode == Opcode.APPEND else new)
+            trace.record(OP_PUT, key, size, None if opcode == Opcode.APPEND else ttl)
+        return Status.OK, str(result).encode("ascii") if opcode == Opcode.INCR else b""
+
+    def _miss_frame(self, sid: int) -> Tuple[int, bytes]:
+        redirect = self._miss_redirect(sid)
+        return self._redirect_frame(redirect, sid) if redirect is not None else (Status.NOT_FOUND, b"")
+
+    @staticmethod
+    def _traced_size(val: Any) -> int:
+        # compressed values count their stored size
+        return len(val) if isinstance(val, (str, bytes, bytearray, memoryview, Compressed)) else 0
+
+    def _execute_traced(self, line: str, session: Optional[ClientSession], timed: bool) -> Optional[str]:
+        """
+        _execute for a command that is timed for the latency histograms or may be
+        traced (self.tracing); see cache.slowlog for the phases.
         """
+        want = self.tracer.wants() if self.tracing else NOT_TRACED
+        if want == NOT_TRACED:
+            if not timed:
+                return self._execute(line, session)
+            start = time.perf_counter_ns()
+            reply = self._execute(line, session)
+            self.metrics.record_line(line, time.perf_counter_ns() - start)
+            return reply
+        tracer = self.tracer
+        timestamp = time.time()
+        start = time.perf_counter_ns()
         parts = line.split()
+        parsed = time.perf_counter_ns()
+        tracer.take_lock_wait()
+        reply = self._execute_parts(parts, session)
+        end = time.perf_counter_ns()
+        if timed:
+            self.metrics.record_line(line, end - start)
+        name = parts[0].upper() if parts else ""
+        tracer.record(
+            line, name if name in COMMANDS else NodeMetrics.OTHER, timestamp, parsed - start, end - parsed, want == SAMPLED
+        )
+        return reply
+
+    def _execute_frame_traced(
+        self, opcode: int, key: str, value: bytes, ttl: Optional[float], timed: bool
+    ) -> Optional[Tuple[int, bytes]]:
+        """
+        Binary-protocol counterpart of _execute_traced. Frames are decoded by the
+        server, so parsing is only the framing share.
+        """
+        want = self.tracer.wants() if self.tracing else NOT_TRACED
+        if want == NOT_TRACED:
+            if not timed:
+                return self._execute_frame(opcode, key, value, ttl)
+            start = time.perf_counter_ns()
+            reply = self._execute_frame(opcode, key, value, ttl)
+            self.metrics.record_opcode(opcode, time.perf_counter_ns() - start)
+            return reply
+        tracer = self.tracer
+        timestamp = time.time()
+        tracer.take_lock_wait()
+        start = time.perf_counter_ns()
+        reply = self._execute_frame(opcode, key, value, ttl)
+        end = time.perf_counter_ns()
+        if timed:
+            self.metrics.record_opcode(opcode, end - start)
+        name = OPCODE_NAMES.get(opcode, NodeMetrics.OTHER)
+        command = f"{name} {key} <{len(value)} bytes>" if value else f"{name} {key}"
+        tracer.record(command, name, timestamp, 0, end - start, want == SAMPLED)
+        return reply
+
+    def handle(self, line: str, session: Optional[ClientSession] = None) -> Optional[str]:
+        """
+        Parse and execute one command. Returns a response string,
+        or None to close the connection (QUIT). session is the connection's, if the
+        server keeps them (needed by CLIENT commands).
+        """
+        metrics = self.metrics
+        metrics.commands_total += 1
+        self._countdown -= 1
+        if self._countdown > 0 and not self.tracing:
+            reply = self._execute(line, session)
+        else:
+            if self.tracing:
+                self.tracer.begin_batch()
+            reply = self._execute_traced(line, session, self._countdown <= 0)
+            if self._countdown <= 0:
+                self._countdown = metrics.countdown()
+        self.commit_log()
+        return reply
+
+    def _execute(self, line: str, session: Optional[ClientSession] = None) -> Optional[str]:
+        return self._execute_parts(line.split(), session)
+
+    def _execute_parts(self, parts: List[str], session: Optional[ClientSession] = None) -> Optional[str]:
         if not parts:
             return "ERR empty_command"
 
         cmd = parts[0].upper()
 
+        # "ASKING <command>": a client following an ASK redirect (see cache.migration)
+        asking = False
+        if cmd == "ASKING":
+            if len(parts) < 2:
+                return "ERR usage: ASKING command"
+            asking = True
+            parts = parts[1:]
+            cmd = parts[0].upper()
+
         # Non-keyed commands
         if cmd == "QUIT":
             return None
 
         if cmd == "STATS":
-            s = self._sum_stats()
-            return f"HITS {s.hits} MISSES {s.misses} EVICTIONS {s.evictions} GETS {s.gets} PUTS {s.puts}"
+            return self._stats_line()
+
+        if cmd == "INFO":
+            return self._info(parts[1:])
+
+        if cmd == "BGSAVE":
+            return self._bgsave()
+
+        if cmd == "REPLICATION":
+            return self._multi(self._replication_lines())
+
+        if cmd == "CLUSTER":
+            return self._cluster(parts[1:])
+
+        if cmd == "MIGRATE":
+            return self._migrate(parts[1:])
+
+        if cmd == "CLIENT":
+            return self._client(parts[1:], session)
+
+        if cmd == "SLOWLOG":
+            return self._slowlog(parts[1:])
+
+        if cmd == "PROFILE":
+            return self._profile(parts[1:])
+
+        if cmd == "TRACE":
+            return self._trace_command(parts[1:])
+
+        # Keyed commands: reject keys too long to log or snapshot before a shard is
+        # touched, then enforce ownership via MOVED
+        if cmd in KEYED_COMMANDS:
+            if len(parts) > 1 and key_too_long(parts[1]):
+                return "ERR key_too_long"
+        elif cmd == "MGET" or cmd == "MDEL":
+            if any(key_too_long(key) for key in parts[1:]):
+                return "ERR key_too_long"
 
-        # Keyed commands: enforce ownership via MOVED
         if cmd == "GET":
             if len(parts) != 2:
                 return "ERR usage: GET key"
             key = parts[1]
-            sid = self.shard_id(key)
-            if sid not in self.cfg.owned_shards:
+            sid, shard = self._route_read(key, asking)
+            if shard is None:
                 return self._moved(sid)
-            val = self.local_shards[sid].get(key)
-            return f"VALUE {val}" if val is not None else "NOT_FOUND"
+            if session is not None and session.tracks_reads and sid in self.owned_shards:
+                # tracked before the read, so a change racing it is still reported
+                self._tracker.track(session, (key,))
+            if self._stateful_reads:
+                val, state = shard.get_with_state(key, self.cfg.xfetch_beta)
+            else:
+                val, state = shard.get(key), FRESH
+            if self._trace is not None:
+                self._trace.record(OP_GET, key, self._traced_size(val))
+            if val is not None:
+                if type(val) is Compressed:
+                    val = self.compression.decompress(val)
+                return self._value_reply(val) if state == FRESH else self._value_reply(val, f" {state}")
+            redirect = self._miss_redirect(sid)
+            return self._redirect(redirect, sid) if redirect is not None else "NOT_FOUND"
+
+        if cmd == "GETL":
+            if not (2 <= len(parts) <= 3):
+                return "ERR usage: GETL key [lease_ms]"
+            lease_ms = FILL_LEASE_MS
+            if len(parts) == 3:
+                if not parts[2].isdigit() or int(parts[2]) == 0:
+                    return "ERR lease_ms must be a positive integer"
+                lease_ms = int(parts[2])
+            return self._getl(parts[1], lease_ms, asking, session)
 
         if cmd == "PUT":
-            if not (3 <= len(parts) <= 4):
-                return "ERR usage: PUT key value [ttl]"
+            if not (3 <= len(parts) <= 5):
+                return "ERR usage: PUT key value [ttl [grace]]"
             key, value = parts[1], parts[2]
-            sid = self.shard_id(key)
-            if sid not in self.cfg.owned_shards:
+            sid, shard = self._route(key, asking)
+            if shard is None:
                 return self._moved(sid)
 
-            ttl = None
-            if len(parts) == 4:
-                try:
-                    ttl = float(parts[3])
-                except ValueError:
-                    return "ERR ttl must be numeric"
+            ttl = grace = None
+            if len(parts) >= 4:
+                ttl = parse_seconds(parts[3])
+                if ttl is None:
+                    return "ERR ttl must be a positive number"
+            if len(parts) == 5:
+                grace = parse_seconds(parts[4])
+                if grace is None:
+                    return "ERR grace must be a positive number"
 
-            self.local_shards[sid].put(key, value, ttl)
-            return "STORED"
+            if self._trace is not None:
+                self._trace.record(OP_PUT, key, len(value), ttl)
+            try:
+                redirect = self._put(sid, shard, key, value, ttl, grace)
+            except ValueTooLargeError:
+                return "ERR value_too_large"
+            return self._redirect(redirect, sid) if redirect is not None else "STORED"
+
+        if cmd in ("INCR", "DECR"):
+            return self._incr(parts[1:], cmd == "DECR", asking)
+
+        if cmd == "APPEND":
+            return self._append(parts[1:], asking)
+
+        if cmd == "GETS":
+            return self._gets(parts[1:], asking, session)
+
+        if cmd == "CAS":
+            return self._cas(parts[1:], asking)
 
         if cmd == "DEL":
             if len(parts) != 2:
                 return "ERR usage: DEL key"
             key = parts[1]
-            sid = self.shard_id(key)
-            if sid not in self.cfg.owned_shards:
+            sid, shard = self._route(key, asking)
+            if shard is None:
                 return self._moved(sid)
-            ok = self.local_shards[sid].delete(key)
+            if self._trace is not None:
+                self._trace.record(OP_DEL, key)
+            redirect, ok = self._delete(sid, shard, key)
+            if redirect is not None:
+                return self._redirect(redirect, sid)
             return "DELETED" if ok else "NOT_FOUND"
 
-        return f"ERR unknown_command {cmd}"
\ No newline at end of file
+        # Multi-key commands: keys are grouped by shard, non-owned keys get a per-key MOVED
+        if cmd == "MGET":
+            if len(parts) < 2:
+                return "ERR usage: MGET key [key ...]"
+            return self._mget(parts[1:], asking, session)
+
+        if cmd == "MSET":
+            if len(parts) < 3:
+                return "ERR usage: MSET key value [EX ttl] [key value [EX ttl] ...]"
+            return self._mset(parts[1:], asking)
+
+        if cmd == "MDEL":
+            if len(parts) < 2:
+                return "ERR usage: MDEL key [key ...]"
+            return self._mdel(parts[1:], asking)
+
+        return f"ERR unknown_command {cmd}"
+
+    def handle_many(self, lines: List[str], session: Optional[ClientSession] = None) -> List[Optional[str]]:
+        """
+        Execute pipelined command lines in order. A None reply (QUIT) ends the batch
+        and is the last item returned. The batch's writes are logged with one commit.
+        """
+        replies: List[Optional[str]] = []
+        metrics = self.metrics
+        metrics.commands_total += len(lines)
+        countdown = self._countdown
+        tracing = self.tracing
+        if tracing:
+            self.tracer.begin_batch()
+        for line in lines:
+            countdown -= 1
+            if countdown > 0 and not tracing:
+                reply = self._execute(line, session)
+            else:
+                reply = self._execute_traced(line, session, countdown <= 0)
+                if countdown <= 0:
+                    countdown = metrics.countdown()
+            replies.append(reply)
+            if reply is None:
+                break
+        self._countdown = countdown
+        self.commit_log()
+        return replies
+
+    def handle_frames(
+        self, requests: List[Tuple[int, str, bytes, Optional[float]]]
+    ) -> List[Optional[Tuple[int, bytes]]]:
+        """
+        Binary-protocol counterpart of handle_many.
+        """
+        replies: List[Optional[Tuple[int, bytes]]] = []
+        metrics = self.metrics
+        metrics.commands_total += len(requests)
+        countdown = self._countdown
+        tracing = self.tracing
+        if tracing:
+            self.tracer.begin_batch()
+        for opcode, key, value, ttl in requests:
+            countdown -= 1
+            if countdown > 0 and not tracing:
+                reply = self._execute_frame(opcode, key, value, ttl)
+            else:
+                reply = self._execute_frame_traced(opcode, key, value, ttl, countdown <= 0)
+                if countdown <= 0:
+                    countdown = metrics.countdown()
+            replies.append(reply)
+            if reply is None:
+                break
+        self._countdown = countdown
+        self.commit_log()
+        return replies
+
+    def handle_frame(self, opcode: int, key: str, value: bytes, ttl: Optional[float]) -> Optional[Tuple[int, bytes]]:
+        """
+        Execute one binary-protocol request. Returns (status, body), or None to
+        close the connection (QUIT). Values are stored and returned as raw bytes.
+        """
+        metrics = self.metrics
+        metrics.commands_total += 1
+        self._countdown -= 1
+        if self._countdown > 0 and not self.tracing:
+            reply = self._execute_frame(opcode, key, value, ttl)
+        else:
+            if self.tracing:
+                self.tracer.begin_batch()
+            reply = self._execute_frame_traced(opcode, key, value, ttl, self._countdown <= 0)
+            if self._countdown <= 0:
+                self._countdown = metrics.countdown()
+        self.commit_log()
+        return reply
+
+    def _execute_frame(self, opcode: int, key: str, value: bytes, ttl: Optional[float]) -> Optional[Tuple[int, bytes]]:
+        if opcode == Opcode.QUIT:
+            return None
+
+        if opcode == Opcode.STATS:
+            # an optional key of comma-separated shard ids limits the stats to those shards
+            if key:
+                try:
+                    ids = [int(sid) for sid in key.split(",")]
+                except ValueError:
+                    return Status.ERR, b"stats key must be comma-separated shard ids"
+                if any(sid not in self.local_shards for sid in ids):
+                    return Status.ERR, b"shard not owned"
+                return Status.OK, self._stats_line(ids).encode("utf-8")
+            return Status.OK, self._stats_line().encode("utf-8")
+
+        if opcode == Opcode.REPLICATE:
+            return self._replica.replicate(key, value)
+
+        if opcode == Opcode.SYNC:
+            return self._replica.sync(key, value)
+
+        if opcode == Opcode.IMPORT:
+            return self._import(key, value)
+
+        if Opcode.INCR <= opcode <= Opcode.GET_ENTRY:
+            return self._atomic_frame(opcode, key, value, ttl)
+
+        requested = opcode
+        asking = False
+        if opcode & Opcode.ASKING:
+            opcode ^= Opcode.ASKING
+            asking = True
+        accept_compressed = False
+        if opcode & Opcode.ACCEPT_COMPRESSED:
+            opcode ^= Opcode.ACCEPT_COMPRESSED
+            accept_compressed = True
+        if opcode not in (Opcode.GET, Opcode.PUT, Opcode.DEL) or (accept_compressed and opcode != Opcode.GET):
+            return Status.ERR, f"unknown_opcode {requested}".encode("utf-8")
+
+        sid, shard = self._route_read(key, asking) if opcode == Opcode.GET else self._route(key, asking)
+        if shard is None:
+            host, port = self._addr_for(sid)
+            return Status.MOVED, f"{sid} {host}:{port}".encode("utf-8")
+
+        trace = self._trace
+        if opcode == Opcode.GET:
+            val = shard.get(key)
+            if trace is not None:
+                trace.record(OP_GET, key, self._traced_size(val))
+            if val is not None:
+                if type(val) is Compressed:
+                    if accept_compressed:
+                        return Status.COMPRESSED, val.data
+                    val = self.compression.decompress(val)
+                return Status.OK, self._as_bytes(val)
+            redirect = self._miss_redirect(sid)
+            if redirect is not None:
+                return self._redirect_frame(redirect, sid)
+            return Status.NOT_FOUND, b""
+
+        if opcode == Opcode.PUT:
+            if trace is not None:
+                trace.record(OP_PUT, key, len(value), ttl)
+            try:
+                redirect = self._put(sid, shard, key, value, ttl)
+            except ValueTooLargeError:
+                return Status.ERR, b"value_too_large"
+            if redirect is not None:
+                return self._redirect_frame(redirect, sid)
+            return Status.OK, b""
+
+        # DEL
+        if trace is not None:
+            trace.record(OP_DEL, key)
+        redirect, ok = self._delete(sid, shard, key)
+        if redirect is not None:
+            return self._redirect_frame(redirect, sid)
+        return (Status.OK if ok else Status.NOT_FOUND), b""
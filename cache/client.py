@@ -0,0 +1,558 @@
+"""
+Cluster-aware client for the text protocol.
+
+The client loads the same cluster config as the nodes, hashes each key to its shard
+with key_shard() and sends the request straight to the owning node. A MOVED reply
+updates the routing table and the request is retried against the new owner. An ASK
+reply (the shard is migrating and the key is on the target already) is retried once
+on the target, prefixed with ASKING, without updating the routing table.
+Multi-key calls are split per node and the per-node batches run in parallel.
+
+With read_from_replica, GET and MGET go to a random one of the shard's owner and
+replicas (cluster.json "replicas"), spreading reads at the cost of possibly stale
+values; writes always go to the owner.
+"""
+
+from __future__ import annotations
+
+import json
+import random
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, List, Mapping, Optional, Sequence, Tuple, TypeVar
+
+from .base import FRESH, REFRESH
+from .cache_node import FILL_LEASE_MS, Address, key_shard
+from .protocol import RecvBuffer
+
+T = TypeVar("T")
+
+
+class CacheClientError(Exception):
+    """Raised when a node answers ERR or a request cannot be routed."""
+
+
+class Connection:
+    """
+    One blocking text-protocol connection to a node.
+    """
+
+    def __init__(self, address: Address, timeout: Optional[float]):
+        self.address = address
+        self.sock = socket.create_connection(address, timeout=timeout)
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.rbuf = RecvBuffer()
+
+    def send_lines(self, lines: List[str]) -> None:
+        self.sock.sendall(("\n".join(lines) + "\n").encode("utf-8"))
+
+    def readline(self) -> str:
+        rbuf = self.rbuf
+        while True:
+            end = rbuf.buf.find(b"\n", rbuf.start, rbuf.end)
+            if end != -1:
+                line = rbuf.buf[rbuf.start:end].decode("utf-8", errors="replace")
+                rbuf.consume_to(end + 1)
+                return line
+            if not rbuf.recv_into(self.sock):
+                raise ConnectionError(f"{self.address} closed the connection")
+
+    def read_reply(self) -> List[str]:
+        """
+        Read one reply. Multi-key replies ("MULTI n") are returned as their n item lines.
+        """
+        line = self.readline()
+        if line.startswith("MULTI "):
+            return [self.readline() for _ in range(int(line.split()[1]))]
+        return [line]
+
+    def close(self) -> None:
+        try:
+            self.sock.close()
+        except OSError:
+            pass
+
+
+class ConnectionPool:
+    """
+    Thread-safe pool of connections to one node. At most max_size connections are
+    open at once; callers block until one is returned. Every new connection first
+    sends the setup commands, each of which must answer OK.
+    """
+
+    def __init__(self, address: Address, max_size: int, timeout: Optional[float], setup: Sequence[str] = ()):
+        self.address = address
+        self.timeout = timeout
+        self.setup = list(setup)
+        self._idle: List[Connection] = []
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max_size)
+        self._closed = False
+
+    def acquire(self) -> Connection:
+        self._slots.acquire()
+        with self._lock:
+            if self._idle:
+                return self._idle.pop()
+        try:
+            conn = Connection(self.address, self.timeout)
+        except OSError:
+            self._slots.release()
+            raise
+        if self.setup:
+            try:
+                conn.send_lines(self.setup)
+                replies = [conn.read_reply()[0] for _ in self.setup]
+            except BaseException:
+                self.release(conn, broken=True)
+                raise
+            if any(reply != "OK" for reply in replies):
+                self.release(conn, broken=True)
+                raise CacheClientError(f"{self.address[0]}:{self.address[1]}: connection setup failed: {replies}")
+        return conn
+
+    def release(self, conn: Connection, broken: bool = False) -> None:
+        with self._lock:
+            if broken or self._closed:
+                conn.close()
+            else:
+                self._idle.append(conn)
+        self._slots.release()
+
+    def call(self, fn: Callable[[Connection], T]) -> T:
+        conn = self.acquire()
+        try:
+            result = fn(conn)
+        except BaseException:
+            self.release(conn, broken=True)
+            raise
+        self.release(conn)
+        return result
+
+    def close(self) -> None:
+        with self._lock:
+            self._closed = True
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.close()
+
+
+def parse_cluster_config(cluster_json: Mapping[str, Any]) -> Tuple[int, Dict[int, Address]]:
+    n_shards = int(cluster_json["n_shards"])
+    cluster_map = {int(k): (v[0], int(v[1])) for k, v in cluster_json["cluster_map"].items()}
+    if set(cluster_map.keys()) != set(range(n_shards)):
+        raise ValueError("cluster_map must contain every shard id in [0, n_shards)")
+    return n_shards, cluster_map
+
+
+def parse_replicas(cluster_json: Mapping[str, Any]) -> Dict[int, List[Address]]:
+    return {int(k): [(h, int(p)) for h, p in v] for k, v in cluster_json.get("replicas", {}).items()}
+
+
+def _parse_moved(reply: str) -> Tuple[int, Address]:
+    # MOVED <shard> <host>:<port>, or the same with ASK
+    _, sid, addr = reply.split()
+    host, port = addr.rsplit(":", 1)
+    return int(sid), (host, int(port))
+
+
+class CacheClient:
+    """
+    Routes every key straight to the node that owns its shard.
+
+    - One ConnectionPool per node, created lazily.
+    - MOVED replies update the routing table and are retried up to max_redirects times;
+      ASK replies are retried on the node they name.
+    - refresh_map() reloads the routing table from a node after shards have moved.
+    - mget/mset/mdel send one batch per node, in parallel.
+    - get_or_load() is a read-through GET where one of the clients missing a key loads it.
+    """
+
+    def __init__(
+        self,
+        cluster_json: Mapping[str, Any],
+        pool_size: int = 8,
+        timeout: Optional[float] = 5.0,
+        max_redirects: int = 5,
+        read_from_replica: bool = False,
+    ):
+        self.n_shards, self.cluster_map = parse_cluster_config(cluster_json)
+        self.map_version = int(cluster_json.get("version", 0))
+        self.replicas = parse_replicas(cluster_json)
+        self.read_from_replica = read_from_replica
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.max_redirects = max_redirects
+
+        self._pools: Dict[Address, ConnectionPool] = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=pool_size, thread_name_prefix="cache-client")
+
+    @classmethod
+    def from_config(cls, path: str, **kwargs: Any) -> "CacheClient":
+        with open(path, "r") as f:
+            return cls(json.load(f), **kwargs)
+
+    def __enter__(self) -> "CacheClient":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=True)
+        with self._lock:
+            pools, self._pools = list(self._pools.values()), {}
+        for pool in pools:
+            pool.close()
+
+    # -- routing --
+
+    def shard_id(self, key: str) -> int:
+        return key_shard(key, self.n_shards)
+
+    def address_for(self, key: str) -> Address:
+        return self.cluster_map[self.shard_id(key)]
+
+    def _read_address_for(self, key: str) -> Address:
+        sid = self.shard_id(key)
+        replicas = self.replicas.get(sid)
+        if not self.read_from_replica or not replicas:
+            return self.cluster_map[sid]
+        return random.choice([self.cluster_map[sid], *replicas])
+
+    def _setup_lines(self, address: Address) -> List[str]:
+        """
+        Commands every new connection to address sends first (see ConnectionPool).
+        """
+        return []
+
+    def _pool(self, address: Address) -> ConnectionPool:
+        with self._lock:
+            pool = self._pools.get(address)
+            if pool is not None:
+                return pool
+        setup = self._setup_lines(address)
+        with self._lock:
+            pool = self._pools.get(address)
+            if pool is None:
+                pool = ConnectionPool(address, self.pool_size, self.timeout, setup)
+                self._pools[address] = pool
+            return pool
+
+    def _drop_pool(self, address: Address) -> None:
+        """
+        Close the connections to address; connections in use are closed when released.
+        """
+        with self._lock:
+            pool = self._pools.pop(address, None)
+        if pool is not None:
+            pool.close()
+
+    def _apply_moved(self, reply: str) -> None:
+        sid, address = _parse_moved(reply)
+        with self._lock:
+            self.cluster_map[sid] = address
+
+    def refresh_map(self, address: Optional[Address] = None) -> int:
+        """
+        Load the cluster map of one node (by default, the owner of shard 0) with
+        CLUSTER MAP and adopt it if it is newer than ours. Returns the map version in use.
+        """
+        lines = self._execute(address or self.cluster_map[0], ["CLUSTER MAP"])[0]
+        if not lines or not lines[0].startswith("VERSION "):
+            raise CacheClientError(self._check(lines[0]) if lines else "empty CLUSTER MAP reply")
+        version = int(lines[0].split()[1])
+        cluster_map: Dict[int, Address] = {}
+        for line in lines[1:]:
+            # SHARD <shard> <host>:<port> EPOCH <epoch> ...
+            fields = line.split()
+            host, port = fields[2].rsplit(":", 1)
+            cluster_map[int(fields[1])] = (host, int(port))
+        with self._lock:
+            if version > self.map_version:
+                self.cluster_map.update(cluster_map)
+                self.map_version = version
+            return self.map_version
+
+    def _execute(self, address: Address, lines: List[str]) -> List[List[str]]:
+        """
+        Pipeline lines to one node and return one parsed reply per line.
+        """
+        def run(conn: Connection) -> List[List[str]]:
+            conn.send_lines(lines)
+            return [conn.read_reply() for _ in lines]
+        return self._pool(address).call(run)
+
+    @staticmethod
+    def _check(reply: str) -> str:
+        if reply.startswith("ERR"):
+            raise CacheClientError(reply)
+        return reply
+
+    @staticmethod
+    def _check_token(token: str, what: str) -> None:
+        if not token or any(c.isspace() for c in token):
+            raise ValueError(f"{what} must be non-empty and contain no whitespace: {token!r}")
+
+    def _single(self, key: str, line: str, read: bool = False) -> str:
+        """
+        read lets the first attempt go to a replica; a MOVED reply is retried on the owner.
+        """
+        for attempt in range(self.max_redirects + 1):
+            address = self._read_address_for(key) if read and attempt == 0 else self.address_for(key)
+            reply = self._check(self._execute(address, [line])[0][0])
+            if reply.startswith("ASK "):
+                _, target = _parse_moved(reply)
+                reply = self._check(self._execute(target, [f"ASKING {line}"])[0][0])
+            if not reply.startswith("MOVED "):
+                return reply
+            self._apply_moved(reply)
+        raise CacheClientError(f"too many redirects for key {key!r}")
+
+    # -- single-key API --
+
+    @staticmethod
+    def _parse_value(reply: str) -> Tuple[str, str]:
+        """
+        (value, state) of a "VALUE v [STALE|REFRESH]" reply.
+        """
+        value, _, state = reply[len("VALUE "):].partition(" ")
+        return value, state or FRESH
+
+    def get(self, key: str) -> Optional[str]:
+        self._check_token(key, "key")
+        reply = self._single(key, f"GET {key}", read=True)
+        if reply == "NOT_FOUND":
+            return None
+        return self._parse_value(reply)[0]
+
+    def get_with_state(self, key: str) -> Tuple[Optional[str], str]:
+        """
+        (value, state) as for Cache.get_with_state: a value past its ttl but within
+        its grace window is STALE, or REFRESH for the one caller that should put a new
+        one. Reads go to the owner, which keeps track of who was told to refresh.
+        """
+        self._check_token(key, "key")
+        reply = self._single(key, f"GET {key}")
+        if reply == "NOT_FOUND":
+            return None, FRESH
+        return self._parse_value(reply)
+
+    def put(self, key: str, value: str, ttl: Optional[float] = None, grace: Optional[float] = None) -> None:
+        """
+        With grace (and ttl), the value is still served, marked STALE, for grace
+        seconds after ttl runs out while one reader refreshes it.
+        """
+        self._check_token(key, "key")
+        self._check_token(value, "value")
+        if grace is not None and ttl is None:
+            raise ValueError("grace needs a ttl")
+        line = f"PUT {key} {value}"
+        if ttl is not None:
+            line += f" {ttl}" if grace is None else f" {ttl} {grace}"
+        self._single(key, line)
+
+    def delete(self, key: str) -> bool:
+        self._check_token(key, "key")
+        return self._single(key, f"DEL {key}") == "DELETED"
+
+    def incr(self, key: str, delta: int = 1, initial: Optional[int] = None, ttl: Optional[float] = None) -> Optional[int]:
+        """
+        Atomically add delta to the integer value of key and return the result. A
+        missing key is created holding initial (with ttl) if given, else None is
+        returned. Raises CacheClientError if the value is not an integer.
+        """
+        self._check_token(key, "key")
+        if ttl is not None and initial is None:
+            raise ValueError("ttl needs an initial value")
+        line = f"INCR {key} {int(delta)}"
+        if initial is not None:
+            line += f" {int(initial)}" if ttl is None else f" {int(initial)} {ttl}"
+        reply = self._single(key, line)
+        return None if reply == "NOT_FOUND" else int(self._parse_value(reply)[0])
+
+    def decr(self, key: str, delta: int = 1, initial: Optional[int] = None, ttl: Optional[float] = None) -> Optional[int]:
+        return self.incr(key, -delta, initial, ttl)
+
+    def append(self, key: str, suffix: str) -> bool:
+        """
+        Atomically append suffix to the value of key; False if key is missing.
+        """
+        self._check_token(key, "key")
+        self._check_token(suffix, "suffix")
+        return self._single(key, f"APPEND {key} {suffix}") == "STORED"
+
+    def gets(self, key: str) -> Optional[Tuple[str, int]]:
+        """
+        (value, version) of key, for cas(). Reads go to the owner, which keeps the versions.
+        """
+        self._check_token(key, "key")
+        reply = self._single(key, f"GETS {key}")
+        if reply == "NOT_FOUND":
+            return None
+        value, _, version = reply[len("VALUE "):].rpartition(" VERSION ")
+        return value, int(version)
+
+    def cas(self, key: str, value: str, version: int, ttl: Optional[float] = None) -> Optional[bool]:
+        """
+        Put value only if key still has the version gets() returned: True if stored,
+        False if key was written since, None if it is missing.
+        """
+        self._check_token(key, "key")
+        self._check_token(value, "value")
+        line = f"CAS {key} {value} {int(version)}"
+        if ttl is not None:
+            line += f" {ttl}"
+        reply = self._single(key, line)
+        return None if reply == "NOT_FOUND" else reply == "STORED"
+
+    def get_or_load(
+        self,
+        key: str,
+        loader: Callable[[str], Optional[str]],
+        ttl: Optional[float] = None,
+        lease_ms: Optional[int] = None,
+        grace: Optional[float] = None,
+    ) -> Optional[str]:
+        """
+        Read-through GET with a fill lease (GETL): of the clients missing key at once,
+        the node tells one to call loader(key) and PUT the result with ttl (and grace),
+        and the others poll until it is there. A client still polling when the lease
+        (lease_ms, by default the node's) runs out calls loader itself and does not
+        store the result. If loader raises or returns None, the lease is given up with
+        a DEL and the next waiter to poll is told to fill instead; None is not stored.
+        A hit marked REFRESH is reloaded and put the same way; STALE ones are returned.
+        """
+        self._check_token(key, "key")
+        line = f"GETL {key}" if lease_ms is None else f"GETL {key} {lease_ms}"
+        deadline = time.monotonic() + (lease_ms or FILL_LEASE_MS) / 1000
+        while True:
+            reply = self._single(key, line)
+            if reply.startswith("VALUE "):
+                value, state = self._parse_value(reply)
+                if state != REFRESH:
+                    return value
+                fresh = loader(key)
+                if fresh is None:
+                    return value
+                self.put(key, fresh, ttl, grace)
+                return fresh
+            if reply == "FILL":
+                try:
+                    value = loader(key)
+                except BaseException:
+                    self.delete(key)
+                    raise
+                if value is None:
+                    self.delete(key)
+                else:
+                    self.put(key, value, ttl, grace)
+                return value
+            # WAIT <ms>
+            if time.monotonic() >= deadline:
+                return loader(key)
+            time.sleep(int(reply.split()[1]) / 1000)
+
+    # -- multi-key API --
+
+    def _fan_out(
+        self,
+        keys: Iterable[str],
+        build: Callable[[List[str]], str],
+        read: bool = False,
+    ) -> Dict[str, str]:
+        """
+        Send one multi-key command per owning node in parallel, following per-key
+        MOVED and ASK replies. Returns {key: per-key reply}. read works as for _single.
+        """
+        pending = list(dict.fromkeys(keys))
+        asked: Dict[str, Address] = {}  # key -> node that answered ASK for it
+        results: Dict[str, str] = {}
+
+        for attempt in range(self.max_redirects + 1):
+            if not pending:
+                return results
+
+            address_for = self._read_address_for if read and attempt == 0 else self.address_for
+            by_node: Dict[Tuple[Address, bool], List[str]] = {}
+            for key in pending:
+                target = asked.pop(key, None)
+                node = (target, True) if target is not None else (address_for(key), False)
+                by_node.setdefault(node, []).append(key)
+
+            def run(item: Tuple[Tuple[Address, bool], List[str]]) -> Tuple[List[str], List[str]]:
+                (address, asking), group = item
+                line = f"ASKING {build(group)}" if asking else build(group)
+                return group, self._execute(address, [line])[0]
+
+            if len(by_node) == 1:
+                batches = [run(next(iter(by_node.items())))]
+            else:
+                batches = list(self._executor.map(run, by_node.items()))
+
+            pending = []
+            for group, replies in batches:
+                if len(replies) != len(group):
+                    raise CacheClientError(self._check(replies[0]))
+                for key, reply in zip(group, replies):
+                    if reply.startswith("MOVED "):
+                        self._apply_moved(reply)
+                        pending.append(key)
+                    elif reply.startswith("ASK "):
+                        asked[key] = _parse_moved(reply)[1]
+                        pending.append(key)
+                    else:
+                        results[key] = self._check(reply)
+
+        raise CacheClientError(f"too many redirects for keys {pending!r}")
+
+    def mget(self, keys: Iterable[str]) -> Dict[str, str]:
+        """
+        Return {key: value} for every key that was found.
+        """
+        keys = list(keys)
+        for key in keys:
+            self._check_token(key, "key")
+        replies = self._fan_out(keys, lambda group: "MGET " + " ".join(group), read=True)
+        return {k: r[len("VALUE "):] for k, r in replies.items() if r.startswith("VALUE ")}
+
+    def mset(self, items: Iterable[Tuple[str, str, Optional[float]]]) -> None:
+        """
+        Store every (key, value, ttl) triple. A key named EX (in any case) cannot be
+        sent in MSET; put() it instead.
+        """
+        entries = {key: (value, ttl) for key, value, ttl in items}
+        for key, (value, _) in entries.items():
+            self._check_token(key, "key")
+            self._check_token(value, "value")
+            if key.upper() == "EX":
+                raise ValueError("mset cannot store a key named EX; use put()")
+
+        def build(group: List[str]) -> str:
+            parts = ["MSET"]
+            for key in group:
+                value, ttl = entries[key]
+                parts += [key, value] if ttl is None else [key, value, "EX", str(ttl)]
+            return " ".join(parts)
+
+        self._fan_out(entries, build)
+
+    def mdel(self, keys: Iterable[str]) -> Dict[str, bool]:
+        """
+        Return {key: removed} for every key.
+        """
+        keys = list(keys)
+        for key in keys:
+            self._check_token(key, "key")
+        replies = self._fan_out(keys, lambda group: "MDEL " + " ".join(group))
+        return {k: r == "DELETED" for k, r in replies.items()}
+
+    def stats(self) -> Dict[Address, str]:
+        """
+        Return the raw STATS line of every node in the routing table, replicas included.
+        """
+        addresses = sorted(set(self.cluster_map.values()) | {a for rs in self.replicas.values() for a in rs})
+        return {a: self._check(self._execute(a, ["STATS"])[0][0]) for a in addresses}
@@ -0,0 +1,229 @@
+from __future__ import annotations
+import time
+from array import array
+from typing import Dict, Generic, Hashable, List, Optional, Tuple, TypeVar
+
+from .base import BoundedCache, CacheStats
+from .sizing import Sizer
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+class CompactLRUCache(BoundedCache[K, V], Generic[K, V]):
+    """
+    LRU cache with the same behavior as LRUCache, but recency links are int32 slot
+    indices in preallocated arrays instead of one DLLNode object per entry.
+
+    - Slot 0 is the sentinel of a circular list: _next[0] is the MRU slot, _prev[0] the LRU slot.
+    - Free slots are chained through _next starting at _free, so puts never allocate.
+    - A slot's expiration time lives in _expires (0.0 = no ttl). Expired entries are
+      removed lazily on get, when they reach the LRU end, and by expire(), which sweeps
+      slots with a clock hand.
+    - Thread-safe at the method level via a lock
+    """
+    def __init__(
+        self,
+        capacity: int,
+        max_bytes: Optional[int] = None,
+        max_entry_bytes: Optional[int] = None,
+        sizer: Optional[Sizer] = None,
+    ):
+        super().__init__(capacity, max_bytes, max_entry_bytes, sizer)
+        # key -> slot
+        self.cache: Dict[K, int] = {}
+        self._hand = 1
+        self._init_slots()
+
+    def _init_slots(self) -> None:
+        n = self.capacity + 1
+        self._keys: List[Optional[K]] = [None] * n
+        self._vals: List[Optional[V]] = [None] * n
+        self._expires = array("d", bytes(8 * n))
+        self._sizes = array("q", bytes(8 * n))
+        self._versions = array("q", bytes(8 * n))
+        self._prev = array("i", bytes(4 * n))
+
+        # free chain 1 -> 2 -> ... -> capacity -> 0 (end)
+        self._next = array("i", range(1, n + 1))
+        self._next[n - 1] = 0
+        self._next[0] = 0
+        self._free = 1
+
+    def _link_front(self, s: int) -> None:
+        nxt = self._next
+        first = nxt[0]
+        nxt[s] = first
+        self._prev[s] = 0
+        self._prev[first] = s
+        nxt[0] = s
+
+    def _unlink(self, s: int) -> None:
+        p = self._prev[s]
+        n = self._next[s]
+        self._next[p] = n
+        self._prev[n] = p
+
+    def _remove_slot(self, s: int) -> None:
+        """
+        Unlink slot s, drop its key from the index and return it to the free chain
+        """
+        self._unlink(s)
+        del self.cache[self._keys[s]]
+        self._bytes_used -= self._sizes[s]
+        self._keys[s] = None
+        self._vals[s] = None
+        self._expires[s] = 0.0
+        self._sizes[s] = 0
+        self._next[s] = self._free
+        self._free = s
+
+    def _evict_lru(self, now: float) -> bool:
+        s = self._prev[0]
+        if s == 0:
+            return False
+        exp = self._expires[s]
+        if exp and now >= exp:
+            self._stats.expired += 1
+        else:
+            self._stats.evictions += 1
+        key = self._keys[s]
+        self._remove_slot(s)
+        if self._on_remove is not None:
+            self._on_remove(key)
+        return True
+
+    def _get_locked(self, key: K, now: float) -> Optional[V]:
+        """
+        get() body; caller must hold self._lock
+        """
+        self._stats.gets += 1
+        s = self.cache.get(key)
+
+        if s is None:
+            self._stats.misses += 1
+            return None
+
+        exp = self._expires[s]
+        if exp and now >= exp:
+            self._remove_slot(s)
+            self._stats.expired += 1
+            self._stats.misses += 1
+            if self._on_remove is not None:
+                self._on_remove(key)
+            return None
+
+        if self._next[0] != s:
+            self._unlink(s)
+            self._link_front(s)
+        self._stats.hits += 1
+        return self._vals[s]
+
+    def _entry_locked(self, key: K, now: float) -> Optional[Tuple[V, Optional[float], int]]:
+        s = self.cache.get(key)
+        if s is None:
+            return None
+        exp = self._expires[s]
+        if exp and now >= exp:
+            self._remove_slot(s)
+            self._stats.expired += 1
+            if self._on_remove is not None:
+                self._on_remove(key)
+            return None
+        return self._vals[s], exp or None, self._versions[s]
+
+    def _put_locked(self, key: K, value: V, ttl: Optional[float], now: float, size: int) -> None:
+        """
+        put() body; caller must hold self._lock and have sized the entry with _check_size
+        """
+        self._stats.puts += 1
+        self._version += 1
+        s = self.cache.get(key)
+
+        if s is not None:
+            if self._next[0] != s:
+                self._unlink(s)
+                self._link_front(s)
+        else:
+            while len(self.cache) >= self.capacity:
+                self._evict_lru(now)
+            s = self._free
+            self._free = self._next[s]
+            self._keys[s] = key
+            self._sizes[s] = 0
+            self.cache[key] = s
+            self._link_front(s)
+
+        self._vals[s] = value
+        self._expires[s] = (now + ttl) if ttl is not None else 0.0
+        self._bytes_used += size - self._sizes[s]
+        self._sizes[s] = size
+        self._versions[s] = self._version
+
+        max_bytes = self.max_bytes
+        if max_bytes is not None:
+            # the entry just written is at the front and fits on its own
+            while self._bytes_used > max_bytes and self._prev[0] != s:
+                self._evict_lru(now)
+
+    def _delete_locked(self, key: K) -> bool:
+        """
+        delete() body; caller must hold self._lock
+        """
+        s = self.cache.get(key)
+        if s is None:
+            return False
+        self._remove_slot(s)
+        return True
+
+    def expire(self, max_items: Optional[int] = None) -> int:
+        """
+        Advance the clock hand over up to max_items slots (one full pass if None),
+        removing entries that are due.
+        """
+        with self._lock:
+            now = time.time()
+            steps = self.capacity if max_items is None else min(max_items, self.capacity)
+            expires = self._expires
+            removed = 0
+            s = self._hand
+            for _ in range(steps):
+                exp = expires[s]
+                if exp and now >= exp:
+                    key = self._keys[s]
+                    self._remove_slot(s)
+                    self._stats.expired += 1
+                    removed += 1
+                    if self._on_remove is not None:
+                        self._on_remove(key)
+                s = s + 1 if s < self.capacity else 1
+            self._hand = s
+            return removed
+
+    def dump(self) -> List[Tuple[K, V, Optional[float]]]:
+        """
+        Live entries as (key, value, expires_at), least recently used first.
+        """
+        with self._lock:
+            now = time.time()
+            items = []
+            prev, keys, vals, expires = self._prev, self._keys, self._vals, self._expires
+            s = prev[0]
+            while s != 0:
+                exp = expires[s]
+                if not exp:
+                    items.append((keys[s], vals[s], None))
+                elif now < exp:
+                    items.append((keys[s], vals[s], exp))
+                s = prev[s]
+            return items
+
+    def clear(self) -> None:
+        """
+        Remove all entries from the cache.
+        """
+        with self._lock:
+            self.cache.clear()
+            self._bytes_used = 0
+            self._hand = 1
+            self._init_slots()
+            self._stats = CacheStats()
@@ -0,0 +1,102 @@
+"""
+Transparent zlib compression of large values (compress_threshold in the node config).
+
+A node with a threshold compresses every value of at least that many bytes when
+it is written (PUT, MSET, binary PUT, and the results of APPEND, INCR and CAS)
+and stores it as a Compressed value if that saves at least MIN_SAVING of its
+size. Compressed values stay compressed in
+the shards, the append-only log, snapshots, replication and migrations, and are
+charged their compressed size against max_bytes. They are decompressed only when
+read: text GETs and binary GETs get the original value, while a binary GET with
+Opcode.ACCEPT_COMPRESSED gets the stored bytes as they are (Status.COMPRESSED).
+Any node can read compressed values, whether or not it compresses its own.
+"""
+
+import time
+import zlib
+from typing import Any, Optional, Union
+
+# zlib's own default trade-off between speed and ratio
+DEFAULT_LEVEL = 6
+
+# Values that shrink by less than this fraction are stored as they are
+MIN_SAVING = 0.125
+
+
+class Compressed:
+    """
+    A value stored zlib-compressed. text says whether it was a str (compressed as
+    UTF-8) or bytes.
+    """
+
+    __slots__ = ("data", "text")
+
+    def __init__(self, data: bytes, text: bool):
+        self.data = data
+        self.text = text
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+    def __eq__(self, other: Any) -> bool:
+        return type(other) is Compressed and other.data == self.data and other.text == self.text
+
+    def __repr__(self) -> str:
+        return f"Compressed({len(self.data)} bytes, text={self.text})"
+
+    def decompress(self) -> Union[str, bytes]:
+        raw = zlib.decompress(self.data)
+        return raw.decode("utf-8") if self.text else raw
+
+
+class Compressor:
+    """
+    Compresses values of at least threshold bytes (None: none) and decompresses
+    Compressed values, counting both for STATS. The counters are updated without
+    a lock, like the node's other metrics.
+    """
+
+    def __init__(self, threshold: Optional[int], level: int = DEFAULT_LEVEL):
+        self.threshold = threshold
+        self.level = level
+        self.compressed = 0  # values stored compressed
+        self.skipped = 0     # values over the threshold that did not shrink enough
+        self.bytes_in = 0    # original size of the values stored compressed
+        self.bytes_out = 0   # their compressed size
+        self.compress_ns = 0  # including the skipped values
+        self.decompressed = 0
+        self.decompress_ns = 0
+
+    def compress(self, value: Any) -> Any:
+        """
+        value as it should be stored: Compressed, or value itself.
+        """
+        threshold = self.threshold
+        # len() of a str counts characters, a lower bound on its UTF-8 size
+        if threshold is None or not isinstance(value, (str, bytes, bytearray)) or len(value) < threshold:
+            return value
+        start = time.perf_counter_ns()
+        text = isinstance(value, str)
+        raw = value.encode("utf-8") if text else value
+        data = zlib.compress(raw, self.level)
+        self.compress_ns += time.perf_counter_ns() - start
+        if len(data) > len(raw) * (1 - MIN_SAVING):
+            self.skipped += 1
+            return value
+        self.compressed += 1
+        self.bytes_in += len(raw)
+        self.bytes_out += len(data)
+        return Compressed(data, text)
+
+    def decompress(self, value: Compressed) -> Union[str, bytes]:
+        start = time.perf_counter_ns()
+        raw = value.decompress()
+        self.decompress_ns += time.perf_counter_ns() - start
+        self.decompressed += 1
+        return raw
+
+    def ratio(self) -> float:
+        """
+        Original over compressed size of the values compressed so far (1.0 before any).
+        """
+        return self.bytes_in / self.bytes_out if self.bytes_out else 1.0
@@ -7,4 +7,12 @@ class DLLNode:
     val: Any = None
     prev: Optional["DLLNode"] = None
     next: Optional["DLLNode"] = None
-    expiration_time: Optional[float] = None  # UNIX timestamp
\ No newline at end of file
+    expiration_time: Optional[float] = None  # UNIX timestamp
+    size: int = 0  # bytes charged by the cache's sizer
+    # Entries put with a grace window: stale from fresh_until to expiration_time.
+    # delta is the seconds the value took to compute (for early refreshes) and
+    # refresh_at when a caller was last told to refresh it.
+    fresh_until: Optional[float] = None
+    delta: float = 0.0
+    refresh_at: Optional[float] = None
+    version: int = 0  # see BoundedCache.gets
@@ -2,5 +2,8 @@ from enum import Enum
 
 class EvictionPolicy(str, Enum):
     LRU = "LRU"
-    # LFU = "lfu"
+    LRU_COMPACT = "LRU_COMPACT"  # LRU with array-backed recency links
+    LFU = "LFU"
+    SIEVE = "SIEVE"  # hits only set a visited bit, reads are lock-free
+    TINYLFU = "TINYLFU"  # W-TinyLFU: sketch-based admission in front of a segmented LRU
     # FIFO = "fifo"
\ No newline at end of file
@@ -0,0 +1,54 @@
+import heapq
+import itertools
+from typing import Any, Hashable, List, Mapping, Optional, Tuple
+
+
+class ExpiryHeap:
+    """
+    Min-heap of (expiration_time, seq, node) used for active TTL expiration.
+
+    Nodes only need `key` and `expiration_time` attributes. Entries go stale when a
+    node is removed or its ttl changes; pop_due skips them, and the heap is rebuilt
+    from the live nodes once stale entries outnumber them, which keeps the cost
+    amortized O(log n) per push. Not thread-safe: callers hold their cache's lock.
+    """
+
+    def __init__(self):
+        self._heap: List[Tuple[float, int, Any]] = []
+        self._seq = itertools.count()
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    def push(self, node: Any, entries: Mapping[Hashable, Any]) -> None:
+        """
+        Track node, whose expiration_time must be set. entries is the cache's key -> node map.
+        """
+        heapq.heappush(self._heap, (node.expiration_time, next(self._seq), node))
+
+        if len(self._heap) > 2 * len(entries) + 64:
+            self._heap = [
+                (n.expiration_time, next(self._seq), n)
+                for n in entries.values()
+                if n.expiration_time is not None
+            ]
+            heapq.heapify(self._heap)
+
+    def pop_due(self, now: float, max_items: Optional[int], entries: Mapping[Hashable, Any]) -> List[Any]:
+        """
+        Pop due entries, doing at most max_items pops (stale or not), and return the
+        nodes that are still live in entries. The caller removes them.
+        """
+        heap = self._heap
+        due = []
+        work = 0
+        while heap and heap[0][0] <= now and (max_items is None or work < max_items):
+            expiration_time, _, node = heapq.heappop(heap)
+            work += 1
+            if node.expiration_time != expiration_time or entries.get(node.key) is not node:
+                continue  # stale: ttl changed or node already removed
+            due.append(node)
+        return due
+
+    def clear(self) -> None:
+        self._heap = []
@@ -1,23 +1,67 @@
-from typing import TypeVar, Generic, Dict, Hashable, Callable, List
+from typing import Any, TypeVar, Generic, Dict, Hashable, Callable, List, Optional
 from .base import Cache
 from .eviction import EvictionPolicy
 from .lru import LRUCache
+from .compact_lru import CompactLRUCache
+from .lfu import LFUCache
+from .sieve import SieveCache
+from .tinylfu import TinyLFUCache
+from .sizing import Sizer
 
 K = TypeVar("K", bound=Hashable)
 V = TypeVar("V")
 
 class CacheFactory(Generic[K, V]):
 
-    _registry: Dict[EvictionPolicy, Callable[[int], Cache[K, V]]] = {
-        EvictionPolicy.LRU: LRUCache
+    # cache_cls(capacity, **options); size options are only passed when set
+    _registry: Dict[EvictionPolicy, Callable[..., Cache[K, V]]] = {
+        EvictionPolicy.LRU: LRUCache,
+        EvictionPolicy.LRU_COMPACT: CompactLRUCache,
+        EvictionPolicy.LFU: LFUCache,
+        EvictionPolicy.SIEVE: SieveCache,
+        EvictionPolicy.TINYLFU: TinyLFUCache,
     }
 
     @classmethod
-    def register(cls, policy: EvictionPolicy, cache_cls: Callable[[int], Cache[K, V]]) -> None:
+    def register(cls, policy: EvictionPolicy, cache_cls: Callable[..., Cache[K, V]]) -> None:
         cls._registry[policy] = cache_cls
 
     @classmethod
-    def create_local_cache(cls, capacity: int, policy: EvictionPolicy) -> Cache[K, V]:
+    def policies(cls) -> List[EvictionPolicy]:
+        """
+        The policies create_local_cache can build, in registration order.
+        """
+        return list(cls._registry)
+
+    @staticmethod
+    def _size_options(
+        max_bytes: Optional[int],
+        max_entry_bytes: Optional[int],
+        sizer: Optional[Sizer],
+    ) -> Dict[str, Any]:
+        if max_bytes is not None and max_bytes <= 0:
+            raise ValueError("max_bytes must be greater than 0")
+        if max_entry_bytes is not None and max_entry_bytes <= 0:
+            raise ValueError("max_entry_bytes must be greater than 0")
+
+        options: Dict[str, Any] = {}
+        if max_bytes is not None:
+            options["max_bytes"] = max_bytes
+        if max_entry_bytes is not None:
+            options["max_entry_bytes"] = max_entry_bytes
+        if sizer is not None:
+            options["sizer"] = sizer
+        return options
+
+    @classmethod
+    def create_local_cache(
+        cls,
+        capacity: int,
+        policy: EvictionPolicy,
+        max_bytes: Optional[int] = None,
+        max_entry_bytes: Optional[int] = None,
+        sizer: Optional[Sizer] = None,
+    ) -> Cache[K, V]:
         if capacity <= 0:
             raise ValueError("capacity must be greater than 0")
         
@@ -26,7 +70,7 @@ class CacheFactory(Generic[K, V]):
         if cache_cls is None:
             raise NotImplementedError(f"{policy} has not been implemented")
     
-        return cache_cls(capacity)
+        return cache_cls(capacity, **cls._size_options(max_bytes, max_entry_bytes, sizer))
     
     @classmethod
     def create_local_shards(
@@ -34,7 +78,13 @@ class CacheFactory(Generic[K, V]):
         total_capacity: int,
         policy: EvictionPolicy,
         shard_ids: List[int],
+        max_bytes: Optional[int] = None,
+        max_entry_bytes: Optional[int] = None,
+        sizer: Optional[Sizer] = None,
     ) -> Dict[int, Cache[K, V]]:
+        """
+        Split total_capacity (and max_bytes, if set) across one cache per shard id.
+        """
         if not shard_ids:
             raise ValueError("shard_ids cannot be empty")
         if total_capacity <= 0:
@@ -50,12 +100,18 @@ class CacheFactory(Generic[K, V]):
         if n > total_capacity:
             raise ValueError("owned shard count cannot exceed total_capacity")
 
+        options = cls._size_options(max_bytes, max_entry_bytes, sizer)
+        if max_bytes is not None and n > max_bytes:
+            raise ValueError("owned shard count cannot exceed max_bytes")
+
         base = total_capacity // n
         rem = total_capacity % n
 
         shards: Dict[int, Cache[K, V]] = {}
         for i, shard_id in enumerate(shard_ids):
             shard_capacity = base + (1 if i < rem else 0)
-            shards[shard_id] = cache_cls(shard_capacity)
+            if max_bytes is not None:
+                options["max_bytes"] = max_bytes // n + (1 if i < max_bytes % n else 0)
+            shards[shard_id] = cache_cls(shard_capacity, **options)
 
         return shards
@@ -0,0 +1,323 @@
+from __future__ import annotations
+import time
+from typing import Any, Dict, Generic, Hashable, List, Optional, Tuple, TypeVar
+
+from .base import BoundedCache, CacheStats
+from .expiry import ExpiryHeap
+from .sizing import Sizer
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+class LFUNode:
+    __slots__ = ("key", "val", "prev", "next", "expiration_time", "size", "bucket", "version")
+
+    def __init__(self, key: Any = None, val: Any = None):
+        self.key = key
+        self.val = val
+        self.prev: Optional[LFUNode] = None
+        self.next: Optional[LFUNode] = None
+        self.expiration_time: Optional[float] = None  # UNIX timestamp
+        self.size = 0
+        self.bucket: Optional[FreqBucket] = None
+        self.version = 0  # see BoundedCache.gets
+
+class FreqBucket:
+    """
+    Doubly linked list of the nodes sharing one access frequency, most recent first.
+    Buckets are themselves linked in ascending frequency order.
+    """
+    __slots__ = ("freq", "head", "tail", "count", "lower", "higher")
+
+    def __init__(self, freq: int):
+        self.freq = freq
+        self.head = LFUNode()
+        self.tail = LFUNode()
+        self.head.next = self.tail
+        self.tail.prev = self.head
+        self.count = 0
+        self.lower: Optional[FreqBucket] = None
+        self.higher: Optional[FreqBucket] = None
+
+    def push_front(self, node: LFUNode) -> None:
+        node.next = self.head.next
+        node.prev = self.head
+        self.head.next.prev = node
+        self.head.next = node
+        node.bucket = self
+        self.count += 1
+
+    def remove(self, node: LFUNode) -> None:
+        node.prev.next = node.next
+        node.next.prev = node.prev
+        node.prev = None
+        node.next = None
+        node.bucket = None
+        self.count -= 1
+
+class LFUCache(BoundedCache[K, V], Generic[K, V]):
+    """
+    O(1) LFU cache: nodes live in per-frequency buckets, and the buckets form a list
+    ordered by frequency, so both the next frequency and the minimum frequency are
+    one pointer away. Eviction takes the least recently used entry of the lowest frequency.
+
+    - Thread-safe at the method level via a lock
+    - A new entry starts at frequency 1, and overwriting an entry counts as an access.
+      Over max_bytes, victims are taken in eviction order, skipping the entry just written.
+    - With decay_after set, every decay_after hits all frequencies are halved, so
+      keys that were hot long ago eventually become evictable again
+    """
+    def __init__(
+        self,
+        capacity: int,
+        decay_after: Optional[int] = None,
+        expire_batch: int = 16,
+        max_bytes: Optional[int] = None,
+        max_entry_bytes: Optional[int] = None,
+        sizer: Optional[Sizer] = None,
+    ):
+        super().__init__(capacity, max_bytes, max_entry_bytes, sizer)
+        if decay_after is not None and decay_after <= 0:
+            raise ValueError("decay_after must be > 0")
+        if expire_batch < 0:
+            raise ValueError("expire_batch must be >= 0")
+
+        self.decay_after = decay_after
+        self.expire_batch = expire_batch
+
+        self.cache: Dict[K, LFUNode] = {}
+        self._hits_since_decay = 0
+        self._expiry_heap = ExpiryHeap()
+        self._init_buckets()
+
+    def _init_buckets(self) -> None:
+        # sentinel bucket: _root.higher is the lowest-frequency bucket
+        self._root = FreqBucket(0)
+        self._root.lower = self._root
+        self._root.higher = self._root
+
+    def _bucket_after(self, bucket: FreqBucket, freq: int) -> FreqBucket:
+        """
+        Return the bucket for freq, creating it right after bucket (which has a lower freq)
+        """
+        nxt = bucket.higher
+        if nxt.freq == freq:
+            return nxt
+        new = FreqBucket(freq)
+        new.lower = bucket
+        new.higher = nxt
+        bucket.higher = new
+        nxt.lower = new
+        return new
+
+    @staticmethod
+    def _drop_if_empty(bucket: FreqBucket) -> None:
+        if bucket.count == 0:
+            bucket.lower.higher = bucket.higher
+            bucket.higher.lower = bucket.lower
+
+    def _unlink(self, node: LFUNode) -> None:
+        """
+        Take node out of its bucket, dropping the bucket if it empties
+        """
+        bucket = node.bucket
+        bucket.remove(node)
+        self._drop_if_empty(bucket)
+
+    def _touch(self, node: LFUNode) -> None:
+        """
+        Record one access: move node to the front of the next frequency bucket
+        """
+        bucket = node.bucket
+        target = self._bucket_after(bucket, bucket.freq + 1)
+        bucket.remove(node)
+        self._drop_if_empty(bucket)
+        target.push_front(node)
+
+        if self.decay_after is not None:
+            self._hits_since_decay += 1
+            if self._hits_since_decay >= self.decay_after:
+                self._decay()
+
+    def _decay(self) -> None:
+        """
+        Halve every frequency (minimum 1). Buckets are merged lowest frequency first
+        and LRU to MRU, so recency order within a merged bucket is preserved.
+        """
+        self._hits_since_decay = 0
+        old = self._root.higher
+        self._init_buckets()
+        last = self._root
+        while old.freq != 0:
+            freq = max(1, old.freq // 2)
+            # old buckets 2 and 3 (and 1) all halve to 1: merge them into one bucket
+            target = last if last.freq == freq else self._bucket_after(last, freq)
+            node = old.tail.prev
+            while node is not old.head:
+                prev = node.prev
+                target.push_front(node)
+                node = prev
+            last = target
+            old = old.higher
+
+    def _delete_node(self, node: LFUNode) -> None:
+        self._unlink(node)
+        del self.cache[node.key]
+        self._bytes_used -= node.size
+
+    def _pick_victim(self, exclude: Optional[LFUNode] = None) -> Optional[LFUNode]:
+        """
+        Least recently used node of the lowest frequency, skipping exclude
+        """
+        bucket = self._root.higher
+        while bucket is not self._root:
+            node = bucket.tail.prev
+            while node is not bucket.head:
+                if node is not exclude:
+                    return node
+                node = node.prev
+            bucket = bucket.higher
+        return None
+
+    def _expire_locked(self, now: float, max_items: Optional[int]) -> int:
+        due = self._expiry_heap.pop_due(now, max_items, self.cache)
+        for node in due:
+            self._delete_node(node)
+        self._stats.expired += len(due)
+        if self._on_remove is not None:
+            for node in due:
+                self._on_remove(node.key)
+        return len(due)
+
+    def _get_locked(self, key: K, now: float) -> Optional[V]:
+        """
+        get() body; caller must hold self._lock
+        """
+        self._stats.gets += 1
+        node = self.cache.get(key)
+
+        if node is None:
+            self._stats.misses += 1
+            return None
+
+        if node.expiration_time is not None and now >= node.expiration_time:
+            self._delete_node(node)
+            self._stats.expired += 1
+            self._stats.misses += 1
+            if self._on_remove is not None:
+                self._on_remove(key)
+            return None
+
+        self._touch(node)
+        self._stats.hits += 1
+        return node.val
+
+    def _entry_locked(self, key: K, now: float) -> Optional[Tuple[V, Optional[float], int]]:
+        node = self.cache.get(key)
+        if node is None:
+            return None
+        exp = node.expiration_time
+        if exp is not None and now >= exp:
+            self._delete_node(node)
+            self._stats.expired += 1
+            if self._on_remove is not None:
+                self._on_remove(key)
+            return None
+        return node.val, exp, node.version
+
+    def _put_locked(self, key: K, value: V, ttl: Optional[float], now: float, size: int) -> None:
+        """
+        put() body; caller must hold self._lock and have sized the entry with _check_size
+        """
+        if self.expire_batch:
+            self._expire_locked(now, self.expire_batch)
+
+        self._stats.puts += 1
+        self._version += 1
+        node = self.cache.get(key)
+        expiration_time = (now + ttl) if ttl is not None else None
+
+        if node is not None:
+            node.val = value
+            node.expiration_time = expiration_time
+            self._bytes_used += size - node.size
+            node.size = size
+            node.version = self._version
+            self._touch(node)
+        else:
+            if len(self.cache) >= self.capacity:
+                victim = self._pick_victim()
+                self._delete_node(victim)
+                self._stats.evictions += 1
+                if self._on_remove is not None:
+                    self._on_remove(victim.key)
+            node = LFUNode(key, value)
+            node.expiration_time = expiration_time
+            node.size = size
+            node.version = self._version
+            self.cache[key] = node
+            self._bytes_used += size
+            self._bucket_after(self._root, 1).push_front(node)
+
+        if expiration_time is not None:
+            self._expiry_heap.push(node, self.cache)
+
+        max_bytes = self.max_bytes
+        if max_bytes is not None:
+            # _check_size guarantees the entry just written fits on its own
+            while self._bytes_used > max_bytes:
+                victim = self._pick_victim(exclude=node)
+                if victim is None:
+                    break
+                self._delete_node(victim)
+                self._stats.evictions += 1
+                if self._on_remove is not None:
+                    self._on_remove(victim.key)
+
+    def _delete_locked(self, key: K) -> bool:
+        """
+        delete() body; caller must hold self._lock
+        """
+        node = self.cache.get(key)
+        if node is None:
+            return False
+        self._delete_node(node)
+        return True
+
+    def expire(self, max_items: Optional[int] = None) -> int:
+        """
+        Remove up to max_items expired entries (all due entries if None).
+        """
+        with self._lock:
+            return self._expire_locked(time.time(), max_items)
+
+    def dump(self) -> List[Tuple[K, V, Optional[float]]]:
+        """
+        Live entries as (key, value, expires_at), lowest frequency first and least
+        recently used first within a frequency. Frequencies themselves are not kept.
+        """
+        with self._lock:
+            now = time.time()
+            items = []
+            bucket = self._root.higher
+            while bucket is not self._root:
+                node = bucket.tail.prev
+                while node is not bucket.head:
+                    exp = node.expiration_time
+                    if exp is None or now < exp:
+                        items.append((node.key, node.val, exp))
+                    node = node.prev
+                bucket = bucket.higher
+            return items
+
+    def clear(self) -> None:
+        """
+        Remove all entries from the cache.
+        """
+        with self._lock:
+            self.cache.clear()
+            self._init_buckets()
+            self._hits_since_decay = 0
+            self._bytes_used = 0
+            self._expiry_heap.clear()
+            self._stats = CacheStats()
@@ -1,28 +1,56 @@
 from __future__ import annotations
+import math
+import random
 import time
-from threading import Lock
-from typing import Dict, Optional, TypeVar, Generic, Hashable
+from typing import Callable, Dict, List, Optional, Tuple, TypeVar, Generic, Hashable
 
-from .base import Cache, CacheStats
+from .base import FRESH, REFRESH, STALE, BoundedCache, CacheStats, LoadGroup
 from .dll import DLLNode
+from .expiry import ExpiryHeap
+from .sizing import Sizer
 
 K = TypeVar("K", bound=Hashable)
 V = TypeVar("V")
     
-class LRUCache(Cache[K, V], Generic[K, V]):
+class LRUCache(BoundedCache[K, V], Generic[K, V]):
     """
     Simple in-memory LRU cache with O(1) get/put.
 
     - Not distributed (yet).
     - Thread-safe at the method level via a lock
+    - Expired entries are removed lazily on get and actively through a min-heap of
+      expiration times: every put drains up to expire_batch due entries, and
+      expire() can be called from a background thread to drain more.
+    - Every entry is charged sizer(key, value) bytes. With max_bytes set, entries are
+      evicted until the cache is back under budget; entries above max_entry_bytes
+      are rejected with ValueTooLargeError.
+    - get_or_load() checks the key, joins a load in flight and stores the loaded value
+      under the same lock, and a write or delete during a load keeps it from being stored.
+    - Entries put with put_with_grace() stay readable for a grace window past their
+      ttl; get_with_state() reports them STALE and hands out one REFRESH per entry.
+    - incr() and append() keep an entry's grace window along with its ttl.
     """
-    def __init__(self, capacity: int):
-        if capacity <= 0:
-            raise ValueError("LRUCache capacity must be > 0")
-    
-        self.capacity = capacity
+
+    # Seconds after which a REFRESH that was not followed by a put is handed out again
+    REFRESH_TIMEOUT = 5.0
+
+    def __init__(
+        self,
+        capacity: int,
+        expire_batch: int = 16,
+        max_bytes: Optional[int] = None,
+        max_entry_bytes: Optional[int] = None,
+        sizer: Optional[Sizer] = None,
+    ):
+        super().__init__(capacity, max_bytes, max_entry_bytes, sizer)
+        if expire_batch < 0:
+            raise ValueError("expire_batch must be >= 0")
+
+        self.expire_batch = expire_batch
         self.cache: Dict[K, DLLNode] = {}
 
+        self._expiry_heap = ExpiryHeap()
+
         #sentinel heads for easier pointer usage
         self.head = DLLNode()
         self.tail = DLLNode()
@@ -30,9 +58,6 @@ class LRUCache(Cache[K, V], Generic[K, V]):
         self.head.next = self.tail
         self.tail.prev = self.head
 
-        self._lock = Lock()
-        self._stats = CacheStats()
-
     def _add_to_front(self, node) -> None:
         """Insert node at front of list after head node"""
         if node.prev is not None or node.next is not None:
@@ -97,6 +122,20 @@ class LRUCache(Cache[K, V], Generic[K, V]):
             now = time.time()
         return now >= node.expiration_time
     
+    def _expire_locked(self, now: float, max_items: Optional[int]) -> int:
+        """
+        Remove due entries, doing at most max_items heap pops. Caller must hold self._lock.
+        Returns number of entries removed.
+        """
+        due = self._expiry_heap.pop_due(now, max_items, self.cache)
+        for node in due:
+            self._delete_node(node.key, node)
+        self._stats.expired += len(due)
+        if self._on_remove is not None:
+            for node in due:
+                self._on_remove(node.key)
+        return len(due)
+
     def _delete_node(self, key: K, node: DLLNode) -> None:
         """
         deletes a node from the cache and DLL
@@ -104,78 +143,264 @@ class LRUCache(Cache[K, V], Generic[K, V]):
         self._remove(node)
         if key in self.cache:
             del self.cache[key]
+            self._bytes_used -= node.size
 
-    def get(self, key: K) -> Optional[V]:
-        with self._lock:
-            self._stats.gets += 1
-            node = self.cache.get(key)
+    def _entry_locked(self, key: K, now: float) -> Optional[Tuple[V, Optional[float], int]]:
+        node = self.cache.get(key)
+        if node is None:
+            return None
+        if self._is_expired(node, now):
+            self._delete_node(key, node)
+            self._stats.expired += 1
+            if self._on_remove is not None:
+                self._on_remove(key)
+            return None
+        return node.val, node.expiration_time, node.version
 
-            if node is None:
-                self._stats.misses += 1
-                return None
-            
-            now = time.time()
+    def _get_locked(self, key: K, now: float) -> Optional[V]:
+        """
+        get() body; caller must hold self._lock
+        """
+        self._stats.gets += 1
+        node = self.cache.get(key)
 
-            if self._is_expired(node, now):
-                self._delete_node(key, node)
-                self._stats.misses += 1
-                return None
+        if node is None:
+            self._stats.misses += 1
+            return None
+
+        if self._is_expired(node, now):
+            self._delete_node(key, node)
+            self._stats.expired += 1
+            self._stats.misses += 1
+            if self._on_remove is not None:
+                self._on_remove(key)
+            return None
 
+        self._move_to_front(node)
+        self._stats.hits += 1
+        return node.val
+
+    def _put_locked(
+        self,
+        key: K,
+        value: V,
+        ttl: Optional[float],
+        now: float,
+        size: int,
+        grace: Optional[float] = None,
+        delta: Optional[float] = None,
+    ) -> None:
+        """
+        put() body; caller must hold self._lock and have sized the entry with _check_size
+        """
+        if self.expire_batch:
+            self._expire_locked(now, self.expire_batch)
+
+        loads = self._loads
+        if loads is not None and (loads.flights or loads.negative):
+            loads.forget(key)
+
+        node = self.cache.get(key)
+        expiration_time = (now + ttl) if ttl is not None else None
+        fresh_until = None
+        if grace and expiration_time is not None:
+            fresh_until = expiration_time
+            expiration_time += grace
+
+        self._stats.puts += 1
+        self._version += 1
+
+        if node is not None:
+            if delta is None and node.refresh_at is not None:
+                delta = now - node.refresh_at
+            node.val = value
+            node.expiration_time = expiration_time
+            node.fresh_until = fresh_until
+            node.refresh_at = None
+            if delta is not None:
+                node.delta = delta
+            self._bytes_used += size - node.size
+            node.size = size
+            node.version = self._version
             self._move_to_front(node)
-            self._stats.hits += 1
-            return node.val
-    
-    def put(self, key: K, value: V, ttl: Optional[float] = None) -> None:
+            if expiration_time is not None:
+                self._expiry_heap.push(node, self.cache)
+        else:
+            node = DLLNode(key, value)
+            node.expiration_time = expiration_time
+            node.fresh_until = fresh_until
+            node.size = size
+            node.version = self._version
+            if delta is not None:
+                node.delta = delta
+            self._add_to_front(node)
+            self.cache[key] = node
+            self._bytes_used += size
+            if expiration_time is not None:
+                self._expiry_heap.push(node, self.cache)
+
+        self._evict_locked(node)
+
+    def _evict_locked(self, node: DLLNode) -> None:
+        """
+        Evict until back under capacity and max_bytes, after writing node; caller must hold self._lock
+        """
+        # The entry just written is at the front, and _check_size guarantees it fits
+        # on its own, so this never evicts it
+        max_bytes = self.max_bytes
+        while len(self.cache) > self.capacity or (max_bytes is not None and self._bytes_used > max_bytes):
+            if self.tail.prev is node:
+                break
+            lru = self._pop_lru()
+            if lru is None:
+                break
+            if lru.key in self.cache:
+                del self.cache[lru.key]
+                self._bytes_used -= lru.size
+                self._stats.evictions += 1
+                if self._on_remove is not None:
+                    self._on_remove(lru.key)
+
+    def _replace_locked(self, key: K, value: V, expires_at: Optional[float], now: float, size: int) -> None:
+        """
+        See BoundedCache._replace_locked; the entry also keeps its grace window
+        """
+        loads = self._loads
+        if loads is not None and (loads.flights or loads.negative):
+            loads.forget(key)
+        node = self.cache[key]
+        self._stats.puts += 1
+        self._version += 1
+        node.val = value
+        node.version = self._version
+        self._bytes_used += size - node.size
+        node.size = size
+        self._move_to_front(node)
+        self._evict_locked(node)
+
+    def _delete_locked(self, key: K) -> bool:
+        """
+        delete() body; caller must hold self._lock
+        """
+        loads = self._loads
+        if loads is not None and (loads.flights or loads.negative):
+            loads.forget(key)
+
+        node = self.cache.get(key)
+        if node is None:
+            return False
+
+        self._delete_node(key, node)
+        return True
+
+    def _refresh_state(self, node: DLLNode, now: float, beta: float) -> str:
+        """
+        get_with_state() for a live node; caller must hold self._lock.
+        """
+        fresh_until = node.fresh_until
+        if fresh_until is None and not beta:
+            return FRESH
+        stale = fresh_until is not None and now >= fresh_until
+        if node.refresh_at is not None and now - node.refresh_at < self.REFRESH_TIMEOUT:
+            return STALE if stale else FRESH
+        if not stale:
+            expiry = fresh_until if fresh_until is not None else node.expiration_time
+            if not beta or expiry is None or not node.delta:
+                return FRESH
+            # XFetch; 1 - random() is in (0, 1]
+            if now - node.delta * beta * math.log(1.0 - random.random()) < expiry:
+                return FRESH
+        node.refresh_at = now
+        return REFRESH
+
+    def get_with_state(self, key: K, beta: float = 0.0) -> Tuple[Optional[V], str]:
         with self._lock:
             now = time.time()
-            node = self.cache.get(key)
-            expiration_time = (now + ttl) if ttl is not None else None
-
-            self._stats.puts += 1
-
-            if node is not None:
-                node.val = value
-                node.expiration_time = expiration_time
-                self._move_to_front(node)
-                
-                return
-
-            new_node = DLLNode(key, value)
-            new_node.expiration_time = expiration_time
-            self._add_to_front(new_node)
-            self.cache[key] = new_node
-
-            if len(self.cache) > self.capacity:
-                lru = self._pop_lru()
-                if lru is not None and lru.key in self.cache:
-                    del self.cache[lru.key]
-                    self._stats.evictions += 1
-        
-    def delete(self, key: K) -> bool:
+            val = self._get_locked(key, now)
+            if val is None:
+                return None, FRESH
+            return val, self._refresh_state(self.cache[key], now, beta)
+
+    def put_with_grace(self, key: K, value: V, ttl: float, grace: float, delta: Optional[float] = None) -> None:
+        size = self._check_size(key, value, ttl, grace)
+        with self._lock:
+            self._put_locked(key, value, ttl, time.time(), size, grace, delta)
+
+    def get_or_load(
+        self,
+        key: K,
+        loader: Callable[[K], Optional[V]],
+        ttl: Optional[float] = None,
+        negative_ttl: Optional[float] = None,
+        grace: Optional[float] = None,
+        beta: float = 0.0,
+    ) -> Optional[V]:
         """
-        Return True if key existed and was removed, False otherwise.
+        See Cache.get_or_load. The loader runs without the lock held, and its run
+        time is kept as the entry's delta.
+
+        A caller told to REFRESH a cached value that loader returns None for gets the
+        cached value back, and the entry is left to expire. If loader raises during a
+        refresh, the exception reaches that caller only; the entry is kept, and the
+        next caller to read it after REFRESH_TIMEOUT is told to refresh it again.
         """
         with self._lock:
-            node = self.cache.get(key)
-            if node is None:
-                return False
+            now = time.time()
+            val = self._get_locked(key, now)
+            if val is not None:
+                if self._refresh_state(self.cache[key], now, beta) != REFRESH:
+                    return val
+            loads = self._loads
+            if loads is None:
+                loads = self._loads = LoadGroup()
+            if val is None and loads.is_negative(key, now):
+                return None
+            flight, started = loads.join(key)
+        if not started:
+            return val if val is not None else flight.result()
 
-            self._delete_node(key, node)
-            return True
+        try:
+            start = time.perf_counter()
+            value = loader(key)
+            delta = time.perf_counter() - start
+            size = self._check_size(key, value, ttl, grace) if value is not None else 0
+        except BaseException as e:
+            flight.error = e
+            raise
+        else:
+            flight.value = value
+        finally:
+            with self._lock:
+                now = time.time()
+                if flight.error is None and value is not None and not flight.stale:
+                    self._put_locked(key, value, ttl, now, size, grace, delta)
+                loads.finish(key, flight, negative_ttl, now)
+            flight.done.set()
+        if value is None and val is not None:
+            return val
+        return value
 
-    def get_stats(self) -> CacheStats:
+    def expire(self, max_items: Optional[int] = None) -> int:
         """
-        Returns collected stats for gets, puts, hits, misses, and evictions.
+        Remove up to max_items expired entries (all due entries if None).
         """
         with self._lock:
-            stats = self._stats
-            return CacheStats(
-                hits=stats.hits,
-                misses=stats.misses,
-                evictions=stats.evictions,
-                gets=stats.gets,
-                puts=stats.puts
-            )
+            return self._expire_locked(time.time(), max_items)
+
+    def dump(self) -> List[Tuple[K, V, Optional[float]]]:
+        """
+        Live entries as (key, value, expires_at), least recently used first.
+        """
+        with self._lock:
+            now = time.time()
+            items = []
+            node = self.tail.prev
+            while node is not self.head:
+                exp = node.expiration_time
+                if exp is None or now < exp:
+                    items.append((node.key, node.val, exp))
+                node = node.prev
+            return items
 
     def clear(self) -> None:
         """
@@ -183,7 +408,11 @@ class LRUCache(Cache[K, V], Generic[K, V]):
         """
         with self._lock:
             self.cache.clear()
+            self._bytes_used = 0
+            self._expiry_heap.clear()
             self.head.next = self.tail
             self.tail.prev = self.head
             self._stats = CacheStats()
+            if self._loads is not None:
+                self._loads.clear()
     
\ No newline at end of file
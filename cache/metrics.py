@@ -0,0 +1,283 @@
+"""
+Node instrumentation: per-command latency histograms, connection and byte counters,
+and their Prometheus text rendering.
+
+Counters are plain attributes updated without a lock. Commands can run on several
+threads at once (a thread per connection in blocking mode, the peer thread of a
+worker, executor threads for offloaded batches), so increments can be lost to a
+race. That only skews a statistic, and the request path stays lock-free.
+
+Timing a command costs about as much as a cheap command itself in CPython, so only
+a random one in sample_every commands is timed. The histograms are therefore built
+from a sample: their percentiles estimate the full distribution, and their counts
+are sample counts. commands_total counts every command.
+"""
+
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Iterable, Iterator, List, Mapping, Tuple
+
+from .base import CacheStats
+
+# Each power of two is split into 2**SUB_BITS buckets, so a recorded value is
+# known to within 25%. Values are nanoseconds; 64-bit values always fit.
+SUB_BITS = 2
+SUB_BUCKETS = 1 << SUB_BITS
+N_BUCKETS = SUB_BUCKETS * (64 - SUB_BITS + 1)
+
+# Prometheus bucket bounds: powers of two from ~1us to ~17s, in nanoseconds
+PROMETHEUS_BOUNDS = [1 << k for k in range(10, 35)]
+
+
+def bucket_index(ns: int) -> int:
+    if ns < SUB_BUCKETS:
+        return ns
+    shift = ns.bit_length() - SUB_BITS - 1
+    return ((shift + 1) << SUB_BITS) + ((ns >> shift) & (SUB_BUCKETS - 1))
+
+
+def bucket_bounds(index: int) -> Tuple[int, int]:
+    """
+    [low, high) in nanoseconds of the values counted in bucket index.
+    """
+    if index < SUB_BUCKETS:
+        return index, index + 1
+    shift = (index >> SUB_BITS) - 1
+    mantissa = SUB_BUCKETS + (index & (SUB_BUCKETS - 1))
+    return mantissa << shift, (mantissa + 1) << shift
+
+
+class LatencyHistogram:
+    """
+    Log-bucketed histogram of durations in nanoseconds. Histograms with the same
+    buckets merge by adding counts, so per-thread or per-process histograms can be
+    combined (merge, to_dict/from_dict) without losing percentile accuracy.
+    """
+
+    __slots__ = ("counts", "count", "total_ns", "max_ns")
+
+    def __init__(self):
+        self.counts = [0] * N_BUCKETS
+        self.count = 0
+        self.total_ns = 0
+        self.max_ns = 0
+
+    def record(self, ns: int) -> None:
+        if ns < SUB_BUCKETS:
+            self.counts[ns] += 1
+        else:
+            shift = ns.bit_length() - SUB_BITS - 1
+            self.counts[((shift + 1) << SUB_BITS) + ((ns >> shift) & (SUB_BUCKETS - 1))] += 1
+        self.count += 1
+        self.total_ns += ns
+        if ns > self.max_ns:
+            self.max_ns = ns
+
+    def merge(self, other: "LatencyHistogram") -> None:
+        counts = self.counts
+        for i, n in enumerate(other.counts):
+            if n:
+                counts[i] += n
+        self.count += other.count
+        self.total_ns += other.total_ns
+        self.max_ns = max(self.max_ns, other.max_ns)
+
+    def percentile(self, q: float) -> float:
+        """
+        Upper bound, in seconds, of the value below which a fraction q of the
+        recorded values fall (never above the largest value recorded).
+        """
+        if not self.count:
+            return 0.0
+        rank = max(1, int(q * self.count + 0.5))
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if seen >= rank:
+                return min(bucket_bounds(i)[1], self.max_ns) / 1e9
+        return self.max_ns / 1e9
+
+    def mean(self) -> float:
+        return self.total_ns / self.count / 1e9 if self.count else 0.0
+
+    def cumulative(self, bounds: Iterable[int]) -> Iterator[Tuple[int, int]]:
+        """
+        (bound, number of values below bound) for each bound, which must be
+        increasing powers of two (so they fall on bucket edges).
+        """
+        seen = 0
+        i = 0
+        for bound in bounds:
+            limit = bucket_index(bound)
+            while i < limit:
+                seen += self.counts[i]
+                i += 1
+            yield bound, seen
+
+    def to_dict(self) -> Dict[str, object]:
+        return {
+            "count": self.count,
+            "total_ns": self.total_ns,
+            "max_ns": self.max_ns,
+            "buckets": {str(i): n for i, n in enumerate(self.counts) if n},
+        }
+
+    @classmethod
+    def from_dict(cls, data: Mapping[str, object]) -> "LatencyHistogram":
+        hist = cls()
+        hist.count = int(data["count"])
+        hist.total_ns = int(data["total_ns"])
+        hist.max_ns = int(data["max_ns"])
+        for i, n in data["buckets"].items():
+            hist.counts[int(i)] = int(n)
+        return hist
+
+
+class NodeMetrics:
+    """
+    Counters for one node. commands names the commands that get their own latency
+    histogram; anything else is recorded under OTHER. sample_every is the mean
+    number of commands per timed one (1 = all, 0 = none).
+    """
+
+    OTHER = "OTHER"
+
+    def __init__(self, commands: Iterable[str], opcodes: Mapping[int, str], sample_every: int = 1):
+        if sample_every < 0:
+            raise ValueError("sample_every must be >= 0")
+        self.started = time.time()
+        self.sample_every = sample_every
+        self._rng = random.Random()
+        self.commands_total = 0
+        self.connections = 0  # open now
+        self.total_connections = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.commands: Dict[str, LatencyHistogram] = {}
+        self._names = frozenset(commands)
+        # first token of a command line (any case) or binary opcode -> its histogram
+        self._by_token: Dict[str, LatencyHistogram] = {}
+        self._by_opcode = {opcode: self.histogram(name) for opcode, name in opcodes.items()}
+        self._other = self.histogram(self.OTHER)
+
+    def countdown(self) -> int:
+        """
+        Commands to let through until the next timed one: callers decrement it per
+        command and time the command that brings it to 0 or below (concurrent callers
+        may take it past 0). Drawn uniformly from [1, 2 * sample_every - 1], so
+        sampling cannot lock onto a periodic workload. sys.maxsize, which no run
+        counts down, when timing is off.
+        """
+        if self.sample_every <= 1:
+            return self.sample_every or sys.maxsize
+        return int(self._rng.random() * (2 * self.sample_every - 1)) + 1
+
+    def histogram(self, name: str) -> LatencyHistogram:
+        hist = self.commands.get(name)
+        if hist is None:
+            hist = self.commands[name] = LatencyHistogram()
+        return hist
+
+    def record_line(self, line: str, ns: int) -> None:
+        end = line.find(" ")
+        token = line if end < 0 else line[:end]
+        hist = self._by_token.get(token)
+        if hist is None:
+            name = token.upper()
+            if name not in self._names:
+                # not remembered, so junk commands cannot grow the table
+                self._other.record(ns)
+                return
+            hist = self._by_token[token] = self.histogram(name)
+        hist.record(ns)
+
+    def record_opcode(self, opcode: int, ns: int) -> None:
+        self._by_opcode.get(opcode, self._other).record(ns)
+
+    def command_lines(self) -> List[str]:
+        """
+        One line per command that has been timed:
+        "<name> samples n mean_us .. p50_us .. p99_us .. p999_us .. max_us ..".
+        """
+        lines = []
+        for name, hist in sorted(self.commands.items()):
+            if hist.count:
+                lines.append(
+                    f"{name} samples {hist.count} mean_us {hist.mean() * 1e6:.1f} "
+                    f"p50_us {hist.percentile(0.5) * 1e6:.1f} p99_us {hist.percentile(0.99) * 1e6:.1f} "
+                    f"p999_us {hist.percentile(0.999) * 1e6:.1f} max_us {hist.max_ns / 1e3:.1f}"
+                )
+        return lines
+
+    def prometheus(self, node_id: str, shard_stats: Mapping[int, CacheStats]) -> str:
+        """
+        Render the counters and the per-shard stats in the Prometheus text format.
+        """
+        node = f'node="{node_id}"'
+        out = [
+            "# TYPE cache_uptime_seconds gauge",
+            f"cache_uptime_seconds{{{node}}} {time.time() - self.started:.3f}",
+            "# TYPE cache_commands_total counter",
+            f"cache_commands_total{{{node}}} {self.commands_total}",
+            "# TYPE cache_connections gauge",
+            f"cache_connections{{{node}}} {self.connections}",
+            "# TYPE cache_connections_total counter",
+            f"cache_connections_total{{{node}}} {self.total_connections}",
+            "# TYPE cache_network_bytes_total counter",
+            f'cache_network_bytes_total{{{node},direction="in"}} {self.bytes_in}',
+            f'cache_network_bytes_total{{{node},direction="out"}} {self.bytes_out}',
+            "# TYPE cache_command_duration_seconds histogram",
+        ]
+        for name, hist in sorted(self.commands.items()):
+            if not hist.count:
+                continue
+            labels = f'{node},command="{name}"'
+            for bound, seen in hist.cumulative(PROMETHEUS_BOUNDS):
+                out.append(f'cache_command_duration_seconds_bucket{{{labels},le="{bound / 1e9:.9g}"}} {seen}')
+            out.append(f'cache_command_duration_seconds_bucket{{{labels},le="+Inf"}} {hist.count}')
+            out.append(f"cache_command_duration_seconds_sum{{{labels}}} {hist.total_ns / 1e9:.9f}")
+            out.append(f"cache_command_duration_seconds_count{{{labels}}} {hist.count}")
+
+        fields = [
+            ("hits", "counter"), ("misses", "counter"), ("evictions", "counter"), ("expired", "counter"),
+            ("gets", "counter"), ("puts", "counter"), ("entries", "gauge"), ("bytes_used", "gauge"),
+        ]
+        for field, kind in fields:
+            metric = f"cache_shard_{field}" + ("_total" if kind == "counter" else "")
+            out.append(f"# TYPE {metric} {kind}")
+            for sid, stats in sorted(shard_stats.items()):
+                out.append(f'{metric}{{{node},shard="{sid}"}} {getattr(stats, field)}')
+        return "\n".join(out) + "\n"
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    render: Callable[[], str]
+
+    def do_GET(self) -> None:
+        if self.path.split("?", 1)[0] not in ("/", "/metrics"):
+            self.send_error(404)
+            return
+        body = self.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args: object) -> None:
+        pass
+
+
+def serve_metrics(host: str, port: int, render: Callable[[], str]) -> ThreadingHTTPServer:
+    """
+    Serve render() at http://host:port/metrics from a background thread.
+    Call shutdown() on the returned server to stop it.
+    """
+    handler = type("MetricsHandler", (_MetricsHandler,), {"render": staticmethod(render)})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="cache-metrics", daemon=True).start()
+    return server
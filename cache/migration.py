@@ -0,0 +1,145 @@
+"""
+Online migration of a shard to another node.
+
+The source keeps serving the shard while its keys are streamed to the target in
+batches, with the same rules as Redis Cluster's ASK redirection:
+
+- A key still on the source is read and written there.
+- A key the source does not have (already moved, or new) is answered with
+  "ASK <shard> <target>"; the client retries that one command on the target
+  prefixed with ASKING, which the target accepts for a shard it is importing.
+
+Each key therefore lives in exactly one place at any time. A batch is copied to the
+target and only then deleted from the source, both under the shard's record lock,
+so reads never miss a key in flight. When every key has moved, the target takes
+ownership first and then the source, both with a new epoch for the shard; from then
+on the source answers MOVED.
+
+IMPORT frames (source -> target, binary protocol):
+
+    key "<shard> begin <host>:<port> <capacity> <max_bytes>"  reply: target's map version
+    key "<shard> keys <count>"  value: snapshot entries
+    key "<shard> end <epoch>"
+    key "<shard> abort"
+"""
+
+import sys
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .base import Cache
+from .protocol import Opcode, PeerConnection, Status
+from .snapshot import encode_entries
+
+Address = Tuple[str, int]
+
+
+class MigrationError(RuntimeError):
+    """Raised when the target rejects a migration step."""
+
+
+class ShardMigration:
+    """
+    Moves one shard from this node to `target` on a background thread.
+
+    The node calls note_write for every write it applies to the shard while the
+    migration runs, holding `lock`, and starts answering ASK for missing keys once
+    `started` is set. on_finish(epoch) and on_abort are called back holding `lock`
+    too. Keys are sent coldest first, so the target ends up with the source's
+    eviction order.
+    """
+
+    BATCH = 256
+
+    def __init__(
+        self,
+        sid: int,
+        shard: Cache[str, Any],
+        lock: threading.Lock,
+        source: Address,
+        target: Address,
+        map_version: Callable[[], int],
+        on_finish: Callable[["ShardMigration", int], None],
+        on_abort: Callable[["ShardMigration"], None],
+    ):
+        self.sid = sid
+        self.shard = shard
+        self.lock = lock
+        self.source = source
+        self.target = target
+        self._map_version = map_version
+        self._on_finish = on_finish
+        self._on_abort = on_abort
+        self.started = False
+        self.moved = 0
+        self.error: Optional[str] = None
+        # key -> absolute deadline of the value written since the shard was copied
+        self._written: Dict[str, Optional[float]] = {}
+        self._peer = PeerConnection(target, timeout=30.0)
+        self._thread = threading.Thread(target=self._run, name=f"cache-migrate-{sid}", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def join(self) -> None:
+        self._thread.join()
+
+    def note_write(self, key: str, deadline: Optional[float]) -> None:
+        self._written[key] = deadline
+
+    def _call(self, key: str, value: bytes = b"") -> bytes:
+        [(status, body)] = self._peer.call([(Opcode.IMPORT, key, value, None)])
+        if status != Status.OK:
+            raise MigrationError(body.decode("utf-8", errors="replace"))
+        return body
+
+    def _move_locked(self, keys: List[str], deadlines: Dict[str, Optional[float]], now: float) -> None:
+        """
+        Copy the keys the shard still holds to the target, then delete them here.
+        """
+        present = self.shard.get_many(keys)
+        items = []
+        for key, value in present.items():
+            deadline = self._written[key] if key in self._written else deadlines.get(key)
+            if deadline is None or deadline > now:
+                items.append((key, value, deadline))
+        if items:
+            self._call(f"{self.sid} keys {len(items)}", encode_entries(items))
+        self.shard.delete_many(list(present))
+        self.moved += len(items)
+
+    def _run(self) -> None:
+        host, port = self.source
+        capacity = getattr(self.shard, "capacity", 0)
+        max_bytes = getattr(self.shard, "max_bytes", None) or 0
+        try:
+            remote_version = int(self._call(f"{self.sid} begin {host}:{port} {capacity} {max_bytes}"))
+            with self.lock:
+                items = self.shard.dump()
+                self.started = True
+
+            for i in range(0, len(items), self.BATCH):
+                chunk = items[i:i + self.BATCH]
+                with self.lock:
+                    self._move_locked([k for k, _, _ in chunk], {k: d for k, _, d in chunk}, time.time())
+
+            with self.lock:
+                # anything written back by a request that raced the start of the migration
+                rest = self.shard.dump()
+                self._move_locked([k for k, _, _ in rest], {k: d for k, _, d in rest}, time.time())
+                epoch = max(self._map_version(), remote_version) + 1
+                self._call(f"{self.sid} end {epoch}")
+                self._on_finish(self, epoch)
+        except (OSError, ValueError, MigrationError) as e:
+            # keys already moved stay on the target, which drops them with the shard
+            self.error = str(e)
+            print(f"[cache-node] migration of shard {self.sid} to {self.target[0]}:{self.target[1]} failed: {e}", file=sys.stderr)
+            try:
+                self._call(f"{self.sid} abort")
+            except (OSError, ValueError, MigrationError):
+                pass
+            with self.lock:
+                self._on_abort(self)
+        finally:
+            self._peer.close()
@@ -0,0 +1,259 @@
+"""
+Client with a near cache: a small in-process LRUCache in front of the cluster,
+kept coherent by the nodes' invalidation pushes (see cache.tracking).
+
+For every node it talks to, the client opens one listener connection, asks for its
+CLIENT ID and starts a thread reading INVALIDATE lines from it. Pooled connections
+to that node send "CLIENT TRACKING ON REDIRECT <id>" when they connect, so every key
+they read is tracked and its invalidation arrives on the listener. With
+bcast_prefixes, the listener subscribes to those prefixes instead
+("CLIENT TRACKING ON BCAST PREFIX ...") and only keys under them are cached near.
+
+A value stays in the near cache until the node invalidates it, it is evicted, or
+near_ttl passes. If a listener connection is lost, invalidations may have been
+missed: the near cache is cleared and the node's pool dropped, so the next request
+reconnects with tracking on again.
+
+Tracking needs nodes running in asyncio mode with one worker; replicas do not
+track, so read_from_replica is not supported.
+"""
+
+from __future__ import annotations
+
+import socket
+import sys
+import threading
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Sequence, Set, Tuple
+
+from .cache_node import Address
+from .client import CacheClient, CacheClientError, Connection
+from .lru import LRUCache
+
+
+class _Listener(threading.Thread):
+    """
+    Reads INVALIDATE pushes from one node and applies them to the near cache.
+    """
+
+    def __init__(self, client: "NearCacheClient", address: Address):
+        super().__init__(daemon=True, name=f"near-cache-{address[0]}:{address[1]}")
+        self.client = client
+        self.address = address
+        self.conn = Connection(address, client.timeout)
+        try:
+            self.conn.send_lines(["CLIENT ID"])
+            reply = self.conn.read_reply()[0]
+            if not reply.startswith("ID "):
+                raise CacheClientError(f"{address[0]}:{address[1]}: CLIENT ID answered {reply}")
+            self.id = int(reply.split()[1])
+            if client.bcast_prefixes:
+                prefixes = " ".join(f"PREFIX {p}" for p in client.bcast_prefixes)
+                self.conn.send_lines([f"CLIENT TRACKING ON BCAST {prefixes}"])
+                reply = self.conn.read_reply()[0]
+                if reply != "OK":
+                    raise CacheClientError(f"{address[0]}:{address[1]}: CLIENT TRACKING answered {reply}")
+        except BaseException:
+            self.conn.close()
+            raise
+        self.conn.sock.settimeout(None)
+        self.closing = False
+
+    def run(self) -> None:
+        try:
+            while True:
+                line = self.conn.readline()
+                if line == "INVALIDATE":
+                    self.client._invalidate_all(pushed=True)
+                elif line.startswith("INVALIDATE "):
+                    self.client._invalidate(line.split()[1:], pushed=True)
+        except (OSError, CacheClientError) as e:
+            if not self.closing:
+                print(f"[near-cache] lost invalidations from {self.address[0]}:{self.address[1]}: {e}", file=sys.stderr)
+        finally:
+            self.conn.close()
+            if not self.closing:
+                self.client._listener_lost(self)
+
+    def stop(self) -> None:
+        self.closing = True
+        try:
+            # close() alone does not wake a thread blocked in recv
+            self.conn.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.conn.close()
+
+
+class NearCacheClient(CacheClient):
+    """
+    CacheClient that answers repeated reads from a local LRUCache.
+
+    - get/mget look in the near cache first and fill it from the cluster on a miss.
+    - put/delete/mset/mdel drop the keys from the near cache before writing, so a
+      client always reads its own writes.
+    - A fill that races an invalidation of the same key is discarded.
+    """
+
+    def __init__(
+        self,
+        cluster_json: Mapping[str, Any],
+        near_capacity: int = 10_000,
+        near_ttl: Optional[float] = None,
+        bcast_prefixes: Sequence[str] = (),
+        **kwargs: Any,
+    ):
+        if kwargs.get("read_from_replica"):
+            raise ValueError("NearCacheClient cannot read from replicas: replicas do not send invalidations")
+        if near_ttl is not None and near_ttl <= 0:
+            raise ValueError("near_ttl must be > 0")
+        for prefix in bcast_prefixes:
+            self._check_token(prefix, "prefix")
+        super().__init__(cluster_json, **kwargs)
+        self.near: LRUCache[str, str] = LRUCache(near_capacity)
+        self.near_ttl = near_ttl
+        self.bcast_prefixes = tuple(bcast_prefixes)
+
+        self._listeners: Dict[Address, _Listener] = {}
+        self._listen_lock = threading.Lock()
+        # guards the near cache against fills that race an invalidation
+        self._near_lock = threading.Lock()
+        self._inflight: Dict[str, int] = {}
+        self._dirty: Set[str] = set()
+        self._generation = 0
+        self.near_hits = 0
+        self.near_misses = 0
+        self.invalidations = 0
+
+    def close(self) -> None:
+        with self._listen_lock:
+            listeners, self._listeners = list(self._listeners.values()), {}
+        for listener in listeners:
+            listener.stop()
+        for listener in listeners:
+            listener.join()
+        super().close()
+
+    # -- tracking --
+
+    def _setup_lines(self, address: Address) -> List[str]:
+        with self._listen_lock:
+            listener = self._listeners.get(address)
+            if listener is None:
+                listener = _Listener(self, address)
+                self._listeners[address] = listener
+                listener.start()
+        return [] if self.bcast_prefixes else [f"CLIENT TRACKING ON REDIRECT {listener.id}"]
+
+    def _listener_lost(self, listener: _Listener) -> None:
+        with self._listen_lock:
+            if self._listeners.get(listener.address) is listener:
+                del self._listeners[listener.address]
+        self._invalidate_all()
+        self._drop_pool(listener.address)
+
+    def _invalidate(self, keys: Iterable[str], pushed: bool = False) -> None:
+        with self._near_lock:
+            for key in keys:
+                self.invalidations += pushed
+                self.near.delete(key)
+                if key in self._inflight:
+                    self._dirty.add(key)
+
+    def _invalidate_all(self, pushed: bool = False) -> None:
+        with self._near_lock:
+            self.invalidations += pushed
+            self._generation += 1
+            self.near.clear()
+
+    def _cacheable(self, key: str) -> bool:
+        return not self.bcast_prefixes or key.startswith(self.bcast_prefixes)
+
+    def _begin_fill(self, keys: Iterable[str]) -> int:
+        with self._near_lock:
+            for key in keys:
+                self._inflight[key] = self._inflight.get(key, 0) + 1
+            return self._generation
+
+    def _end_fill(self, keys: Iterable[str], values: Dict[str, str], generation: int) -> None:
+        with self._near_lock:
+            for key in keys:
+                left = self._inflight[key] - 1
+                value = values.get(key)
+                if value is not None and key not in self._dirty and generation == self._generation:
+                    self.near.put(key, value, self.near_ttl)
+                if left:
+                    self._inflight[key] = left
+                else:
+                    del self._inflight[key]
+                    self._dirty.discard(key)
+
+    # -- reads --
+
+    def get(self, key: str) -> Optional[str]:
+        self._check_token(key, "key")
+        if not self._cacheable(key):
+            return super().get(key)
+        value = self.near.get(key)
+        if value is not None:
+            self.near_hits += 1
+            return value
+        self.near_misses += 1
+        generation = self._begin_fill([key])
+        value = None
+        try:
+            value = super().get(key)
+        finally:
+            self._end_fill([key], {} if value is None else {key: value}, generation)
+        return value
+
+    def mget(self, keys: Iterable[str]) -> Dict[str, str]:
+        keys = list(dict.fromkeys(keys))
+        for key in keys:
+            self._check_token(key, "key")
+        found = self.near.get_many(k for k in keys if self._cacheable(k))
+        missing = [k for k in keys if k not in found]
+        self.near_hits += len(found)
+        self.near_misses += len(missing)
+        if not missing:
+            return found
+        fill = [k for k in missing if self._cacheable(k)]
+        generation = self._begin_fill(fill)
+        values: Dict[str, str] = {}
+        try:
+            values = super().mget(missing)
+        finally:
+            self._end_fill(fill, values, generation)
+        found.update(values)
+        return found
+
+    # -- writes --
+
+    def put(self, key: str, value: str, ttl: Optional[float] = None, grace: Optional[float] = None) -> None:
+        self._invalidate([key])
+        super().put(key, value, ttl, grace)
+
+    def delete(self, key: str) -> bool:
+        self._invalidate([key])
+        return super().delete(key)
+
+    def mset(self, items: Iterable[Tuple[str, str, Optional[float]]]) -> None:
+        items = list(items)
+        self._invalidate(key for key, _, _ in items)
+        super().mset(items)
+
+    def mdel(self, keys: Iterable[str]) -> Dict[str, bool]:
+        keys = list(keys)
+        self._invalidate(keys)
+        return super().mdel(keys)
+
+    def near_stats(self) -> Dict[str, int]:
+        """
+        Near-cache hits and misses, invalidations pushed by the nodes, and entries held.
+        """
+        with self._near_lock:
+            return {
+                "hits": self.near_hits,
+                "misses": self.near_misses,
+                "invalidations": self.invalidations,
+                "entries": len(self.near.cache),
+            }
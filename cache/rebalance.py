@@ -0,0 +1,172 @@
+"""
+Move shards between running nodes.
+
+    python -m cache.rebalance --cluster-config cluster.json --move 3 127.0.0.1:7003
+    python -m cache.rebalance --cluster-config cluster.json --add 127.0.0.1:7003
+
+--add moves shards from the nodes that own the most onto a new (empty) node until it
+owns its even share. Each shard is moved with MIGRATE on its owner, which streams it
+to the target while both keep serving (see cache.migration); once the owner reports
+the new owner, every other node is told with CLUSTER SETOWNER. Nodes that miss the
+broadcast still answer MOVED, so clients end up at the new owner either way.
+
+The nodes' config files are not changed; --output writes the resulting cluster map
+(with its new "version") as a cluster.json.
+"""
+
+import argparse
+import json
+import sys
+import time
+from typing import Dict, List, Tuple
+
+from .cache_node import Address
+from .client import Connection, parse_cluster_config
+
+# shard id -> (owner, epoch, extra fields such as "MIGRATING h:p MOVED n" or "FAILED")
+ShardInfo = Tuple[Address, int, List[str]]
+
+
+class RebalanceError(RuntimeError):
+    """Raised when a node refuses or fails a migration."""
+
+
+def parse_address(text: str) -> Address:
+    host, sep, port = text.rpartition(":")
+    if not sep or not port.isdigit():
+        raise argparse.ArgumentTypeError(f"expected host:port, got {text!r}")
+    return host, int(port)
+
+
+def command(address: Address, line: str, timeout: float = 5.0) -> List[str]:
+    conn = Connection(address, timeout)
+    try:
+        conn.send_lines([line])
+        return conn.read_reply()
+    finally:
+        conn.close()
+
+
+def fetch_map(address: Address) -> Tuple[int, Dict[int, ShardInfo]]:
+    """
+    Return (version, shards) from one node's CLUSTER MAP.
+    """
+    lines = command(address, "CLUSTER MAP")
+    if not lines[0].startswith("VERSION "):
+        raise RebalanceError(f"{address[0]}:{address[1]}: {lines[0]}")
+    shards: Dict[int, ShardInfo] = {}
+    for line in lines[1:]:
+        # SHARD <shard> <host>:<port> EPOCH <epoch> ...
+        fields = line.split()
+        shards[int(fields[1])] = (parse_address(fields[2]), int(fields[4]), fields[5:])
+    return int(lines[0].split()[1]), shards
+
+
+def plan_add(cluster_map: Dict[int, Address], new_node: Address) -> List[Tuple[int, Address]]:
+    """
+    Shards to move to new_node so it owns floor(n_shards / n_nodes), taken from the
+    nodes that own the most.
+    """
+    owned: Dict[Address, List[int]] = {}
+    for sid, owner in sorted(cluster_map.items()):
+        owned.setdefault(owner, []).append(sid)
+    owned.setdefault(new_node, [])
+    share = len(cluster_map) // len(owned)
+
+    moves: List[Tuple[int, Address]] = []
+    while len(owned[new_node]) < share:
+        donor = max((a for a in owned if a != new_node), key=lambda a: len(owned[a]))
+        sid = owned[donor].pop()
+        owned[new_node].append(sid)
+        moves.append((sid, new_node))
+    return moves
+
+
+def migrate_shard(
+    sid: int,
+    target: Address,
+    cluster_map: Dict[int, Address],
+    nodes: List[Address],
+    timeout: float,
+) -> int:
+    """
+    Move one shard to target and tell every node. Returns the shard's new epoch.
+    """
+    source = cluster_map[sid]
+    if source == target:
+        return -1
+    reply = command(source, f"MIGRATE {sid} {target[0]}:{target[1]}")[0]
+    if reply != "OK":
+        raise RebalanceError(f"shard {sid}: {source[0]}:{source[1]} answered {reply}")
+
+    deadline = time.time() + timeout
+    while True:
+        owner, epoch, extra = fetch_map(source)[1][sid]
+        if "MIGRATING" not in extra:
+            break
+        if time.time() > deadline:
+            raise RebalanceError(f"shard {sid}: migration did not finish within {timeout}s")
+        time.sleep(0.05)
+    if owner != target:
+        raise RebalanceError(f"shard {sid}: migration to {target[0]}:{target[1]} failed, see the log of {source[0]}:{source[1]}")
+
+    for node in nodes:
+        if node not in (source, target):
+            try:
+                command(node, f"CLUSTER SETOWNER {sid} {target[0]}:{target[1]} {epoch}")
+            except OSError as e:
+                print(f"[rebalance] could not update {node[0]}:{node[1]}: {e}", file=sys.stderr)
+    cluster_map[sid] = target
+    return epoch
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Move shards between running cache nodes")
+    parser.add_argument("--cluster-config", required=True, help="Path to cluster.json")
+    parser.add_argument("--add", type=parse_address, help="Move an even share of the shards to this node")
+    parser.add_argument(
+        "--move", nargs=2, action="append", default=[], metavar=("SHARD", "HOST:PORT"),
+        help="Move one shard to a node (repeatable)",
+    )
+    parser.add_argument("--timeout", type=float, default=300.0, help="Seconds to wait for each shard")
+    parser.add_argument("--output", help="Write the resulting cluster map to this path")
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    with open(args.cluster_config, "r") as f:
+        cluster_json = json.load(f)
+    n_shards, cluster_map = parse_cluster_config(cluster_json)
+
+    # the nodes may already have moved shards since cluster.json was written
+    version, shards = fetch_map(cluster_map[0])
+    cluster_map = {sid: owner for sid, (owner, _, _) in shards.items()}
+
+    moves = [(int(sid), parse_address(addr)) for sid, addr in args.move]
+    if args.add is not None:
+        moves += plan_add(cluster_map, args.add)
+    if any(not 0 <= sid < n_shards for sid, _ in moves):
+        sys.exit(f"shard ids must be in [0, {n_shards})")
+
+    nodes = sorted(set(cluster_map.values()) | {target for _, target in moves})
+    try:
+        for sid, target in moves:
+            start = time.perf_counter()
+            epoch = migrate_shard(sid, target, cluster_map, nodes, args.timeout)
+            if epoch >= 0:
+                version = max(version, epoch)
+                print(f"shard {sid} -> {target[0]}:{target[1]} epoch {epoch} ({time.perf_counter() - start:.2f}s)")
+    except (OSError, RebalanceError) as e:
+        sys.exit(f"[rebalance] {e}")
+
+    if args.output:
+        cluster_json = dict(cluster_json)
+        cluster_json["version"] = version
+        cluster_json["cluster_map"] = {str(sid): list(addr) for sid, addr in sorted(cluster_map.items())}
+        with open(args.output, "w") as f:
+            json.dump(cluster_json, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,226 @@
+"""
+Asynchronous primary-replica replication of shards.
+
+A shard may list replica addresses in cluster.json. The shard's primary (its owner
+in cluster_map) keeps a ReplicationBacklog per replicated shard: the stream of its
+writes, encoded as append-only log records, addressed by byte offset. One
+ReplicaLink thread per replica address pushes the new part of every shard's stream
+as a REPLICATE frame every INTERVAL seconds; replicas apply it and answer with
+their new offset, and the primary never waits for them to answer a client.
+
+A replica that is new, restarted, or so far behind that its offset has been
+trimmed from the backlog is resynced from scratch: the primary copies the shard
+with Cache.dump() (the same copy a snapshot makes) and sends it as SYNC frames of
+snapshot entries, tagged with the stream offset the copy corresponds to.
+
+Every primary run has its own replid; offsets are only comparable within one
+replid, so a primary restart always triggers a full resync.
+
+Replicas serve GETs and MGETs for the shards they replicate. Reads from a
+replica may lag behind the primary by up to INTERVAL plus a round trip.
+"""
+
+import os
+import sys
+import threading
+import time
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+
+from .aof import apply_records
+from .base import Cache
+from .protocol import Opcode, PeerConnection, Status
+from .snapshot import decode_entries, encode_entries
+
+Address = Tuple[str, int]
+
+# Full resyncs are sent in frames of about this many bytes
+SYNC_CHUNK_BYTES = 4 * 2**20
+
+
+def new_replid() -> str:
+    return os.urandom(8).hex()
+
+
+class ReplicationBacklog:
+    """
+    The tail of one shard's write stream. Holds at least max_bytes of the most
+    recent records (trimmed in steps of max_bytes, so appends stay O(1) amortized).
+    """
+
+    def __init__(self, max_bytes: int):
+        if max_bytes <= 0:
+            raise ValueError("max_bytes must be > 0")
+        self.max_bytes = max_bytes
+        self._buf = bytearray()
+        self._start = 0  # stream offset of _buf[0]
+        self._lock = threading.Lock()
+
+    @property
+    def end_offset(self) -> int:
+        with self._lock:
+            return self._start + len(self._buf)
+
+    def append(self, record: bytes) -> None:
+        with self._lock:
+            self._buf += record
+            if len(self._buf) >= 2 * self.max_bytes:
+                drop = len(self._buf) - self.max_bytes
+                del self._buf[:drop]
+                self._start += drop
+
+    def read_from(self, offset: int) -> Optional[bytes]:
+        """
+        Return the stream from offset to the end, or None if offset is no longer
+        (or not yet) in the backlog.
+        """
+        with self._lock:
+            if not self._start <= offset <= self._start + len(self._buf):
+                return None
+            return bytes(self._buf[offset - self._start:])
+
+
+class ReplicaLink:
+    """
+    Pushes some of a primary's shards to one replica address.
+
+    shards maps each shard id to (cache, backlog, lock), where lock is held by the
+    primary while it applies a write and appends its record, so a copy of the shard
+    taken under it matches the backlog's end offset exactly.
+    """
+
+    INTERVAL = 0.005
+    RETRY_INTERVAL = 1.0
+
+    def __init__(
+        self,
+        address: Address,
+        shards: Mapping[int, Tuple[Cache[str, Any], ReplicationBacklog, threading.Lock]],
+        replid: str,
+        stop: threading.Event,
+    ):
+        self.address = address
+        self.shards = dict(shards)
+        self.replid = replid
+        self._stop = stop
+        self._peer = PeerConnection(address)
+        self.acked: Dict[int, int] = {}  # shard id -> offset the replica has applied
+        self._thread = threading.Thread(
+            target=self._run, name=f"cache-repl-{address[0]}:{address[1]}", daemon=True
+        )
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def join(self) -> None:
+        self._thread.join()
+        self._peer.close()
+
+    def _run(self) -> None:
+        failing = False
+        while not self._stop.wait(self.RETRY_INTERVAL if failing else self.INTERVAL):
+            try:
+                self.sync_once()
+                failing = False
+            except (OSError, ValueError) as e:
+                if not failing:
+                    print(f"[cache-node] replication to {self.address[0]}:{self.address[1]} failed: {e}", file=sys.stderr)
+                failing = True
+
+    def _full_sync(self, sid: int) -> List[Tuple[int, str, bytes, Optional[float]]]:
+        cache, backlog, lock = self.shards[sid]
+        with lock:
+            items = cache.dump()
+            offset = backlog.end_offset
+
+        chunks: List[List[Tuple[str, Any, Optional[float]]]] = [[]]
+        size = 0
+        for item in items:
+            if size >= SYNC_CHUNK_BYTES:
+                chunks.append([])
+                size = 0
+            chunks[-1].append(item)
+            size += len(item[0]) + len(item[1])
+
+        frames = []
+        for part, chunk in enumerate(chunks):
+            last = int(part == len(chunks) - 1)
+            key = f"{sid} {self.replid} {offset} {part} {last} {len(chunk)}"
+            frames.append((Opcode.SYNC, key, encode_entries(chunk), None))
+        return frames
+
+    def sync_once(self) -> None:
+        """
+        Send every shard's new records (or a full resync) and record the replica's
+        acknowledged offsets.
+        """
+        frames: List[Tuple[int, str, bytes, Optional[float]]] = []
+        sent: List[Tuple[int, int]] = []  # (shard id, index of the shard's last frame)
+        for sid, (_, backlog, _) in self.shards.items():
+            acked = self.acked.get(sid)
+            data = backlog.read_from(acked) if acked is not None else None
+            if data is None:
+                frames.extend(self._full_sync(sid))
+            elif data:
+                frames.append((Opcode.REPLICATE, f"{sid} {self.replid} {acked}", data, None))
+            else:
+                continue
+            sent.append((sid, len(frames) - 1))
+        if not frames:
+            return
+
+        replies = self._peer.call(frames)
+        for sid, last in sent:
+            status, body = replies[last]
+            if status == Status.OK:
+                self.acked[sid] = int(body)
+            else:
+                # forces a full resync of this shard next round
+                self.acked.pop(sid, None)
+                if body != b"need_resync":
+                    raise ValueError(f"shard {sid}: {body.decode('utf-8', errors='replace')}")
+
+
+class ReplicaShards:
+    """
+    Replica side: applies REPLICATE and SYNC frames to the shards this node replicates.
+    """
+
+    def __init__(self, shards: Mapping[int, Cache[str, Any]]):
+        self.shards = dict(shards)
+        self.offsets: Dict[int, Tuple[str, int]] = {}  # shard id -> (replid, applied offset)
+        self._lock = threading.Lock()
+
+    def _parse(self, key: str, n_fields: int) -> Optional[List[str]]:
+        fields = key.split()
+        if len(fields) != n_fields or not fields[0].isdigit() or int(fields[0]) not in self.shards:
+            return None
+        return fields
+
+    def replicate(self, key: str, data: bytes) -> Tuple[int, bytes]:
+        fields = self._parse(key, 3)
+        if fields is None:
+            return Status.ERR, b"not a replica of this shard"
+        sid, replid, offset = int(fields[0]), fields[1], int(fields[2])
+        with self._lock:
+            if self.offsets.get(sid) != (replid, offset):
+                return Status.ERR, b"need_resync"
+            apply_records(data, {sid: self.shards[sid]}, lambda k: sid)
+            offset += len(data)
+            self.offsets[sid] = (replid, offset)
+        return Status.OK, str(offset).encode("utf-8")
+
+    def sync(self, key: str, data: bytes) -> Tuple[int, bytes]:
+        fields = self._parse(key, 6)
+        if fields is None:
+            return Status.ERR, b"not a replica of this shard"
+        sid, replid, offset = int(fields[0]), fields[1], int(fields[2])
+        part, last, count = int(fields[3]), fields[4] == "1", int(fields[5])
+        shard = self.shards[sid]
+        with self._lock:
+            if part == 0:
+                self.offsets.pop(sid, None)
+                shard.clear()
+            shard.put_many(decode_entries(data, 0, count, time.time()))
+            if last:
+                self.offsets[sid] = (replid, offset)
+        return Status.OK, str(offset).encode("utf-8")
@@ -1,11 +1,36 @@
 import socket
 import argparse
+import asyncio
 import json
+import os
+import shutil
+import signal
 import sys
+import tempfile
+import threading
+import time
+import traceback
 
 from .cache_node import CacheNode, CacheNodeConfig
+from .aof import FSYNC_INTERVAL
+from .compression import DEFAULT_LEVEL
 from .eviction import EvictionPolicy
-from typing import Tuple
+from .metrics import serve_metrics
+from .slowlog import SLOWLOG_MAX_LEN
+from .protocol import (
+    REQUEST_MAGIC,
+    ProtocolError,
+    RecvBuffer,
+    Status,
+    encode_response,
+    parse_requests,
+    send_buffers,
+)
+from .tracking import MAX_TRACKED_KEYS, ClientSession
+from .workers import build_worker_nodes, split_shards
+from typing import List, Optional, Tuple
+
+RECV_SIZE = 65536
 
 def load_json_file(path):
     try: 
@@ -23,18 +48,53 @@ def parse_args():
 
     parser.add_argument("--cluster-config", required=True, help="Path to cluster config JSON (global)")
     parser.add_argument("--node-config", required=True, help="Path to node config JSON (this node)")
+    parser.add_argument(
+        "--mode",
+        choices=("asyncio", "blocking"),
+        default="asyncio",
+        help="asyncio serves many connections concurrently; blocking serves one client at a time",
+    )
+    parser.add_argument("--backlog", type=int, default=128, help="Listen backlog for pending connections")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Worker processes sharing the port via SO_REUSEPORT, each owning a slice of the shards",
+    )
+    parser.add_argument(
+        "--switch-interval",
+        type=float,
+        default=None,
+        help="GIL switch interval in seconds (default: Python's 0.005); lower lets threads answering "
+        "sibling workers run sooner",
+    )
 
     return parser.parse_args()
 
 def build_config(cluster_json, node_json) -> Tuple[CacheNodeConfig, str, int]:
     n_shards = int(cluster_json["n_shards"])
     cluster_map = {int(k): (v[0], int(v[1])) for k, v in cluster_json["cluster_map"].items()}
+    replicas = {int(k): [(h, int(p)) for h, p in v] for k, v in cluster_json.get("replicas", {}).items()}
 
     host = node_json["host"]
     port = int(node_json["port"])
     node_id = node_json.get("node_id", f"{host}:{port}")
     owned_shards = set(map(int, node_json["owned_shards"]))
+    replica_shards = set(map(int, node_json.get("replica_shards", [])))
     capacity = int(node_json["capacity"])
+    max_bytes = node_json.get("max_bytes")
+    max_entry_bytes = node_json.get("max_entry_bytes")
+    expire_interval = node_json.get("expire_interval")
+    if expire_interval is not None:
+        expire_interval = float(expire_interval)
+    snapshot_path = node_json.get("snapshot_path")
+    snapshot_interval = node_json.get("snapshot_interval")
+    if snapshot_interval is not None:
+        snapshot_interval = float(snapshot_interval)
+    aof_path = node_json.get("aof_path")
+    aof_fsync = str(node_json.get("aof_fsync", FSYNC_INTERVAL))
+    aof_fsync_ms = int(node_json.get("aof_fsync_ms", 1000))
+    aof_rewrite_bytes = node_json.get("aof_rewrite_bytes", 64 * 2**20)
 
     if set(cluster_map.keys()) != set(range(n_shards)):
         raise ValueError("cluster_map must contain every shard id in [0, n_shards)")
@@ -50,6 +110,9 @@ def build_config(cluster_json, node_json) -> Tuple[CacheNodeConfig, str, int]:
     for shard_id in owned_shards:
         if cluster_map.get(shard_id) != (host, port):
             raise ValueError(f"config mismatch: shard {shard_id} is owned but cluster_map says {cluster_map.get(shard_id)} not {(host, port)}")
+    for shard_id in replica_shards:
+        if (host, port) not in replicas.get(shard_id, []):
+            raise ValueError(f"config mismatch: shard {shard_id} is replicated here but its replicas are {replicas.get(shard_id, [])}")
 
     cfg = CacheNodeConfig(
         node_id=node_id,
@@ -59,7 +122,33 @@ def build_config(cluster_json, node_json) -> Tuple[CacheNodeConfig, str, int]:
         owned_shards=owned_shards,
         cluster_map=cluster_map,
         capacity=capacity,
-        policy=policy
+        policy=policy,
+        max_bytes=int(max_bytes) if max_bytes is not None else None,
+        max_entry_bytes=int(max_entry_bytes) if max_entry_bytes is not None else None,
+        expire_interval=expire_interval,
+        snapshot_path=snapshot_path,
+        snapshot_interval=snapshot_interval,
+        aof_path=aof_path,
+        aof_fsync=aof_fsync,
+        aof_fsync_ms=aof_fsync_ms,
+        aof_rewrite_bytes=int(aof_rewrite_bytes) if aof_rewrite_bytes is not None else None,
+        replicas=replicas,
+        replica_shards=replica_shards,
+        repl_backlog_bytes=int(node_json.get("repl_backlog_bytes", 2**20)),
+        map_version=int(cluster_json.get("version", 0)),
+        tracking_max_keys=int(node_json.get("tracking_max_keys", MAX_TRACKED_KEYS)),
+        latency_sample=int(node_json.get("latency_sample", 16)),
+        metrics_port=int(node_json["metrics_port"]) if node_json.get("metrics_port") is not None else None,
+        slowlog_threshold_us=(
+            int(node_json["slowlog_threshold_us"]) if node_json.get("slowlog_threshold_us") is not None else None
+        ),
+        slowlog_max_len=int(node_json.get("slowlog_max_len", SLOWLOG_MAX_LEN)),
+        trace_path=node_json.get("trace_path"),
+        xfetch_beta=float(node_json.get("xfetch_beta", 0.0)),
+        compress_threshold=(
+            int(node_json["compress_threshold"]) if node_json.get("compress_threshold") is not None else None
+        ),
+        compress_level=int(node_json.get("compress_level", DEFAULT_LEVEL)),
     )
 
     return cfg, host, port
@@ -83,19 +172,120 @@ def run_server() -> None:
         print(f"FATAL: invalid config: {e}", file=sys.stderr)
         sys.exit(1)
     
-    node = CacheNode(cfg)
+    if args.switch_interval is not None:
+        if args.switch_interval <= 0:
+            print("FATAL: --switch-interval must be > 0", file=sys.stderr)
+            sys.exit(1)
+        # inherited by forked workers
+        sys.setswitchinterval(args.switch_interval)
 
-    server_sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-    server_sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    if args.workers > 1:
+        serve_workers(cfg, host, port, args.mode, args.backlog, args.workers)
+        return
 
     try:
-        server_sock.bind((host, port))
-        server_sock.listen(5)
-    except OSError as e:
-        print(f"FATAL: could not bind to {host}:{port}: {e}", file=sys.stderr)
+        node = CacheNode(cfg)
+    except (OSError, ValueError) as e:
+        print(f"FATAL: could not start node: {e}", file=sys.stderr)
         sys.exit(1)
+    if cfg.snapshot_path is not None and os.path.exists(cfg.snapshot_path):
+        restore_snapshot(node)
+    if cfg.aof_path is not None:
+        restore_log(node)
+    node.start_replication()
+    metrics_server = None
+    if cfg.metrics_port is not None:
+        try:
+            metrics_server = serve_metrics(host, cfg.metrics_port, node.prometheus_metrics)
+        except OSError as e:
+            print(f"FATAL: could not bind metrics endpoint to {host}:{cfg.metrics_port}: {e}", file=sys.stderr)
+            node.close()
+            sys.exit(1)
+        print(f"[cache-server] Serving metrics on http://{host}:{cfg.metrics_port}/metrics")
+
+    # SIGTERM unwinds like Ctrl-C so the final snapshot below is written
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    try:
+        if args.mode == "asyncio":
+            asyncio.run(serve_asyncio(node, host, port, args.backlog))
+        else:
+            serve_blocking(node, host, port, args.backlog)
+    except (KeyboardInterrupt, SystemExit):
+        pass
+    finally:
+        if metrics_server is not None:
+            metrics_server.shutdown()
+        try:
+            if cfg.snapshot_path is not None:
+                n = node.save_snapshot()
+                print(f"[cache-server] Saved {n} keys to {cfg.snapshot_path}")
+        finally:
+            node.close()
+
+
+def restore_snapshot(node: CacheNode) -> None:
+    path = node.cfg.snapshot_path
+    start = time.perf_counter()
+    skipped: List[str] = []
+    try:
+        n = node.load_snapshot(skipped)
+    except (OSError, ValueError) as e:
+        # a corrupt section may be found after earlier ones were loaded
+        for shard in node.local_shards.values():
+            shard.clear()
+        print(f"[cache-server] WARNING: could not load snapshot {path}, starting empty: {e}", file=sys.stderr)
+        return
+    print(f"[cache-server] Loaded {n} keys from {path} in {time.perf_counter() - start:.2f}s")
+    if skipped:
+        print(
+            f"[cache-server] WARNING: skipped {len(skipped)} keys from {path} larger than max_entry_bytes "
+            f"or max_bytes",
+            file=sys.stderr,
+        )
+
+
+def restore_log(node: CacheNode) -> None:
+    path = node.cfg.aof_path
+    start = time.perf_counter()
+    try:
+        n = node.replay_log()
+    except (OSError, ValueError) as e:
+        print(f"[cache-server] WARNING: could not replay log {path}: {e}", file=sys.stderr)
+        return
+    print(f"[cache-server] Replayed {n} records from {path} in {time.perf_counter() - start:.2f}s")
 
-    print(f"[cache-server] Listening on {host}:{port} (capacity={cfg.capacity})")
+
+def bind_listener(host: str, port: int, backlog: int, reuse_port: bool = False) -> socket.socket:
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    if reuse_port:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    try:
+        sock.bind((host, port))
+        sock.listen(backlog)
+    except OSError:
+        sock.close()
+        raise
+    return sock
+
+
+def serve_blocking(
+    node: CacheNode, host: str, port: int, backlog: int, sock: Optional[socket.socket] = None
+) -> None:
+    """
+    Accept one connection at a time and serve it inline until it closes.
+    sock, if given, is an already listening socket (multi-worker mode).
+    """
+    if sock is not None:
+        server_sock = sock
+    else:
+        try:
+            server_sock = bind_listener(host, port, backlog)
+        except OSError as e:
+            print(f"FATAL: could not bind to {host}:{port}: {e}", file=sys.stderr)
+            sys.exit(1)
+
+        print(f"[cache-server] Listening on {host}:{port} (capacity={node.cfg.capacity}, mode=blocking)")
 
     try:
         while True:
@@ -106,32 +296,428 @@ def run_server() -> None:
         server_sock.close()
 
 
+async def serve_asyncio(
+    node: CacheNode,
+    host: str,
+    port: int,
+    backlog: int,
+    sock: Optional[socket.socket] = None,
+    offload: bool = False,
+) -> None:
+    """
+    Serve every connection from a single event loop. Commands are still executed
+    synchronously by CacheNode.handle, so the loop only multiplexes socket I/O.
+    sock, if given, is an already listening socket (multi-worker mode). offload
+    runs the commands in the loop's executor instead (see CacheProtocol).
+    """
+    loop = asyncio.get_running_loop()
+
+    if sock is not None:
+        server = await loop.create_server(lambda: CacheProtocol(node, offload), sock=sock, backlog=backlog)
+    else:
+        try:
+            server = await loop.create_server(
+                lambda: CacheProtocol(node, offload),
+                host,
+                port,
+                backlog=backlog,
+                reuse_address=True,
+            )
+        except OSError as e:
+            print(f"FATAL: could not bind to {host}:{port}: {e}", file=sys.stderr)
+            sys.exit(1)
+
+        print(f"[cache-server] Listening on {host}:{port} (capacity={node.cfg.capacity}, mode=asyncio)")
+
+    async with server:
+        await server.serve_forever()
+
+
+def serve_workers(cfg: CacheNodeConfig, host: str, port: int, mode: str, backlog: int, n_workers: int) -> None:
+    """
+    Fork n_workers processes that accept on the same port through SO_REUSEPORT.
+    Each worker owns a slice of the node's shards (see cache.workers) and forwards
+    requests for its siblings' shards over per-worker Unix sockets.
+
+    Every listening socket is bound before forking, so no worker can receive a
+    request for a sibling that is not listening yet. If any worker exits, the
+    whole node shuts down.
+    """
+    if not hasattr(socket, "SO_REUSEPORT"):
+        print("FATAL: --workers needs SO_REUSEPORT, which this platform lacks", file=sys.stderr)
+        sys.exit(1)
+    if cfg.snapshot_path is not None or cfg.aof_path is not None:
+        print("FATAL: snapshot_path and aof_path are not supported with --workers", file=sys.stderr)
+        sys.exit(1)
+    if cfg.replica_shards or any(cfg.replicas.get(sid) for sid in cfg.owned_shards):
+        print("FATAL: replication is not supported with --workers", file=sys.stderr)
+        sys.exit(1)
+    if cfg.metrics_port is not None:
+        print("FATAL: metrics_port is not supported with --workers", file=sys.stderr)
+        sys.exit(1)
+    if cfg.trace_path is not None:
+        print("FATAL: trace_path is not supported with --workers", file=sys.stderr)
+        sys.exit(1)
+    if cfg.compress_threshold is not None:
+        print("FATAL: compress_threshold is not supported with --workers", file=sys.stderr)
+        sys.exit(1)
+    try:
+        slices = split_shards(cfg.owned_shards, n_workers)
+    except ValueError as e:
+        print(f"FATAL: invalid --workers: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    sock_dir = tempfile.mkdtemp(prefix="cache-workers-")
+    peer_paths = [os.path.join(sock_dir, f"worker{i}.sock") for i in range(n_workers)]
+    listeners: List[socket.socket] = []
+    peer_listeners: List[socket.socket] = []
+    try:
+        for path in peer_paths:
+            peer_sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            peer_sock.bind(path)
+            peer_sock.listen(backlog)
+            peer_listeners.append(peer_sock)
+        for _ in range(n_workers):
+            listeners.append(bind_listener(host, port, backlog, reuse_port=True))
+    except OSError as e:
+        print(f"FATAL: could not bind to {host}:{port}: {e}", file=sys.stderr)
+        shutil.rmtree(sock_dir, ignore_errors=True)
+        sys.exit(1)
+
+    print(
+        f"[cache-server] Listening on {host}:{port} "
+        f"(capacity={cfg.capacity}, mode={mode}, workers={n_workers})",
+        flush=True,
+    )
+
+    pids: List[int] = []
+    for i in range(n_workers):
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                for j in range(n_workers):
+                    if j != i:
+                        listeners[j].close()
+                        peer_listeners[j].close()
+                run_worker(cfg, slices, i, peer_paths, listeners[i], peer_listeners[i], mode, backlog)
+            except KeyboardInterrupt:
+                pass
+            except BaseException:
+                traceback.print_exc()
+                code = 1
+            finally:
+                sys.stdout.flush()
+                sys.stderr.flush()
+                os._exit(code)
+        pids.append(pid)
+
+    for sock in listeners + peer_listeners:
+        sock.close()
+
+    def terminate(signum, frame):
+        raise SystemExit(0)
+
+    signal.signal(signal.SIGTERM, terminate)
+    try:
+        pid, status = os.wait()
+        print(f"[cache-server] worker {pid} exited (status {status}), shutting down", file=sys.stderr)
+    except (KeyboardInterrupt, SystemExit):
+        pass
+    finally:
+        for pid in pids:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        for pid in pids:
+            try:
+                os.waitpid(pid, 0)
+            except ChildProcessError:
+                pass
+        shutil.rmtree(sock_dir, ignore_errors=True)
+
+
+def run_worker(
+    cfg: CacheNodeConfig,
+    slices: List[List[int]],
+    index: int,
+    peer_paths: List[str],
+    listener: socket.socket,
+    peer_listener: socket.socket,
+    mode: str,
+    backlog: int,
+) -> None:
+    """
+    Body of one worker process: serve siblings on peer_listener from a thread and
+    clients on listener with the configured mode.
+    """
+    local, front = build_worker_nodes(cfg, slices, index, peer_paths)
+
+    # Sibling requests are answered from their own threads, never from the client
+    # loop, so two workers forwarding to each other at once cannot deadlock.
+    threading.Thread(target=serve_peers, args=(peer_listener, local), name="cache-peers", daemon=True).start()
+
+    if mode == "asyncio":
+        # forwarded requests block on a sibling, so they must not run on the loop
+        asyncio.run(serve_asyncio(front, cfg.host, cfg.port, backlog, sock=listener, offload=True))
+    else:
+        serve_blocking(front, cfg.host, cfg.port, backlog, sock=listener)
+
+
+def serve_peers(listener: socket.socket, node: CacheNode) -> None:
+    """
+    Accept sibling-worker connections and serve each from its own thread.
+    """
+    while True:
+        conn, _ = listener.accept()
+        threading.Thread(target=handle_client, args=(conn, node), daemon=True).start()
+
+
+class CacheProtocol(asyncio.BufferedProtocol):
+    """
+    One instance per connection. Reads straight into its own preallocated receive
+    buffer and stops reading from the socket while the transport's write buffer is
+    above its high-water mark.
+
+    With offload, each batch runs in the loop's default executor, with reading
+    paused until it is answered, so a batch that waits on a sibling worker does not
+    stall the other connections.
+    """
+
+    def __init__(self, node: CacheNode, offload: bool = False):
+        self.node = node
+        self.offload = offload
+        self.transport: Optional[asyncio.Transport] = None
+        self.rbuf = RecvBuffer(RECV_SIZE)
+        self.binary: Optional[bool] = None
+        self.session: Optional[ClientSession] = None
+        self._write_paused = False
+        self._running = False  # an offloaded batch owns rbuf
+
+    def connection_made(self, transport: asyncio.BaseTransport) -> None:
+        self.transport = transport  # type: ignore[assignment]
+        self.node.metrics.connections += 1
+        self.node.metrics.total_connections += 1
+        loop = asyncio.get_running_loop()
+        # invalidations may be pushed from the node's background threads
+        self.session = self.node.open_session(lambda data: loop.call_soon_threadsafe(self._push, data))
+
+    def connection_lost(self, exc: Optional[Exception]) -> None:
+        self.transport = None
+        self.node.metrics.connections -= 1
+        if self.session is not None:
+            self.node.close_session(self.session)
+
+    def _push(self, data: bytes) -> None:
+        if self.transport is not None:
+            self.transport.write(data)
+
+    def pause_writing(self) -> None:
+        self._write_paused = True
+        if self.transport is not None:
+            self.transport.pause_reading()
+
+    def resume_writing(self) -> None:
+        self._write_paused = False
+        if self.transport is not None and not self._running:
+            self.transport.resume_reading()
+
+    def get_buffer(self, sizehint: int) -> memoryview:
+        return self.rbuf.writable()
+
+    def buffer_updated(self, nbytes: int) -> None:
+        self.rbuf.commit(nbytes)
+        if self.binary is None:
+            self.binary = is_binary(self.rbuf)
+
+        self.node.metrics.bytes_in += nbytes
+        if not self.offload:
+            self._send(*execute_buffered(self.rbuf, self.node, self.binary, self.session))
+            return
+
+        self._running = True
+        self.transport.pause_reading()
+        loop = asyncio.get_running_loop()
+        batch = loop.run_in_executor(None, execute_buffered, self.rbuf, self.node, self.binary, self.session)
+        batch.add_done_callback(self._batch_done)
+
+    def _batch_done(self, batch: "asyncio.Future[Tuple[List[bytes], bool]]") -> None:
+        self._running = False
+        if self.transport is None:
+            return
+        try:
+            out, closing = batch.result()
+        except Exception:
+            traceback.print_exc()
+            self.transport.close()
+            return
+        self._send(out, closing)
+        if not closing and not self._write_paused:
+            self.transport.resume_reading()
+
+    def _send(self, out: List[bytes], closing: bool) -> None:
+        node = self.node
+        metrics = node.metrics
+        if node.tracing:
+            start = time.perf_counter_ns()
+            if out:
+                metrics.bytes_out += sum(map(len, out))
+                self.transport.writelines(out)
+            node.tracer.end_batch(time.perf_counter_ns() - start)
+        elif out:
+            metrics.bytes_out += sum(map(len, out))
+            self.transport.writelines(out)
+        if closing:
+            self.transport.close()
+
+
+def is_binary(rbuf: RecvBuffer) -> bool:
+    """
+    The protocol is picked from the first byte a client sends.
+    """
+    return rbuf.buf[rbuf.start] == REQUEST_MAGIC
+
+
+def execute_pipeline(
+    buffer: bytearray,
+    node: CacheNode,
+    start: int = 0,
+    end: Optional[int] = None,
+    session: Optional[ClientSession] = None,
+) -> Tuple[List[bytes], int, bool]:
+    """
+    Run every complete line in buffer[start:end], scanning by offset so the
+    remaining bytes are never re-sliced per command. The lines are handed to
+    node.handle_many as one batch.
+
+    Returns (responses, consumed, closing): the encoded responses in request order
+    (without trailing newlines), the offset of the first unconsumed byte, and
+    whether a QUIT was seen. Commands after a QUIT are not executed.
+    """
+    if end is None:
+        end = len(buffer)
+    tracing = node.tracing
+    if tracing:
+        framing_start = time.perf_counter_ns()
+    lines: List[str] = []
+    line_ends: List[int] = []
+
+    while True:
+        line_end = buffer.find(b"\n", start, end)
+        if line_end == -1:
+            break
+
+        cmd_line = buffer[start:line_end].decode("utf-8", errors="replace").strip()
+        start = line_end + 1
+        if cmd_line:
+            lines.append(cmd_line)
+            line_ends.append(start)
+
+    if not lines:
+        return [], start, False
+
+    if tracing:
+        node.tracer.framed(time.perf_counter_ns() - framing_start, len(lines))
+    replies = node.handle_many(lines, session)
+    if replies[-1] is None:
+        # QUIT: stop consuming right after it
+        return [r.encode("utf-8") for r in replies[:-1]], line_ends[len(replies) - 1], True
+
+    return [r.encode("utf-8") for r in replies], start, False
+
+
+def execute_frames(
+    buffer: bytearray, node: CacheNode, start: int, end: int
+) -> Tuple[List[bytes], int, bool]:
+    """
+    Binary-protocol counterpart of execute_pipeline. Returns (out, consumed, closing)
+    where out is the list of response buffers (headers and values, uncopied). After
+    a frame that cannot be parsed, the requests before it are still answered, then
+    an error is sent and the connection closed.
+    """
+    out: List[bytes] = []
+    tracing = node.tracing
+    if tracing:
+        framing_start = time.perf_counter_ns()
+    error: Optional[ProtocolError] = None
+    try:
+        requests, consumed = parse_requests(buffer, start, end)
+    except ProtocolError as e:
+        requests, consumed, error = e.requests, end, e
+
+    if not requests:
+        if error is not None:
+            return encode_response(Status.ERR, str(error).encode("utf-8")), end, True
+        return out, consumed, False
+
+    if tracing:
+        node.tracer.framed(time.perf_counter_ns() - framing_start, len(requests))
+
+    for result in node.handle_frames(requests):
+        if result is None:
+            # QUIT
+            return out, consumed, True
+        out.extend(encode_response(*result))
+
+    if error is not None:
+        out.extend(encode_response(Status.ERR, str(error).encode("utf-8")))
+        return out, consumed, True
+    return out, consumed, False
+
+
+def execute_buffered(
+    rbuf: RecvBuffer, node: CacheNode, binary: bool, session: Optional[ClientSession] = None
+) -> Tuple[List[bytes], bool]:
+    """
+    Execute everything complete in rbuf with the connection's protocol and consume it.
+    Returns (buffers to write, closing).
+    """
+    if binary:
+        out, consumed, closing = execute_frames(rbuf.buf, node, rbuf.start, rbuf.end)
+    else:
+        responses, consumed, closing = execute_pipeline(rbuf.buf, node, rbuf.start, rbuf.end, session)
+        out = [b"\n".join(responses) + b"\n"] if responses else []
+
+    rbuf.consume_to(consumed)
+    return out, closing
+
+
 def handle_client(client_sock: socket.socket, node: CacheNode) -> None:
     """
-    Handle one TCP connection. Read lines, delegate to node.handle(), write response.
+    Handle one TCP connection. Read commands, delegate to the node, and write all
+    responses for one received chunk back with a single send.
     """
-    buffer = b""
-    with client_sock:
-        while True:
-            chunk = client_sock.recv(4096)
-            if not chunk:
-                break
-            buffer += chunk
-
-            while b"\n" in buffer:
-                line, buffer = buffer.split(b"\n", 1)
-                line = line.strip()
-                if not line:
-                    continue
-
-                cmd_line = line.decode("utf-8", errors="replace")
-                response = node.handle(cmd_line)
-
-                if response is None:
-                    # QUIT
-                    return
+    rbuf = RecvBuffer(RECV_SIZE)
+    binary: Optional[bool] = None
+    metrics = node.metrics
+    metrics.connections += 1
+    metrics.total_connections += 1
+    try:
+        with client_sock:
+            while True:
+                n = rbuf.recv_into(client_sock)
+                if not n:
+                    break
+                metrics.bytes_in += n
+                if binary is None:
+                    binary = is_binary(rbuf)
 
-                client_sock.sendall(response.encode("utf-8") + b"\n")
+                out, closing = execute_buffered(rbuf, node, binary)
+
+                if node.tracing:
+                    start = time.perf_counter_ns()
+                    if out:
+                        metrics.bytes_out += sum(map(len, out))
+                        send_buffers(client_sock, out)
+                    node.tracer.end_batch(time.perf_counter_ns() - start)
+                elif out:
+                    metrics.bytes_out += sum(map(len, out))
+                    send_buffers(client_sock, out)
+                if closing:
+                    return
+    finally:
+        metrics.connections -= 1
 
 if __name__ == "__main__":
     run_server()
\ No newline at end of file
@@ -0,0 +1,346 @@
+from __future__ import annotations
+import threading
+import time
+import weakref
+from dataclasses import replace
+from typing import Any, Dict, Generic, Hashable, Iterable, List, Optional, Tuple, TypeVar
+
+from .base import BoundedCache, CacheStats
+from .expiry import ExpiryHeap
+from .sizing import Sizer
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+class SieveNode:
+    __slots__ = ("key", "val", "newer", "older", "expiration_time", "size", "visited", "version")
+
+    def __init__(self, key: Any = None, val: Any = None):
+        self.key = key
+        self.val = val
+        self.newer: Optional[SieveNode] = None
+        self.older: Optional[SieveNode] = None
+        self.expiration_time: Optional[float] = None  # UNIX timestamp
+        self.size = 0
+        self.visited = False
+        self.version = 0  # see BoundedCache.gets
+
+class _ReadCounters:
+    """
+    Hit-path counters owned by one thread, so they can be bumped without the lock
+    """
+    __slots__ = ("gets", "hits", "misses")
+
+    def __init__(self):
+        self.gets = 0
+        self.hits = 0
+        self.misses = 0
+
+class SieveCache(BoundedCache[K, V], Generic[K, V]):
+    """
+    SIEVE cache: entries sit in insertion order and a hit only sets the entry's
+    visited bit, so get() never relinks the list and does not take the lock.
+
+    - Eviction moves a hand from the oldest entry toward the newest, clearing visited
+      bits, and evicts the first unvisited entry it reaches. Survivors keep their
+      position, so the hand resumes where it stopped on the next eviction.
+    - put/delete/expire/clear take the lock; get/get_many only take it to remove an
+      entry they found expired.
+    - Hit-path stats (gets, hits, misses) are kept per thread and summed by get_stats.
+      Counters of threads that have exited are folded into the shared stats.
+    - Over max_bytes the hand keeps going, evicting until the cache is back under
+      budget; it skips the entry just written.
+    """
+    def __init__(
+        self,
+        capacity: int,
+        expire_batch: int = 16,
+        max_bytes: Optional[int] = None,
+        max_entry_bytes: Optional[int] = None,
+        sizer: Optional[Sizer] = None,
+    ):
+        super().__init__(capacity, max_bytes, max_entry_bytes, sizer)
+        if expire_batch < 0:
+            raise ValueError("expire_batch must be >= 0")
+
+        self.expire_batch = expire_batch
+
+        self.cache: Dict[K, SieveNode] = {}
+        self._expiry_heap = ExpiryHeap()
+        self._init_list()
+        self._init_counters()
+
+    def _init_list(self) -> None:
+        # head.older is the newest entry, tail.newer the oldest
+        self.head = SieveNode()
+        self.tail = SieveNode()
+        self.head.older = self.tail
+        self.tail.newer = self.head
+        self._hand: Optional[SieveNode] = None
+
+    def _init_counters(self) -> None:
+        self._local = threading.local()
+        # (thread, its counters) for every thread that has read since the last prune
+        self._readers: List[Tuple[weakref.ref, _ReadCounters]] = []
+
+    def _counters(self) -> _ReadCounters:
+        try:
+            return self._local.counters
+        except AttributeError:
+            counters = _ReadCounters()
+            with self._lock:
+                self._prune_readers_locked()
+                self._readers.append((weakref.ref(threading.current_thread()), counters))
+            self._local.counters = counters
+            return counters
+
+    def _prune_readers_locked(self) -> None:
+        """
+        Fold the counters of threads that have exited into self._stats and drop them,
+        so _readers stays as long as the number of live reader threads.
+        """
+        live = []
+        stats = self._stats
+        for ref, counters in self._readers:
+            thread = ref()
+            if thread is not None and thread.is_alive():
+                live.append((ref, counters))
+            else:
+                stats.gets += counters.gets
+                stats.hits += counters.hits
+                stats.misses += counters.misses
+        self._readers = live
+
+    def _push_newest(self, node: SieveNode) -> None:
+        node.older = self.head.older
+        node.newer = self.head
+        self.head.older.newer = node
+        self.head.older = node
+
+    def _delete_node(self, node: SieveNode) -> None:
+        if self._hand is node:
+            self._hand = node.newer if node.newer is not self.head else None
+        node.newer.older = node.older
+        node.older.newer = node.newer
+        del self.cache[node.key]
+        self._bytes_used -= node.size
+
+    def _pick_victim(self, exclude: Optional[SieveNode] = None) -> Optional[SieveNode]:
+        """
+        Advance the hand to the first unvisited entry other than exclude, clearing
+        visited bits on the way. Two passes always suffice.
+        """
+        if len(self.cache) <= (exclude is not None):
+            return None
+
+        node = self._hand or self.tail.newer
+        while node.visited or node is exclude:
+            if node is not exclude:
+                node.visited = False
+            node = node.newer
+            if node is self.head:
+                node = self.tail.newer
+        self._hand = node
+        return node
+
+    def _evict_one(self, now: float, exclude: Optional[SieveNode] = None) -> bool:
+        victim = self._pick_victim(exclude)
+        if victim is None:
+            return False
+        if victim.expiration_time is not None and now >= victim.expiration_time:
+            self._stats.expired += 1
+        else:
+            self._stats.evictions += 1
+        self._delete_node(victim)
+        if self._on_remove is not None:
+            self._on_remove(victim.key)
+        return True
+
+    def _expire_locked(self, now: float, max_items: Optional[int]) -> int:
+        due = self._expiry_heap.pop_due(now, max_items, self.cache)
+        for node in due:
+            self._delete_node(node)
+        self._stats.expired += len(due)
+        if self._on_remove is not None:
+            for node in due:
+                self._on_remove(node.key)
+        return len(due)
+
+    def _drop_expired(self, node: SieveNode) -> None:
+        """
+        Remove node, found expired on the lock-free read path, unless a concurrent
+        put replaced or refreshed it first
+        """
+        with self._lock:
+            exp = node.expiration_time
+            if self.cache.get(node.key) is node and exp is not None and time.time() >= exp:
+                self._delete_node(node)
+                self._stats.expired += 1
+                if self._on_remove is not None:
+                    self._on_remove(node.key)
+
+    def _get_unlocked(self, key: K, now: float, counters: _ReadCounters) -> Optional[V]:
+        counters.gets += 1
+        node = self.cache.get(key)
+
+        if node is None:
+            counters.misses += 1
+            return None
+
+        exp = node.expiration_time
+        if exp is not None and now >= exp:
+            self._drop_expired(node)
+            counters.misses += 1
+            return None
+
+        node.visited = True
+        counters.hits += 1
+        return node.val
+
+    def _get_locked(self, key: K, now: float) -> Optional[V]:
+        """
+        get() for a caller that already holds self._lock; counted in self._stats
+        """
+        self._stats.gets += 1
+        node = self.cache.get(key)
+
+        if node is None:
+            self._stats.misses += 1
+            return None
+
+        exp = node.expiration_time
+        if exp is not None and now >= exp:
+            self._delete_node(node)
+            self._stats.expired += 1
+            self._stats.misses += 1
+            if self._on_remove is not None:
+                self._on_remove(key)
+            return None
+
+        node.visited = True
+        self._stats.hits += 1
+        return node.val
+
+    def _entry_locked(self, key: K, now: float) -> Optional[Tuple[V, Optional[float], int]]:
+        node = self.cache.get(key)
+        if node is None:
+            return None
+        exp = node.expiration_time
+        if exp is not None and now >= exp:
+            self._delete_node(node)
+            self._stats.expired += 1
+            if self._on_remove is not None:
+                self._on_remove(key)
+            return None
+        return node.val, exp, node.version
+
+    def _put_locked(self, key: K, value: V, ttl: Optional[float], now: float, size: int) -> None:
+        """
+        put() body; caller must hold self._lock and have sized the entry with _check_size
+        """
+        if self.expire_batch:
+            self._expire_locked(now, self.expire_batch)
+
+        self._stats.puts += 1
+        self._version += 1
+        node = self.cache.get(key)
+        expiration_time = (now + ttl) if ttl is not None else None
+
+        if node is not None:
+            node.val = value
+            node.expiration_time = expiration_time
+            self._bytes_used += size - node.size
+            node.size = size
+            node.version = self._version
+            node.visited = True
+        else:
+            if len(self.cache) >= self.capacity:
+                self._evict_one(now)
+            node = SieveNode(key, value)
+            node.expiration_time = expiration_time
+            node.size = size
+            node.version = self._version
+            self.cache[key] = node
+            self._bytes_used += size
+            self._push_newest(node)
+
+        if expiration_time is not None:
+            self._expiry_heap.push(node, self.cache)
+
+        max_bytes = self.max_bytes
+        if max_bytes is not None:
+            # _check_size guarantees the entry just written fits on its own
+            while self._bytes_used > max_bytes and self._evict_one(now, exclude=node):
+                pass
+
+    def _delete_locked(self, key: K) -> bool:
+        """
+        delete() body; caller must hold self._lock
+        """
+        node = self.cache.get(key)
+        if node is None:
+            return False
+        self._delete_node(node)
+        return True
+
+    def get(self, key: K) -> Optional[V]:
+        return self._get_unlocked(key, time.time(), self._counters())
+
+    def get_many(self, keys: Iterable[K]) -> Dict[K, V]:
+        """
+        Look up every key without taking the lock. Missing or expired keys are omitted.
+        """
+        found: Dict[K, V] = {}
+        now = time.time()
+        counters = self._counters()
+        for key in keys:
+            val = self._get_unlocked(key, now, counters)
+            if val is not None:
+                found[key] = val
+        return found
+
+    def expire(self, max_items: Optional[int] = None) -> int:
+        """
+        Remove up to max_items expired entries (all due entries if None).
+        """
+        with self._lock:
+            return self._expire_locked(time.time(), max_items)
+
+    def _stats_locked(self) -> CacheStats:
+        self._prune_readers_locked()
+        stats = super()._stats_locked()
+        readers = [counters for _, counters in self._readers]
+        return replace(
+            stats,
+            hits=stats.hits + sum(c.hits for c in readers),
+            misses=stats.misses + sum(c.misses for c in readers),
+            gets=stats.gets + sum(c.gets for c in readers),
+        )
+
+    def dump(self) -> List[Tuple[K, V, Optional[float]]]:
+        """
+        Live entries as (key, value, expires_at), oldest insertion first. Visited
+        bits are not kept.
+        """
+        with self._lock:
+            now = time.time()
+            items = []
+            node = self.tail.newer
+            while node is not self.head:
+                exp = node.expiration_time
+                if exp is None or now < exp:
+                    items.append((node.key, node.val, exp))
+                node = node.newer
+            return items
+
+    def clear(self) -> None:
+        """
+        Remove all entries from the cache.
+        """
+        with self._lock:
+            self.cache.clear()
+            self._init_list()
+            self._bytes_used = 0
+            self._expiry_heap.clear()
+            self._stats = CacheStats()
+            self._init_counters()
@@ -0,0 +1,333 @@
+"""
+Miss-ratio curves from request traces (see cache.trace), for choosing capacity.
+
+    python -m cache.simulator trace.bin [trace.bin ...] [--sample 0.01] [--sizes N ...]
+
+The curve gives, for each cache size in entries, the fraction of GETs that would
+miss. Requests are replayed the way the node sees them: a GET that misses is
+filled (read-through), a PUT stores the key and a DEL removes it; only GETs count
+towards the miss ratio. TTLs are recorded but not simulated. A node splits its
+capacity over its shards, but keys are spread over them by hash, so a curve for
+one cache of the total size is a close model of it.
+
+Sampling (SHARDS): only keys whose mixed hash falls below sample * 2**24 are
+kept. The sampled requests look like the full trace over a keyspace sample times
+as large, so a cache of size C is modelled by one of size C * sample. Accuracy
+depends on the number of distinct sampled keys rather than on the trace length:
+about ten thousand give curves within a few percent, the error being largest at
+small sizes, where a handful of hot keys (sampled or not) decide the result.
+Several traces (e.g. one per node) are merged by time.
+
+LRU's curve comes from one pass over the sampled trace: LRU has the stack
+property, so a GET hits in every LRU cache at least as large as its stack
+distance (the number of distinct keys used since the key was last used), which a
+Fenwick tree over request positions gives in O(log n). A DEL takes its key out
+of the stack; a real LRU cache instead keeps the slot free until the next insert,
+so with DELs the curve is a close approximation rather than exact. The other policies have
+no such property and are replayed on the sampled trace once per size, which
+sampling keeps cheap.
+
+NumPy, if installed, decodes, samples and merges the traces in bulk, which is
+most of the work on a long trace sampled at a low rate; the stack-distance pass
+over the sampled requests is sequential. Without NumPy the traces are decoded
+record by record.
+"""
+
+import argparse
+import bisect
+import json
+import math
+import sys
+from collections import Counter
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from .eviction import EvictionPolicy
+from .factory import CacheFactory
+from .trace import OP_DEL, OP_GET, OP_PUT, RECORD, TraceError, read_header, read_trace
+
+try:
+    import numpy as np
+except ImportError:  # optional, see the module docstring
+    np = None
+
+# Sampling decisions use the low SAMPLE_BITS bits of the mixed key hash
+SAMPLE_BITS = 24
+SAMPLE_MOD = 1 << SAMPLE_BITS
+
+# Fewer distinct sampled keys than this make sampled curves noisy
+MIN_SAMPLED_KEYS = 10_000
+
+# Records decoded per NumPy chunk
+CHUNK_RECORDS = 1 << 22
+
+MASK64 = (1 << 64) - 1
+
+
+def mix64(h: int) -> int:
+    """
+    splitmix64 finalizer: spreads every input bit over the output, so sampling on
+    the low bits is independent of shard placement (which uses the CRC-32).
+    """
+    h ^= h >> 30
+    h = (h * 0xBF58476D1CE4E5B9) & MASK64
+    h ^= h >> 27
+    h = (h * 0x94D049BB133111EB) & MASK64
+    return h ^ (h >> 31)
+
+
+class SampledTrace(NamedTuple):
+    ops: List[int]
+    keys: List[int]  # key hashes
+    sample: float
+    requests: int    # in the full trace
+    gets: int        # in the full trace
+
+
+def _threshold(sample: float) -> int:
+    if not 0 < sample <= 1:
+        raise ValueError("sample must be in (0, 1]")
+    return max(1, round(sample * SAMPLE_MOD))
+
+
+def load_trace(paths: Sequence[str], sample: float = 1.0, use_numpy: Optional[bool] = None) -> SampledTrace:
+    """
+    Read and sample the traces at paths, merging several by time. use_numpy picks
+    the implementation (default: NumPy if installed).
+    """
+    if not paths:
+        raise ValueError("no traces given")
+    threshold = _threshold(sample)
+    if use_numpy is None:
+        use_numpy = np is not None
+    if use_numpy:
+        if np is None:
+            raise RuntimeError("NumPy is not installed")
+        return _load_numpy(paths, threshold)
+
+    parts: List[List[Tuple[int, int, int]]] = []
+    requests = gets = 0
+    for path in paths:
+        with open(path, "rb") as f:
+            started_ns = int(read_header(f, path) * 1e9)
+        part = []
+        for rec in read_trace(path):
+            requests += 1
+            gets += rec.op == OP_GET
+            if mix64(rec.key_hash) & (SAMPLE_MOD - 1) < threshold:
+                part.append((started_ns + rec.t_ns, rec.op, rec.key_hash))
+        parts.append(part)
+    records = parts[0] if len(parts) == 1 else sorted((r for part in parts for r in part), key=lambda r: r[0])
+    return SampledTrace([r[1] for r in records], [r[2] for r in records], threshold / SAMPLE_MOD, requests, gets)
+
+
+def _load_numpy(paths: Sequence[str], threshold: int) -> SampledTrace:
+    dtype = np.dtype([("t_ns", ">u8"), ("op", "u1"), ("key", ">u8"), ("size", ">u4"), ("ttl", ">f4")])
+    assert dtype.itemsize == RECORD.size
+    times, ops, keys = [], [], []
+    requests = gets = 0
+    for path in paths:
+        with open(path, "rb") as f:
+            started_ns = int(read_header(f, path) * 1e9)
+            while True:
+                chunk = f.read(CHUNK_RECORDS * RECORD.size)
+                records = np.frombuffer(chunk, dtype, len(chunk) // RECORD.size)
+                requests += len(records)
+                gets += int(np.count_nonzero(records["op"] == OP_GET))
+                h = records["key"].astype(np.uint64)
+                h ^= h >> np.uint64(30)
+                h *= np.uint64(0xBF58476D1CE4E5B9)
+                h ^= h >> np.uint64(27)
+                h *= np.uint64(0x94D049BB133111EB)
+                h ^= h >> np.uint64(31)
+                kept = records[(h & np.uint64(SAMPLE_MOD - 1)) < np.uint64(threshold)]
+                times.append(kept["t_ns"].astype(np.int64) + started_ns)
+                ops.append(kept["op"])
+                keys.append(kept["key"])
+                if len(chunk) < CHUNK_RECORDS * RECORD.size:
+                    break
+    t = np.concatenate(times)
+    op = np.concatenate(ops)
+    key = np.concatenate(keys)
+    if len(paths) > 1:
+        order = np.argsort(t, kind="stable")
+        op, key = op[order], key[order]
+    return SampledTrace(op.tolist(), key.tolist(), threshold / SAMPLE_MOD, requests, gets)
+
+
+class StackDistances(NamedTuple):
+    distances: Dict[int, int]  # LRU stack distance -> number of GETs, in sampled keys
+    cold: int                  # GETs of keys not in the stack (first use, or after a DEL)
+    gets: int                  # sampled GETs
+    keys: int                  # distinct sampled keys
+
+
+def stack_distances(ops: Sequence[int], keys: Sequence[int]) -> StackDistances:
+    """
+    One pass over a trace. Position t of the Fenwick tree is 1 while the request
+    at t is the latest use of its key, so the keys used since a key's last use at
+    p are the marked positions after p.
+    """
+    n = len(keys)
+    tree = [0] * (n + 1)
+    last: Dict[int, int] = {}
+    distances: Counter = Counter()
+    cold = gets = live = 0
+    distinct = set()
+    for t, (op, key) in enumerate(zip(ops, keys), 1):
+        prev = last.get(key)
+        if prev is not None:
+            # keys used since prev: the marks after it; then prev is no longer the latest use
+            if op == OP_GET:
+                i, before = prev, 0
+                while i:
+                    before += tree[i]
+                    i &= i - 1
+                distances[live - before + 1] += 1
+            i = prev
+            while i <= n:
+                tree[i] -= 1
+                i += i & -i
+            live -= 1
+        elif op == OP_GET:
+            cold += 1
+        gets += op == OP_GET
+        if op == OP_DEL:
+            if prev is not None:
+                del last[key]
+            continue
+        distinct.add(key)
+        last[key] = t
+        live += 1
+        i = t
+        while i <= n:
+            tree[i] += 1
+            i += i & -i
+    return StackDistances(dict(distances), cold, gets, len(distinct))
+
+
+def lru_curve(stack: StackDistances, trace: SampledTrace, sizes: Sequence[int]) -> List[float]:
+    """
+    LRU miss ratio at each size (in full-trace entries).
+    """
+    if not stack.gets:
+        return [0.0 for _ in sizes]
+    sample = trace.sample
+    dists = sorted(stack.distances)
+    cumulative, seen = [], 0
+    for d in dists:
+        seen += stack.distances[d]
+        cumulative.append(seen)
+    # a GET hits in caches of at least distance / sample entries
+    scaled = [d / sample for d in dists]
+    curve = []
+    for size in sizes:
+        idx = bisect.bisect_right(scaled, size)
+        curve.append(_miss_ratio(stack.gets - (cumulative[idx - 1] if idx else 0), trace))
+    return curve
+
+
+def _miss_ratio(misses: int, trace: SampledTrace) -> float:
+    """
+    misses (of the sampled GETs) over the GETs the sample was expected to have.
+    Hot keys make the sampled share of GETs vary a lot from trace.sample; the
+    difference is made up of hits, as in SHARDS' adjustment of the smallest
+    distances, since a GET to a hot key over- or under-sampled almost always hits.
+    """
+    expected = trace.gets * trace.sample
+    return min(1.0, misses / expected) if expected else 0.0
+
+
+def replay_misses(policy: EvictionPolicy, capacity: int, ops: Sequence[int], keys: Sequence[int]) -> int:
+    """
+    Number of GETs that miss replaying the trace on one cache of capacity entries.
+    """
+    cache = CacheFactory.create_local_cache(capacity, policy)
+    get, put = cache.get, cache.put
+    misses = 0
+    for op, key in zip(ops, keys):
+        if op == OP_GET:
+            if get(key) is None:
+                misses += 1
+                put(key, True)
+        elif op == OP_PUT:
+            put(key, True)
+        else:
+            cache.delete(key)
+    return misses
+
+
+def policy_curve(policy: EvictionPolicy, trace: SampledTrace, sizes: Sequence[int]) -> List[float]:
+    """
+    Miss ratio of policy at each size, replaying the sampled trace on a cache
+    scaled down by the sampling rate.
+    """
+    return [
+        _miss_ratio(replay_misses(policy, max(1, round(size * trace.sample)), trace.ops, trace.keys), trace)
+        for size in sizes
+    ]
+
+
+def default_sizes(stack: StackDistances, sample: float, points: int) -> List[int]:
+    """
+    points sizes evenly spaced up to the estimated number of distinct keys.
+    """
+    top = max(points, math.ceil(stack.keys / sample))
+    return sorted({max(1, round(top * i / points)) for i in range(1, points + 1)})
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Miss-ratio curves from request traces")
+    parser.add_argument("traces", nargs="+", help="Trace files recorded by nodes (trace_path)")
+    parser.add_argument("--sample", type=float, default=1.0, help="SHARDS sampling rate, e.g. 0.01")
+    parser.add_argument("--sizes", type=int, nargs="+", help="Cache sizes in entries (default: evenly spaced)")
+    parser.add_argument("--points", type=int, default=20, help="Number of default sizes")
+    parser.add_argument(
+        "--policies", nargs="*", default=[p.value for p in CacheFactory.policies()],
+        help="Policies to replay besides the LRU stack-distance curve (none: LRU curve only)",
+    )
+    parser.add_argument("--no-numpy", action="store_true", help="Do not use NumPy even if installed")
+    parser.add_argument("--output", help="Write the curves as JSON to this file")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    try:
+        policies = [EvictionPolicy(name.upper()) for name in args.policies]
+    except ValueError as e:
+        sys.exit(f"error: {e}")
+    try:
+        trace = load_trace(args.traces, args.sample, use_numpy=False if args.no_numpy else None)
+    except (OSError, TraceError, ValueError) as e:
+        sys.exit(f"error: {e}")
+
+    stack = stack_distances(trace.ops, trace.keys)
+    sizes = sorted(set(args.sizes)) if args.sizes else default_sizes(stack, trace.sample, args.points)
+    curves = {"LRU (stack distance)": lru_curve(stack, trace, sizes)}
+    for policy in policies:
+        curves[policy.value] = policy_curve(policy, trace, sizes)
+
+    print(f"--- Miss-Ratio Curves ---")
+    print(
+        f"Requests: {trace.requests:,} ({trace.gets:,} GETs), sampled at {trace.sample:.4g}: "
+        f"{len(trace.ops):,} requests, {stack.keys:,} distinct keys"
+    )
+    if trace.sample < 1 and stack.keys < MIN_SAMPLED_KEYS:
+        print(f"warning: fewer than {MIN_SAMPLED_KEYS} sampled keys; raise --sample for smoother curves")
+    print()
+    names = list(curves)
+    print(f"{'size':>10}" + "".join(f"{name:>22}" for name in names))
+    for i, size in enumerate(sizes):
+        print(f"{size:>10,}" + "".join(f"{curves[name][i]:>22.2%}" for name in names))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({
+                "traces": args.traces, "requests": trace.requests, "gets": trace.gets, "sample": trace.sample,
+                "sampled_requests": len(trace.ops), "sampled_keys": stack.keys, "sizes": sizes, "miss_ratio": curves,
+            }, f, indent=1)
+        print(f"\nCurves written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
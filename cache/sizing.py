@@ -0,0 +1,36 @@
+import sys
+from typing import Any, Callable
+
+from .compression import Compressed
+
+# sizer(key, value) -> bytes charged against a cache's max_bytes budget
+Sizer = Callable[[Any, Any], int]
+
+
+def _payload_size(obj: Any) -> int:
+    # Fast paths for the types the server stores; anything else falls back to getsizeof
+    if isinstance(obj, str):
+        return len(obj) if obj.isascii() else len(obj.encode("utf-8"))
+    if isinstance(obj, (bytes, bytearray)):
+        return len(obj)
+    if isinstance(obj, memoryview):
+        return obj.nbytes
+    if isinstance(obj, int):
+        return 8
+    if type(obj) is Compressed:
+        return len(obj.data)
+    return sys.getsizeof(obj)
+
+
+def default_sizer(key: Any, value: Any) -> int:
+    """
+    Charge an entry the encoded size of its key plus its value.
+    """
+    # Inlined fast path for the common str key / str-or-bytes value entry
+    if type(key) is str and key.isascii():
+        key_size = len(key)
+    else:
+        key_size = _payload_size(key)
+    if type(value) is bytes or (type(value) is str and value.isascii()):
+        return key_size + len(value)
+    return key_size + _payload_size(value)
@@ -0,0 +1,82 @@
+from array import array
+from typing import Hashable
+
+_MASK64 = (1 << 64) - 1
+
+# Odd 64-bit multipliers, one per row
+_ROW_SEEDS = (
+    0x9E3779B97F4A7C15,
+    0xC2B2AE3D27D4EB4F,
+    0x165667B19E3779F9,
+    0xD6E8FEB86659FD93,
+)
+
+# byte -> byte >> 1, so halving every counter is one C-level bytes.translate
+_HALVE = bytes(b >> 1 for b in range(256))
+
+
+class CountMinSketch:
+    """
+    Count-min frequency sketch with saturating 4-bit-range counters (max 15) stored one
+    per byte in a flat array, so its memory is fixed at depth * width bytes no matter
+    how many distinct keys are counted.
+
+    After sample_size increments every counter is halved, which ages out old history
+    (the "reset" of TinyLFU).
+    """
+
+    MAX_COUNT = 15
+
+    def __init__(self, width: int, sample_size: int, depth: int = 4):
+        if width <= 0:
+            raise ValueError("width must be > 0")
+        if not 1 <= depth <= len(_ROW_SEEDS):
+            raise ValueError(f"depth must be in [1, {len(_ROW_SEEDS)}]")
+        if sample_size <= 0:
+            raise ValueError("sample_size must be > 0")
+
+        # round width up to a power of two so indexing is a mask
+        self.width = 1 << (width - 1).bit_length()
+        self.depth = depth
+        self.sample_size = sample_size
+        self.additions = 0
+        self._mask = self.width - 1
+        self._rows = [(row * self.width, _ROW_SEEDS[row]) for row in range(depth)]
+        self._table = array("B", bytes(self.width * depth))
+
+    def _indexes(self, key: Hashable):
+        h = hash(key) & _MASK64
+        h ^= h >> 29
+        mask = self._mask
+        return [
+            offset + ((h * seed & _MASK64) >> 40 & mask)
+            for offset, seed in self._rows
+        ]
+
+    def estimate(self, key: Hashable) -> int:
+        table = self._table
+        return min([table[i] for i in self._indexes(key)])
+
+    def increment(self, key: Hashable) -> None:
+        table = self._table
+        added = False
+        for i in self._indexes(key):
+            if table[i] < 15:  # MAX_COUNT
+                table[i] += 1
+                added = True
+
+        if added:
+            self.additions += 1
+            if self.additions >= self.sample_size:
+                self.reset()
+
+    def reset(self) -> None:
+        """
+        Halve every counter.
+        """
+        self._table = array("B", self._table.tobytes().translate(_HALVE))
+        self.additions //= 2
+
+    def clear(self) -> None:
+        self._table = array("B", bytes(len(self._table)))
+        self.additions = 0
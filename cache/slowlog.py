@@ -0,0 +1,254 @@
+"""
+Slow-command log and sampling profiler.
+
+A traced command is timed in four phases:
+
+- parse: the server's share of framing the batch the command came in (finding line
+  ends or decoding frame headers, split evenly over the batch) plus splitting the
+  command line into arguments;
+- lock: time spent waiting for contended shard locks (see Cache.set_lock_timer);
+- execute: the rest of the command's execution;
+- write: handing the batch's replies to the socket. Replies to a pipelined batch
+  are written together, so every command in the batch is charged the whole write.
+
+With a slowlog threshold set, every command is traced and those taking at least
+the threshold in total are kept in a ring buffer of the last max_len. A profile
+(PROFILE START [every]) traces a random one in every commands and keeps a
+histogram per phase and command until PROFILE STOP returns them.
+
+When neither is on, nothing is traced: the node checks one flag per command and
+the server one per batch, and shard locks are the plain locks.
+"""
+
+import itertools
+import random
+import threading
+import time
+from collections import deque
+from typing import Deque, Dict, List, NamedTuple, Optional
+
+from .metrics import LatencyHistogram
+
+PHASES = ("parse", "lock", "execute", "write")
+
+# Default number of slow commands kept
+SLOWLOG_MAX_LEN = 128
+
+# Command text kept per slowlog entry
+MAX_COMMAND_CHARS = 128
+
+# PROFILE START without a rate samples one command in this many
+DEFAULT_PROFILE_EVERY = 100
+
+# Traced commands held per thread before they are filed without a write time, for
+# callers that never report writes (handle() used in process)
+MAX_PENDING = 1024
+
+# Values returned by RequestTracer.wants
+NOT_TRACED = 0
+TRACED = 1    # for the slowlog only
+SAMPLED = 2   # for the profile (and the slowlog, if on)
+
+
+class SlowLogEntry(NamedTuple):
+    id: int
+    timestamp: float  # UNIX time the command started
+    command: str
+    parse_ns: int
+    lock_ns: int
+    execute_ns: int
+    write_ns: int
+
+    @property
+    def total_ns(self) -> int:
+        return self.parse_ns + self.lock_ns + self.execute_ns + self.write_ns
+
+    def line(self) -> str:
+        return (
+            f"{self.id} {self.timestamp:.6f} total_us {self.total_ns / 1e3:.1f} parse_us {self.parse_ns / 1e3:.1f} "
+            f"lock_us {self.lock_ns / 1e3:.1f} execute_us {self.execute_ns / 1e3:.1f} "
+            f"write_us {self.write_ns / 1e3:.1f} command {self.command}"
+        )
+
+
+class _Pending(NamedTuple):
+    command: str
+    name: str
+    timestamp: float
+    parse_ns: int
+    lock_ns: int
+    execute_ns: int
+    sampled: bool
+
+
+class RequestTracer:
+    """
+    Per-node slowlog and profile. Traced commands are held per thread until the
+    server reports the write of their batch (end_batch).
+    """
+
+    def __init__(self, threshold_us: Optional[int] = None, max_len: int = SLOWLOG_MAX_LEN):
+        if threshold_us is not None and threshold_us < 0:
+            raise ValueError("slowlog threshold must be >= 0")
+        if max_len <= 0:
+            raise ValueError("slowlog max_len must be > 0")
+        self.threshold_ns: Optional[int] = None if threshold_us is None else threshold_us * 1000
+        self._entries: Deque[SlowLogEntry] = deque(maxlen=max_len)
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+        self.profile_every = 0
+        self._profile: Optional[Dict[str, List[LatencyHistogram]]] = None  # name -> per phase, then total
+        self._profile_started = 0.0
+        self._countdown = -1
+        self._rng = random.Random()
+
+        # per thread: pending (commands traced since the last end_batch), framing_ns
+        # (framing time of the batch being executed, per command) and lock_ns
+        self._local = threading.local()
+
+    @property
+    def active(self) -> bool:
+        return self.threshold_ns is not None or self._profile is not None
+
+    # -- configuration --
+
+    def set_threshold(self, threshold_us: Optional[int]) -> None:
+        if threshold_us is not None and threshold_us < 0:
+            raise ValueError("slowlog threshold must be >= 0")
+        self.threshold_ns = None if threshold_us is None else threshold_us * 1000
+
+    def start_profile(self, every: int) -> None:
+        if every <= 0:
+            raise ValueError("profile rate must be > 0")
+        with self._lock:
+            self.profile_every = every
+            self._profile = {}
+            self._profile_started = time.time()
+            self._countdown = self._next_countdown()
+
+    def stop_profile(self) -> List[str]:
+        """
+        Stop profiling and return one line per command sampled:
+        "<name> samples n total_us mean/p99 parse_us mean/p99 ...".
+        """
+        with self._lock:
+            profile, self._profile = self._profile, None
+            elapsed = time.time() - self._profile_started
+        if profile is None:
+            return []
+        lines = [f"seconds {elapsed:.3f} every {self.profile_every}"]
+        for name, hists in sorted(profile.items()):
+            fields = [f"{name} samples {hists[-1].count}"]
+            for phase, hist in zip((*PHASES, "total"), hists):
+                fields.append(f"{phase}_us {hist.mean() * 1e6:.1f}/{hist.percentile(0.99) * 1e6:.1f}")
+            lines.append(" ".join(fields))
+        return lines
+
+    def _next_countdown(self) -> int:
+        every = self.profile_every
+        return 1 if every <= 1 else int(self._rng.random() * (2 * every - 1)) + 1
+
+    # -- request path --
+
+    def wants(self) -> int:
+        """
+        Whether to trace the next command: NOT_TRACED, TRACED or SAMPLED.
+        """
+        if self._profile is not None:
+            self._countdown -= 1
+            if self._countdown <= 0:
+                self._countdown = self._next_countdown()
+                return SAMPLED
+        return TRACED if self.threshold_ns is not None else NOT_TRACED
+
+    def framed(self, ns: int, n_commands: int) -> None:
+        """
+        Server hook: the batch about to be executed took ns to frame.
+        """
+        self._local.framing_ns = ns // max(n_commands, 1)
+
+    def lock_waited(self, ns: int) -> None:
+        local = self._local
+        local.lock_ns = getattr(local, "lock_ns", 0) + ns
+
+    def take_lock_wait(self) -> int:
+        local = self._local
+        ns = getattr(local, "lock_ns", 0)
+        local.lock_ns = 0
+        return ns
+
+    def record(self, command: str, name: str, timestamp: float, parse_ns: int, execute_ns: int, sampled: bool) -> None:
+        """
+        Add a traced command. execute_ns includes the lock waits taken since the
+        last take_lock_wait, which are split out here.
+        """
+        local = self._local
+        lock_ns = self.take_lock_wait()
+        parse_ns += getattr(local, "framing_ns", 0)
+        pending = getattr(local, "pending", None)
+        if pending is None:
+            pending = local.pending = []
+        elif len(pending) >= MAX_PENDING:
+            local.pending = []
+            self._file(pending, 0)
+            pending = local.pending
+        pending.append(_Pending(command, name, timestamp, parse_ns, lock_ns, execute_ns - lock_ns, sampled))
+
+    def begin_batch(self) -> None:
+        """
+        Called by the node before executing a batch. Files commands still pending
+        from an earlier batch whose write was never reported (no server, or the
+        connection closed) with a write time of 0.
+        """
+        pending = getattr(self._local, "pending", None)
+        if pending:
+            self._local.pending = []
+            self._file(pending, 0)
+
+    def end_batch(self, write_ns: int) -> None:
+        """
+        Server hook: the replies of the batch were written in write_ns. Files the
+        batch's traced commands.
+        """
+        local = self._local
+        local.framing_ns = 0
+        pending = getattr(local, "pending", None)
+        if pending:
+            local.pending = []
+            self._file(pending, write_ns)
+
+    def _file(self, pending: List[_Pending], write_ns: int) -> None:
+        threshold = self.threshold_ns
+        with self._lock:
+            profile = self._profile
+            for p in pending:
+                total = p.parse_ns + p.lock_ns + p.execute_ns + write_ns
+                if threshold is not None and total >= threshold:
+                    command = p.command if len(p.command) <= MAX_COMMAND_CHARS else p.command[:MAX_COMMAND_CHARS] + "..."
+                    self._entries.append(
+                        SlowLogEntry(next(self._ids), p.timestamp, command, p.parse_ns, p.lock_ns, p.execute_ns, write_ns)
+                    )
+                if p.sampled and profile is not None:
+                    hists = profile.get(p.name)
+                    if hists is None:
+                        hists = profile[p.name] = [LatencyHistogram() for _ in range(len(PHASES) + 1)]
+                    for hist, ns in zip(hists, (p.parse_ns, p.lock_ns, p.execute_ns, write_ns, total)):
+                        hist.record(ns)
+
+    # -- queries --
+
+    def entries(self, count: Optional[int] = None) -> List[SlowLogEntry]:
+        """
+        The logged commands, newest first.
+        """
+        with self._lock:
+            newest = list(reversed(self._entries))
+        return newest if count is None else newest[:count]
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._entries.clear()
@@ -0,0 +1,227 @@
+"""
+Point-in-time snapshots of a node's shards.
+
+A snapshot is written shard by shard: each shard is copied with Cache.dump() under
+its own lock and serialized after the lock is released, so traffic to a shard is
+only held up while that one shard is copied. Files are written to a temporary name
+and renamed into place, so a crash never leaves a torn snapshot behind.
+
+Layout (integers big-endian):
+
+    header   magic b"CSNP" | version u16 | n_shards u32 | created_at f64 | n_sections u32
+    section  shard_id u32 | n_entries u32 | n_bytes u64, then n_bytes of entries
+    entry    key_len u16 | kind u8 | value_len u32 | expires_at f64 | key | value
+
+kind is 0 for str values (stored as UTF-8), 1 for bytes, and 2 and 3 for str and
+bytes values stored zlib-compressed (see cache.compression). expires_at is a UNIX
+timestamp, 0 for no ttl, so time spent down still counts against an entry's ttl.
+Entries are stored coldest first, so loading them in order restores eviction order
+and, if the cache is now smaller, keeps the hottest entries.
+"""
+
+import mmap
+import os
+import struct
+import time
+from typing import Any, Callable, Dict, List, Mapping, Optional, Tuple, Union
+
+from .base import Cache, ValueTooLargeError
+from .compression import Compressed
+from .protocol import key_too_long
+
+MAGIC = b"CSNP"
+VERSION = 1
+
+HEADER = struct.Struct("!4sHIdI")
+SECTION = struct.Struct("!IIQ")
+ENTRY = struct.Struct("!HBId")
+
+KIND_STR = 0
+KIND_BYTES = 1
+KIND_COMPRESSED_STR = 2
+KIND_COMPRESSED_BYTES = 3
+KINDS = (KIND_STR, KIND_BYTES, KIND_COMPRESSED_STR, KIND_COMPRESSED_BYTES)
+
+
+class SnapshotError(ValueError):
+    """Raised when a file is not a readable snapshot."""
+
+
+def encode_value(key: str, value: Any) -> Tuple[int, bytes]:
+    """
+    Return (kind, raw bytes) for a node value; node values are str, bytes or Compressed.
+    """
+    if isinstance(value, str):
+        return KIND_STR, value.encode("utf-8")
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return KIND_BYTES, bytes(value)
+    if type(value) is Compressed:
+        return (KIND_COMPRESSED_STR if value.text else KIND_COMPRESSED_BYTES), value.data
+    raise TypeError(f"cannot persist value of type {type(value).__name__} for key {key!r}")
+
+
+def decode_value(kind: int, raw: bytes) -> Any:
+    if kind == KIND_STR:
+        return raw.decode("utf-8")
+    if kind == KIND_BYTES:
+        return raw
+    return Compressed(bytes(raw), kind == KIND_COMPRESSED_STR)
+
+
+def encode_entries(items: List[Tuple[str, Any, Optional[float]]]) -> bytes:
+    """
+    Encode (key, value, expires_at) items as consecutive entries.
+    """
+    pack = ENTRY.pack
+    parts: List[bytes] = []
+    for key, value, expires_at in items:
+        kb = key.encode("utf-8")
+        kind, vb = encode_value(key, value)
+        parts.append(pack(len(kb), kind, len(vb), expires_at or 0.0))
+        parts.append(kb)
+        parts.append(vb)
+    return b"".join(parts)
+
+
+def write_snapshot(
+    path: str, shards: Mapping[int, Cache[str, Any]], n_shards: int, skipped: Optional[List[str]] = None
+) -> int:
+    """
+    Write every shard to path and return the number of entries written. Entries
+    whose key does not fit key_len are left out; their keys are appended to
+    skipped, if given.
+    """
+    tmp_path = f"{path}.tmp"
+    total = 0
+    with open(tmp_path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, n_shards, time.time(), len(shards)))
+        for sid in sorted(shards):
+            items = shards[sid].dump()
+            if any(key_too_long(key) for key, _, _ in items):
+                if skipped is not None:
+                    skipped.extend(key for key, _, _ in items if key_too_long(key))
+                items = [item for item in items if not key_too_long(item[0])]
+            body = encode_entries(items)
+            f.write(SECTION.pack(sid, len(items), len(body)))
+            f.write(body)
+            total += len(items)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    return total
+
+
+def decode_entries(
+    buf: Union[bytes, mmap.mmap], offset: int, count: int, now: float
+) -> List[Tuple[str, Any, Optional[float]]]:
+    """
+    Decode count entries starting at offset into (key, value, ttl) triples,
+    dropping entries that have expired since the snapshot was taken.
+    """
+    unpack = ENTRY.unpack_from
+    entry_size = ENTRY.size
+    items: List[Tuple[str, Any, Optional[float]]] = []
+    for _ in range(count):
+        key_len, kind, value_len, expires_at = unpack(buf, offset)
+        offset += entry_size
+        key_end = offset + key_len
+        value_end = key_end + value_len
+        if expires_at and expires_at <= now:
+            offset = value_end
+            continue
+        key = buf[offset:key_end].decode("utf-8")
+        value = buf[key_end:value_end]
+        if kind != KIND_BYTES:
+            value = decode_value(kind, value)
+        items.append((key, value, expires_at - now if expires_at else None))
+        offset = value_end
+    return items
+
+
+def load_snapshot(
+    path: str,
+    shards: Mapping[int, Cache[str, Any]],
+    n_shards: int,
+    shard_of: Callable[[str], int],
+    skipped: Optional[List[str]] = None,
+) -> int:
+    """
+    Load path into shards (memory-mapped, one put_many per shard) and return the
+    number of entries loaded. Sections of shards not in `shards` are skipped
+    without decoding. If the snapshot was taken with a different n_shards, every
+    key is re-routed with shard_of instead. Entries too large for their shard (its
+    max_entry_bytes or max_bytes is now lower) are not loaded; their keys are
+    appended to skipped, if given.
+    """
+    now = time.time()
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size < HEADER.size:
+            raise SnapshotError(f"{path} is too short to be a snapshot")
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+            magic, version, snap_shards, _, n_sections = HEADER.unpack_from(buf, 0)
+            if magic != MAGIC:
+                raise SnapshotError(f"{path} is not a snapshot")
+            if version != VERSION:
+                raise SnapshotError(f"{path} has unsupported snapshot version {version}")
+
+            try:
+                loaded = _load_sections(buf, shards, n_sections, snap_shards != n_shards, shard_of, now, skipped)
+            except (struct.error, UnicodeDecodeError) as e:
+                raise SnapshotError(f"{path} is corrupt: {e}") from e
+    return loaded
+
+
+def _load_sections(
+    buf: mmap.mmap,
+    shards: Mapping[int, Cache[str, Any]],
+    n_sections: int,
+    reroute: bool,
+    shard_of: Callable[[str], int],
+    now: float,
+    skipped: Optional[List[str]],
+) -> int:
+    loaded = 0
+    offset = HEADER.size
+    for _ in range(n_sections):
+        sid, count, n_bytes = SECTION.unpack_from(buf, offset)
+        offset += SECTION.size
+        if offset + n_bytes > len(buf):
+            raise SnapshotError("snapshot is truncated")
+
+        if reroute:
+            by_shard: Dict[int, List[Tuple[str, Any, Optional[float]]]] = {}
+            for item in decode_entries(buf, offset, count, now):
+                by_shard.setdefault(shard_of(item[0]), []).append(item)
+            for target, items in by_shard.items():
+                if target in shards:
+                    loaded += _put_fitting(shards[target], items, skipped)
+        elif sid in shards:
+            loaded += _put_fitting(shards[sid], decode_entries(buf, offset, count, now), skipped)
+
+        offset += n_bytes
+    return loaded
+
+
+def _put_fitting(
+    shard: Cache[str, Any], items: List[Tuple[str, Any, Optional[float]]], skipped: Optional[List[str]]
+) -> int:
+    """
+    put_many items into shard and return how many were stored. put_many stores
+    nothing if one entry is too large, so the batch is then put entry by entry,
+    leaving out the ones that do not fit.
+    """
+    try:
+        shard.put_many(items)
+        return len(items)
+    except ValueTooLargeError:
+        pass
+    stored = 0
+    for key, value, ttl in items:
+        try:
+            shard.put(key, value, ttl)
+        except ValueTooLargeError:
+            if skipped is not None:
+                skipped.append(key)
+            continue
+        stored += 1
+    return stored
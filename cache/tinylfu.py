@@ -0,0 +1,284 @@
+from __future__ import annotations
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Generic, Hashable, List, Optional, Tuple, TypeVar
+
+from .base import BoundedCache, CacheStats
+from .expiry import ExpiryHeap
+from .sizing import Sizer
+from .sketch import CountMinSketch
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+WINDOW, PROBATION, PROTECTED = 0, 1, 2
+
+
+class TinyLFUNode:
+    __slots__ = ("key", "val", "expiration_time", "size", "segment", "version")
+
+    def __init__(self, key: Any, val: Any):
+        self.key = key
+        self.val = val
+        self.expiration_time: Optional[float] = None  # UNIX timestamp
+        self.size = 0
+        self.segment = WINDOW
+        self.version = 0  # see BoundedCache.gets
+
+
+class TinyLFUCache(BoundedCache[K, V], Generic[K, V]):
+    """
+    W-TinyLFU cache: a small LRU admission window in front of a segmented LRU main
+    region, with a CountMinSketch deciding which entries get into the main region.
+
+    - New entries enter the window. The window's LRU entry is the candidate for the
+      main region; when the main region is full it is admitted only if the sketch
+      estimates it more frequent than the main region's victim (probation LRU), and
+      the loser is evicted. One-off keys therefore never displace the hot set.
+    - The main region is split into probation and protected (protected_ratio of it).
+      A hit in probation promotes the entry to protected; protected overflow is
+      demoted back to probation.
+    - Every get and put is counted in the sketch, which halves its counters every
+      10 * capacity additions so old popularity fades.
+    - Thread-safe at the method level via a lock
+    - Over max_bytes, entries are evicted from probation, then the window, then
+      protected, each least recently used first, skipping the entry just written.
+    """
+    def __init__(
+        self,
+        capacity: int,
+        window_ratio: float = 0.01,
+        protected_ratio: float = 0.8,
+        expire_batch: int = 16,
+        max_bytes: Optional[int] = None,
+        max_entry_bytes: Optional[int] = None,
+        sizer: Optional[Sizer] = None,
+    ):
+        super().__init__(capacity, max_bytes, max_entry_bytes, sizer)
+        if not 0.0 < window_ratio < 1.0:
+            raise ValueError("window_ratio must be in (0, 1)")
+        if not 0.0 <= protected_ratio < 1.0:
+            raise ValueError("protected_ratio must be in [0, 1)")
+        if expire_batch < 0:
+            raise ValueError("expire_batch must be >= 0")
+
+        self.window_capacity = max(1, int(capacity * window_ratio))
+        self.main_capacity = capacity - self.window_capacity
+        self.protected_capacity = int(self.main_capacity * protected_ratio)
+        self.expire_batch = expire_batch
+
+        self.cache: Dict[K, TinyLFUNode] = {}
+        # per-segment recency order, LRU first
+        self._segments = (OrderedDict(), OrderedDict(), OrderedDict())
+        self.sketch = CountMinSketch(width=4 * capacity, sample_size=10 * capacity)
+        self._expiry_heap = ExpiryHeap()
+
+    def _main_len(self) -> int:
+        return len(self._segments[PROBATION]) + len(self._segments[PROTECTED])
+
+    def _move(self, node: TinyLFUNode, segment: int) -> None:
+        del self._segments[node.segment][node.key]
+        node.segment = segment
+        self._segments[segment][node.key] = node
+
+    def _touch(self, node: TinyLFUNode) -> None:
+        """
+        Record a hit on node: refresh its recency, promoting it out of probation
+        """
+        if node.segment != PROBATION:
+            self._segments[node.segment].move_to_end(node.key)
+            return
+
+        self._move(node, PROTECTED)
+        protected = self._segments[PROTECTED]
+        if len(protected) > self.protected_capacity:
+            _, demoted = protected.popitem(last=False)
+            demoted.segment = PROBATION
+            self._segments[PROBATION][demoted.key] = demoted
+
+    def _delete_node(self, node: TinyLFUNode) -> None:
+        del self._segments[node.segment][node.key]
+        del self.cache[node.key]
+        self._bytes_used -= node.size
+
+    def _evict(self, node: TinyLFUNode, now: float) -> None:
+        if node.expiration_time is not None and now >= node.expiration_time:
+            self._stats.expired += 1
+        else:
+            self._stats.evictions += 1
+        self._delete_node(node)
+        if self._on_remove is not None:
+            self._on_remove(node.key)
+
+    def _main_victim(self) -> Optional[TinyLFUNode]:
+        for segment in (PROBATION, PROTECTED):
+            entries = self._segments[segment]
+            if entries:
+                return next(iter(entries.values()))
+        return None
+
+    def _drain_window(self, now: float) -> None:
+        """
+        Move window overflow into the main region, evicting whichever of the candidate
+        and the main victim the sketch estimates as less frequent
+        """
+        window = self._segments[WINDOW]
+        while len(window) > self.window_capacity:
+            candidate = next(iter(window.values()))
+            if self._main_len() < self.main_capacity:
+                self._move(candidate, PROBATION)
+                continue
+
+            victim = self._main_victim()
+            if victim is None:
+                # capacity is too small for a main region
+                self._evict(candidate, now)
+            elif self.sketch.estimate(candidate.key) > self.sketch.estimate(victim.key):
+                self._evict(victim, now)
+                self._move(candidate, PROBATION)
+            else:
+                self._evict(candidate, now)
+
+    def _byte_victim(self, exclude: TinyLFUNode) -> Optional[TinyLFUNode]:
+        """
+        Least valuable entry other than exclude: probation, then window, then protected
+        """
+        for segment in (PROBATION, WINDOW, PROTECTED):
+            for node in self._segments[segment].values():
+                if node is not exclude:
+                    return node
+        return None
+
+    def _expire_locked(self, now: float, max_items: Optional[int]) -> int:
+        due = self._expiry_heap.pop_due(now, max_items, self.cache)
+        for node in due:
+            self._delete_node(node)
+        self._stats.expired += len(due)
+        if self._on_remove is not None:
+            for node in due:
+                self._on_remove(node.key)
+        return len(due)
+
+    def _get_locked(self, key: K, now: float) -> Optional[V]:
+        """
+        get() body; caller must hold self._lock
+        """
+        self._stats.gets += 1
+        self.sketch.increment(key)
+        node = self.cache.get(key)
+
+        if node is None:
+            self._stats.misses += 1
+            return None
+
+        if node.expiration_time is not None and now >= node.expiration_time:
+            self._delete_node(node)
+            self._stats.expired += 1
+            self._stats.misses += 1
+            if self._on_remove is not None:
+                self._on_remove(key)
+            return None
+
+        self._touch(node)
+        self._stats.hits += 1
+        return node.val
+
+    def _entry_locked(self, key: K, now: float) -> Optional[Tuple[V, Optional[float], int]]:
+        node = self.cache.get(key)
+        if node is None:
+            return None
+        exp = node.expiration_time
+        if exp is not None and now >= exp:
+            self._delete_node(node)
+            self._stats.expired += 1
+            if self._on_remove is not None:
+                self._on_remove(key)
+            return None
+        return node.val, exp, node.version
+
+    def _put_locked(self, key: K, value: V, ttl: Optional[float], now: float, size: int) -> None:
+        """
+        put() body; caller must hold self._lock and have sized the entry with _check_size
+        """
+        if self.expire_batch:
+            self._expire_locked(now, self.expire_batch)
+
+        self._stats.puts += 1
+        self._version += 1
+        self.sketch.increment(key)
+        node = self.cache.get(key)
+        expiration_time = (now + ttl) if ttl is not None else None
+
+        if node is not None:
+            node.val = value
+            node.expiration_time = expiration_time
+            self._bytes_used += size - node.size
+            node.size = size
+            node.version = self._version
+            self._touch(node)
+        else:
+            node = TinyLFUNode(key, value)
+            node.expiration_time = expiration_time
+            node.size = size
+            node.version = self._version
+            self.cache[key] = node
+            self._segments[WINDOW][key] = node
+            self._bytes_used += size
+            self._drain_window(now)
+
+        if expiration_time is not None:
+            self._expiry_heap.push(node, self.cache)
+
+        max_bytes = self.max_bytes
+        if max_bytes is not None:
+            # _check_size guarantees the entry just written fits on its own
+            while self._bytes_used > max_bytes:
+                victim = self._byte_victim(exclude=node)
+                if victim is None:
+                    break
+                self._evict(victim, now)
+
+    def _delete_locked(self, key: K) -> bool:
+        """
+        delete() body; caller must hold self._lock
+        """
+        node = self.cache.get(key)
+        if node is None:
+            return False
+        self._delete_node(node)
+        return True
+
+    def expire(self, max_items: Optional[int] = None) -> int:
+        """
+        Remove up to max_items expired entries (all due entries if None).
+        """
+        with self._lock:
+            return self._expire_locked(time.time(), max_items)
+
+    def dump(self) -> List[Tuple[K, V, Optional[float]]]:
+        """
+        Live entries as (key, value, expires_at): probation, then window, then
+        protected, each least recently used first. The frequency sketch is not kept.
+        """
+        with self._lock:
+            now = time.time()
+            items = []
+            for segment in (PROBATION, WINDOW, PROTECTED):
+                for node in self._segments[segment].values():
+                    exp = node.expiration_time
+                    if exp is None or now < exp:
+                        items.append((node.key, node.val, exp))
+            return items
+
+    def clear(self) -> None:
+        """
+        Remove all entries from the cache.
+        """
+        with self._lock:
+            self.cache.clear()
+            for entries in self._segments:
+                entries.clear()
+            self.sketch.clear()
+            self._bytes_used = 0
+            self._expiry_heap.clear()
+            self._stats = CacheStats()
@@ -0,0 +1,147 @@
+"""
+Request traces for offline capacity planning (see cache.simulator).
+
+While a node records (trace_path in its config, then TRACE START), every key it
+reads, writes or deletes for a client is appended to the trace as one fixed-size
+record. Keys are stored as a 64-bit hash, so traces are compact and hold no data;
+one GET/MGET key, PUT/MSET entry or DEL/MDEL key is one record. Replication,
+migration and expiry are not client requests and are not recorded.
+
+Layout (integers big-endian):
+
+    header   magic b"CTRC" | version u16 | started_at f64
+    record   t_ns u64 | op u8 | key_hash u64 | size u32 | ttl f32
+
+t_ns is nanoseconds since started_at (a UNIX timestamp). size is the value's
+length for a PUT, the found value's length for a GET (0 on a miss) and 0 for a
+DEL; ttl is the PUT's ttl in seconds, 0 for none.
+
+Records are appended to a buffer without taking a lock and written
+RECORDS_PER_WRITE at a time, so recording costs a hash and a struct pack per key;
+nothing is done while the node is not recording. A full buffer is swapped out
+and written at the next swap, so a thread that read the buffer just before the
+swap still has a whole buffer's worth of records to finish its append in. A
+record cut short by a crash is ignored when the trace is read.
+"""
+
+import struct
+import threading
+import time
+import zlib
+from typing import BinaryIO, Iterator, List, NamedTuple, Optional
+
+MAGIC = b"CTRC"
+VERSION = 1
+
+HEADER = struct.Struct("!4sHd")
+RECORD = struct.Struct("!QBQIf")
+
+OP_GET = 0
+OP_PUT = 1
+OP_DEL = 2
+OP_NAMES = {OP_GET: "GET", OP_PUT: "PUT", OP_DEL: "DEL"}
+
+# Records buffered before a write()
+RECORDS_PER_WRITE = 4096
+
+
+class TraceError(ValueError):
+    """Raised when a file is not a readable trace."""
+
+
+class TraceRecord(NamedTuple):
+    t_ns: int
+    op: int
+    key_hash: int
+    size: int
+    ttl: float
+
+
+def key_hash(key: str) -> int:
+    """
+    Stable 64-bit hash of a key: CRC-32 (as used for shard placement) in the high
+    half and Adler-32 in the low half.
+    """
+    data = key.encode("utf-8")
+    return (zlib.crc32(data) << 32) | zlib.adler32(data)
+
+
+class TraceRecorder:
+    """
+    Appends records to a trace file. Safe to call from any thread.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.started = time.time()
+        self._start_ns = time.perf_counter_ns()
+        self._file: Optional[BinaryIO] = open(path, "wb")
+        self._file.write(HEADER.pack(MAGIC, VERSION, self.started))
+        self._buf: List[bytes] = []
+        self._retired: List[bytes] = []  # swapped out, written at the next swap
+        self._lock = threading.Lock()
+        self.records = 0
+
+    def record(self, op: int, key: str, size: int = 0, ttl: Optional[float] = None) -> None:
+        data = key.encode("utf-8")
+        # key_hash, inlined
+        rec = RECORD.pack(
+            time.perf_counter_ns() - self._start_ns, op, (zlib.crc32(data) << 32) | zlib.adler32(data),
+            min(size, 0xFFFFFFFF), ttl or 0.0,
+        )
+        buf = self._buf
+        buf.append(rec)
+        if len(buf) >= RECORDS_PER_WRITE:
+            with self._lock:
+                if buf is self._buf:  # not swapped by another thread meanwhile
+                    self._buf = []
+                    self._write(self._retired)
+                    self._retired = buf
+
+    def _write(self, records: List[bytes]) -> None:
+        """
+        Caller holds self._lock.
+        """
+        if self._file is not None and records:
+            self._file.write(b"".join(records))
+            self.records += len(records)
+
+    def close(self) -> None:
+        with self._lock:
+            self._write(self._retired)
+            self._write(self._buf)
+            self._retired, self._buf = [], []
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+def read_header(f: BinaryIO, path: str) -> float:
+    """
+    Check the header of an open trace and return its started_at.
+    """
+    header = f.read(HEADER.size)
+    if len(header) < HEADER.size:
+        raise TraceError(f"{path}: not a trace (too short)")
+    magic, version, started = HEADER.unpack(header)
+    if magic != MAGIC:
+        raise TraceError(f"{path}: not a trace (bad magic)")
+    if version != VERSION:
+        raise TraceError(f"{path}: unsupported trace version {version}")
+    return started
+
+
+def read_trace(path: str) -> Iterator[TraceRecord]:
+    """
+    The records of the trace at path, in order.
+    """
+    with open(path, "rb") as f:
+        read_header(f, path)
+        chunk_size = RECORD.size * RECORDS_PER_WRITE
+        while True:
+            chunk = f.read(chunk_size)
+            usable = len(chunk) - len(chunk) % RECORD.size
+            for rec in RECORD.iter_unpack(memoryview(chunk)[:usable]):
+                yield TraceRecord._make(rec)
+            if len(chunk) < chunk_size:
+                return
@@ -0,0 +1,188 @@
+"""
+Client-side caching support: the node remembers which clients may hold which keys
+and pushes invalidations when those keys change.
+
+A connection is a ClientSession. After "CLIENT TRACKING ON", the node tracks every
+key the connection reads (or, with BCAST, every key starting with one of its
+prefixes, read or not) and, when the key is written, deleted, evicted or expired,
+sends the session the line
+
+    INVALIDATE <key> [<key> ...]
+
+An INVALIDATE with no keys means "drop everything you cached from this node" (sent
+when a shard migrates away). With "REDIRECT <id>", invalidations for the keys this
+connection reads go to the session with that id instead, so a client can read over
+pooled request/reply connections and receive pushes on one dedicated connection.
+
+Like Redis, a tracked key is forgotten once it has been invalidated; the client
+reads it again to be told about the next change. The table of tracked keys holds
+at most max_keys keys; the oldest are invalidated to make room.
+"""
+
+import itertools
+import threading
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+# Default cap on the number of distinct keys being tracked per node
+MAX_TRACKED_KEYS = 1_000_000
+
+
+class ClientSession:
+    """
+    Per-connection state. push writes raw bytes to the connection and must be safe
+    to call from any thread; it is None for connections that cannot receive pushes.
+    """
+
+    __slots__ = ("id", "push", "tracking", "bcast", "prefixes", "redirect")
+
+    def __init__(self, session_id: int, push: Optional[Callable[[bytes], None]]):
+        self.id = session_id
+        self.push = push
+        self.tracking = False
+        self.bcast = False
+        self.prefixes: Tuple[str, ...] = ()
+        self.redirect: Optional[int] = None
+
+    @property
+    def tracks_reads(self) -> bool:
+        return self.tracking and not self.bcast
+
+
+class Tracker:
+    """
+    The node's tracking table. invalidate() may be called while a shard lock is
+    held (it only queues the key); flush() sends what has been queued.
+    """
+
+    def __init__(self, max_keys: int = MAX_TRACKED_KEYS):
+        if max_keys <= 0:
+            raise ValueError("max_keys must be > 0")
+        self.max_keys = max_keys
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._sessions: Dict[int, ClientSession] = {}
+        self._keys: Dict[str, Set[int]] = {}  # key -> ids of the sessions to tell
+        self._overflow: Dict[str, Set[int]] = {}  # oldest keys pushed out of _keys, invalidated on flush
+        self._bcast: Dict[int, Tuple[str, ...]] = {}  # session id -> prefixes ("" matches all)
+        self._pending_lock = threading.Lock()
+        self._pending: List[str] = []
+        self._pending_all = False
+        self.invalidations = 0  # INVALIDATE messages sent
+
+    def open(self, push: Optional[Callable[[bytes], None]]) -> ClientSession:
+        session = ClientSession(next(self._ids), push)
+        with self._lock:
+            self._sessions[session.id] = session
+        return session
+
+    def close(self, session: ClientSession) -> None:
+        # keys tracked for the session are dropped lazily, when they are next invalidated
+        with self._lock:
+            self._sessions.pop(session.id, None)
+            self._bcast.pop(session.id, None)
+
+    def enable(
+        self, session: ClientSession, redirect: Optional[int], bcast: bool, prefixes: Iterable[str]
+    ) -> Optional[str]:
+        """
+        Returns an error message, or None on success.
+        """
+        prefixes = tuple(prefixes)
+        if prefixes and not bcast:
+            return "PREFIX needs BCAST"
+        with self._lock:
+            target = self._sessions.get(session.id if redirect is None else redirect)
+            if target is None:
+                return f"no client with id {redirect}"
+            if target.push is None:
+                return "the client receiving invalidations cannot be sent pushes"
+            if bcast and redirect is not None:
+                return "BCAST cannot be combined with REDIRECT"
+            session.tracking = True
+            session.bcast = bcast
+            session.prefixes = prefixes or ("",)
+            session.redirect = redirect
+            if bcast:
+                self._bcast[session.id] = session.prefixes
+        return None
+
+    def disable(self, session: ClientSession) -> None:
+        with self._lock:
+            session.tracking = False
+            self._bcast.pop(session.id, None)
+
+    def track(self, session: ClientSession, keys: Iterable[str]) -> None:
+        """
+        Remember that the session's client may now cache these keys.
+        """
+        target = session.id if session.redirect is None else session.redirect
+        with self._lock:
+            table = self._keys
+            for key in keys:
+                ids = table.get(key)
+                if ids is None:
+                    table[key] = {target}
+                else:
+                    ids.add(target)
+            while len(table) > self.max_keys:
+                key = next(iter(table))
+                self._overflow.setdefault(key, set()).update(table.pop(key))
+
+    def invalidate(self, key: str) -> None:
+        with self._pending_lock:
+            self._pending.append(key)
+
+    def invalidate_all(self) -> None:
+        with self._pending_lock:
+            self._pending_all = True
+
+    def flush(self) -> None:
+        """
+        Push one INVALIDATE line per affected session for everything queued so far.
+        """
+        if not self._pending and not self._pending_all and not self._overflow:
+            return
+        with self._pending_lock:
+            keys, self._pending = self._pending, []
+            everything, self._pending_all = self._pending_all, False
+
+        messages: List[Tuple[Callable[[bytes], None], bytes]] = []
+        with self._lock:
+            overflow, self._overflow = self._overflow, {}
+            if everything:
+                table, self._keys = self._keys, {}
+                targets = {i for ids in (*table.values(), *overflow.values()) for i in ids} | set(self._bcast)
+                for i in targets:
+                    session = self._sessions.get(i)
+                    if session is not None:
+                        messages.append((session.push, b"INVALIDATE\n"))
+            else:
+                by_session: Dict[int, Dict[str, None]] = {}
+                for key, ids in overflow.items():
+                    for i in ids:
+                        by_session.setdefault(i, {})[key] = None
+                for key in keys:
+                    ids = self._keys.pop(key, None)
+                    if ids:
+                        for i in ids:
+                            by_session.setdefault(i, {})[key] = None
+                    for i, prefixes in self._bcast.items():
+                        if key.startswith(prefixes):
+                            by_session.setdefault(i, {})[key] = None
+                for i, changed in by_session.items():
+                    session = self._sessions.get(i)
+                    if session is not None:
+                        messages.append((session.push, ("INVALIDATE " + " ".join(changed) + "\n").encode("utf-8")))
+            self.invalidations += len(messages)
+
+        for push, data in messages:
+            push(data)
+
+    def info(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "sessions": len(self._sessions),
+                "tracked_keys": len(self._keys),
+                "bcast_sessions": len(self._bcast),
+                "invalidations": self.invalidations,
+            }
@@ -0,0 +1,322 @@
+"""
+Building blocks for running one node as several worker processes.
+
+Each worker owns a disjoint slice of the node's shards. The shards owned by sibling
+workers are represented by RemoteShard proxies, so a worker's CacheNode routes every
+key of the node as usual and requests for sibling shards are forwarded over a Unix
+socket, using the binary protocol, to the sibling's local node. Atomic updates
+(INCR, APPEND, GETS, CAS) run there too, under the owning shard's lock.
+"""
+
+from __future__ import annotations
+
+import dataclasses
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from .base import Cache, CacheStats, ValueTooLargeError, WrongTypeError, counter_value
+from .cache_node import CacheNode, CacheNodeConfig, parse_seconds
+from .protocol import Opcode, PeerConnection, Status, key_too_long
+from .tracking import ClientSession
+
+
+def parse_stats_line(line: str) -> CacheStats:
+    """
+    Inverse of CacheNode._stats_line: "HITS 1 MISSES 2 ..." -> CacheStats.
+    """
+    parts = line.split()
+    fields = {parts[i].lower(): int(parts[i + 1]) for i in range(0, len(parts) - 1, 2)}
+    return CacheStats(**{k: v for k, v in fields.items() if k in CacheStats.__dataclass_fields__})
+
+
+class RemoteShard(Cache[str, Any]):
+    """
+    A shard that lives in a sibling worker. Values come back as bytes, which
+    CacheNode already handles for both protocols.
+    """
+
+    def __init__(self, shard_id: int, peer: PeerConnection):
+        self.shard_id = shard_id
+        self.peer = peer
+
+    def _check(self, status: int, body: bytes) -> None:
+        if status == Status.ERR:
+            if body == b"value_too_large":
+                raise ValueTooLargeError(f"shard {self.shard_id}: value too large")
+            if body in (b"not_an_integer", b"wrong_type"):
+                raise WrongTypeError(f"shard {self.shard_id}: {body.decode('utf-8')}")
+            raise RuntimeError(f"shard {self.shard_id}: {body.decode('utf-8', errors='replace')}")
+
+    def get(self, key: str) -> Optional[Any]:
+        return self.get_many([key]).get(key)
+
+    def put(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        self.put_many([(key, value, ttl)])
+
+    def delete(self, key: str) -> bool:
+        return self.delete_many([key])[key]
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, Any]:
+        keys = list(keys)
+        replies = self.peer.call([(Opcode.GET, key, b"", None) for key in keys])
+        found: Dict[str, Any] = {}
+        for key, (status, body) in zip(keys, replies):
+            if status == Status.OK:
+                found[key] = body
+            elif status != Status.NOT_FOUND:
+                self._check(status, body)
+        return found
+
+    def put_many(self, items: Iterable[Tuple[str, Any, Optional[float]]]) -> None:
+        replies = self.peer.call([(Opcode.PUT, key, CacheNode._as_bytes(value), ttl) for key, value, ttl in items])
+        for status, body in replies:
+            self._check(status, body)
+
+    def delete_many(self, keys: Iterable[str]) -> Dict[str, bool]:
+        keys = list(keys)
+        replies = self.peer.call([(Opcode.DEL, key, b"", None) for key in keys])
+        removed: Dict[str, bool] = {}
+        for key, (status, body) in zip(keys, replies):
+            self._check(status, body)
+            removed[key] = status == Status.OK
+        return removed
+
+    def _call(self, opcode: int, key: str, value: bytes = b"", ttl: Optional[float] = None) -> Tuple[int, bytes]:
+        [reply] = self.peer.call([(opcode, key, value, ttl)])
+        return reply
+
+    # The sibling applies its own node's encoding (compression) to what it stores, so
+    # encode is not sent along
+
+    def incr(
+        self,
+        key: str,
+        delta: int = 1,
+        initial: Any = None,
+        ttl: Optional[float] = None,
+        encode: Optional[Callable[[Any], Any]] = None,
+    ) -> Optional[int]:
+        args = str(delta) if initial is None else f"{delta} {counter_value(initial)}"
+        status, body = self._call(Opcode.INCR, key, args.encode("ascii"), ttl)
+        if status == Status.NOT_FOUND:
+            return None
+        self._check(status, body)
+        return int(body)
+
+    def append(self, key: str, suffix: Any, encode: Optional[Callable[[Any], Any]] = None) -> bool:
+        status, body = self._call(Opcode.APPEND, key, CacheNode._as_bytes(suffix))
+        if status == Status.NOT_FOUND:
+            return False
+        self._check(status, body)
+        return True
+
+    def gets(self, key: str) -> Optional[Tuple[Any, int]]:
+        status, body = self._call(Opcode.GETS, key)
+        if status == Status.NOT_FOUND:
+            return None
+        self._check(status, body)
+        version, _, value = body.partition(b" ")
+        return value, int(version)
+
+    def cas(self, key: str, value: Any, version: int, ttl: Optional[float] = None) -> Optional[bool]:
+        status, body = self._call(Opcode.CAS, key, b"%d " % version + CacheNode._as_bytes(value), ttl)
+        if status == Status.NOT_FOUND:
+            return None
+        if status == Status.EXISTS:
+            return False
+        self._check(status, body)
+        return True
+
+    def get_entry(self, key: str) -> Optional[Tuple[Any, Optional[float]]]:
+        status, body = self._call(Opcode.GET_ENTRY, key)
+        if status == Status.NOT_FOUND:
+            return None
+        self._check(status, body)
+        expires_at, _, value = body.partition(b" ")
+        return value, float(expires_at) or None
+
+    def get_stats(self) -> CacheStats:
+        [(status, body)] = self.peer.call([(Opcode.STATS, str(self.shard_id), b"", None)])
+        self._check(status, body)
+        return parse_stats_line(body.decode("utf-8"))
+
+    def clear(self) -> None:
+        raise NotImplementedError("RemoteShard cannot be cleared from a sibling worker")
+
+
+class WorkerNode(CacheNode):
+    """
+    Front node of one worker. Requests for sibling shards found in one pipelined
+    batch are sent to each sibling as a single pipeline instead of one round trip
+    per request.
+
+    Forwarded requests only ever share a shard with other forwarded requests, and
+    every other command that may touch a sibling shard (multi-key commands, STATS)
+    first waits for the pending forwards, so each key still sees its requests in order.
+    """
+
+    # Each worker has its own copy of the cluster map, so shards cannot move in this mode
+
+    def _migrate(self, args: List[str]) -> str:
+        return "ERR migration is not supported in multi-worker mode"
+
+    def _set_owner(self, args: List[str]) -> str:
+        return "ERR migration is not supported in multi-worker mode"
+
+    def _import(self, key: str, value: bytes) -> Tuple[int, bytes]:
+        return Status.ERR, b"migration is not supported in multi-worker mode"
+
+    def _client(self, args: List[str], session: Optional[ClientSession]) -> str:
+        # writes to sibling shards are applied, and would be reported, in the sibling
+        if args and args[0].upper() == "TRACKING":
+            return "ERR client tracking is not supported in multi-worker mode"
+        return super()._client(args, session)
+
+    def _forwardable(self, parts: List[str]) -> Optional[Tuple[PeerConnection, Tuple[int, str, bytes, Optional[float]]]]:
+        """
+        Return (peer, request frame) if the command is a well-formed GET/PUT/DEL of a
+        key on a sibling shard, else None. Requests a frame cannot carry are left to
+        handle(), which replies with the error.
+        """
+        cmd = parts[0].upper() if parts else ""
+        if cmd in ("GET", "DEL") and len(parts) == 2:
+            opcode = Opcode.GET if cmd == "GET" else Opcode.DEL
+            value, ttl = b"", None
+        elif cmd == "PUT" and 3 <= len(parts) <= 4:
+            opcode = Opcode.PUT
+            value = parts[2].encode("utf-8")
+            ttl = parse_seconds(parts[3]) if len(parts) == 4 else None
+            if len(parts) == 4 and ttl is None:
+                return None
+        else:
+            return None
+        if key_too_long(parts[1]):
+            return None
+
+        _, shard = self._route(parts[1])
+        if not isinstance(shard, RemoteShard):
+            return None
+        return shard.peer, (opcode, parts[1], value, ttl)
+
+    def _text_reply(self, opcode: int, status: int, body: bytes) -> str:
+        if status == Status.ERR:
+            return f"ERR {body.decode('utf-8', errors='replace')}"
+        if opcode == Opcode.GET:
+            return self._value_reply(body) if status == Status.OK else "NOT_FOUND"
+        if opcode == Opcode.PUT:
+            return "STORED"
+        return "DELETED" if status == Status.OK else "NOT_FOUND"
+
+    def handle_many(self, lines: List[str], session: Optional[ClientSession] = None) -> List[Optional[str]]:
+        replies: List[Optional[str]] = [None] * len(lines)
+        pending: Dict[PeerConnection, List[Tuple[int, Tuple[int, str, bytes, Optional[float]]]]] = {}
+
+        def flush() -> None:
+            for peer, batch in pending.items():
+                results = peer.call([request for _, request in batch])
+                for (idx, request), (status, body) in zip(batch, results):
+                    replies[idx] = self._text_reply(request[0], status, body)
+            pending.clear()
+
+        for idx, line in enumerate(lines):
+            parts = line.split()
+            forward = self._forwardable(parts)
+            if forward is not None:
+                peer, request = forward
+                pending.setdefault(peer, []).append((idx, request))
+                continue
+
+            if parts and parts[0].upper() not in ("GET", "PUT", "DEL"):
+                flush()
+            reply = self.handle(line, session)
+            if reply is None:
+                return replies[:idx + 1]
+            replies[idx] = reply
+
+        flush()
+        return replies
+
+    def handle_frames(
+        self, requests: List[Tuple[int, str, bytes, Optional[float]]]
+    ) -> List[Optional[Tuple[int, bytes]]]:
+        replies: List[Optional[Tuple[int, bytes]]] = [None] * len(requests)
+        pending: Dict[PeerConnection, List[Tuple[int, Tuple[int, str, bytes, Optional[float]]]]] = {}
+
+        def flush() -> None:
+            for peer, batch in pending.items():
+                results = peer.call([request for _, request in batch])
+                for (idx, _), result in zip(batch, results):
+                    replies[idx] = result
+            pending.clear()
+
+        for idx, request in enumerate(requests):
+            opcode, key = request[0], request[1]
+            if opcode in (Opcode.GET, Opcode.PUT, Opcode.DEL):
+                _, shard = self._route(key)
+                if isinstance(shard, RemoteShard):
+                    pending.setdefault(shard.peer, []).append((idx, request))
+                    continue
+            else:
+                flush()
+
+            reply = self.handle_frame(*request)
+            if reply is None:
+                return replies[:idx + 1]
+            replies[idx] = reply
+
+        flush()
+        return replies
+
+
+def split_shards(owned_shards: Iterable[int], n_workers: int) -> List[List[int]]:
+    """
+    Deal the owned shards round-robin across n_workers workers.
+    """
+    shards = sorted(owned_shards)
+    if not 1 <= n_workers <= len(shards):
+        raise ValueError(f"workers must be in [1, {len(shards)}] (the number of owned shards)")
+    return [shards[i::n_workers] for i in range(n_workers)]
+
+
+def _share(total: Optional[int], shards: List[int], owned: List[int]) -> Optional[int]:
+    """
+    The part of total that CacheFactory.create_local_shards would give these shards.
+    """
+    if total is None:
+        return None
+    n = len(owned)
+    base, rem = divmod(total, n)
+    return sum(base + (1 if owned.index(sid) < rem else 0) for sid in shards)
+
+
+def build_worker_nodes(
+    cfg: CacheNodeConfig,
+    slices: List[List[int]],
+    index: int,
+    peer_paths: List[str],
+) -> Tuple[CacheNode, CacheNode]:
+    """
+    Return (local, front) for worker `index`.
+
+    local owns only this worker's slice and serves sibling workers; it runs the
+    background expiry thread. front owns every shard of the node, with RemoteShard
+    proxies for the sibling slices, and serves clients.
+    """
+    owned = sorted(cfg.owned_shards)
+    mine = slices[index]
+    local = CacheNode(dataclasses.replace(
+        cfg,
+        owned_shards=set(mine),
+        capacity=_share(cfg.capacity, mine, owned),
+        max_bytes=_share(cfg.max_bytes, mine, owned),
+    ))
+
+    shards: Dict[int, Cache[str, Any]] = dict(local.local_shards)
+    for peer_index, peer_slice in enumerate(slices):
+        if peer_index == index:
+            continue
+        peer = PeerConnection(peer_paths[peer_index])
+        for sid in peer_slice:
+            shards[sid] = RemoteShard(sid, peer)
+
+    front = WorkerNode(dataclasses.replace(cfg, expire_interval=None), shards=shards)
+    return local, front
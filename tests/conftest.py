@@ -1,8 +1,191 @@
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+
 import pytest
 from cache.factory import CacheFactory
 from cache.lru import LRUCache
 from cache.eviction import EvictionPolicy
+from cache.cache_node import CacheNode, CacheNodeConfig
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
 
 @pytest.fixture
 def small_cache() -> LRUCache[str, int]:
-    return CacheFactory.create_local_cache(capacity=3, policy=EvictionPolicy.LRU)
\ No newline at end of file
+    return CacheFactory.create_local_cache(capacity=3, policy=EvictionPolicy.LRU)
+
+@pytest.fixture
+def node() -> CacheNode:
+    cfg = CacheNodeConfig(
+        node_id="test-node",
+        host="127.0.0.1",
+        port=9000,
+        n_shards=4,
+        owned_shards={0, 1},
+        cluster_map={
+            0: ("127.0.0.1", 9000),
+            1: ("127.0.0.1", 9000),
+            2: ("127.0.0.1", 9001),
+            3: ("127.0.0.1", 9001),
+        },
+        capacity=100,
+    )
+    return CacheNode(cfg)
+
+
+@pytest.fixture
+def owned_key(node):
+    """Return a function producing distinct keys that hash to shards owned by `node`."""
+    def make(prefix: str = "k", owned: bool = True):
+        i = 0
+        while True:
+            key = f"{prefix}{i}"
+            if (node.shard_id(key) in node.cfg.owned_shards) == owned:
+                yield key
+            i += 1
+    return make
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_node(cluster_path, node_path, *extra_args) -> subprocess.Popen:
+    """Start `python -m cache.server` and wait until it accepts connections."""
+    with open(node_path) as f:
+        node_json = json.load(f)
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "cache.server",
+         "--cluster-config", str(cluster_path), "--node-config", str(node_path), *extra_args],
+        cwd=REPO_ROOT,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+    )
+    deadline = time.time() + 10
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"node exited: {proc.stderr.read().decode()}")
+        try:
+            socket.create_connection((node_json["host"], node_json["port"]), timeout=0.2).close()
+            return proc
+        except OSError:
+            time.sleep(0.05)
+    proc.kill()
+    raise RuntimeError(f"node {node_path} did not start")
+
+
+def stop_node(proc: subprocess.Popen) -> None:
+    proc.terminate()
+    try:
+        proc.wait(timeout=5)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+        proc.wait()
+    if proc.stderr is not None:
+        proc.stderr.close()
+
+
+def write_cluster_configs(config_dir, n_nodes: int = 2, shards_per_node: int = 2, **node_options):
+    """
+    Write cluster.json and one node<port>.json per node, mirroring cache/configs/.
+    Returns (cluster_path, [node_path, ...]).
+    """
+    ports = [free_port() for _ in range(n_nodes)]
+    cluster_map = {}
+    node_paths = []
+    for i, port in enumerate(ports):
+        owned = list(range(i * shards_per_node, (i + 1) * shards_per_node))
+        for sid in owned:
+            cluster_map[str(sid)] = ["127.0.0.1", port]
+        node_path = config_dir / f"node{port}.json"
+        node_path.write_text(json.dumps({
+            "host": "127.0.0.1",
+            "port": port,
+            "owned_shards": owned,
+            "capacity": 1000,
+            "policy": "LRU",
+            **node_options,
+        }))
+        node_paths.append(node_path)
+
+    cluster_path = config_dir / "cluster.json"
+    cluster_path.write_text(json.dumps({"n_shards": n_nodes * shards_per_node, "cluster_map": cluster_map}))
+    return cluster_path, node_paths
+
+
+def write_replicated_configs(config_dir, n_replicas: int, n_shards: int = 4, **node_options):
+    """
+    Write configs for one node owning every shard plus n_replicas nodes replicating
+    all of them. Returns (cluster_path, primary_path, [replica_path, ...]).
+    """
+    primary_port, *replica_ports = [free_port() for _ in range(1 + n_replicas)]
+    shards = list(range(n_shards))
+    cluster_path = config_dir / "cluster.json"
+    cluster_path.write_text(json.dumps({
+        "n_shards": n_shards,
+        "cluster_map": {str(s): ["127.0.0.1", primary_port] for s in shards},
+        "replicas": {str(s): [["127.0.0.1", p] for p in replica_ports] for s in shards},
+    }))
+
+    def node_config(port, owned, replicated):
+        path = config_dir / f"node{port}.json"
+        path.write_text(json.dumps({
+            "host": "127.0.0.1",
+            "port": port,
+            "owned_shards": owned,
+            "replica_shards": replicated,
+            "capacity": 10_000,
+            **node_options,
+        }))
+        return path
+
+    primary_path = node_config(primary_port, shards, [])
+    return cluster_path, primary_path, [node_config(p, [], shards) for p in replica_ports]
+
+
+@pytest.fixture
+def local_cluster(tmp_path):
+    """Two `cache.server` processes on free ports. Yields the cluster config path."""
+    cluster_path, node_paths = write_cluster_configs(tmp_path)
+    procs = []
+    try:
+        for node_path in node_paths:
+            procs.append(start_node(cluster_path, node_path))
+        yield cluster_path
+    finally:
+        for proc in procs:
+            stop_node(proc)
+
+
+@pytest.fixture
+def replicated_cluster(tmp_path):
+    """
+    A primary owning 4 shards and 2 replicas of all of them, as `cache.server`
+    processes. Yields (cluster_path, [primary proc, replica procs...]).
+    """
+    cluster_path, primary_path, replica_paths = write_replicated_configs(tmp_path, n_replicas=2)
+    procs = []
+    try:
+        for node_path in [*replica_paths, primary_path]:
+            procs.append(start_node(cluster_path, node_path))
+        yield cluster_path, [procs[-1], *procs[:-1]]
+    finally:
+        for proc in procs:
+            stop_node(proc)
+
+
+@pytest.fixture
+def worker_node(tmp_path):
+    """One `cache.server` process owning 4 shards, split across 2 workers. Yields the cluster config path."""
+    cluster_path, [node_path] = write_cluster_configs(tmp_path, n_nodes=1, shards_per_node=4)
+    proc = start_node(cluster_path, node_path, "--workers", "2")
+    try:
+        yield cluster_path
+    finally:
+        stop_node(proc)
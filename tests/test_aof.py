@@ -0,0 +1,162 @@
+import dataclasses
+import os
+import time
+
+import pytest
+
+from cache.aof import AppendOnlyLog, replay_log
+from cache.cache_node import CacheNode
+from cache.client import CacheClient
+from cache.compression import Compressed
+from cache.lru import LRUCache
+from cache.snapshot import load_snapshot, write_snapshot
+from tests.conftest import start_node, write_cluster_configs
+
+
+def test_replay_applies_records_in_order(tmp_path):
+    path = str(tmp_path / "node.aof")
+    log = AppendOnlyLog(path, fsync="never")
+    log.append_put("a", "1", None)
+    log.append_put("raw", b"\x00\xff", None)
+    log.append_del("a")
+    log.append_put("a", "2", time.time() + 60)
+    log.append_put("gone", "x", None)
+    log.append_del("gone")
+    log.append_put("dead", "d", time.time() - 1)
+    log.close()
+
+    shard = LRUCache(capacity=10)
+    assert replay_log(path, {0: shard}, shard_of=lambda k: 0) == 7
+    assert sorted(shard.cache) == ["a", "raw"]
+    assert shard.get("a") == "2"
+    assert shard.get("raw") == b"\x00\xff"
+    assert 59 < shard.cache["a"].expiration_time - time.time() <= 60
+
+
+def test_torn_record_is_ignored_and_truncated_on_open(tmp_path):
+    path = tmp_path / "node.aof"
+    log = AppendOnlyLog(str(path), fsync="always")
+    log.append_put("k1", "v1", None)
+    log.append_put("k2", "v2", None)
+    log.commit()
+    log.close()
+    whole = path.stat().st_size
+    path.write_bytes(path.read_bytes()[:-1])
+
+    shard = LRUCache(capacity=10)
+    assert replay_log(str(path), {0: shard}, shard_of=lambda k: 0) == 1
+    assert sorted(shard.cache) == ["k1"]
+
+    AppendOnlyLog(str(path), fsync="never").close()
+    assert 0 < path.stat().st_size < whole - 1
+
+
+def test_node_writes_are_logged_once_per_batch_and_replayed(tmp_path, node, owned_key):
+    keys = [k for k, _ in zip(owned_key(), range(4))]
+    cfg = dataclasses.replace(node.cfg, aof_path=str(tmp_path / "node.aof"), aof_fsync="always")
+    writer = CacheNode(cfg)
+    writer.handle_many([f"PUT {keys[0]} a", f"MSET {keys[1]} b {keys[2]} c EX 60", f"DEL {keys[0]}"])
+    writer.handle(f"MDEL {keys[1]}")
+    writer.handle_frame(2, keys[3], b"\x01", None)
+    writer.handle(f"DEL {keys[0]}")  # not found: nothing to log
+    writer.close()
+
+    reader = CacheNode(cfg)
+    assert reader.replay_log() == 6
+    assert reader.handle(f"MGET {' '.join(keys)}").splitlines()[1:] == [
+        "NOT_FOUND", "NOT_FOUND", "VALUE c", "VALUE \x01",
+    ]
+    reader.close()
+
+
+def test_snapshot_compacts_the_log(tmp_path, node, owned_key):
+    keys = [k for k, _ in zip(owned_key(), range(3))]
+    cfg = dataclasses.replace(
+        node.cfg, snapshot_path=str(tmp_path / "node.snap"), aof_path=str(tmp_path / "node.aof"), aof_fsync="never",
+    )
+    writer = CacheNode(cfg)
+    writer.handle(f"PUT {keys[0]} a")
+    writer.handle(f"PUT {keys[1]} b")
+    assert writer.save_snapshot() == 2
+    assert os.path.getsize(cfg.aof_path) == 0
+    assert not os.path.exists(f"{cfg.aof_path}.old")
+    writer.handle(f"DEL {keys[0]}")
+    writer.handle(f"PUT {keys[2]} c")
+    writer.close()
+
+    reader = CacheNode(cfg)
+    reader.load_snapshot()
+    assert reader.replay_log() == 2
+    assert reader.handle(f"MGET {' '.join(keys)}").splitlines()[1:] == ["NOT_FOUND", "VALUE b", "VALUE c"]
+    reader.close()
+
+
+def test_rejects_unknown_fsync_policy(tmp_path, node):
+    with pytest.raises(ValueError):
+        CacheNode(dataclasses.replace(node.cfg, aof_path=str(tmp_path / "node.aof"), aof_fsync="sometimes"))
+
+
+def test_killed_node_recovers_acknowledged_writes(tmp_path):
+    cluster_path, [node_path] = write_cluster_configs(
+        tmp_path, n_nodes=1, aof_path=str(tmp_path / "node.aof"), aof_fsync="always",
+    )
+    proc = start_node(cluster_path, node_path)
+    try:
+        with CacheClient.from_config(str(cluster_path)) as client:
+            client.mset([(f"k{i}", f"v{i}", None) for i in range(50)])
+            client.delete("k0")
+    finally:
+        proc.kill()  # no shutdown path runs
+        proc.wait()
+        proc.stderr.close()
+
+    proc = start_node(cluster_path, node_path)
+    try:
+        with CacheClient.from_config(str(cluster_path)) as client:
+            assert client.mget(f"k{i}" for i in range(50)) == {f"k{i}": f"v{i}" for i in range(1, 50)}
+    finally:
+        proc.kill()
+        proc.wait()
+        proc.stderr.close()
+
+
+def test_compressed_values_stay_compressed_through_log_and_snapshot(tmp_path, node, owned_key):
+    key = next(owned_key())
+    text = "0123456789" * 100
+    cfg = dataclasses.replace(
+        node.cfg, aof_path=str(tmp_path / "node.aof"), snapshot_path=str(tmp_path / "node.snap"), compress_threshold=64
+    )
+    writer = CacheNode(cfg)
+    writer.handle(f"PUT {key} {text}")
+    writer.close()
+    assert os.path.getsize(cfg.aof_path) < len(text)
+
+    reader = CacheNode(dataclasses.replace(cfg, compress_threshold=None))
+    assert reader.replay_log() == 1
+    assert type(reader.local_shards[reader.shard_id(key)].get(key)) is Compressed
+    assert reader.handle(f"GET {key}") == f"VALUE {text}"
+    write_snapshot(cfg.snapshot_path, reader.local_shards, cfg.n_shards)
+    reader.close()
+
+    restored = {sid: LRUCache(capacity=10) for sid in node.local_shards}
+    assert load_snapshot(cfg.snapshot_path, restored, cfg.n_shards, node.shard_id) == 1
+    assert restored[node.shard_id(key)].get(key).decompress() == text
+
+
+def test_atomic_updates_log_the_entry_they_leave(tmp_path, node, owned_key):
+    keys = owned_key()
+    counter, text, swapped = next(keys), next(keys), next(keys)
+    cfg = dataclasses.replace(node.cfg, aof_path=str(tmp_path / "node.aof"))
+    writer = CacheNode(cfg)
+    writer.handle_many([f"INCR {counter} 1 5 60", f"INCR {counter} 2", f"PUT {text} ab", f"APPEND {text} cd"])
+    writer.handle_many([f"PUT {swapped} a", f"CAS {swapped} b 0", f"INCR {text}"])  # wrong version, wrong type
+    version = writer.handle(f"GETS {swapped}").split()[-1]
+    writer.handle(f"CAS {swapped} b {version}")
+    writer.close()
+
+    reader = CacheNode(cfg)
+    assert reader.replay_log() == 6
+    assert reader.handle(f"MGET {counter} {text} {swapped}").splitlines()[1:] == ["VALUE 7", "VALUE abcd", "VALUE b"]
+    expires_at = reader.local_shards[reader.shard_id(counter)].get_entry(counter)[1]
+    assert expires_at is not None and expires_at > time.time() + 50
+    reader.close()
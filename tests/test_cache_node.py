@@ -0,0 +1,269 @@
+import dataclasses
+import random
+import time
+import zlib
+
+from cache.cache_node import CacheNode
+from cache.compression import Compressed
+from cache.eviction import EvictionPolicy
+from cache.protocol import Opcode, Status
+
+
+def test_mget_returns_one_reply_per_key_in_request_order(node, owned_key):
+    a, b = next(owned_key("a")), next(owned_key("b"))
+    remote = next(owned_key("r", owned=False))
+    node.handle(f"PUT {a} 1")
+
+    reply = node.handle(f"MGET {a} {remote} {b}").split("\n")
+
+    sid = node.shard_id(remote)
+    host, port = node.cfg.cluster_map[sid]
+    assert reply == ["MULTI 3", "VALUE 1", f"MOVED {sid} {host}:{port}", "NOT_FOUND"]
+
+
+def test_mset_stores_owned_keys_with_optional_ttl(node, owned_key):
+    a, b = next(owned_key("a")), next(owned_key("b"))
+    remote = next(owned_key("r", owned=False))
+
+    reply = node.handle(f"MSET {a} 1 EX 100 {remote} 2 {b} 3").split("\n")
+
+    assert reply[0] == "MULTI 3"
+    assert reply[1] == "STORED"
+    assert reply[2].startswith("MOVED ")
+    assert reply[3] == "STORED"
+    assert node.handle(f"GET {a}") == "VALUE 1"
+    assert node.handle(f"GET {b}") == "VALUE 3"
+
+
+def test_mset_rejects_malformed_arguments(node):
+    assert node.handle("MSET a").startswith("ERR usage")
+    assert node.handle("MSET a 1 b").startswith("ERR usage")
+    assert node.handle("MSET a 1 EX soon") == "ERR ttl must be a positive number"
+    reserved = "ERR EX is reserved in MSET and cannot be a key; use PUT"
+    assert node.handle("MSET EX 1") == reserved
+    assert node.handle("MSET a 1 EX 5 ex 2") == reserved
+    assert node.handle("MSET a 1 Ex").startswith("ERR usage")  # a ttl marker without its ttl
+
+
+def test_mdel_reports_per_key_result(node, owned_key):
+    a, b = next(owned_key("a")), next(owned_key("b"))
+    node.handle(f"PUT {a} 1")
+
+    assert node.handle(f"MDEL {a} {b}").split("\n") == ["MULTI 2", "DELETED", "NOT_FOUND"]
+    assert node.handle(f"GET {a}") == "NOT_FOUND"
+
+
+def test_multi_key_commands_take_one_shard_lock_per_group(node, owned_key):
+    keys = [k for k, _ in zip(owned_key("k"), range(20))]
+    calls = []
+    for sid, shard in node.local_shards.items():
+        original = shard.get_many
+        shard.get_many = lambda group, sid=sid, original=original: calls.append(sid) or original(group)
+
+    node.handle("MGET " + " ".join(keys))
+
+    assert sorted(calls) == sorted({node.shard_id(k) for k in keys})
+
+
+def test_background_sweep_expires_unread_keys(node, owned_key):
+    cfg = dataclasses.replace(node.cfg, expire_interval=0.01)
+    swept = CacheNode(cfg)
+    try:
+        keys = [k for k, _ in zip(owned_key("s"), range(10))]
+        for key in keys:
+            swept.handle(f"PUT {key} v 0.01")
+
+        deadline = time.time() + 2
+        while time.time() < deadline and any(len(s.cache) for s in swept.local_shards.values()):
+            time.sleep(0.01)
+
+        assert all(len(s.cache) == 0 for s in swept.local_shards.values())
+        assert "EXPIRED 10" in swept.handle("STATS")
+    finally:
+        swept.close()
+
+
+def test_ttls_must_be_finite_and_positive(node, owned_key):
+    key = next(owned_key())
+    for bad in ("nan", "inf", "-1", "0"):
+        for command in (
+            f"PUT {key} v {bad}",
+            f"MSET {key} v EX {bad}",
+            f"INCR {key} 1 0 {bad}",
+            f"CAS {key} v 1 {bad}",
+        ):
+            assert node.handle(command) == "ERR ttl must be a positive number"
+        assert node.handle(f"PUT {key} v 10 {bad}") == "ERR grace must be a positive number"
+    assert node.handle(f"GET {key}") == "NOT_FOUND"
+
+    node.handle(f"PUT {key} v 0.01")
+    time.sleep(0.02)
+    assert sum(shard.expire() for shard in node.local_shards.values()) == 1
+
+
+def test_keys_too_long_to_log_are_rejected_before_any_write(node, owned_key):
+    long_key = "\u00e9" * 40000  # 80000 bytes in UTF-8
+    fits = next(owned_key("k" * 65530))
+    for command in (
+        f"PUT {long_key} v",
+        f"INCR {long_key} 1 0",
+        f"APPEND {long_key} v",
+        f"CAS {long_key} v 1",
+        f"GET {long_key}",
+        f"MGET {fits} {long_key}",
+        f"MDEL {long_key}",
+        f"MSET {fits} v {long_key} v",
+    ):
+        assert node.handle(command) == "ERR key_too_long"
+    assert all(len(shard.cache) == 0 for shard in node.local_shards.values())
+
+    assert node.handle(f"PUT {fits} v") == "STORED"
+
+
+def test_node_byte_budget_and_entry_limit(node, owned_key):
+    cfg = dataclasses.replace(node.cfg, max_bytes=1000, max_entry_bytes=64)
+    sized = CacheNode(cfg)
+    a, b = next(owned_key("a")), next(owned_key("b"))
+
+    assert sized.handle(f"PUT {a} {'x' * 10}") == "STORED"
+    assert sized.handle(f"PUT {b} {'x' * 100}") == "ERR value_too_large"
+    assert sized.handle(f"MSET {b} {'x' * 100}").split("\n")[1] == "ERR value_too_large"
+    assert f"BYTES_USED {len(a) + 10}" in sized.handle("STATS")
+
+
+def test_getl_tells_one_client_to_fill(node, owned_key):
+    keys = owned_key()
+    a, b = next(keys), next(keys)
+    remote = next(owned_key("r", owned=False))
+    assert node.handle(f"GETL {a}") == "FILL"
+    wait = node.handle(f"GETL {a}").split()
+    assert wait[0] == "WAIT" and 0 < int(wait[1]) <= 20
+    node.handle(f"PUT {a} v")
+    assert node.handle(f"GETL {a}") == "VALUE v"
+
+    # a DEL gives the lease up, and an unfilled lease runs out
+    assert node.handle(f"GETL {b} 50") == "FILL"
+    node.handle(f"DEL {b}")
+    assert node.handle(f"GETL {b} 50") == "FILL"
+    assert node.handle(f"GETL {b}").startswith("WAIT")
+    time.sleep(0.06)
+    assert node.handle(f"GETL {b}") == "FILL"
+
+    assert node.handle(f"GETL {remote}").startswith("MOVED")
+    assert node.handle(f"GETL {a} 0") == "ERR lease_ms must be a positive integer"
+
+
+def test_stale_values_are_marked_and_one_reader_refreshes(node, owned_key):
+    key = next(owned_key())
+    node.handle(f"PUT {key} old 0.05 10")
+    assert node.handle(f"GET {key}") == "VALUE old"
+    time.sleep(0.06)
+    assert node.handle(f"GET {key}") == "VALUE old REFRESH"
+    assert node.handle(f"GETL {key}") == "VALUE old STALE"
+    node.handle(f"PUT {key} new 60 10")
+    assert node.handle(f"GET {key}") == "VALUE new"
+    assert node.handle(f"PUT {key} v 1 x") == "ERR grace must be a positive number"
+
+    node = CacheNode(dataclasses.replace(node.cfg, xfetch_beta=1.0))
+    node.local_shards[node.shard_id(key)].put_with_grace(key, "v", 60, 10, delta=1e6)
+    assert node.handle(f"GET {key}") == "VALUE v REFRESH"
+
+
+def test_large_values_are_stored_compressed(node, owned_key):
+    keys = owned_key()
+    big, small, noise, raw = next(keys), next(keys), next(keys), next(keys)
+    node = CacheNode(dataclasses.replace(node.cfg, compress_threshold=100))
+    text = "abcdefgh" * 200
+    random_bytes = random.Random(1).randbytes(200)
+    node.handle_many([f"PUT {big} {text}", f"MSET {small} tiny"])
+    node.handle_frames([(Opcode.PUT, raw, text.encode() * 2, None), (Opcode.PUT, noise, random_bytes, None)])
+
+    shard = node.local_shards[node.shard_id(big)]
+    assert type(shard.get(big)) is Compressed
+    assert shard.get_stats().bytes_used < len(text)
+    assert node.handle(f"GET {big}") == f"VALUE {text}"
+    assert node.handle(f"MGET {small} {big}").split("\n")[1:] == ["VALUE tiny", f"VALUE {text}"]
+    assert node.handle_frames([(Opcode.GET, noise, b"", None)]) == [(Status.OK, random_bytes)]
+    assert node.handle_frames([(Opcode.GET, raw, b"", None)]) == [(Status.OK, text.encode() * 2)]
+    [(status, body)] = node.handle_frames([(Opcode.GET | Opcode.ACCEPT_COMPRESSED, raw, b"", None)])
+    assert status == Status.COMPRESSED and zlib.decompress(body) == text.encode() * 2
+    [(status, body)] = node.handle_frames([(Opcode.PUT | Opcode.ACCEPT_COMPRESSED, raw, b"x", None)])
+    assert (status, body) == (Status.ERR, b"unknown_opcode 66")
+
+    fields = node.handle("STATS").split()
+    stat = lambda name: fields[fields.index(name) + 1]
+    assert (stat("COMPRESSED"), stat("COMPRESS_SKIPPED"), stat("DECOMPRESSED")) == ("2", "1", "3")
+    assert float(stat("COMPRESS_RATIO")) > 10
+    assert "compress_ratio" in node.handle("INFO stats")
+
+    # atomic updates store their results compressed too
+    node.handle(f"PUT {small} tiny")
+    assert node.handle(f"APPEND {small} {text}") == "STORED"
+    assert type(node.local_shards[node.shard_id(small)].get(small)) is Compressed
+    assert node.handle(f"GET {small}") == f"VALUE tiny{text}"
+    counter = next(keys)
+    node.handle(f"PUT {counter} {'1' * 150}")
+    assert node.handle(f"INCR {counter}") == f"VALUE {'1' * 149}2"
+    assert type(node.local_shards[node.shard_id(counter)].get(counter)) is Compressed
+
+
+def test_counters_append_and_cas(node, owned_key):
+    keys = owned_key()
+    counter, text = next(keys), next(keys)
+    remote = next(owned_key("r", owned=False))
+    assert node.handle(f"INCR {counter}") == "NOT_FOUND"
+    assert node.handle(f"INCR {counter} 1 1 60") == "VALUE 1"
+    assert node.handle_many([f"INCR {counter}", f"INCR {counter} 10", f"DECR {counter} 20"]) == [
+        "VALUE 2", "VALUE 12", "VALUE -8",
+    ]
+    assert node.handle(f"GET {counter}") == "VALUE -8"
+    assert node.handle(f"INCR {remote}").startswith("MOVED")
+    assert node.handle(f"INCR {counter} x") == "ERR delta and initial must be integers"
+
+    node.handle(f"PUT {text} ab")
+    assert node.handle(f"APPEND {text} cd") == "STORED"
+    assert node.handle(f"APPEND {remote} y").startswith("MOVED")
+    assert node.handle(f"INCR {text}") == "ERR not_an_integer"
+
+    value, version = node.handle(f"GETS {text}").split()[1::2]
+    assert value == "abcd"
+    assert node.handle(f"CAS {text} new {version}") == "STORED"
+    assert node.handle(f"CAS {text} newer {version}") == "EXISTS"
+    assert node.handle(f"GET {text}") == "VALUE new"
+    node.handle(f"DEL {text}")
+    assert node.handle(f"CAS {text} v {version}") == "NOT_FOUND"
+    assert node.handle(f"APPEND {text} x") == "NOT_FOUND"
+    assert node.handle(f"GETS {text}") == "NOT_FOUND"
+
+    lfu = CacheNode(dataclasses.replace(node.cfg, policy=EvictionPolicy.LFU))
+    assert lfu.handle(f"INCR {counter} 1 0") == "VALUE 0"
+    assert lfu.handle(f"INCR {counter}") == "VALUE 1"
+
+
+def test_atomic_update_frames(node, owned_key):
+    counter, text = next(owned_key("c")), next(owned_key("t"))
+    remote = next(owned_key("r", owned=False))
+    frame = node.handle_frame
+
+    assert frame(Opcode.INCR, counter, b"1", None) == (Status.NOT_FOUND, b"")
+    assert frame(Opcode.INCR, counter, b"1 5", 60.0) == (Status.OK, b"5")
+    assert frame(Opcode.INCR, counter, b"-7", None) == (Status.OK, b"-2")
+    assert frame(Opcode.INCR, counter, b"x", None)[0] == Status.ERR
+    assert frame(Opcode.INCR, remote, b"1", None)[0] == Status.MOVED
+
+    node.handle_frame(Opcode.PUT, text, b"a\nb", None)
+    assert frame(Opcode.APPEND, text, b"\x00", None) == (Status.OK, b"")
+    assert frame(Opcode.INCR, text, b"1", None) == (Status.ERR, b"not_an_integer")
+    version, _, value = frame(Opcode.GETS, text, b"", None)[1].partition(b" ")
+    assert value == b"a\nb\x00"
+    assert frame(Opcode.CAS, text, version + b" new", None) == (Status.OK, b"")
+    assert frame(Opcode.CAS, text, version + b" newer", None) == (Status.EXISTS, b"")
+    assert frame(Opcode.GET, text, b"", None) == (Status.OK, b"new")
+
+    expires_at, _, value = frame(Opcode.GET_ENTRY, counter, b"", None)[1].partition(b" ")
+    assert value == b"-2" and 0 < float(expires_at) - time.time() <= 60
+    assert frame(Opcode.GET_ENTRY, text, b"", None) == (Status.OK, b"0.0 new")
+    node.handle_frame(Opcode.DEL, text, b"", None)
+    for opcode in (Opcode.APPEND, Opcode.GETS, Opcode.GET_ENTRY):
+        assert frame(opcode, text, b"x", None) == (Status.NOT_FOUND, b"")
+    assert frame(Opcode.CAS, text, version + b" v", None) == (Status.NOT_FOUND, b"")
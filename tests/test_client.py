@@ -0,0 +1,147 @@
+import json
+import threading
+import time
+
+import pytest
+
+from cache.client import CacheClient, CacheClientError
+
+
+def test_client_routes_keys_to_owning_nodes(local_cluster):
+    with CacheClient.from_config(str(local_cluster)) as client:
+        keys = [f"user:{i}" for i in range(50)]
+        for i, key in enumerate(keys):
+            client.put(key, str(i))
+
+        assert [client.get(k) for k in keys] == [str(i) for i in range(50)]
+        assert client.delete(keys[0]) is True
+        assert client.get(keys[0]) is None
+        assert client.delete(keys[0]) is False
+
+        # both nodes received a share of the writes
+        stats = client.stats()
+        assert len(stats) == 2
+        assert all(int(line.split()[line.split().index("PUTS") + 1]) > 0 for line in stats.values())
+
+
+def test_client_follows_moved_and_updates_routing_table(local_cluster):
+    cluster_json = json.loads(local_cluster.read_text())
+    # Point every shard at node 0; shards owned by node 1 will answer MOVED
+    first = cluster_json["cluster_map"]["0"]
+    stale = dict(cluster_json, cluster_map={sid: first for sid in cluster_json["cluster_map"]})
+
+    with CacheClient(stale) as client:
+        key = next(k for k in (f"k{i}" for i in range(1000)) if client.shard_id(k) in (2, 3))
+        client.put(key, "v")
+        assert client.get(key) == "v"
+        assert client.cluster_map[client.shard_id(key)] != tuple(first)
+
+
+def test_client_multi_key_calls_span_nodes(local_cluster):
+    with CacheClient.from_config(str(local_cluster)) as client:
+        keys = [f"page:{i}" for i in range(40)]
+        client.mset([(k, f"v{i}", None if i % 2 else 60.0) for i, k in enumerate(keys)])
+
+        assert client.mget(keys + ["missing"]) == {k: f"v{i}" for i, k in enumerate(keys)}
+        assert len({client.address_for(k) for k in keys}) == 2
+
+        removed = client.mdel(keys[:5] + ["missing"])
+        assert removed == {**{k: True for k in keys[:5]}, "missing": False}
+
+
+def test_client_pool_is_thread_safe(local_cluster):
+    errors = []
+
+    with CacheClient.from_config(str(local_cluster), pool_size=4) as client:
+        def worker(t):
+            try:
+                for i in range(100):
+                    key = f"t{t}:{i}"
+                    client.put(key, str(i))
+                    assert client.get(key) == str(i)
+            except Exception as e:  # pragma: no cover - reported below
+                errors.append(e)
+
+        threads = [threading.Thread(target=worker, args=(t,)) for t in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+    assert errors == []
+
+
+def test_concurrent_counters_and_cas_lose_no_updates(local_cluster):
+    with CacheClient.from_config(str(local_cluster), pool_size=8) as client:
+        assert client.incr("hits") is None
+        assert client.incr("hits", initial=0, ttl=60) == 0
+        client.put("doc", "0")
+
+        def worker():
+            for _ in range(50):
+                client.incr("hits")
+                while True:
+                    value, version = client.gets("doc")
+                    if client.cas("doc", str(int(value) + 1), version):
+                        break
+
+        threads = [threading.Thread(target=worker) for _ in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        assert client.get("hits") == "200"
+        assert client.decr("hits", 50) == 150
+        assert client.get("doc") == "200"
+        assert client.append("doc", "x") and client.get("doc") == "200x"
+        assert client.append("missing", "x") is False
+        assert client.cas("missing", "v", 1) is None
+        with pytest.raises(CacheClientError):
+            client.incr("doc")
+        with pytest.raises(ValueError):
+            client.incr("hits", ttl=5)
+
+
+def test_get_or_load_fills_each_key_once(local_cluster):
+    calls = []
+
+    def loader(key):
+        calls.append(key)
+        time.sleep(0.1)
+        return None if key == "absent" else f"v{key}"
+
+    with CacheClient.from_config(str(local_cluster), pool_size=16) as client:
+        results = []
+        threads = [
+            threading.Thread(target=lambda key=key: results.append(client.get_or_load(key, loader)))
+            for key in ("hot", "absent") for _ in range(10)
+        ]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert sorted(results, key=str) == [None] * 10 + ["vhot"] * 10
+        assert calls.count("hot") == 1
+        assert client.get("hot") == "vhot"
+        # None is not stored: each waiter takes its turn at filling once the last one gives up
+        assert calls.count("absent") == 10
+
+
+def test_client_reads_stale_values(local_cluster):
+    with CacheClient.from_config(str(local_cluster)) as client:
+        client.put("k", "old", ttl=0.05, grace=10)
+        time.sleep(0.06)
+        assert client.get_with_state("k") == ("old", "REFRESH")
+        assert client.get("k") == "old"
+        assert client.get_or_load("k", lambda key: "new", ttl=60) == "old"  # not told to refresh
+        with pytest.raises(ValueError):
+            client.put("k", "v", grace=1)
+
+
+def test_client_rejects_values_the_text_protocol_cannot_carry(local_cluster):
+    with CacheClient.from_config(str(local_cluster)) as client:
+        with pytest.raises(ValueError):
+            client.put("k", "has space")
+        with pytest.raises(CacheClientError):
+            client._single("k", "PUT k v not-a-ttl")
@@ -0,0 +1,42 @@
+from cache.compact_lru import CompactLRUCache
+
+
+def test_eviction_order_matches_lru():
+    cache = CompactLRUCache(capacity=3)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    cache.put("c", 3)
+    assert cache.get("a") == 1
+
+    cache.put("d", 4)
+
+    assert cache.get("b") is None
+    assert [cache.get(k) for k in "acd"] == [1, 3, 4]
+
+
+def test_slots_are_recycled_through_the_free_list():
+    cache = CompactLRUCache(capacity=4)
+    for round_ in range(3):
+        for i in range(4):
+            cache.put(f"k{i}", round_)
+        for i in range(4):
+            assert cache.delete(f"k{i}")
+
+    assert cache.cache == {}
+    assert sorted(_free_slots(cache)) == [1, 2, 3, 4]
+
+
+def test_expired_lru_entry_counts_as_expired_not_evicted():
+    cache = CompactLRUCache(capacity=1)
+    cache.put("a", 1, ttl=-1)
+    cache.put("b", 2)
+
+    stats = cache.get_stats()
+    assert (stats.expired, stats.evictions) == (1, 0)
+
+
+def _free_slots(cache):
+    s = cache._free
+    while s:
+        yield s
+        s = cache._next[s]
@@ -0,0 +1,26 @@
+import pytest
+
+from cache.eviction import EvictionPolicy
+from cache.factory import CacheFactory
+
+
+def test_create_local_shards_splits_capacity_and_byte_budget():
+    shards = CacheFactory.create_local_shards(
+        total_capacity=10, policy=EvictionPolicy.LRU, shard_ids=[0, 1, 2], max_bytes=100, max_entry_bytes=8
+    )
+
+    assert [s.capacity for s in shards.values()] == [4, 3, 3]
+    assert [s.max_bytes for s in shards.values()] == [34, 33, 33]
+    assert all(s.max_entry_bytes == 8 for s in shards.values())
+
+
+def test_create_local_shards_validates_byte_budget():
+    with pytest.raises(ValueError):
+        CacheFactory.create_local_shards(10, EvictionPolicy.LRU, [0, 1], max_bytes=0)
+    with pytest.raises(ValueError):
+        CacheFactory.create_local_shards(10, EvictionPolicy.LRU, [0, 1, 2], max_bytes=2)
+
+
+def test_byte_budget_is_optional():
+    cache = CacheFactory.create_local_cache(capacity=3, policy=EvictionPolicy.LRU)
+    assert cache.max_bytes is None
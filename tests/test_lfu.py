@@ -0,0 +1,100 @@
+from cache.lfu import LFUCache
+
+
+def test_evicts_least_frequently_used():
+    cache = LFUCache(capacity=3)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    cache.put("c", 3)
+    cache.get("a")
+    cache.get("a")
+    cache.get("c")
+
+    cache.put("d", 4)  # b has the lowest frequency
+
+    assert cache.get("b") is None
+    assert [cache.get(k) for k in "acd"] == [1, 3, 4]
+
+
+def test_ties_are_broken_by_recency():
+    cache = LFUCache(capacity=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+
+    cache.put("c", 3)  # a and b both have frequency 1, a is older
+
+    assert cache.get("a") is None
+    assert cache.get("b") == 2
+
+
+def test_hot_set_survives_a_scan():
+    cache = LFUCache(capacity=10)
+    for i in range(5):
+        cache.put(f"hot{i}", i)
+        cache.get(f"hot{i}")
+        cache.get(f"hot{i}")
+
+    for i in range(100):
+        cache.put(f"scan{i}", i)
+
+    assert all(cache.get(f"hot{i}") == i for i in range(5))
+
+
+def test_decay_lets_formerly_hot_keys_be_evicted():
+    cache = LFUCache(capacity=2, decay_after=8)
+    cache.put("old", 0)
+    for _ in range(6):
+        cache.get("old")  # frequency 7
+
+    cache.put("new", 1)
+    for _ in range(2):
+        cache.get("new")  # 8 hits in total -> frequencies halve to old=3, new=1
+
+    assert cache._root.higher.freq == 1
+    for _ in range(3):
+        cache.get("new")  # new=4 now outranks old=3
+
+    cache.put("x", 2)
+    assert cache.get("old") is None
+    assert cache.get("new") == 1
+
+
+def test_delete_of_min_frequency_bucket_keeps_bucket_list_consistent():
+    cache = LFUCache(capacity=3)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    cache.get("b")
+    cache.delete("a")
+
+    assert cache._root.higher.freq == 2
+    cache.put("c", 3)
+    cache.put("d", 4)
+    cache.put("e", 5)  # evicts c (freq 1, older than d)
+
+    assert cache.get("c") is None
+    assert cache.get("b") == 2
+
+
+def test_decay_merges_buckets_that_halve_to_the_same_frequency():
+    cache = LFUCache(capacity=3, decay_after=4)
+    for key in ("z", "a", "b"):
+        cache.put(key, key)
+    cache.get("a")  # a: 2
+    cache.get("b")
+    cache.get("b")  # b: 3
+    cache.get("z")  # z: 2, and the 4th hit halves 2, 2 and 3 to 1
+
+    def buckets():
+        out, bucket = [], cache._root.higher
+        while bucket is not cache._root:
+            out.append(bucket.freq)
+            bucket = bucket.higher
+        return out
+
+    assert buckets() == [1]
+    cache.get("b")
+    assert buckets() == [1, 2]
+    assert cache._pick_victim().key == "a"
+    cache.put("c", "c")
+    assert cache.get("a") is None
+    assert all(cache.get(k) == k for k in ("z", "b", "c"))
@@ -1,5 +1,11 @@
+import threading
 import time
 
+import pytest
+
+from cache.base import ValueTooLargeError, WrongTypeError
+from cache.lru import LRUCache
+
 def test_get_on_missing_key_returns_none_and_counts_miss(small_cache):
     assert small_cache.get("missing") is None
     stats = small_cache.get_stats()
@@ -111,4 +117,271 @@ def test_clear_resets_cache_and_stats(small_cache):
     assert stats.puts == 0
     assert stats.evictions == 0
 
-    
\ No newline at end of file
+    
+
+def test_batch_operations_match_single_key_semantics(small_cache):
+    small_cache.put_many([("a", 1, None), ("b", 2, 0.05), ("c", 3, None)])
+
+    assert small_cache.get_many(["a", "b", "missing"]) == {"a": 1, "b": 2}
+
+    time.sleep(0.06)
+    assert small_cache.get_many(["a", "b"]) == {"a": 1}
+
+    assert small_cache.delete_many(["a", "missing"]) == {"a": True, "missing": False}
+    assert small_cache.get("a") is None
+
+    stats = small_cache.get_stats()
+    assert stats.puts == 3
+    assert stats.gets == 6
+    assert stats.hits == 3
+    assert stats.misses == 3
+
+
+def test_put_many_evicts_in_insertion_order(small_cache):
+    small_cache.put_many([(k, i, None) for i, k in enumerate("abcd")])
+
+    assert small_cache.get_many("abcd") == {"b": 1, "c": 2, "d": 3}
+    assert small_cache.get_stats().evictions == 1
+
+
+def test_puts_actively_expire_due_entries(small_cache):
+    small_cache.put("a", 1, ttl=0.01)
+    small_cache.put("b", 2, ttl=0.01)
+    time.sleep(0.02)
+
+    # Both expired entries are reclaimed by the put instead of evicting a live entry
+    small_cache.put("c", 3)
+    assert "a" not in small_cache.cache
+    assert "b" not in small_cache.cache
+
+    stats = small_cache.get_stats()
+    assert stats.expired == 2
+    assert stats.evictions == 0
+
+
+def test_expire_skips_entries_whose_ttl_was_refreshed(small_cache):
+    small_cache.put("a", 1, ttl=0.01)
+    small_cache.put("a", 2, ttl=60)
+    small_cache.put("b", 3, ttl=0.01)
+    time.sleep(0.02)
+
+    assert small_cache.expire() == 1
+    assert small_cache.get("a") == 2
+    assert "b" not in small_cache.cache
+    assert small_cache.get_stats().expired == 1
+
+
+def test_expiry_heap_stays_bounded_under_overwrites():
+    cache = LRUCache(capacity=10, expire_batch=0)
+    for i in range(10_000):
+        cache.put(f"k{i % 5}", i, ttl=60)
+
+    assert len(cache._expiry_heap) <= 2 * len(cache.cache) + 65
+
+
+def test_byte_budget_evicts_until_under_budget():
+    cache = LRUCache(capacity=100, max_bytes=30)
+    cache.put("a", "x" * 9)  # 10 bytes with key
+    cache.put("b", "x" * 9)
+    cache.put("c", "x" * 9)
+    assert cache.get_stats().bytes_used == 30
+
+    cache.put("d", "x" * 19)  # 20 bytes -> evicts a and b
+    assert cache.get("a") is None
+    assert cache.get("b") is None
+    assert cache.get("c") == "x" * 9
+
+    stats = cache.get_stats()
+    assert stats.bytes_used == 30
+    assert stats.evictions == 2
+
+
+def test_overwrite_and_delete_adjust_bytes_used():
+    cache = LRUCache(capacity=10, max_bytes=100)
+    cache.put("a", b"x" * 10)
+    cache.put("a", b"x" * 4)
+    assert cache.get_stats().bytes_used == 5
+
+    cache.delete("a")
+    assert cache.get_stats().bytes_used == 0
+
+
+def test_oversized_entries_are_rejected_up_front():
+    cache = LRUCache(capacity=10, max_bytes=100, max_entry_bytes=20)
+    cache.put("a", "small")
+
+    with pytest.raises(ValueTooLargeError):
+        cache.put("b", "x" * 50)
+    with pytest.raises(ValueTooLargeError):
+        cache.put_many([("c", "ok", None), ("d", "x" * 50, None)])
+
+    assert cache.get("c") is None
+    assert cache.get("a") == "small"
+
+
+def test_custom_sizer_is_charged():
+    cache = LRUCache(capacity=10, max_bytes=3, sizer=lambda key, value: 1)
+    for k in "abcd":
+        cache.put(k, "whatever")
+    assert len(cache.cache) == 3
+
+
+def test_get_or_load_does_not_overwrite_a_write_made_during_the_load():
+    cache = LRUCache(capacity=10)
+    started, release = threading.Event(), threading.Event()
+
+    def loader(key):
+        started.set()
+        release.wait(5)
+        return "loaded"
+
+    results = []
+    t = threading.Thread(target=lambda: results.append(cache.get_or_load("a", loader, negative_ttl=60)))
+    t.start()
+    started.wait(5)
+    cache.put("a", "written")
+    release.set()
+    t.join()
+    assert results == ["loaded"]
+    assert cache.get("a") == "written"
+
+    cache.get_or_load("b", lambda key: None, negative_ttl=60)
+    cache.put("b", "now here")  # ends the remembered miss
+    cache.delete("b")
+    assert cache.get_or_load("b", lambda key: "reloaded") == "reloaded"
+
+
+def test_grace_window_serves_stale_and_hands_out_one_refresh():
+    cache = LRUCache(capacity=10)
+    cache.put_with_grace("a", 1, ttl=0.05, grace=10)
+    assert cache.get_with_state("a") == (1, "FRESH")
+    time.sleep(0.06)
+    assert cache.get_with_state("a") == (1, "REFRESH")
+    assert cache.get_with_state("a") == (1, "STALE")
+    assert cache.get("a") == 1
+    time.sleep(0.01)
+    cache.put_with_grace("a", 2, ttl=60, grace=10)
+    assert cache.get_with_state("a") == (2, "FRESH")
+    assert cache.cache["a"].delta >= 0.01  # from the REFRESH to the put
+
+    # XFetch: an entry slow to recompute is handed out for refresh ahead of expiry
+    cache.put_with_grace("b", 1, ttl=60, grace=10, delta=1e6)
+    assert cache.get_with_state("b") == (1, "FRESH")
+    assert cache.get_with_state("b", beta=1.0) == (1, "REFRESH")
+    assert cache.get_with_state("b", beta=1.0) == (1, "FRESH")
+
+    cache.put("c", 1, ttl=0.01)
+    time.sleep(0.02)
+    assert cache.get_with_state("c") == (None, "FRESH")
+
+
+def test_get_or_load_refreshes_stale_entries_once():
+    cache = LRUCache(capacity=10)
+    loads = []
+
+    def loader(key):
+        loads.append(key)
+        return len(loads)
+
+    assert cache.get_or_load("a", loader, ttl=0.05, grace=10) == 1
+    time.sleep(0.06)
+    assert cache.get_with_state("a") == (1, "REFRESH")
+    assert cache.get_or_load("a", loader, ttl=0.05, grace=10) == 1  # someone else is refreshing
+    cache.cache["a"].refresh_at = None
+    assert cache.get_or_load("a", loader, ttl=60, grace=10) == 2
+    assert cache.get_with_state("a") == (2, "FRESH")
+    assert len(loads) == 2
+
+
+def test_failed_refresh_keeps_serving_the_stale_value():
+    cache = LRUCache(capacity=10)
+    cache.put_with_grace("a", 1, ttl=0.05, grace=10)
+    time.sleep(0.06)
+
+    assert cache.get_or_load("a", lambda key: None, ttl=60, grace=10) == 1
+    assert cache.get_with_state("a") == (1, "STALE")
+
+    cache.cache["a"].refresh_at = None
+
+    def fail(key):
+        raise KeyError(key)
+
+    with pytest.raises(KeyError):
+        cache.get_or_load("a", fail, ttl=60, grace=10)
+    assert cache.get_or_load("a", fail, ttl=60, grace=10) == 1  # refresh handed out already
+
+
+def test_incr_and_append_keep_the_value_type_and_ttl():
+    cache = LRUCache(capacity=10)
+    assert cache.incr("hits") is None
+    assert cache.get("hits") is None
+    assert cache.incr("hits", 5, initial="1", ttl=60) == 1  # created holding initial
+    assert cache.incr("hits", 5) == 6
+    assert cache.incr("hits", -10) == -4
+    assert cache.get("hits") == "-4"
+    deadline = cache.get_entry("hits")[1]
+    assert deadline is not None and deadline > time.time() + 50
+
+    cache.put("n", 1)
+    cache.put("b", b"41")
+    assert cache.incr("n") == 2 and cache.get("n") == 2
+    assert cache.incr("b") == 42 and cache.get("b") == b"42"
+
+    cache.put("s", "ab", ttl=60)
+    deadline = cache.get_entry("s")[1]
+    assert cache.append("s", "cd")
+    assert cache.get_entry("s") == ("abcd", deadline)
+    assert cache.append("missing", "x") is False
+    with pytest.raises(WrongTypeError):
+        cache.incr("s")
+    with pytest.raises(WrongTypeError):
+        cache.append("n", "x")
+    assert cache.get_stats().bytes_used == sum(cache.sizer(k, v) for k, v, _ in cache.dump())
+
+
+def test_cas_only_stores_over_the_version_it_read():
+    cache = LRUCache(capacity=10)
+    assert cache.gets("a") is None
+    assert cache.cas("a", 1, 0) is None
+    cache.put("a", 1)
+    value, version = cache.gets("a")
+    assert value == 1
+
+    cache.put("a", 2)  # another writer
+    assert cache.cas("a", 3, version) is False
+    assert cache.get("a") == 2
+
+    value, version = cache.gets("a")
+    assert cache.cas("a", value + 1, version, ttl=60)
+    assert cache.get("a") == 3
+    assert cache.gets("a")[1] > version
+    cache.incr("a")
+    assert cache.cas("a", 0, version + 1) is False
+
+    # versions are not reused when a key is deleted and written again
+    _, version = cache.gets("a")
+    cache.delete("a")
+    cache.put("a", 4)
+    assert cache.cas("a", 5, version) is False
+
+
+def test_concurrent_incr_and_cas_lose_no_updates():
+    cache = LRUCache(capacity=10)
+    cache.put("counter", "0")
+    cache.put("cas", 0)
+
+    def work():
+        for _ in range(500):
+            cache.incr("counter")
+            while True:
+                value, version = cache.gets("cas")
+                if cache.cas("cas", value + 1, version):
+                    break
+
+    threads = [threading.Thread(target=work) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert cache.get("counter") == "2000"
+    assert cache.get("cas") == 2000
@@ -0,0 +1,88 @@
+import dataclasses
+import urllib.request
+
+from cache.cache_node import CacheNode
+from cache.client import CacheClient
+from cache.metrics import LatencyHistogram, bucket_bounds, bucket_index
+from tests.conftest import free_port, start_node, stop_node, write_cluster_configs
+
+
+def test_histogram_buckets_and_percentiles():
+    for ns in [0, 1, 3, 4, 7, 8, 1000, 123_456_789, 2**63 - 1]:
+        low, high = bucket_bounds(bucket_index(ns))
+        assert low <= ns < high
+        assert high - low <= max(1, high // 4)
+
+    hist = LatencyHistogram()
+    for us in range(1, 1001):
+        hist.record(us * 1000)
+    assert hist.count == 1000
+    assert 0.0005 <= hist.percentile(0.5) <= 0.0005 * 1.25
+    assert 0.00099 <= hist.percentile(0.99) <= 0.001
+    assert abs(hist.mean() - 0.0005005) < 1e-9
+
+    other = LatencyHistogram.from_dict(hist.to_dict())
+    other.merge(hist)
+    assert other.count == 2000
+    assert other.percentile(0.5) == hist.percentile(0.5)
+    assert dict(other.cumulative([1 << 19])) == {1 << 19: 2 * 524}
+
+
+def test_info_and_stats(node, owned_key):
+    key = next(owned_key())
+    node = CacheNode(dataclasses.replace(node.cfg, latency_sample=1))
+    node.handle_many([f"PUT {key} v", f"get {key}", "GET nope", "FOO"])
+    stats = node.handle("STATS").split()
+    assert stats[stats.index("ENTRIES") + 1] == "1"
+    assert stats[stats.index("COMMANDS") + 1] == "5"  # STATS counts itself
+
+    commands = node.handle("INFO commands").split("\n")
+    assert commands[:2] == ["MULTI 5", "# commands"]
+    by_name = {line.split()[0]: line.split() for line in commands[2:]}
+    assert by_name["GET"][1:3] == ["samples", "2"]
+    assert by_name["OTHER"][1:3] == ["samples", "1"]
+    assert "p99_us" in by_name["PUT"]
+
+    shards = node.handle("INFO shards").split("\n")[2:]
+    assert [line.split()[0] for line in shards] == ["0", "1"]
+    assert sum(int(line.split()[2]) for line in shards) == 1
+
+    sections = [line for line in node.handle("INFO").split("\n") if line.startswith("# ")]
+    assert sections == ["# server", "# clients", "# stats", "# commands", "# shards"]
+    assert node.handle("INFO nope").startswith("ERR usage")
+
+
+def test_latency_sampling(node):
+    node.handle_many(["GET a"] * 16_000)
+    samples = node.metrics.commands["GET"].count
+    assert 800 <= samples <= 1200
+    assert node.metrics.commands_total == 16_000
+
+    node._countdown = -3  # concurrent commands took it past 0
+    node.handle("GET a")
+    assert node.metrics.commands["GET"].count == samples + 1
+    assert node._countdown > 0
+
+    node = CacheNode(dataclasses.replace(node.cfg, latency_sample=0))
+    node.handle_many(["GET a"] * 100)
+    assert node.metrics.commands["GET"].count == 0
+
+
+def test_prometheus_endpoint(tmp_path):
+    metrics_port = free_port()
+    cluster_path, [node_path] = write_cluster_configs(tmp_path, n_nodes=1, metrics_port=metrics_port, latency_sample=1)
+    proc = start_node(cluster_path, node_path)
+    try:
+        with CacheClient.from_config(str(cluster_path)) as client:
+            client.put("a", "1")
+            client.get("a")
+            text = urllib.request.urlopen(f"http://127.0.0.1:{metrics_port}/metrics", timeout=5).read().decode()
+            stats = next(iter(client.stats().values())).split()
+        assert "cache_connections{" in text
+        assert 'cache_command_duration_seconds_count{node="127.0.0.1:%d",command="GET"} 1' % client.cluster_map[0][1] in text
+        assert 'le="+Inf"' in text
+        assert 'cache_shard_entries{' in text
+        assert int(stats[stats.index("CONNECTIONS") + 1]) >= 1
+        assert int(stats[stats.index("BYTES_IN") + 1]) > 0
+    finally:
+        stop_node(proc)
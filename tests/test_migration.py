@@ -0,0 +1,109 @@
+import json
+import threading
+
+from cache.client import CacheClient, Connection
+from cache.rebalance import fetch_map, migrate_shard, plan_add
+from tests.conftest import free_port, start_node, stop_node, write_cluster_configs
+
+
+def add_empty_node(config_dir):
+    port = free_port()
+    node_path = config_dir / f"node{port}.json"
+    node_path.write_text(json.dumps({"host": "127.0.0.1", "port": port, "owned_shards": [], "capacity": 1000}))
+    return ("127.0.0.1", port), node_path
+
+
+def send(address, line):
+    conn = Connection(address, timeout=5.0)
+    try:
+        conn.send_lines([line])
+        return conn.read_reply()
+    finally:
+        conn.close()
+
+
+def test_cluster_map_and_setowner(node):
+    assert node.handle("CLUSTER MAP").split("\n")[:2] == ["MULTI 5", "VERSION 0"]
+    assert node.handle("CLUSTER SETOWNER 2 127.0.0.1:9002 1") == "OK"
+    assert node.handle("CLUSTER SETOWNER 2 127.0.0.1:9001 1") == "STALE"
+    assert "SHARD 2 127.0.0.1:9002 EPOCH 1" in node.handle("CLUSTER MAP")
+    assert node.handle("CLUSTER MAP").split("\n")[1] == "VERSION 1"
+    # shards held here (or not) only change hands by migration
+    assert node.handle("CLUSTER SETOWNER 0 127.0.0.1:9002 5").startswith("ERR")
+    assert node.handle("CLUSTER SETOWNER 3 127.0.0.1:9000 5").startswith("ERR")
+
+
+def test_migrate_rejects_bad_requests(node, owned_key):
+    assert node.handle("MIGRATE 2 127.0.0.1:9002") == "ERR shard not owned"
+    assert node.handle("MIGRATE 0 127.0.0.1:9000") == "ERR shard is already here"
+    assert node.handle("MIGRATE 0 nowhere").startswith("ERR usage")
+    # ASKING only opens shards being imported
+    key = next(owned_key(owned=False))
+    assert node.handle(f"ASKING GET {key}").startswith("MOVED ")
+    assert node.handle("ASKING") == "ERR usage: ASKING command"
+
+
+def test_plan_add_takes_shards_from_the_fullest_nodes():
+    a, b, new = ("h", 1), ("h", 2), ("h", 3)
+    cluster_map = {0: a, 1: a, 2: a, 3: a, 4: b, 5: b}
+    assert plan_add(cluster_map, new) == [(3, new), (2, new)]
+
+
+def test_shards_move_to_a_new_node_under_load(tmp_path):
+    cluster_path, node_paths = write_cluster_configs(tmp_path)
+    new_node, new_path = add_empty_node(tmp_path)
+    procs = [start_node(cluster_path, path) for path in [*node_paths, new_path]]
+    try:
+        with CacheClient.from_config(str(cluster_path)) as client:
+            client.mset([(f"k{i}", f"v{i}", 300.0 if i % 3 == 0 else None) for i in range(500)])
+
+            # keep writing and reading while shards move
+            stop = threading.Event()
+            errors = []
+            written = {}
+
+            def load():
+                i = 0
+                while not stop.is_set():
+                    key = f"w{i % 200}"
+                    try:
+                        client.put(key, str(i))
+                        written[key] = str(i)
+                        if client.get(f"k{i % 500}") != f"v{i % 500}":
+                            errors.append(f"k{i % 500} missing")
+                    except Exception as e:
+                        errors.append(repr(e))
+                    i += 1
+
+            thread = threading.Thread(target=load)
+            thread.start()
+            try:
+                version, shards = fetch_map(client.cluster_map[0])
+                cluster_map = {sid: owner for sid, (owner, _, _) in shards.items()}
+                nodes = sorted(set(cluster_map.values()) | {new_node})
+                moves = plan_add(cluster_map, new_node)
+                moves.append((0, new_node))
+                for sid, target in moves:
+                    assert migrate_shard(sid, target, cluster_map, nodes, timeout=30) > version
+            finally:
+                stop.set()
+                thread.join()
+
+            assert errors == []
+            assert client.mget(f"k{i}" for i in range(500)) == {f"k{i}": f"v{i}" for i in range(500)}
+            assert client.mget(written) == written
+
+        # every node agrees on the new map
+        maps = [fetch_map(address)[1] for address in nodes]
+        assert all({sid: info[0] for sid, info in m.items()} == cluster_map for m in maps)
+        assert sorted(sid for sid, owner in cluster_map.items() if owner == new_node) == sorted(s for s, _ in moves)
+        assert send(nodes[0], "CLUSTER MAP")[0] == f"VERSION {max(e for _, e, _ in maps[0].values())}"
+
+        # a fresh client routes through MOVED, and can adopt the new map
+        with CacheClient.from_config(str(cluster_path)) as client:
+            assert client.get("k3") == "v3"
+            assert client.refresh_map() > 0
+            assert client.cluster_map == cluster_map
+    finally:
+        for proc in procs:
+            stop_node(proc)
@@ -0,0 +1,177 @@
+"""
+Contract tests every registered cache policy must pass.
+"""
+import threading
+import time
+
+import pytest
+
+from cache.base import ValueTooLargeError, WrongTypeError
+from cache.factory import CacheFactory
+
+
+@pytest.fixture(params=sorted(CacheFactory._registry, key=lambda p: p.value), ids=lambda p: p.value)
+def policy(request):
+    return request.param
+
+
+def test_put_get_overwrite_and_stats(policy):
+    cache = CacheFactory.create_local_cache(capacity=10, policy=policy)
+    cache.put("a", 1)
+    cache.put("a", 2)
+
+    assert cache.get("a") == 2
+    assert cache.get("missing") is None
+
+    stats = cache.get_stats()
+    assert (stats.puts, stats.gets, stats.hits, stats.misses) == (2, 2, 1, 1)
+
+
+def test_capacity_is_never_exceeded(policy):
+    cache = CacheFactory.create_local_cache(capacity=5, policy=policy)
+    for i in range(50):
+        cache.put(f"k{i}", i)
+        cache.get(f"k{i // 2}")
+
+    assert sum(cache.get(f"k{i}") is not None for i in range(50)) <= 5
+    assert cache.get_stats().evictions >= 45
+
+
+def test_ttl_and_expire(policy):
+    cache = CacheFactory.create_local_cache(capacity=10, policy=policy)
+    cache.put("short", 1, ttl=0.01)
+    cache.put("long", 2, ttl=60)
+    time.sleep(0.02)
+
+    cache.expire()
+    assert cache.get("short") is None
+    assert cache.get("long") == 2
+    assert cache.get_stats().expired == 1
+
+
+def test_delete_batch_ops_and_clear(policy):
+    cache = CacheFactory.create_local_cache(capacity=10, policy=policy)
+    cache.put_many([("a", 1, None), ("b", 2, None)])
+
+    assert cache.get_many(["a", "b", "c"]) == {"a": 1, "b": 2}
+    assert cache.delete_many(["a", "c"]) == {"a": True, "c": False}
+    assert cache.delete("b") is True
+    assert cache.delete("b") is False
+
+    cache.put("d", 4)
+    cache.clear()
+    assert cache.get("d") is None
+    assert cache.get_stats().puts == 0
+
+
+def test_byte_budget(policy):
+    cache = CacheFactory.create_local_cache(capacity=100, policy=policy, max_bytes=50, max_entry_bytes=20)
+    for i in range(20):
+        cache.put(f"k{i:02d}", "x" * 7)  # 10 bytes each
+
+    assert cache.get_stats().bytes_used <= 50
+    with pytest.raises(ValueTooLargeError):
+        cache.put("big", "x" * 30)
+
+
+def test_non_finite_ttls_are_rejected(policy):
+    cache = CacheFactory.create_local_cache(capacity=10, policy=policy)
+    for ttl in (float("nan"), float("inf")):
+        with pytest.raises(ValueError):
+            cache.put("a", 1, ttl=ttl)
+        with pytest.raises(ValueError):
+            cache.put_many([("b", 2, None), ("c", 3, ttl)])
+        with pytest.raises(ValueError):
+            cache.incr("n", initial=0, ttl=ttl)
+
+    cache.put("short", 1, ttl=0.01)
+    time.sleep(0.02)
+    assert cache.expire() == 1
+    assert cache.get_many(["a", "b", "c", "n"]) == {}
+
+
+def test_dump_round_trips_entries_and_order(policy):
+    cache = CacheFactory.create_local_cache(capacity=20, policy=policy)
+    for i in range(10):
+        cache.put(f"k{i}", i, ttl=60.0 if i % 2 else None)
+    cache.put("gone", 0, ttl=0.01)
+    for i in (3, 1, 7):
+        cache.get(f"k{i}")
+    time.sleep(0.02)
+
+    items = cache.dump()
+    assert sorted(k for k, _, _ in items) == sorted(f"k{i}" for i in range(10))
+    assert all((exp is None) == (int(k[1:]) % 2 == 0) for k, _, exp in items)
+
+    restored = CacheFactory.create_local_cache(capacity=20, policy=policy)
+    now = time.time()
+    restored.put_many((k, v, None if exp is None else exp - now) for k, v, exp in items)
+    assert [k for k, _, _ in restored.dump()] == [k for k, _, _ in items]
+
+
+def test_get_or_load_shares_one_load(policy):
+    cache = CacheFactory.create_local_cache(capacity=10, policy=policy)
+    calls = []
+    release = threading.Event()
+
+    def loader(key):
+        calls.append(key)
+        release.wait(5)
+        if key == "bad":
+            raise KeyError(key)
+        return None if key == "absent" else key.upper()
+
+    for key, expected in (("a", "A"), ("bad", KeyError), ("absent", None)):
+        results = []
+
+        def load():
+            try:
+                results.append(cache.get_or_load(key, loader, negative_ttl=60))
+            except KeyError as e:
+                results.append(type(e))
+
+        threads = [threading.Thread(target=load) for _ in range(8)]
+        for t in threads:
+            t.start()
+        time.sleep(0.05)
+        release.set()
+        for t in threads:
+            t.join()
+        release.clear()
+        assert results == [expected] * 8
+        assert calls.count(key) == 1
+
+    assert cache.get("a") == "A" and cache.get("bad") is None
+    release.set()
+    assert cache.get_or_load("absent", loader) is None  # remembered
+    assert calls.count("absent") == 1
+    with pytest.raises(KeyError):  # errors are not remembered
+        cache.get_or_load("bad", loader)
+    assert calls.count("bad") == 2
+
+
+def test_atomic_updates_and_versions(policy):
+    cache = CacheFactory.create_local_cache(capacity=10, policy=policy)
+    assert cache.incr("n") is None
+    assert cache.incr("n", 2, initial="1", ttl=60) == 1
+    assert cache.incr("n", 2) == 3
+    value, deadline = cache.get_entry("n")
+    assert value == "3" and deadline > time.time() + 50
+
+    cache.put("s", b"ab")
+    assert cache.append("s", "cd") and cache.get("s") == b"abcd"
+    assert cache.append("missing", "x") is False
+    with pytest.raises(WrongTypeError):
+        cache.incr("s")
+
+    value, version = cache.gets("s")
+    assert cache.cas("s", b"x", version) is True
+    assert cache.cas("s", b"y", version) is False
+    _, version = cache.gets("s")
+    cache.append("s", "z")
+    assert cache.cas("s", b"y", version) is False
+    cache.delete("s")
+    assert cache.cas("s", b"y", version) is None
+    cache.put("s", b"again")
+    assert cache.gets("s")[1] > version
+    assert cache.get_stats().bytes_used == sum(cache.sizer(k, v) for k, v, _ in cache.dump())
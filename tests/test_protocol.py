@@ -0,0 +1,155 @@
+import socket
+import threading
+import time
+
+import pytest
+
+from cache.protocol import (
+    Opcode, PeerConnection, RecvBuffer, Status, encode_request, encode_response, read_response,
+)
+from cache.server import handle_client
+
+
+@pytest.fixture
+def conn(node):
+    client, server = socket.socketpair()
+    t = threading.Thread(target=handle_client, args=(server, node), daemon=True)
+    t.start()
+    yield client
+    client.close()
+    t.join(timeout=2)
+
+
+def call(sock, rbuf, opcode, key="", value=b"", ttl=None):
+    sock.sendall(b"".join(encode_request(opcode, key.encode(), value, ttl)))
+    return read_response(sock, rbuf)
+
+
+def test_binary_values_round_trip_without_transcoding(conn, owned_key):
+    rbuf = RecvBuffer()
+    key = next(owned_key("bin"))
+    value = b"has spaces\nnewlines\x00and \xff bytes"
+
+    assert call(conn, rbuf, Opcode.PUT, key, value) == (Status.OK, b"")
+    assert call(conn, rbuf, Opcode.GET, key) == (Status.OK, value)
+    assert call(conn, rbuf, Opcode.DEL, key) == (Status.OK, b"")
+    assert call(conn, rbuf, Opcode.GET, key) == (Status.NOT_FOUND, b"")
+
+
+def test_text_replies_refuse_values_with_line_breaks(node, owned_key):
+    key, plain = next(owned_key("bin")), next(owned_key("txt"))
+    node.handle_frames([(Opcode.PUT, key, b"two\nlines", None), (Opcode.PUT, plain, b"one-line", None)])
+    assert node.handle(f"GET {key}") == "ERR binary_value"
+    assert node.handle(f"MGET {key} {plain}").splitlines()[1:] == ["ERR binary_value", "VALUE one-line"]
+    assert node.handle_frames([(Opcode.GET, key, b"", None)]) == [(Status.OK, b"two\nlines")]
+
+
+def test_frames_before_a_bad_one_are_answered(conn, owned_key, node):
+    rbuf = RecvBuffer()
+    key = next(owned_key("k"))
+    remote = next(owned_key("r", owned=False))
+    frames = encode_request(Opcode.PUT, key.encode(), b"v") + encode_request(0x1F, remote.encode())
+    conn.sendall(b"".join(frames) + bytes(32))  # then a frame with a bad magic byte
+
+    assert read_response(conn, rbuf) == (Status.OK, b"")
+    # an unknown opcode is rejected before its key is routed, so no MOVED
+    assert read_response(conn, rbuf) == (Status.ERR, b"unknown_opcode 31")
+    status, body = read_response(conn, rbuf)
+    assert status == Status.ERR and body.startswith(b"bad request magic")
+    assert conn.recv(1) == b""  # closed
+    assert node.handle(f"GET {key}") == "VALUE v"
+
+
+def test_binary_moved_and_stats(conn, owned_key, node):
+    rbuf = RecvBuffer()
+    remote = next(owned_key("r", owned=False))
+    sid = node.shard_id(remote)
+    host, port = node.cfg.cluster_map[sid]
+
+    assert call(conn, rbuf, Opcode.GET, remote) == (Status.MOVED, f"{sid} {host}:{port}".encode())
+
+    status, body = call(conn, rbuf, Opcode.STATS)
+    assert status == Status.OK
+    assert body.startswith(b"HITS ")
+
+
+def test_binary_pipelined_frames_and_large_values(conn, owned_key):
+    rbuf = RecvBuffer(size=1024)
+    keys = [next(owned_key(f"p{i}-")) for i in range(8)]
+    values = [bytes([i]) * (200_000 + i) for i in range(8)]
+
+    frames = []
+    for key, value in zip(keys, values):
+        frames.extend(encode_request(Opcode.PUT, key.encode(), value))
+    for key in keys:
+        frames.extend(encode_request(Opcode.GET, key.encode()))
+    conn.sendall(b"".join(frames))
+
+    for _ in keys:
+        assert read_response(conn, rbuf) == (Status.OK, b"")
+    for value in values:
+        assert read_response(conn, rbuf) == (Status.OK, value)
+
+
+def test_text_clients_share_the_same_handler(conn, owned_key):
+    key = next(owned_key("t"))
+    conn.sendall(f"PUT {key} hello\nGET {key}\n".encode())
+
+    data = b""
+    while data.count(b"\n") < 2:
+        data += conn.recv(4096)
+    assert data == b"STORED\nVALUE hello\n"
+
+
+def test_recv_buffer_compacts_before_growing():
+    rbuf = RecvBuffer(size=16, min_free=4)
+    with rbuf.writable() as view:
+        view[:14] = b"x" * 14
+    rbuf.commit(14)
+    rbuf.consume_to(12)
+
+    with rbuf.writable() as view:
+        assert len(view) == 14
+
+    assert (rbuf.start, rbuf.end) == (0, 2)
+    assert len(rbuf.buf) == 16
+
+
+def one_shot_peer(reply: bool):
+    """
+    A peer that takes one batch per connection, answers it with OK (if reply) and
+    closes. Returns (address, received), received holding each connection's bytes.
+    """
+    listener = socket.create_server(("127.0.0.1", 0))
+    received = []
+
+    def serve():
+        while True:
+            sock, _ = listener.accept()
+            with sock:
+                received.append(sock.recv(65536))
+                if reply:
+                    sock.sendall(b"".join(encode_response(Status.OK, b"done")))
+
+    threading.Thread(target=serve, daemon=True).start()
+    return listener.getsockname(), received
+
+
+def test_peer_connection_replaces_a_connection_the_peer_closed():
+    address, received = one_shot_peer(reply=True)
+    peer = PeerConnection(address)
+    assert peer.call([(Opcode.GET, "a", b"", None)]) == [(Status.OK, b"done")]
+    time.sleep(0.05)  # the peer has closed the idle connection
+    assert peer.call([(Opcode.GET, "b", b"", None)]) == [(Status.OK, b"done")]
+    assert len(received) == 2
+    peer.close()
+
+
+def test_peer_connection_does_not_resend_a_batch_that_was_sent():
+    address, received = one_shot_peer(reply=False)
+    peer = PeerConnection(address)
+    with pytest.raises(OSError):
+        peer.call([(Opcode.PUT, "k", b"v", None)])
+    time.sleep(0.05)
+    assert received == [b"".join(encode_request(Opcode.PUT, b"k", b"v"))]
+    peer.close()
@@ -0,0 +1,127 @@
+import json
+import os
+import signal
+import time
+
+from cache.client import CacheClient, Connection
+from cache.replication import ReplicationBacklog
+from tests.conftest import start_node, stop_node, write_replicated_configs
+
+
+def addresses(cluster_path):
+    cluster = json.loads(cluster_path.read_text())
+    primary = tuple(cluster["cluster_map"]["0"])
+    return primary, [tuple(a) for a in cluster["replicas"]["0"]]
+
+
+def wait_until_replicated(primary, timeout: float = 10.0) -> None:
+    """Poll the primary's REPLICATION lines until every replica has acked its offset."""
+    conn = Connection(primary, timeout=5.0)
+    try:
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            conn.send_lines(["REPLICATION"])
+            lines = conn.read_reply()
+            fields = [line.split() for line in lines]
+            if fields and all(f[5] == f[9] for f in fields):
+                return
+            time.sleep(0.02)
+        raise AssertionError(f"replicas did not catch up: {lines}")
+    finally:
+        conn.close()
+
+
+def read_all(address, keys):
+    conn = Connection(address, timeout=5.0)
+    try:
+        conn.send_lines(["MGET " + " ".join(keys)])
+        return conn.read_reply()
+    finally:
+        conn.close()
+
+
+def test_backlog_serves_offsets_it_still_holds():
+    backlog = ReplicationBacklog(max_bytes=8)
+    backlog.append(b"abcd")
+    assert backlog.read_from(0) == b"abcd"
+    assert backlog.read_from(2) == b"cd"
+    assert backlog.read_from(4) == b""
+    assert backlog.read_from(5) is None
+
+    for _ in range(4):
+        backlog.append(b"efgh")
+    assert backlog.end_offset == 20
+    assert backlog.read_from(0) is None
+    assert backlog.read_from(12) == b"efghefgh"
+
+
+def test_replicas_converge_and_serve_reads(replicated_cluster):
+    cluster_path, _ = replicated_cluster
+    primary, replicas = addresses(cluster_path)
+    keys = [f"k{i}" for i in range(200)]
+    with CacheClient.from_config(str(cluster_path)) as client:
+        client.mset([(key, f"v{i}", 300.0 if i % 2 else None) for i, key in enumerate(keys)])
+        client.mdel(keys[:50])
+        client.put("k60", "changed")
+
+    wait_until_replicated(primary)
+    expected = read_all(primary, keys)
+    assert expected.count("NOT_FOUND") == 50 and "VALUE changed" in expected
+    for replica in replicas:
+        assert read_all(replica, keys) == expected
+
+
+def test_replica_redirects_writes_to_the_primary(replicated_cluster):
+    cluster_path, _ = replicated_cluster
+    primary, replicas = addresses(cluster_path)
+    conn = Connection(replicas[0], timeout=5.0)
+    try:
+        conn.send_lines(["PUT k1 v", "DEL k1"])
+        for reply in (conn.read_reply(), conn.read_reply()):
+            assert reply[0].startswith("MOVED ") and reply[0].endswith(f"{primary[0]}:{primary[1]}")
+    finally:
+        conn.close()
+
+
+def test_client_can_read_from_replicas(replicated_cluster):
+    cluster_path, _ = replicated_cluster
+    primary, _ = addresses(cluster_path)
+    with CacheClient.from_config(str(cluster_path)) as writer:
+        writer.mset([(f"k{i}", f"v{i}", None) for i in range(100)])
+    wait_until_replicated(primary)
+
+    with CacheClient.from_config(str(cluster_path), read_from_replica=True) as reader:
+        for _ in range(5):
+            assert reader.mget(f"k{i}" for i in range(100)) == {f"k{i}": f"v{i}" for i in range(100)}
+            assert reader.get("k7") == "v7"
+        # writes still reach the primary
+        reader.put("k7", "new")
+        assert reader.stats()
+
+
+def test_replica_too_far_behind_is_resynced(tmp_path):
+    cluster_path, primary_path, [replica_path] = write_replicated_configs(
+        tmp_path, n_replicas=1, repl_backlog_bytes=512,
+    )
+    primary, [replica_addr] = addresses(cluster_path)
+    replica = start_node(cluster_path, replica_path)
+    proc = start_node(cluster_path, primary_path)
+    try:
+        with CacheClient.from_config(str(cluster_path)) as client:
+            client.put("before", "1")
+            wait_until_replicated(primary)
+
+            # writes made while the replica is paused overflow the primary's backlog
+            os.kill(replica.pid, signal.SIGSTOP)
+            try:
+                client.mset([(f"k{i}", "x" * 64, None) for i in range(500)])
+            finally:
+                os.kill(replica.pid, signal.SIGCONT)
+            client.delete("before")
+
+        wait_until_replicated(primary)
+        keys = ["before", *(f"k{i}" for i in range(500))]
+        assert read_all(replica_addr, keys) == read_all(primary, keys)
+    finally:
+        stop_node(proc)
+        stop_node(replica)
@@ -0,0 +1,59 @@
+import asyncio
+
+import pytest
+
+from cache.server import CacheProtocol, execute_pipeline
+
+
+def test_pipeline_runs_every_complete_line_in_order(node, owned_key):
+    a, b = next(owned_key("a")), next(owned_key("b"))
+    buffer = bytearray(f"PUT {a} 1\nPUT {b} 2\nGET {a}\nGET {b}\n".encode())
+
+    responses, consumed, closing = execute_pipeline(buffer, node)
+
+    assert responses == [b"STORED", b"STORED", b"VALUE 1", b"VALUE 2"]
+    assert consumed == len(buffer)
+    assert closing is False
+
+
+def test_pipeline_leaves_partial_line_unconsumed(node, owned_key):
+    a = next(owned_key("a"))
+    buffer = bytearray(f"PUT {a} 1\nGET {a}".encode())
+
+    responses, consumed, closing = execute_pipeline(buffer, node)
+
+    assert responses == [b"STORED"]
+    assert bytes(buffer[consumed:]) == f"GET {a}".encode()
+    assert closing is False
+
+
+def test_pipeline_skips_blank_lines_and_stops_at_quit(node, owned_key):
+    a = next(owned_key("a"))
+    buffer = bytearray(f"\r\n\nPUT {a} 1\r\nQUIT\nGET {a}\n".encode())
+
+    responses, consumed, closing = execute_pipeline(buffer, node)
+
+    assert responses == [b"STORED"]
+    assert closing is True
+    assert bytes(buffer[consumed:]) == f"GET {a}\n".encode()
+
+
+@pytest.mark.parametrize("offload", [False, True], ids=["on_loop", "offloaded"])
+def test_asyncio_server_runs_pipelines_split_across_reads(node, owned_key, offload):
+    a, b = next(owned_key("a")), next(owned_key("b"))
+
+    async def exchange():
+        server = await asyncio.get_running_loop().create_server(lambda: CacheProtocol(node, offload), "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        async with server:
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.write(f"PUT {a} 1\nPUT {b} 2\nGET {a}\nGE".encode())
+            await writer.drain()
+            await asyncio.sleep(0.05)  # the rest of the line arrives in a later read
+            writer.write(f"T {b}\nQUIT\nGET {a}\n".encode())
+            await writer.drain()
+            replies = await asyncio.wait_for(reader.read(), timeout=5)  # until the server closes
+            writer.close()
+            return replies
+
+    assert asyncio.run(exchange()).splitlines() == [b"STORED", b"STORED", b"VALUE 1", b"VALUE 2"]
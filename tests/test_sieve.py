@@ -0,0 +1,85 @@
+import threading
+
+from cache.sieve import SieveCache
+
+
+def test_visited_entries_survive_eviction():
+    cache = SieveCache(capacity=3)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    cache.put("c", 3)
+    cache.get("a")
+
+    cache.put("d", 4)  # hand skips visited a, evicts b
+
+    assert cache.get("b") is None
+    assert [cache.get(k) for k in "acd"] == [1, 3, 4]
+
+
+def test_hand_resumes_where_it_stopped():
+    cache = SieveCache(capacity=3)
+    for k in "abc":
+        cache.put(k, k)
+    cache.get("a")
+    cache.get("c")
+
+    cache.put("d", "d")  # clears a, evicts b; hand stops at c
+    cache.put("e", "e")  # clears c, evicts d without revisiting a
+
+    assert cache.get("b") is None
+    assert cache.get("d") is None
+    assert [cache.get(k) for k in "ace"] == ["a", "c", "e"]
+
+
+def test_hot_set_survives_a_scan():
+    cache = SieveCache(capacity=10)
+    for i in range(5):
+        cache.put(f"hot{i}", i)
+
+    for i in range(100):
+        for j in range(5):
+            cache.get(f"hot{j}")
+        cache.put(f"scan{i}", i)
+
+    assert all(cache.get(f"hot{i}") == i for i in range(5))
+
+
+def test_concurrent_readers_keep_stats_consistent():
+    cache = SieveCache(capacity=50)
+    for i in range(50):
+        cache.put(i, i)
+
+    def reader():
+        for i in range(2_000):
+            cache.get(i % 60)
+
+    def writer():
+        for i in range(2_000):
+            cache.put(100 + i % 80, i)
+
+    threads = [threading.Thread(target=reader) for _ in range(4)] + [threading.Thread(target=writer)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    stats = cache.get_stats()
+    assert stats.gets == 8_000
+    assert stats.hits + stats.misses == stats.gets
+    assert len(cache.cache) <= 50
+
+
+def test_counters_of_exited_threads_are_folded_in():
+    cache = SieveCache(capacity=10)
+    cache.put("a", 1)
+
+    for _ in range(20):
+        t = threading.Thread(target=lambda: (cache.get("a"), cache.get("b")))
+        t.start()
+        t.join()
+    cache.get("a")
+
+    assert len(cache._readers) <= 2
+    stats = cache.get_stats()
+    assert (stats.gets, stats.hits, stats.misses) == (41, 21, 20)
+    assert len(cache._readers) == 1
@@ -0,0 +1,103 @@
+import dataclasses
+import threading
+import time
+
+from cache.base import TimedLock
+from cache.cache_node import CacheNode
+from cache.client import CacheClient
+from cache.protocol import Opcode
+from cache.slowlog import RequestTracer
+from tests.conftest import start_node, stop_node, write_cluster_configs
+
+
+def test_timed_lock_reports_contended_waits():
+    waits = []
+    lock = threading.Lock()
+    timed = TimedLock(lock, waits.append)
+    with timed:
+        pass
+    assert waits == []  # uncontended
+
+    lock.acquire()
+    releaser = threading.Timer(0.05, lock.release)
+    releaser.start()
+    with timed:
+        assert lock.locked()
+    releaser.join()
+    assert len(waits) == 1 and waits[0] >= 0.03e9
+
+
+def test_slowlog_threshold_and_lock_timers(node, owned_key):
+    key = next(owned_key())
+    assert not node.tracing
+    assert all(type(shard._lock) is not TimedLock for shard in node.local_shards.values())
+    assert node.handle("SLOWLOG GET") == "MULTI 0"
+
+    assert node.handle("SLOWLOG THRESHOLD 0") == "OK"
+    assert node.tracing
+    assert all(type(shard._lock) is TimedLock for shard in node.local_shards.values())
+    node.handle_many([f"PUT {key} v", f"GET {key}", "FOO"])
+    node.handle_frames([(Opcode.PUT, key, b"abc", None)])
+
+    reply = node.handle("SLOWLOG GET 3").split("\n")
+    assert reply[0] == "MULTI 3"
+    newest = reply[1].split()
+    assert newest[0] == "4" and newest[newest.index("command") + 1:] == ["PUT", key, "<3", "bytes>"]
+    assert reply[2].endswith("command FOO") and reply[3].endswith(f"command GET {key}")
+    for phase in ("total_us", "parse_us", "lock_us", "execute_us", "write_us"):
+        assert float(newest[newest.index(phase) + 1]) >= 0
+    assert node.handle("SLOWLOG LEN") == "5"  # and SLOWLOG GET itself
+
+    assert node.handle("SLOWLOG THRESHOLD 10000000") == "OK"
+    logged = node.handle("SLOWLOG LEN")
+    node.handle(f"GET {key}")
+    assert node.handle("SLOWLOG LEN") == logged
+    assert node.handle("SLOWLOG RESET") == "OK"
+    assert node.handle("SLOWLOG LEN") == "0"
+
+    assert node.handle("SLOWLOG THRESHOLD OFF") == "OK"
+    assert not node.tracing
+    assert all(type(shard._lock) is not TimedLock for shard in node.local_shards.values())
+    assert node.handle("SLOWLOG THRESHOLD x").startswith("ERR")
+    assert node.handle("SLOWLOG").startswith("ERR usage")
+
+
+def test_profile_samples_commands(node, owned_key):
+    key = next(owned_key())
+    node = CacheNode(dataclasses.replace(node.cfg, latency_sample=0))
+    assert node.handle("PROFILE STOP") == "ERR no profile running"
+    assert node.handle("PROFILE START 10") == "OK"
+    node.handle_many([f"GET {key}"] * 10_000)
+    reply = node.handle("PROFILE STOP").split("\n")
+    assert not node.tracing
+    assert reply[0] == "MULTI 2" and reply[1].endswith("every 10")
+    fields = reply[2].split()
+    assert fields[0] == "GET"
+    assert 700 <= int(fields[2]) <= 1300
+    assert fields[3:] and fields[3] == "parse_us" and "/" in fields[4]
+    assert len(node.tracer) == 0  # the slowlog stays off
+
+
+def test_tracer_folds_lock_wait_and_write_time():
+    tracer = RequestTracer(threshold_us=0)
+    tracer.framed(1000, 2)
+    tracer.lock_waited(300)
+    tracer.record("GET a", "GET", time.time(), 100, 800, False)
+    tracer.end_batch(5000)
+    [entry] = tracer.entries()
+    assert (entry.parse_ns, entry.lock_ns, entry.execute_ns, entry.write_ns) == (600, 300, 500, 5000)
+    assert entry.total_ns == 6400
+
+
+def test_slowlog_write_phase_over_tcp(tmp_path):
+    cluster_path, [node_path] = write_cluster_configs(tmp_path, n_nodes=1, slowlog_threshold_us=0)
+    proc = start_node(cluster_path, node_path)
+    try:
+        with CacheClient.from_config(str(cluster_path)) as client:
+            client.put("a", "1")
+            [reply] = client._execute(client.cluster_map[0], ["SLOWLOG GET 1"])
+        [fields] = [line.split() for line in reply]
+        assert fields[fields.index("command") + 1:] == ["PUT", "a", "1"]
+        assert float(fields[fields.index("write_us") + 1]) > 0
+    finally:
+        stop_node(proc)
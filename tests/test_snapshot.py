@@ -0,0 +1,146 @@
+import dataclasses
+import time
+
+import pytest
+
+from cache.cache_node import CacheNode
+from cache.client import CacheClient, Connection
+from cache.lru import LRUCache
+from cache.server import restore_snapshot
+from cache.snapshot import SnapshotError, load_snapshot, write_snapshot
+from tests.conftest import start_node, stop_node, write_cluster_configs
+
+
+def test_round_trip_keeps_values_ttls_and_recency(tmp_path):
+    path = str(tmp_path / "snap.bin")
+    shard = LRUCache(capacity=10)
+    shard.put("text", "héllo")
+    shard.put("raw", b"\x00\xff")
+    shard.put("ttl", "t", ttl=60.0)
+    shard.put("dead", "d", ttl=0.01)
+    shard.get("text")
+    time.sleep(0.02)
+
+    assert write_snapshot(path, {0: shard}, n_shards=1) == 3
+
+    restored = LRUCache(capacity=10)
+    assert load_snapshot(path, {0: restored}, n_shards=1, shard_of=lambda k: 0) == 3
+    assert [k for k, _, _ in restored.dump()] == ["raw", "ttl", "text"]
+    assert restored.get("text") == "héllo"
+    assert restored.get("raw") == b"\x00\xff"
+    assert restored.get("dead") is None
+    assert 59 < restored.cache["ttl"].expiration_time - time.time() <= 60
+
+
+def test_smaller_cache_keeps_the_hottest_entries(tmp_path):
+    path = str(tmp_path / "snap.bin")
+    shard = LRUCache(capacity=10)
+    for i in range(10):
+        shard.put(f"k{i}", str(i))
+    write_snapshot(path, {0: shard}, n_shards=1)
+
+    restored = LRUCache(capacity=3)
+    load_snapshot(path, {0: restored}, n_shards=1, shard_of=lambda k: 0)
+    assert sorted(restored.cache) == ["k7", "k8", "k9"]
+
+
+def test_keys_too_long_for_an_entry_are_left_out(tmp_path, node, owned_key):
+    path = str(tmp_path / "snap.bin")
+    shard = LRUCache(capacity=10)
+    shard.put("k" * 70000, "v")
+    shard.put("ok", "v")
+
+    skipped = []
+    assert write_snapshot(path, {0: shard}, n_shards=1, skipped=skipped) == 1
+    assert skipped == ["k" * 70000]
+    restored = LRUCache(capacity=10)
+    assert load_snapshot(path, {0: restored}, n_shards=1, shard_of=lambda k: 0) == 1
+
+    saving = CacheNode(dataclasses.replace(node.cfg, snapshot_path=path))
+    try:
+        key = next(owned_key())
+        saving.handle(f"PUT {key} v")
+        saving.local_shards[saving.shard_id(key)].put("k" * 70000, "v")
+        assert saving.save_snapshot() == 1
+    finally:
+        saving.close()
+
+
+def test_unowned_shards_are_skipped_and_keys_rerouted_on_reshard(tmp_path, node, owned_key):
+    path = str(tmp_path / "snap.bin")
+    keys = [k for k, _ in zip(owned_key(), range(20))]
+    for key in keys:
+        node.handle(f"PUT {key} v")
+    write_snapshot(path, node.local_shards, node.cfg.n_shards)
+
+    only_first = {0: LRUCache(capacity=100)}
+    loaded = load_snapshot(path, only_first, node.cfg.n_shards, node.shard_id)
+    assert loaded == sum(node.shard_id(k) == 0 for k in keys)
+
+    single = {0: LRUCache(capacity=100)}
+    assert load_snapshot(path, single, n_shards=1, shard_of=lambda k: 0) == 20
+
+
+def test_rejects_files_that_are_not_snapshots(tmp_path):
+    path = tmp_path / "junk.bin"
+    path.write_bytes(b"not a snapshot at all")
+    with pytest.raises(SnapshotError):
+        load_snapshot(str(path), {}, n_shards=1, shard_of=lambda k: 0)
+
+    shard = LRUCache(capacity=10)
+    shard.put("k", "v")
+    write_snapshot(str(path), {0: shard}, n_shards=1)
+    path.write_bytes(path.read_bytes()[:-3])
+    with pytest.raises(SnapshotError):
+        load_snapshot(str(path), {0: LRUCache(capacity=10)}, n_shards=1, shard_of=lambda k: 0)
+
+
+def test_entries_too_large_for_the_new_budget_are_skipped(tmp_path):
+    path = str(tmp_path / "snap.bin")
+    shard = LRUCache(capacity=10)
+    shard.put("small", "v")
+    shard.put("big", "x" * 100)
+    shard.put("tail", "w")
+    write_snapshot(path, {0: shard}, n_shards=1)
+
+    restored = LRUCache(capacity=10, max_entry_bytes=50)
+    skipped = []
+    assert load_snapshot(path, {0: restored}, n_shards=1, shard_of=lambda k: 0, skipped=skipped) == 2
+    assert skipped == ["big"]
+    assert [k for k, _, _ in restored.dump()] == ["small", "tail"]
+
+
+def test_restore_starts_empty_when_a_later_section_is_corrupt(tmp_path, node, owned_key):
+    path = tmp_path / "node.snap"
+    for key, _ in zip(owned_key(), range(20)):
+        node.handle(f"PUT {key} v")
+    write_snapshot(str(path), node.local_shards, node.cfg.n_shards)
+    path.write_bytes(path.read_bytes()[:-3])
+
+    fresh = CacheNode(dataclasses.replace(node.cfg, snapshot_path=str(path)))
+    restore_snapshot(fresh)
+    assert all(shard.get_stats().entries == 0 for shard in fresh.local_shards.values())
+
+
+def test_node_restarts_warm_from_its_snapshot(tmp_path):
+    snapshot = tmp_path / "node.snap"
+    cluster_path, [node_path] = write_cluster_configs(tmp_path, n_nodes=1, snapshot_path=str(snapshot))
+
+    proc = start_node(cluster_path, node_path)
+    try:
+        with CacheClient.from_config(str(cluster_path)) as client:
+            client.mset([(f"k{i}", f"v{i}", 300.0 if i % 2 else None) for i in range(100)])
+            conn = Connection(client.address_for("k0"), timeout=5.0)
+            conn.send_lines(["BGSAVE"])
+            assert conn.read_reply() == ["OK"]
+            conn.close()
+    finally:
+        stop_node(proc)  # SIGTERM writes a final snapshot
+    assert snapshot.exists()
+
+    proc = start_node(cluster_path, node_path)
+    try:
+        with CacheClient.from_config(str(cluster_path)) as client:
+            assert client.mget(f"k{i}" for i in range(100)) == {f"k{i}": f"v{i}" for i in range(100)}
+    finally:
+        stop_node(proc)
@@ -0,0 +1,56 @@
+from cache.sketch import CountMinSketch
+from cache.tinylfu import PROTECTED, TinyLFUCache
+
+
+def test_sketch_estimates_and_halves():
+    sketch = CountMinSketch(width=64, sample_size=1_000)
+    for _ in range(6):
+        sketch.increment("hot")
+    sketch.increment("cold")
+
+    assert sketch.estimate("hot") >= 6
+    assert sketch.estimate("cold") >= 1
+    assert sketch.estimate("hot") > sketch.estimate("cold")
+
+    before = sketch.estimate("hot")
+    sketch.reset()
+    assert sketch.estimate("hot") == before // 2
+
+
+def test_sketch_counters_saturate():
+    sketch = CountMinSketch(width=16, sample_size=10_000)
+    for _ in range(100):
+        sketch.increment("k")
+    assert sketch.estimate("k") == CountMinSketch.MAX_COUNT
+
+
+def test_one_off_keys_are_not_admitted_over_frequent_ones():
+    cache = TinyLFUCache(capacity=100)
+    for _ in range(3):
+        for i in range(90):
+            cache.put(i, i)
+            cache.get(i)
+
+    for i in range(1_000, 2_000):
+        cache.put(i, i)
+
+    assert all(cache.get(i) == i for i in range(90))
+    assert len(cache.cache) <= 100
+
+
+def test_probation_hit_promotes_to_protected():
+    cache = TinyLFUCache(capacity=10)
+    for i in range(5):
+        cache.put(i, i)  # window holds one entry, the rest spill into probation
+
+    cache.get(0)
+    assert cache.cache[0].segment == PROTECTED
+    assert len(cache._segments[PROTECTED]) <= cache.protected_capacity
+
+
+def test_capacity_of_one():
+    cache = TinyLFUCache(capacity=1)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("b") == 2
+    assert len(cache.cache) == 1
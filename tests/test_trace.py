@@ -0,0 +1,89 @@
+import dataclasses
+import random
+
+import pytest
+
+from cache.benchmarks.hit_ratio_benchmarks import zipf_trace
+from cache.cache_node import CacheNode
+from cache.eviction import EvictionPolicy
+from cache.protocol import Opcode
+from cache.simulator import load_trace, lru_curve, policy_curve, replay_misses, stack_distances
+from cache.trace import OP_DEL, OP_GET, OP_PUT, TraceRecorder, key_hash, read_trace
+
+
+def write_trace(path, requests):
+    recorder = TraceRecorder(str(path))
+    for op, key in requests:
+        recorder.record(op, f"key{key}", 10 if op == OP_PUT else 0)
+    recorder.close()
+    return str(path)
+
+
+def test_node_records_requests(node, owned_key, tmp_path):
+    keys = owned_key()
+    a, b = next(keys), next(keys)
+    assert node.handle("TRACE START") == "ERR no trace_path configured"
+
+    path = str(tmp_path / "trace.bin")
+    node = CacheNode(dataclasses.replace(node.cfg, trace_path=path))
+    assert node.handle("TRACE STATUS") == "OFF"
+    assert node.handle("TRACE START") == "OK"
+    node.handle_many([f"PUT {a} hello 60", f"GET {a}", f"GET {b}", f"MSET {b} xy", f"MGET {a} {b}", f"DEL {a}"])
+    node.handle_frames([(Opcode.PUT, b, b"abc", None), (Opcode.GET, b, b"", None)])
+    assert node.handle("TRACE STATUS") == f"RECORDING {path} RECORDS 0"  # still buffered
+    assert node.handle("TRACE STOP") == "RECORDS 9"
+    assert node.handle("TRACE STOP") == "ERR no trace running"
+    node.handle(f"GET {a}")
+
+    records = list(read_trace(path))
+    assert [(r.op, r.key_hash, r.size) for r in records] == [
+        (OP_PUT, key_hash(a), 5), (OP_GET, key_hash(a), 5), (OP_GET, key_hash(b), 0), (OP_PUT, key_hash(b), 2),
+        (OP_GET, key_hash(a), 5), (OP_GET, key_hash(b), 2), (OP_DEL, key_hash(a), 0), (OP_PUT, key_hash(b), 3),
+        (OP_GET, key_hash(b), 3),
+    ]
+    assert records[0].ttl == 60 and records[3].ttl == 0
+    assert all(r.t_ns <= s.t_ns for r, s in zip(records, records[1:]))
+
+
+def test_stack_distances_match_lru_replay(tmp_path):
+    rng = random.Random(7)
+    keys = zipf_trace(20_000, 2_000, 0.8, seed=3)
+    sizes = [1, 10, 100, 500, 1500]
+    for name, del_ratio, tolerance in (("reads_writes", 0.0, 1e-12), ("with_dels", 0.05, 0.005)):
+        requests = []
+        for key in keys:
+            r = rng.random()
+            requests.append((OP_DEL if r < del_ratio else OP_PUT if r < 0.2 else OP_GET, key))
+        trace = load_trace([write_trace(tmp_path / f"{name}.bin", requests)], use_numpy=False)
+        assert trace.requests == 20_000 and len(trace.ops) == 20_000
+
+        curve = lru_curve(stack_distances(trace.ops, trace.keys), trace, sizes)
+        exact = [replay_misses(EvictionPolicy.LRU, size, trace.ops, trace.keys) / trace.gets for size in sizes]
+        assert curve == pytest.approx(exact, abs=tolerance)
+        assert curve == sorted(curve, reverse=True)
+
+
+def test_sampled_curves_approximate_full_ones(tmp_path):
+    path = write_trace(tmp_path / "t.bin", [(OP_GET, key) for key in zipf_trace(200_000, 50_000, 0.9)])
+    sizes = [1_000, 5_000, 20_000]
+    full = load_trace([path], use_numpy=False)
+    sampled = load_trace([path], sample=0.3, use_numpy=False)
+    assert 0.25 * len(full.ops) < len(sampled.ops) < 0.35 * len(full.ops)
+
+    exact = lru_curve(stack_distances(full.ops, full.keys), full, sizes)
+    estimate = lru_curve(stack_distances(sampled.ops, sampled.keys), sampled, sizes)
+    assert estimate == pytest.approx(exact, abs=0.03)
+    assert policy_curve(EvictionPolicy.LRU, sampled, sizes) == pytest.approx(exact, abs=0.03)
+
+
+def test_numpy_loader_matches(tmp_path):
+    pytest.importorskip("numpy")
+    first = write_trace(tmp_path / "a.bin", [(OP_GET, i % 5_000) for i in range(30_000)])
+    second = write_trace(tmp_path / "b.bin", [(OP_PUT, i % 7_000) for i in range(20_000)])
+    with open(second, "ab") as f:
+        f.write(b"\x00" * 7)  # torn last record
+    for sample in (1.0, 0.05):
+        plain = load_trace([first, second], sample, use_numpy=False)
+        vectorized = load_trace([first, second], sample, use_numpy=True)
+        assert plain == vectorized
+        assert plain.requests == 50_000 and plain.gets == 30_000
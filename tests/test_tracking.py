@@ -0,0 +1,145 @@
+import json
+import time
+
+import pytest
+from cache.client import CacheClient
+from cache.near_cache import NearCacheClient
+from cache.tracking import Tracker
+from tests.conftest import start_node, stop_node, write_cluster_configs
+
+
+def test_tracker_pushes_to_sessions_that_read_the_key():
+    tracker = Tracker()
+    reader_pushes, other_pushes = [], []
+    reader, other = tracker.open(reader_pushes.append), tracker.open(other_pushes.append)
+    assert tracker.enable(reader, None, False, []) is None
+    tracker.track(reader, ["a", "b"])
+
+    tracker.invalidate("a")
+    tracker.invalidate("c")
+    tracker.flush()
+    assert reader_pushes == [b"INVALIDATE a\n"]
+    assert other_pushes == []
+
+    # a is forgotten until it is read again
+    tracker.invalidate("a")
+    tracker.flush()
+    assert reader_pushes == [b"INVALIDATE a\n"]
+
+    assert tracker.enable(other, None, True, ["b"]) is None
+    tracker.invalidate("b")
+    tracker.invalidate_all()
+    tracker.flush()
+    assert reader_pushes[-1] == b"INVALIDATE\n"
+    assert other_pushes == [b"INVALIDATE\n"]
+
+
+def test_tracker_redirect_and_overflow():
+    tracker = Tracker(max_keys=2)
+    pushes = []
+    listener = tracker.open(pushes.append)
+    reader = tracker.open(None)
+    assert tracker.enable(reader, 999, False, []) == "no client with id 999"
+    assert tracker.enable(reader, reader.id, False, []).startswith("the client receiving")
+    assert tracker.enable(reader, listener.id, False, ["p"]) == "PREFIX needs BCAST"
+    assert tracker.enable(reader, listener.id, False, []) is None
+
+    # the oldest key is invalidated to make room
+    tracker.track(reader, ["a", "b", "c"])
+    tracker.flush()
+    assert pushes == [b"INVALIDATE a\n"]
+    assert tracker.info()["tracked_keys"] == 2
+
+
+def test_node_tracks_reads_per_session(node, owned_key):
+    keys = owned_key()
+    hit, missed, other = next(keys), next(keys), next(keys)
+    pushes = []
+    session = node.open_session(pushes.append)
+    assert node.handle("CLIENT ID", session) == f"ID {session.id}"
+    assert node.handle("CLIENT TRACKING ON", session) == "OK"
+    assert node.handle("CLIENT ID").startswith("ERR")
+
+    node.handle(f"PUT {hit} v")
+    node.handle(f"PUT {other} v")
+    assert node.handle(f"GET {hit}", session) == "VALUE v"
+    assert node.handle(f"MGET {missed}", session) == "MULTI 1\nNOT_FOUND"
+    node.handle(f"PUT {hit} v2")
+    node.handle(f"PUT {missed} v")
+    node.handle(f"PUT {other} v2")
+    node.commit_log()
+    assert pushes == [f"INVALIDATE {hit}\n".encode(), f"INVALIDATE {missed}\n".encode()]
+
+    assert node.handle("CLIENT TRACKING OFF", session) == "OK"
+    node.handle(f"GET {hit}", session)
+    node.handle(f"DEL {hit}")
+    node.commit_log()
+    assert len(pushes) == 2
+    node.close_session(session)
+
+
+def test_eviction_pushes_invalidations(node, owned_key):
+    pushes = []
+    session = node.open_session(pushes.append)
+    node.handle("CLIENT TRACKING ON BCAST PREFIX ev", session)
+    for key, _ in zip(owned_key("ev"), range(150)):
+        node.handle(f"PUT {key} v")
+    node.commit_log()
+    invalidated = {k for p in pushes for k in p.decode().split()[1:]}
+    # every key was written (and some of them then evicted); all were pushed
+    assert len(invalidated) == 150
+
+
+@pytest.fixture
+def sweeping_cluster(tmp_path):
+    """Two `cache.server` processes that sweep expired keys every 50ms."""
+    cluster_path, node_paths = write_cluster_configs(tmp_path, expire_interval=0.05)
+    procs = []
+    try:
+        for node_path in node_paths:
+            procs.append(start_node(cluster_path, node_path))
+        yield json.loads(cluster_path.read_text())
+    finally:
+        for proc in procs:
+            stop_node(proc)
+
+
+def test_near_cache_is_invalidated_by_other_clients(sweeping_cluster):
+    with NearCacheClient(sweeping_cluster, near_capacity=100) as near, CacheClient(sweeping_cluster) as other:
+        other.mset([(f"k{i}", "v1", None) for i in range(10)])
+        other.put("short", "v1", ttl=0.3)
+        assert near.mget(f"k{i}" for i in range(10)) == {f"k{i}": "v1" for i in range(10)}
+        assert near.get("short") == "v1"
+        assert near.get("k3") == "v1"
+        assert near.near_stats()["hits"] == 1
+
+        other.put("k3", "v2")
+        other.delete("k4")
+        deadline = time.time() + 5
+        while near.near.get("short") is not None and time.time() < deadline:
+            time.sleep(0.05)
+
+        assert near.get("k3") == "v2"
+        assert near.get("k4") is None
+        assert near.get("short") is None
+        assert near.near_stats()["invalidations"] >= 3
+
+        # own writes are visible at once
+        near.put("k5", "mine")
+        assert near.get("k5") == "mine"
+
+
+def test_near_cache_bcast_prefixes(local_cluster):
+    cluster_json = json.loads(local_cluster.read_text())
+    with NearCacheClient(cluster_json, bcast_prefixes=["user:"]) as near, CacheClient(cluster_json) as other:
+        other.put("user:1", "a")
+        other.put("order:1", "a")
+        assert near.get("user:1") == "a"
+        assert near.get("order:1") == "a"
+        assert near.near_stats()["entries"] == 1
+
+        other.put("user:1", "b")
+        deadline = time.time() + 5
+        while near.near.get("user:1") is not None and time.time() < deadline:
+            time.sleep(0.05)
+        assert near.get("user:1") == "b"
@@ -0,0 +1,107 @@
+import json
+
+import pytest
+
+from cache.client import CacheClient, Connection
+from cache.protocol import Opcode, Status
+from cache.workers import parse_stats_line, split_shards
+
+
+def test_split_shards_deals_round_robin():
+    assert split_shards({3, 0, 2, 1, 4}, 2) == [[0, 2, 4], [1, 3]]
+    with pytest.raises(ValueError):
+        split_shards({0, 1}, 3)
+
+
+def test_stats_frame_can_be_limited_to_shards(node, owned_key):
+    key = next(owned_key())
+    node.handle(f"PUT {key} v")
+
+    sid = node.shard_id(key)
+    status, body = node.handle_frame(Opcode.STATS, str(sid), b"", None)
+    assert status == Status.OK
+    assert parse_stats_line(body.decode()).puts == 1
+
+    other = next(s for s in node.cfg.owned_shards if s != sid)
+    assert parse_stats_line(node.handle_frame(Opcode.STATS, str(other), b"", None)[1].decode()).puts == 0
+    assert node.handle_frame(Opcode.STATS, "3", b"", None)[0] == Status.ERR
+
+
+def test_workers_forward_sibling_shards_and_aggregate_stats(worker_node):
+    with CacheClient.from_config(str(worker_node), pool_size=4) as client:
+        keys = [f"w:{i}" for i in range(100)]
+        for i, key in enumerate(keys):
+            client.put(key, str(i))
+        client.mset([(f"m:{i}", str(i), 60.0) for i in range(50)])
+
+        # every connection lands on one worker, which forwards half the shards
+        assert [client.get(k) for k in keys] == [str(i) for i in range(100)]
+        assert client.mget(f"m:{i}" for i in range(50)) == {f"m:{i}": str(i) for i in range(50)}
+        assert client.delete(keys[0]) is True
+        assert client.get(keys[0]) is None
+
+        [line] = client.stats().values()
+        stats = parse_stats_line(line)
+        assert stats.puts == 150
+        assert stats.gets == 151
+
+
+def test_pipelined_forwards_keep_per_key_order(worker_node):
+    port = json.loads(worker_node.read_text())["cluster_map"]["0"][1]
+    keys = [f"p:{i}" for i in range(8)]  # spread over both workers' shards
+    lines = []
+    for key in keys:
+        lines += [f"PUT {key} a", f"GET {key}", f"PUT {key} b"]
+    lines += ["MGET " + " ".join(keys)] + [f"DEL {key}" for key in keys] + [f"GET {keys[0]}"]
+
+    conn = Connection(("127.0.0.1", port), timeout=5.0)
+    try:
+        conn.send_lines(lines)
+        replies = [conn.read_reply() for _ in lines]
+    finally:
+        conn.close()
+
+    assert replies[:24] == [["STORED"], ["VALUE a"], ["STORED"]] * 8
+    assert replies[24] == ["VALUE b"] * 8
+    assert replies[25:33] == [["DELETED"]] * 8
+    assert replies[33] == ["NOT_FOUND"]
+
+
+def test_forwards_that_do_not_fit_a_frame_are_answered(worker_node):
+    port = json.loads(worker_node.read_text())["cluster_map"]["0"][1]
+    keys = [f"t:{i}" for i in range(8)]
+    lines = [f"PUT {key} v 5000000" for key in keys]  # about 58 days, over ttl_ms
+    lines += [f"PUT {keys[0]} v nan", f"PUT {'k' * 70000} v", f"GET {'k' * 70000}"]
+    lines += [f"GET {key}" for key in keys]
+
+    conn = Connection(("127.0.0.1", port), timeout=5.0)
+    try:
+        conn.send_lines(lines)
+        replies = [conn.read_reply() for _ in lines]
+    finally:
+        conn.close()
+
+    assert replies[:8] == [["STORED"]] * 8
+    assert replies[8:11] == [["ERR ttl must be a positive number"], ["ERR key_too_long"], ["ERR key_too_long"]]
+    assert replies[11:] == [["VALUE v"]] * 8
+
+
+def test_atomic_updates_run_on_the_owning_worker(worker_node):
+    port = json.loads(worker_node.read_text())["cluster_map"]["0"][1]
+    keys = [f"a:{i}" for i in range(8)]  # spread over both workers' shards
+    lines = []
+    for key in keys:
+        lines += [f"INCR {key} 1 5 60", f"DECR {key} 2", f"APPEND {key} x", f"INCR {key}", f"GETS {key}"]
+
+    conn = Connection(("127.0.0.1", port), timeout=5.0)
+    try:
+        conn.send_lines(lines)
+        replies = [conn.read_reply() for _ in lines]
+        for i, key in enumerate(keys):
+            assert replies[5 * i:5 * i + 4] == [["VALUE 5"], ["VALUE 3"], ["STORED"], ["ERR not_an_integer"]]
+            value, _, version = replies[5 * i + 4][0].split()[1:]
+            assert value == "3x"
+            conn.send_lines([f"CAS {key} new {version}", f"CAS {key} newer {version}", f"GET {key}"])
+            assert [conn.read_reply() for _ in range(3)] == [["STORED"], ["EXISTS"], ["VALUE new"]]
+    finally:
+        conn.close()